@@ -1,15 +1,20 @@
 """ Frontend to MySQL DB AccountingDB
 """
+import copy
 import datetime
 import time
 import threading
 import random
 
+import numpy as np
+
 from DIRAC.Core.Base.DB import DB
 from DIRAC import S_OK, S_ERROR, gConfig
 from DIRAC.Core.Utilities import List, ThreadSafe, Time, DEncode
+from DIRAC.Core.Utilities.DictCache import DictCache
 from DIRAC.Core.Utilities.Plotting.TypeLoader import TypeLoader
 from DIRAC.Core.Utilities.ThreadPool import ThreadPool
+from DIRAC.AccountingSystem.private import BucketCompaction
 
 gSynchro = ThreadSafe.Synchronizer()
 
@@ -32,6 +37,19 @@ class AccountingDB(DB):
         maxParallelInsertions = self.getCSOption("ParallelRecordInsertions", 10)
         self.__threadPool = ThreadPool(1, maxParallelInsertions)
         self.__threadPool.daemonize()
+        # Compaction: time span of the windows compacted in one transaction, and buckets read per query
+        self.__compactionWindow = int(self.getCSOption("CompactionWindow", 86400))
+        self.__compactionChunkSize = int(self.getCSOption("CompactionChunkSize", 10000))
+        self.__slowCompaction = self.getCSOption("SlowCompaction", False)
+        # Cache of the results of retrieveBucketedData. The results for buckets which are not compacted any more
+        # are kept longer, the others for the length of their buckets at most
+        self.__reportCache = DictCache(maxEntries=int(self.getCSOption("ReportCacheSize", 1000)))
+        self.__reportCacheLifeTime = int(self.getCSOption("ReportCacheLifeTime", 300))
+        self.__immutableReportCacheLifeTime = int(self.getCSOption("ImmutableReportCacheLifeTime", 3600))
+        # Bumped when this object modifies buckets considered immutable, to invalidate the cached results of a type.
+        # The modifications made by other processes (e.g. the records inserted by the DataStore) are not seen:
+        # they are only taken into account when the cached results expire
+        self.__reportCacheGeneration = {}
         self.catalogTableName = _getTableName("catalog", "Types")
         self._createTables(
             {
@@ -456,6 +474,7 @@ class AccountingDB(DB):
         if not retVal["OK"]:
             return retVal
         retVal = self._update("DELETE FROM `%s` WHERE name='%s'" % (_getTableName("catalog", "Types"), typeName))
+        self.__invalidateReportCache(typeName)
         del self.dbCatalog[typeName]
         return S_OK()
 
@@ -565,15 +584,27 @@ class AccountingDB(DB):
     def insertRecordBundleThroughQueue(self, recordsToQueue):
         if self.__readOnly:
             return S_ERROR("ReadOnly mode enabled. No modification allowed")
-        recordsToProcess = []
-        now = Time.toEpoch()
-        for record in recordsToQueue:
-            typeName, startTime, endTime, valuesList = record
-            result = self.__insertInQueueTable(typeName, startTime, endTime, valuesList)
-            if not result["OK"]:
-                return result
-            iD = result["Value"]
-            recordsToProcess.append((iD, typeName, startTime, endTime, valuesList, now))
+        # Group the records by type, to insert them with as few statements as possible
+        rowsByType = {}
+        for typeName, startTime, endTime, valuesList in recordsToQueue:
+            if typeName not in self.dbCatalog:
+                return S_ERROR("Type %s has not been defined in the db" % typeName)
+            rowsByType.setdefault(typeName, []).append(list(valuesList) + [startTime, endTime])
+
+        now = Time.dateTime()
+        for typeName, rows in rowsByType.items():
+            typeFields = self.dbCatalog[typeName]["typeFields"]
+            for row in rows:
+                if len(row) != len(typeFields):
+                    return S_ERROR(
+                        "Fields mismatch for record %s. %s fields and %s expected"
+                        % (typeName, len(row), len(typeFields))
+                    )
+            retVal = self.bulkInsert(
+                _getTableName("in", typeName), ["taken", "takenSince"] + typeFields, ([0, now] + row for row in rows)
+            )
+            if not retVal["OK"]:
+                return retVal
 
         return S_OK()
 
@@ -730,6 +761,7 @@ class AccountingDB(DB):
         buckets = self.calculateBuckets(typeName, startTime, endTime)
         if not buckets:
             return S_OK()
+        self.__invalidateReportCache(typeName, buckets[0][0])
         # Separate key values from normal values
         numKeys = len(self.dbCatalog[typeName]["keys"])
         keyValues = valuesList[:numKeys]
@@ -743,6 +775,8 @@ class AccountingDB(DB):
         """
         # Calculate amount of buckets
         buckets = self.calculateBuckets(typeName, startTime, endTime, self.__lastCompactionEpoch)
+        if buckets:
+            self.__invalidateReportCache(typeName, buckets[0][0])
         # Separate key values from normal values
         numKeys = len(self.dbCatalog[typeName]["keys"])
         keyValues = valuesList[:numKeys]
@@ -942,7 +976,6 @@ class AccountingDB(DB):
         """
         if typeName not in self.dbCatalog:
             return S_ERROR("Type %s is not defined" % typeName)
-        startQueryEpoch = time.time()
         if len(selectFields) < 2:
             return S_ERROR("selectFields has to be a list containing a string and a list of fields")
         retVal = self.__checkIncomingFieldsForQuery(
@@ -953,16 +986,119 @@ class AccountingDB(DB):
         nowEpoch = Time.toEpoch(Time.dateTime())
         bucketTimeLength = self.calculateBucketLengthForTime(typeName, nowEpoch, startTime)
         startTime = startTime - startTime % bucketTimeLength
-        result = self.__queryType(
-            typeName, startTime, endTime, selectFields, condDict, groupFields, orderFields, "bucket", connObj=connObj
+        startTime, endTime = self.__getBucketTimeLimits(typeName, startTime, endTime)
+
+        queryArgs = (selectFields, condDict, groupFields, orderFields)
+        immutableLimit = self.__getImmutableBucketsLimit(typeName, nowEpoch)
+        timeOrdered = not orderFields or list(orderFields[1]) == ["startTime"]
+        if (
+            groupFields
+            and "startTime" in groupFields[1]
+            and timeOrdered
+            and endTime
+            and startTime < immutableLimit <= endTime
+        ):
+            # The rows of the buckets which are not compacted any more are cached on their own,
+            # so that only the recent buckets have to be queried again
+            retVal = self.__cachedQueryType(typeName, startTime, immutableLimit - 1, queryArgs, connObj=connObj)
+            if not retVal["OK"]:
+                return retVal
+            oldRows = retVal["Value"]
+            retVal = self.__cachedQueryType(typeName, immutableLimit, endTime, queryArgs, connObj=connObj)
+            if not retVal["OK"]:
+                return retVal
+            return S_OK(tuple(oldRows) + tuple(retVal["Value"]))
+        return self.__cachedQueryType(typeName, startTime, endTime, queryArgs, connObj=connObj)
+
+    def __getBucketTimeLimits(self, typeName, startTime, endTime):
+        """
+        Get the start times of the first and last buckets to select between two times
+        """
+        # HACK because MySQL and UNIX do not start epoch at the same time
+        if startTime:
+            startTime = self.calculateBuckets(typeName, startTime + 3600, startTime + 3600)[0][0]
+        if endTime:
+            endTime = self.calculateBuckets(typeName, endTime + 3600, endTime + 3600)[0][0]
+        return startTime, endTime
+
+    def __getImmutableBucketsLimit(self, typeName, nowEpoch):
+        """
+        Get the time before which the buckets have their final length, and are not changed by the compaction
+        """
+        bucketsLength = self.dbBucketsLength[typeName]
+        if len(bucketsLength) < 2:
+            return 0
+        maxBucketLength = bucketsLength[-1][1]
+        limit = nowEpoch - nowEpoch % bucketsLength[-2][1] - bucketsLength[-2][0] - maxBucketLength
+        return int(limit - limit % maxBucketLength)
+
+    def __invalidateReportCache(self, typeName, bucketStartTime=None):
+        """
+        Invalidate the cached results of a type, if the modified buckets are considered as immutable
+        or if no bucket start time is given
+        """
+        if bucketStartTime is None or bucketStartTime < self.__getImmutableBucketsLimit(typeName, Time.toEpoch()):
+            self.__reportCacheGeneration[typeName] = self.__reportCacheGeneration.get(typeName, 0) + 1
+
+    def __cachedQueryType(self, typeName, startTime, endTime, queryArgs, connObj=False):
+        """
+        Query the buckets between the start times of the first and last buckets, or get the result from the cache
+        """
+        selectFields, condDict, groupFields, orderFields = queryArgs
+        cacheKey = repr(
+            (
+                typeName,
+                self.__reportCacheGeneration.get(typeName, 0),
+                startTime,
+                endTime,
+                selectFields,
+                sorted(condDict.items()),
+                groupFields,
+                orderFields,
+            )
         )
-        return result
+        result = self.__reportCache.get(cacheKey)
+        if result is not None:
+            return S_OK(result)
+        # __queryType modifies its arguments
+        retVal = self.__queryType(
+            typeName,
+            startTime,
+            endTime,
+            *copy.deepcopy(queryArgs),
+            tableType="bucket",
+            connObj=connObj,
+            bucketedTimes=True,
+        )
+        if not retVal["OK"]:
+            return retVal
+        nowEpoch = Time.toEpoch()
+        if endTime and endTime < self.__getImmutableBucketsLimit(typeName, nowEpoch):
+            lifeTime = self.__immutableReportCacheLifeTime
+        else:
+            bucketLength = self.calculateBucketLengthForTime(typeName, nowEpoch, endTime or nowEpoch)
+            lifeTime = min(self.__reportCacheLifeTime, bucketLength)
+        self.__reportCache.add(cacheKey, lifeTime, tuple(retVal["Value"]))
+        return retVal
 
     def __queryType(
-        self, typeName, startTime, endTime, selectFields, condDict, groupFields, orderFields, tableType, connObj=False
+        self,
+        typeName,
+        startTime,
+        endTime,
+        selectFields,
+        condDict,
+        groupFields,
+        orderFields,
+        tableType,
+        connObj=False,
+        bucketedTimes=False,
     ):
         """
         Execute a query over a main table
+
+        :param bool bucketedTimes: for the bucket table, whether startTime and endTime are already
+                                   the start times of the first and last buckets
         """
 
         tableName = _getTableName(tableType, typeName)
@@ -1021,17 +1157,13 @@ class AccountingDB(DB):
         cmd += " FROM %s" % ", ".join(sqlFromList)
         # Calculate time conditions
         sqlTimeCond = []
+        if tableType == "bucket" and not bucketedTimes:
+            startTime, endTime = self.__getBucketTimeLimits(typeName, startTime, endTime)
         if startTime:
-            if tableType == "bucket":
-                # HACK because MySQL and UNIX do not start epoch at the same time
-                startTime = startTime + 3600
-                startTime = self.calculateBuckets(typeName, startTime, startTime)[0][0]
             sqlTimeCond.append("`%s`.`startTime` >= %s" % (tableName, startTime))
         if endTime:
             if tableType == "bucket":
                 endTimeSQLVar = "startTime"
-                endTime = endTime + 3600
-                endTime = self.calculateBuckets(typeName, endTime, endTime)[0][0]
             else:
                 endTimeSQLVar = "endTime"
             sqlTimeCond.append("`%s`.`%s` <= %s" % (tableName, endTimeSQLVar, endTime))
@@ -1107,7 +1239,6 @@ class AccountingDB(DB):
             self.__doingCompaction = True
         finally:
             gSynchro.unlock()
-        slow = True
         for typeName in self.dbCatalog:
             if typeFilter and typeName.find(typeFilter) == -1:
                 self.log.info("[COMPACT] Skipping %s" % typeName)
@@ -1116,10 +1247,11 @@ class AccountingDB(DB):
                 self.log.info("[COMPACT] Deleting records older that timespan for type %s" % typeName)
                 self.__deleteRecordsOlderThanDataTimespan(typeName)
             self.log.info("[COMPACT] Compacting %s" % typeName)
-            if slow:
+            if self.__slowCompaction:
                 self.__slowCompactBucketsForType(typeName)
             else:
                 self.__compactBucketsForType(typeName)
+            self.__invalidateReportCache(typeName)
         self.log.info("[COMPACT] Compaction finished")
         self.__lastCompactionEpoch = int(Time.toEpoch())
         gSynchro.lock()
@@ -1130,90 +1262,198 @@ class AccountingDB(DB):
             gSynchro.unlock()
         return S_OK()
 
-    def __selectForCompactBuckets(self, typeName, timeLimit, bucketLength, nextBucketLength, connObj=False):
+    def __selectForCompactBuckets(
+        self, typeName, windowStart, windowEnd, bucketLength, afterKey, querySize, connObj=False
+    ):
         """
-        Nasty SQL query to get ideal buckets using grouping by date calculations and adding value contents
+        Get a chunk of the buckets of a time window, ordered by start time and keys as the unique index
+
+        :param afterKey: (startTime, key IDs...) of the last bucket of the previous chunk, None for the first one
         """
         tableName = _getTableName("bucket", typeName)
-        selectSQL = "SELECT "
-        sqlSelectList = []
-        for field in self.dbCatalog[typeName]["keys"]:
-            sqlSelectList.append("`%s`.`%s`" % (tableName, field))
+        orderFields = ["`%s`.`startTime`" % tableName]
+        orderFields.extend("`%s`.`%s`" % (tableName, field) for field in self.dbCatalog[typeName]["keys"])
+        sqlSelectList = list(orderFields)
         for field in self.dbCatalog[typeName]["values"]:
-            sqlSelectList.append("SUM( `%s`.`%s` )" % (tableName, field))
-        sqlSelectList.append("SUM( `%s`.`entriesInBucket` )" % (tableName))
-        sqlSelectList.append("MIN( `%s`.`startTime` )" % tableName)
-        sqlSelectList.append("MAX( `%s`.`startTime` )" % tableName)
-        selectSQL += ", ".join(sqlSelectList)
-        selectSQL += " FROM `%s`" % tableName
-        selectSQL += " WHERE `%s`.`startTime` < '%s' AND" % (tableName, timeLimit)
-        selectSQL += " `%s`.`bucketLength` = %s" % (tableName, bucketLength)
-        # MAGIC bucketing
-        sqlGroupList = [_bucketizeDataField("`%s`.`startTime`" % tableName, nextBucketLength)]
-        for field in self.dbCatalog[typeName]["keys"]:
-            sqlGroupList.append("`%s`.`%s`" % (tableName, field))
-        selectSQL += " GROUP BY %s" % ", ".join(sqlGroupList)
+            sqlSelectList.append("`%s`.`%s`" % (tableName, field))
+        sqlSelectList.append("`%s`.`entriesInBucket`" % tableName)
+        selectSQL = "SELECT %s FROM `%s`" % (", ".join(sqlSelectList), tableName)
+        selectSQL += " WHERE `%s`.`startTime` >= %d AND `%s`.`startTime` < %d" % (
+            tableName,
+            windowStart,
+            tableName,
+            windowEnd,
+        )
+        selectSQL += " AND `%s`.`bucketLength` = %d" % (tableName, bucketLength)
+        if afterKey:
+            selectSQL += " AND ( %s ) > ( %s )" % (", ".join(orderFields), ", ".join("%d" % v for v in afterKey))
+        selectSQL += " ORDER BY %s LIMIT %d" % (", ".join(orderFields), querySize)
         return self._query(selectSQL, conn=connObj)
 
-    def __deleteForCompactBuckets(self, typeName, timeLimit, bucketLength, connObj=False):
+    def __deleteForCompactBuckets(self, typeName, windowStart, windowEnd, bucketLength, connObj=False):
         """
         Delete compacted buckets
         """
         tableName = _getTableName("bucket", typeName)
         deleteSQL = "DELETE FROM `%s` WHERE " % tableName
-        deleteSQL += "`%s`.`startTime` < '%s' AND " % (tableName, timeLimit)
-        deleteSQL += "`%s`.`bucketLength` = %s" % (tableName, bucketLength)
+        deleteSQL += "`%s`.`startTime` >= %d AND `%s`.`startTime` < %d AND " % (
+            tableName,
+            windowStart,
+            tableName,
+            windowEnd,
+        )
+        deleteSQL += "`%s`.`bucketLength` = %d" % (tableName, bucketLength)
         return self._update(deleteSQL, conn=connObj)
 
+    def __getCompactionWindows(self, typeName, timeLimit, bucketLength, nextBucketLength):
+        """
+        Get the time windows containing buckets to compact, aligned on the next bucket length
+
+        :return: S_OK(list of (windowStart, windowEnd))
+        """
+        tableName = _getTableName("bucket", typeName)
+        retVal = self._query(
+            "SELECT MIN(`startTime`), MAX(`startTime`) FROM `%s` WHERE `startTime` < %d AND `bucketLength` = %d"
+            % (tableName, timeLimit, bucketLength)
+        )
+        if not retVal["OK"]:
+            return retVal
+        minTime, maxTime = retVal["Value"][0]
+        if minTime is None:
+            return S_OK([])
+        windowLength = nextBucketLength * max(1, self.__compactionWindow // nextBucketLength)
+        windows = []
+        windowStart = int(minTime) - int(minTime) % nextBucketLength
+        while windowStart <= maxTime:
+            windows.append((windowStart, min(windowStart + windowLength, timeLimit)))
+            windowStart += windowLength
+        return S_OK(windows)
+
+    def __compactWindow(self, typeName, windowStart, windowEnd, bucketLength, nextBucketLength):
+        """
+        Compact the buckets of a time window into buckets of the next length, in a single transaction
+
+        :return: S_OK(number of compacted buckets)
+        """
+        numKeys = len(self.dbCatalog[typeName]["keys"])
+        retVal = self._getConnection()
+        if not retVal["OK"]:
+            return retVal
+        connObj = retVal["Value"]
+        try:
+            retVal = self.__startTransaction(connObj)
+            if not retVal["OK"]:
+                return retVal
+            compacted = 0
+            lastKey = None
+            while True:
+                retVal = self.__selectForCompactBuckets(
+                    typeName, windowStart, windowEnd, bucketLength, lastKey, self.__compactionChunkSize, connObj
+                )
+                if not retVal["OK"]:
+                    self.__rollbackTransaction(connObj)
+                    return retVal
+                bucketsData = retVal["Value"]
+                if not bucketsData:
+                    break
+                data = np.asarray(bucketsData, dtype=np.float64)
+                startTimes, keys, values = BucketCompaction.rebucket(
+                    data[:, 0], bucketLength, data[:, 1 : numKeys + 1], data[:, numKeys + 1 :], nextBucketLength
+                )
+                retVal = self.__bulkWriteBuckets(typeName, startTimes, nextBucketLength, keys, values, connObj)
+                if not retVal["OK"]:
+                    self.__rollbackTransaction(connObj)
+                    return retVal
+                compacted += len(bucketsData)
+                if len(bucketsData) < self.__compactionChunkSize:
+                    break
+                lastKey = [int(value) for value in bucketsData[-1][: numKeys + 1]]
+            if compacted:
+                retVal = self.__deleteForCompactBuckets(typeName, windowStart, windowEnd, bucketLength, connObj)
+                if not retVal["OK"]:
+                    self.__rollbackTransaction(connObj)
+                    return retVal
+            retVal = self.__commitTransaction(connObj)
+            if not retVal["OK"]:
+                self.__rollbackTransaction(connObj)
+                return retVal
+            return S_OK(compacted)
+        finally:
+            self._releaseConnection()
+
     def __compactBucketsForType(self, typeName):
         """
         Compact all buckets for a given type
+
+        For each bucket length, the buckets to compact are processed by time windows. The buckets of a window
+        are read in key-ordered chunks, re-bucketed with NumPy into the next bucket length and added to the
+        existing buckets with multi-row upserts. Each window is compacted in its own transaction, so that
+        an interrupted compaction resumes from the first window not compacted yet.
         """
         nowEpoch = Time.toEpoch()
-        # retVal = self.__startTransaction(connObj)
-        # if not retVal[ 'OK' ]:
-        #  return retVal
-        for bPos in range(len(self.dbBucketsLength[typeName]) - 1):
-            self.log.info("[COMPACT] Query %d of %d" % (bPos + 1, len(self.dbBucketsLength[typeName]) - 1))
+        numLevels = len(self.dbBucketsLength[typeName]) - 1
+        for bPos in range(numLevels):
             secondsLimit = self.dbBucketsLength[typeName][bPos][0]
             bucketLength = self.dbBucketsLength[typeName][bPos][1]
             timeLimit = (nowEpoch - nowEpoch % bucketLength) - secondsLimit
             nextBucketLength = self.dbBucketsLength[typeName][bPos + 1][1]
             self.log.info(
-                "[COMPACT] Compacting data newer that %s with bucket size %s"
-                % (Time.fromEpoch(timeLimit), bucketLength)
+                "[COMPACT] Compacting data older than %s with bucket size %s for %s (%d of %d)"
+                % (Time.fromEpoch(timeLimit), bucketLength, typeName, bPos + 1, numLevels)
             )
-            # Retrieve the data
-            retVal = self.__selectForCompactBuckets(typeName, timeLimit, bucketLength, nextBucketLength)
-            if not retVal["OK"]:
-                # self.__rollbackTransaction(connObj)
-                return retVal
-            bucketsData = retVal["Value"]
-            self.log.info("[COMPACT] Got %d records to compact" % len(bucketsData))
-            if len(bucketsData) == 0:
-                continue
-            retVal = self.__deleteForCompactBuckets(typeName, timeLimit, bucketLength)
+            retVal = self.__getCompactionWindows(typeName, timeLimit, bucketLength, nextBucketLength)
             if not retVal["OK"]:
-                # self.__rollbackTransaction( connObj )
                 return retVal
-            self.log.info(
-                "[COMPACT] Compacting %s records %s seconds size for %s" % (len(bucketsData), bucketLength, typeName)
-            )
-            # Add data
-            for record in bucketsData:
-                startTime = record[-2]
-                endTime = record[-1]
-                valuesList = record[:-2]
-                retVal = self.__splitInBuckets(typeName, startTime, endTime, valuesList)
+            windows = retVal["Value"]
+            totalCompacted = 0
+            startCompaction = time.time()
+            for iWindow, (windowStart, windowEnd) in enumerate(windows):
+                retVal = self.__compactWindow(typeName, windowStart, windowEnd, bucketLength, nextBucketLength)
                 if not retVal["OK"]:
-                    # self.__rollbackTransaction( connObj )
                     self.log.error(
-                        "[COMPACT] Error while compacting data for record", "%s: %s" % (typeName, retVal["Value"])
+                        "[COMPACT] Error while compacting window",
+                        "%s [%s, %s): %s"
+                        % (typeName, Time.fromEpoch(windowStart), Time.fromEpoch(windowEnd), retVal["Message"]),
                     )
-            self.log.info("[COMPACT] Finished compaction %d of %d" % (bPos, len(self.dbBucketsLength[typeName]) - 1))
-        # return self.__commitTransaction( connObj )
+                    return retVal
+                totalCompacted += retVal["Value"]
+                elapsed = time.time() - startCompaction
+                expectedEnd = datetime.timedelta(seconds=int(elapsed * (len(windows) - iWindow - 1) / (iWindow + 1)))
+                self.log.info(
+                    "[COMPACT] Compacted window %d of %d for %s: %d buckets (%d done, %.2f buckets/s | ETA %s)"
+                    % (
+                        iWindow + 1,
+                        len(windows),
+                        typeName,
+                        retVal["Value"],
+                        totalCompacted,
+                        totalCompacted / max(elapsed, 0.001),
+                        expectedEnd,
+                    )
+                )
         return S_OK()
 
+    def __bulkWriteBuckets(self, typeName, startTimes, bucketLengths, keys, values, connObj=False):
+        """
+        Add values to buckets, creating the missing ones, with multi-row upserts
+
+        :param startTimes: array of the start times of the buckets
+        :param bucketLengths: array of the bucket lengths, or a single length for all the buckets
+        :param keys: 2D array of the key IDs of the buckets
+        :param values: 2D array of the values of the buckets, the last column being the number of entries
+        """
+        valueFields = ["`%s`" % field for field in self.dbCatalog[typeName]["values"]] + ["`entriesInBucket`"]
+        inFields = ["startTime", "bucketLength"] + self.dbCatalog[typeName]["keys"]
+        inFields += self.dbCatalog[typeName]["values"] + ["entriesInBucket"]
+        updateFields = {field[1:-1]: "%s + VALUES(%s)" % (field, field) for field in valueFields}
+        bucketLengths = np.broadcast_to(np.asarray(bucketLengths, dtype=np.int64), np.shape(startTimes))
+        rows = np.column_stack([startTimes, bucketLengths, keys]).tolist()
+        for row, bucketValues in zip(rows, np.asarray(values).tolist()):
+            row.extend(bucketValues)
+        return self.bulkUpsert(
+            _getTableName("bucket", typeName), inFields, rows, updateFields=updateFields, conn=connObj
+        )
+
     def __slowCompactBucketsForType(self, typeName):
         """
         Compact all buckets for a given type
@@ -1469,32 +1709,49 @@ class AccountingDB(DB):
                 return retVal
             rawData = retVal["Value"]
             self.log.info("[REBUCKET] Retrieved %s records" % len(rawData))
-            rebucketedRecords = 0
             startQuery = time.time()
-            startBlock = time.time()
             numRecords = len(rawData)
-            for entry in rawData:
-                startT = entry[0]
-                endT = entry[1]
-                values = entry[2:]
-                retVal = self.__splitInBuckets(typeName, startT, endT, values)
+            for chunkStart in range(0, numRecords, self.__compactionChunkSize):
+                retVal = self.__rebucketRecords(typeName, rawData[chunkStart : chunkStart + self.__compactionChunkSize])
                 if not retVal["OK"]:
-                    # self.__rollbackTransaction(connObj)
                     return retVal
-                rebucketedRecords += 1
-                if rebucketedRecords % 1000 == 0:
-                    queryAvg = rebucketedRecords / float(time.time() - startQuery)
-                    blockAvg = 1000 / float(time.time() - startBlock)
-                    startBlock = time.time()
-                    perDone = 100 * rebucketedRecords / float(numRecords)
-                    expectedEnd = str(datetime.timedelta(seconds=int((numRecords - rebucketedRecords) / blockAvg)))
-                    self.log.info(
-                        "[REBUCKET] Rebucketed %.2f%% %s (%.2f r/s block %.2f r/s query | ETA %s )..."
-                        % (perDone, typeName, blockAvg, queryAvg, expectedEnd)
-                    )
+                rebucketedRecords = min(numRecords, chunkStart + self.__compactionChunkSize)
+                queryAvg = rebucketedRecords / max(time.time() - startQuery, 0.001)
+                perDone = 100 * rebucketedRecords / float(numRecords)
+                expectedEnd = str(datetime.timedelta(seconds=int((numRecords - rebucketedRecords) / queryAvg)))
+                self.log.info(
+                    "[REBUCKET] Rebucketed %.2f%% %s (%.2f r/s | ETA %s )..."
+                    % (perDone, typeName, queryAvg, expectedEnd)
+                )
+        self.__invalidateReportCache(typeName)
         # return self.__commitTransaction(connObj)
         return S_OK()
 
+    def __rebucketRecords(self, typeName, records):
+        """
+        Bucketize records (startTime, endTime, keys..., values..., entries), aggregating them
+        by bucket before writing the buckets with multi-row upserts
+        """
+        numKeys = len(self.dbCatalog[typeName]["keys"])
+        nowEpoch = int(Time.toEpoch())
+        groupColumns = []
+        proportions = []
+        recordPositions = []
+        for recordPos, record in enumerate(records):
+            keyValues = [int(keyValue) for keyValue in record[2 : numKeys + 2]]
+            for bucketStartTime, bucketProportion, bucketLength in self.calculateBuckets(
+                typeName, int(record[0]), int(record[1]), nowEpoch
+            ):
+                groupColumns.append([bucketStartTime, bucketLength] + keyValues)
+                proportions.append(bucketProportion)
+                recordPositions.append(recordPos)
+        if not groupColumns:
+            return S_OK()
+        values = np.asarray([record[numKeys + 2 :] for record in records], dtype=np.float64)
+        values = values[recordPositions] * np.asarray(proportions)[:, np.newaxis]
+        buckets, values = BucketCompaction.groupSum(groupColumns, values)
+        return self.__bulkWriteBuckets(typeName, buckets[:, 0], buckets[:, 1], buckets[:, 2:], values)
+
     def __startTransaction(self, connObj):
         return self._query("START TRANSACTION", conn=connObj)
 
@@ -3,8 +3,9 @@
 # pylint: disable=protected-access
 
 # imports
+import time
 import unittest
-from mock import MagicMock
+from mock import MagicMock, patch
 
 import DIRAC.AccountingSystem.DB.AccountingDB as moduleTested
 
@@ -417,6 +418,80 @@ ORDER BY startTime"
         self.assertEqual(retVal, expectedQuery)
 
 
+class ReportCache(TestCase):
+    """testing the cache of the bucketed data"""
+
+    typeName = "LHCb-Certification_Test"
+
+    def setUp(self):
+        super().setUp()
+        self.queries = []
+        self.module = self.testClass()
+        self.module.dbCatalog = {
+            self.typeName: {
+                "keys": ["Site"],
+                "values": ["CPUTime"],
+                "bucketFields": ["Site", "CPUTime", "entriesInBucket", "startTime", "bucketLength"],
+                "dataTimespan": 0,
+            }
+        }
+        self.module.dbBucketsLength[self.typeName] = [(86400, 900), (604800, 3600), (31104000, 86400)]
+        self.module._query = self.query
+        self.module._AccountingDB__reportCacheLifeTime = 300
+        self.module._AccountingDB__immutableReportCacheLifeTime = 86400
+
+    def query(self, cmd, conn=None):  # pylint: disable=unused-argument
+        """Record the queries, returning a row per query"""
+        self.queries.append(cmd)
+        return {"OK": True, "Value": ((len(self.queries),),)}
+
+    def retrieve(self, startTime, endTime):
+        return self.module.retrieveBucketedData(
+            self.typeName,
+            startTime,
+            endTime,
+            ("%s, %s, %s, SUM(%s)", ["Site", "startTime", "bucketLength", "CPUTime"]),
+            {},
+            ("%s, %s", ["startTime", "Site"]),
+            ("%s", ["startTime"]),
+        )
+
+    def test_cachedResults(self):
+        """The same query is only executed once"""
+        now = int(time.time())
+        startTime = now - 3 * 86400
+        for _ in range(3):
+            retVal = self.retrieve(startTime, now)
+            self.assertTrue(retVal["OK"])
+            self.assertEqual(retVal["Value"], ((1,),))
+        self.assertEqual(len(self.queries), 1)
+        # Another time range is another query
+        self.retrieve(startTime - 86400, now)
+        self.assertEqual(len(self.queries), 2)
+
+    def test_immutableBuckets(self):
+        """Old buckets are queried apart, and kept when querying again the recent ones"""
+        now = int(time.time())
+        startTime = now - 300 * 86400
+        retVal = self.retrieve(startTime, now)
+        self.assertTrue(retVal["OK"])
+        self.assertEqual(retVal["Value"], ((1,), (2,)))
+        self.assertEqual(len(self.queries), 2)
+        recentQuery = self.queries[1]
+
+        # Later, only the recent buckets are queried again
+        with patch("time.monotonic", return_value=time.monotonic() + 1000):
+            retVal = self.retrieve(startTime, now)
+        self.assertEqual(retVal["Value"], ((1,), (3,)))
+        self.assertEqual(len(self.queries), 3)
+        self.assertEqual(self.queries[2], recentQuery)
+
+        # Unless the old buckets are modified
+        self.module._AccountingDB__invalidateReportCache(self.typeName)
+        retVal = self.retrieve(startTime, now)
+        self.assertEqual(retVal["Value"], ((4,), (5,)))
+
+
 #############################################################################
 # Test Suite run
 #############################################################################
@@ -425,4 +500,5 @@ ORDER BY startTime"
 if __name__ == "__main__":
     suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestCase)
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(MakeQuery))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(ReportCache))
     testResult = unittest.TextTestRunner(verbosity=2).run(suite)
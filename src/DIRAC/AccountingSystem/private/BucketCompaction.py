@@ -0,0 +1,70 @@
+""" Vectorized re-bucketing of the accounting buckets, used by the AccountingDB compaction.
+
+    The buckets are given as NumPy arrays:
+
+    * startTimes: start time of each bucket
+    * bucketLengths: length of each bucket (or a single length for all of them)
+    * keys: 2D array with the IDs of the key fields of each bucket
+    * values: 2D array with the values of each bucket, the last column being the number of entries
+"""
+import numpy as np
+
+
+def groupSum(groupColumns, values):
+    """Sum the values of the rows having the same group columns
+
+    :param groupColumns: 2D integer array, one row per bucket
+    :param values: 2D float array, one row per bucket
+
+    :return: tuple (groups, sums) with one row per distinct group, ordered by the group columns
+    """
+    groupColumns = np.asarray(groupColumns, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if not len(groupColumns):
+        return groupColumns.reshape(0, groupColumns.shape[1]), values.reshape(0, values.shape[1])
+    # lexsort uses the last column as primary key
+    order = np.lexsort(groupColumns.T[::-1])
+    groupColumns = groupColumns[order]
+    values = values[order]
+    newGroup = np.empty(len(groupColumns), dtype=bool)
+    newGroup[0] = True
+    newGroup[1:] = np.any(groupColumns[1:] != groupColumns[:-1], axis=1)
+    starts = np.flatnonzero(newGroup)
+    return groupColumns[starts], np.add.reduceat(values, starts, axis=0)
+
+
+def rebucket(startTimes, bucketLengths, keys, values, newBucketLength):
+    """Move buckets into buckets of another length, summing the values of the buckets ending up
+    in the same new bucket. A bucket overlapping several new buckets is split among them, in proportion
+    of the overlap, as AccountingDB.calculateBuckets does for the records.
+
+    :param int newBucketLength: length of the new buckets
+
+    :return: tuple (startTimes, keys, values) of the new buckets, ordered by start time and keys
+    """
+    startTimes = np.asarray(startTimes, dtype=np.int64)
+    keys = np.asarray(keys, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    bucketLengths = np.broadcast_to(np.asarray(bucketLengths, dtype=np.int64), startTimes.shape)
+    endTimes = startTimes + bucketLengths
+    firstStarts = startTimes - startTimes % newBucketLength
+
+    allStarts, allKeys, allValues = [], [], []
+    maxSpan = int((endTimes - 1 - firstStarts).max() // newBucketLength) + 1 if len(startTimes) else 0
+    for span in range(maxSpan):
+        newStarts = firstStarts + span * newBucketLength
+        overlap = np.minimum(endTimes, newStarts + newBucketLength) - np.maximum(startTimes, newStarts)
+        inNewBucket = overlap > 0
+        if not inNewBucket.any():
+            continue
+        proportions = overlap[inNewBucket] / bucketLengths[inNewBucket]
+        allStarts.append(newStarts[inNewBucket])
+        allKeys.append(keys[inNewBucket])
+        allValues.append(values[inNewBucket] * proportions[:, np.newaxis])
+    if not allStarts:
+        return startTimes[:0], keys[:0], values[:0]
+
+    groups, sums = groupSum(
+        np.column_stack([np.concatenate(allStarts), np.concatenate(allKeys)]), np.concatenate(allValues)
+    )
+    return groups[:, 0], groups[:, 1:], sums
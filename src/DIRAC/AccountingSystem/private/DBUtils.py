@@ -1,6 +1,9 @@
 """ Class that collects utilities used in Accounting and Monitoring systems
 """
+import numpy as np
+
 from DIRAC.Core.Utilities import Time
+from DIRAC.AccountingSystem.private.BucketCompaction import groupSum, rebucket
 
 
 class DBUtils(object):
@@ -72,45 +75,27 @@ class DBUtils(object):
           - field 0: datetime
           - field 1: bucketLength
           - fields 2-n: numericalFields
+
+        The values of the buckets are spread among the buckets of the granularity in proportion
+        of their overlap, and the sum of the proportions is appended to the values.
         """
-        normData = {}
-
-        def addToNormData(bucketDate, data, proportion=1.0):
-            if bucketDate in normData:
-                for iP in range(len(data)):
-                    val = data[iP]
-                    if val is None:
-                        val = 0
-                    normData[bucketDate][iP] += float(val) * proportion
-                normData[bucketDate][-1] += proportion
-            else:
-                normData[bucketDate] = []
-                for fD in data:
-                    if fD is None:
-                        fD = 0
-                    normData[bucketDate].append(float(fD) * proportion)
-                normData[bucketDate].append(proportion)
-
-        for bucketData in bucketsData:
-            bucketDate = bucketData[0]
-            originalBucketLength = bucketData[1]
-            bucketValues = bucketData[2:]
-            if originalBucketLength == granularity:
-                addToNormData(bucketDate, bucketValues)
-            else:
-                startEpoch = bucketDate
-                endEpoch = bucketDate + originalBucketLength
-                newBucketEpoch = startEpoch - startEpoch % granularity
-                if startEpoch == endEpoch:
-                    addToNormData(newBucketEpoch, bucketValues)
-                else:
-                    while newBucketEpoch < endEpoch:
-                        start = max(newBucketEpoch, startEpoch)
-                        end = min(newBucketEpoch + granularity, endEpoch)
-                        proportion = float(end - start) / originalBucketLength
-                        addToNormData(newBucketEpoch, bucketValues, proportion)
-                        newBucketEpoch += granularity
-        return normData
+        if not bucketsData:
+            return {}
+        data = np.nan_to_num(np.array(bucketsData, dtype=np.float64))
+        values = np.ones((len(data), data.shape[1] - 1))
+        values[:, :-1] = data[:, 2:]
+        noKeys = np.empty((len(data), 0))
+        # Buckets of the granularity are kept as they are
+        asIs = data[:, 1] == granularity
+        # Empty buckets go entirely in the bucket containing them
+        bucketLengths = np.maximum(data[~asIs, 1], 1)
+        startTimes, _keys, spanValues = rebucket(
+            data[~asIs, 0], bucketLengths, noKeys[~asIs], values[~asIs], granularity
+        )
+        groups, values = groupSum(
+            np.concatenate([data[asIs, 0], startTimes])[:, np.newaxis], np.concatenate([values[asIs], spanValues])
+        )
+        return dict(zip(groups[:, 0].tolist(), values.tolist()))
 
     def _sumToGranularity(self, granularity, bucketsData):
         """
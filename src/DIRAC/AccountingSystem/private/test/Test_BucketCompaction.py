@@ -0,0 +1,53 @@
+""" Test the vectorized re-bucketing used by the AccountingDB compaction
+"""
+import numpy as np
+from pytest import approx
+
+from DIRAC.AccountingSystem.private.BucketCompaction import groupSum, rebucket
+
+
+def test_groupSum():
+    """Rows with the same group columns are summed, and the groups are ordered"""
+    groups, sums = groupSum([[2, 1], [1, 5], [2, 1], [1, 2]], [[1.0, 1], [2.0, 1], [3.0, 1], [4.0, 1]])
+    assert groups.tolist() == [[1, 2], [1, 5], [2, 1]]
+    assert sums.tolist() == [[4.0, 1], [2.0, 1], [4.0, 2]]
+
+    groups, sums = groupSum(np.zeros((0, 2)), np.zeros((0, 3)))
+    assert groups.shape == (0, 2)
+    assert sums.shape == (0, 3)
+
+
+def test_rebucket():
+    """Buckets are moved into the longer buckets containing them"""
+    startTimes = [0, 900, 1800, 3600, 900]
+    keys = [[1, 1], [1, 1], [1, 2], [1, 1], [2, 1]]
+    values = [[10.0, 1], [20.0, 2], [30.0, 3], [40.0, 4], [50.0, 5]]
+    newStarts, newKeys, newValues = rebucket(startTimes, 900, keys, values, 3600)
+    assert newStarts.tolist() == [0, 0, 0, 3600]
+    assert newKeys.tolist() == [[1, 1], [1, 2], [2, 1], [1, 1]]
+    assert newValues.tolist() == [[30.0, 3], [30.0, 3], [50.0, 5], [40.0, 4]]
+
+
+def test_rebucketSplit():
+    """A bucket overlapping two new buckets is split in proportion"""
+    newStarts, newKeys, newValues = rebucket([2700], [1800], [[1]], [[100.0, 4]], 3600)
+    assert newStarts.tolist() == [0, 3600]
+    assert newKeys.tolist() == [[1], [1]]
+    assert newValues == approx(np.array([[50.0, 2], [50.0, 2]]))
+
+
+def test_rebucketConservesValues():
+    """The totals per key are not changed by the re-bucketing"""
+    rng = np.random.default_rng(42)
+    startTimes = rng.integers(0, 1000, size=1000) * 900
+    keys = rng.integers(0, 5, size=(1000, 3))
+    values = rng.random((1000, 2))
+    newStarts, newKeys, newValues = rebucket(startTimes, 900, keys, values, 86400)
+    assert not np.any(newStarts % 86400)
+    assert newValues.sum(axis=0) == approx(values.sum(axis=0))
+    assert len(newStarts) == len({(start,) + tuple(key) for start, key in zip(newStarts, newKeys.tolist())})
+
+
+def test_rebucketEmpty():
+    newStarts, newKeys, newValues = rebucket([], 900, np.zeros((0, 2)), np.zeros((0, 3)), 3600)
+    assert len(newStarts) == len(newKeys) == len(newValues) == 0
@@ -0,0 +1,34 @@
+""" Test the conversion of the buckets to the granularity of the reports
+"""
+from decimal import Decimal
+
+from pytest import approx
+
+from DIRAC.AccountingSystem.private.DBUtils import DBUtils
+
+bucketsData = [
+    [0, 900, Decimal("1.5"), None],
+    [900, 900, 2, 3],
+    [1800, 1800, 4, 5],
+    [3600, 3600, 6, 7],
+]
+
+
+def test_sumToGranularity():
+    """Smaller buckets are summed, longer ones are split in proportion"""
+    dbUtils = DBUtils(None, None)
+    assert dbUtils._sumToGranularity(3600, bucketsData) == {0: [7.5, 8.0], 3600: [6.0, 7.0]}
+    normData = dbUtils._sumToGranularity(1800, bucketsData)
+    assert sorted(normData) == [0, 1800, 3600, 5400]
+    assert normData[0] == [3.5, 3.0]
+    assert normData[1800] == [4.0, 5.0]
+    assert normData[3600] == normData[5400] == approx([3.0, 3.5])
+    assert dbUtils._sumToGranularity(900, []) == {}
+
+
+def test_averageToGranularity():
+    """The values are averaged over the proportions of the buckets"""
+    dbUtils = DBUtils(None, None)
+    normData = dbUtils._averageToGranularity(1800, bucketsData)
+    assert normData[0] == approx([1.75, 1.5])
+    assert normData[1800] == approx([4.0, 5.0])
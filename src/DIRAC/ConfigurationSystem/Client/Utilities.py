@@ -385,8 +385,8 @@ def getDBParameters(fullname):
            Not used as the method will fail if it cannot be found
            defaultQueueSize is the QueueSize to return if the option is not found in the CS
 
-    :return: S_OK(dict)/S_ERROR() - dictionary with the keys: 'host', 'port', 'user', 'password',
-                                    'db' and 'queueSize'
+    :return: S_OK(dict)/S_ERROR() - dictionary with the keys: 'Host', 'Port', 'User', 'Password',
+                                    'DBName', 'MaxConnections' and 'ConnectionWaitTimeout'
     """
 
     cs_path = getDatabaseSection(fullname)
@@ -443,6 +443,14 @@ def getDBParameters(fullname):
     dbName = result["Value"]
     parameters["DBName"] = dbName
 
+    # Size of the connection pool (0 for no limit) and maximum wait for a free connection
+    for option, default in (("MaxConnections", 0), ("ConnectionWaitTimeout", 60)):
+        value = gConfig.getValue(cs_path + "/" + option, gConfig.getValue("/Systems/Databases/" + option, default))
+        try:
+            parameters[option] = int(value)
+        except ValueError:
+            return S_ERROR("Invalid value for the configuration parameter %s: %s" % (option, value))
+
     return S_OK(parameters)
 
 
@@ -64,6 +64,7 @@ AGENTS = [
                 "ReplicaCacheValidity",
                 "NoUnusedDelay",
                 "maxThreadsInPool",
+                "PrefetchDepth",
             ]
         },
     ),
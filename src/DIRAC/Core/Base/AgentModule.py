@@ -6,6 +6,7 @@
   Base class for all agent modules
 """
 import os
+import sys
 import threading
 import time
 import signal
@@ -368,16 +369,19 @@ class AgentModule:
             if self.activityMonitoring:
                 # Here we record the data about the cycle duration along with some basic details about the
                 # agent and right now it isn't committed to the ES backend.
-                self.activityMonitoringReporter.addRecord(
-                    {
-                        "AgentName": self.agentName,
-                        "timestamp": int(Time.toEpoch()),
-                        "Host": Network.getFQDN(),
-                        "MemoryUsage": mem,
-                        "CpuPercentage": cpuPercentage,
-                        "CycleDuration": elapsedTime,
-                    }
-                )
+                record = {
+                    "AgentName": self.agentName,
+                    "timestamp": int(Time.toEpoch()),
+                    "Host": Network.getFQDN(),
+                    "MemoryUsage": mem,
+                    "CpuPercentage": cpuPercentage,
+                    "CycleDuration": elapsedTime,
+                }
+                # Reuse of the HTTPS connections to the services, if any was called
+                sessionPoolModule = sys.modules.get("DIRAC.Core.Tornado.Client.private.SessionPool")
+                if sessionPoolModule:
+                    record.update(sessionPoolModule.getSessionPoolActivity())
+                self.activityMonitoringReporter.addRecord(record)
         else:
             self.log.warn(" Cycle had an error:", cycleResult["Message"])
         self.log.notice("-" * 40)
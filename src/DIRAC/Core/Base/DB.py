@@ -31,6 +31,8 @@ class DB(DIRACDB, MySQL):
             dbName=self.dbName,
             port=self.dbPort,
             debug=debug,
+            maxConnections=dbParameters.get("MaxConnections", 0),
+            connectionWaitTimeout=dbParameters.get("ConnectionWaitTimeout", 60),
             parentLogger=parentLogger,
         )
 
@@ -13,6 +13,7 @@ class ExecutorMindHandler(RequestHandler):
 
     MSG_DEFINITIONS = {
         "ProcessTask": {"taskId": int, "taskStub": str, "eType": str},
+        "ProcessTasks": {"taskIds": (list, tuple), "taskStubs": (list, tuple), "eType": str},
         "TaskDone": {"taskId": int, "taskStub": str},
         "TaskFreeze": {
             "taskId": (int, str),
@@ -29,8 +30,9 @@ class ExecutorMindHandler(RequestHandler):
     }
 
     class MindCallbacks(ExecutorDispatcherCallbacks):
-        def __init__(self, sendTaskCB, dispatchCB, disconnectCB, taskProcCB, taskFreezeCB, taskErrCB):
+        def __init__(self, sendTaskCB, dispatchCB, disconnectCB, taskProcCB, taskFreezeCB, taskErrCB, sendTasksCB=None):
             self.__sendTaskCB = sendTaskCB
+            self.__sendTasksCB = sendTasksCB
             self.__dispatchCB = dispatchCB
             self.__disconnectCB = disconnectCB
             self.__taskProcDB = taskProcCB
@@ -41,6 +43,11 @@ class ExecutorMindHandler(RequestHandler):
         def cbSendTask(self, taskId, taskObj, eId, eType):
             return self.__sendTaskCB(taskId, taskObj, eId, eType)
 
+        def cbSendTasks(self, tasks, eId, eType):
+            if self.__sendTasksCB is None:
+                return super().cbSendTasks(tasks, eId, eType)
+            return self.__sendTasksCB(tasks, eId, eType)
+
         def cbDispatch(self, taskId, taskObj, pathExecuted):
             return self.__dispatchCB(taskId, taskObj, pathExecuted)
 
@@ -71,6 +78,7 @@ class ExecutorMindHandler(RequestHandler):
             cls.exec_taskProcessed,
             cls.exec_taskFreeze,
             cls.exec_taskError,
+            sendTasksCB=cls.__sendTasks,
         )
         cls.__eDispatch.setCallbacks(cls.__callbacks)
         cls.__allowedClients = []
@@ -91,32 +99,64 @@ class ExecutorMindHandler(RequestHandler):
         cls.__allowedClients = aClients
 
     @classmethod
-    def __sendTask(self, taskId, taskObj, eId, eType):
+    def __prepareTask(cls, taskId, taskObj, eId):
+        """Prepare a task to be sent to an executor
+
+        :return: S_OK(task stub)/S_ERROR
+        """
         try:
-            result = self.exec_prepareToSend(taskId, taskObj, eId)
+            result = cls.exec_prepareToSend(taskId, taskObj, eId)
             if not result["OK"]:
                 return result
         except Exception as excp:
             gLogger.exception("Exception while executing prepareToSend: %s" % str(excp), lException=excp)
             return S_ERROR("Cannot presend task")
         try:
-            result = self.exec_serializeTask(taskObj)
+            result = cls.exec_serializeTask(taskObj)
         except Exception as excp:
             gLogger.exception("Exception while serializing task %s" % taskId, lException=excp)
             return S_ERROR("Cannot serialize task %s: %s" % (taskId, str(excp)))
         if not isReturnStructure(result):
             raise Exception("exec_serializeTask does not return a return structure")
+        return result
+
+    @classmethod
+    def __sendTask(cls, taskId, taskObj, eId, eType):
+        result = cls.__prepareTask(taskId, taskObj, eId)
         if not result["OK"]:
             return result
         taskStub = result["Value"]
-        result = self.srv_msgCreate("ProcessTask")
+        result = cls.srv_msgCreate("ProcessTask")
         if not result["OK"]:
             return result
         msgObj = result["Value"]
         msgObj.taskId = taskId
         msgObj.taskStub = taskStub
         msgObj.eType = eType
-        return self.srv_msgSend(eId, msgObj)
+        return cls.srv_msgSend(eId, msgObj)
+
+    @classmethod
+    def __sendTasks(cls, tasks, eId, eType):
+        """Send a batch of tasks to an executor in one message"""
+        taskIds = []
+        taskStubs = []
+        for taskId, taskObj in tasks:
+            result = cls.__prepareTask(taskId, taskObj, eId)
+            if not result["OK"]:
+                gLogger.warn("Cannot send task", "%s: %s" % (taskId, result["Message"]))
+                continue
+            taskIds.append(taskId)
+            taskStubs.append(result["Value"])
+        if not taskIds:
+            return S_OK()
+        result = cls.srv_msgCreate("ProcessTasks")
+        if not result["OK"]:
+            return result
+        msgObj = result["Value"]
+        msgObj.taskIds = taskIds
+        msgObj.taskStubs = taskStubs
+        msgObj.eType = eType
+        return cls.srv_msgSend(eId, msgObj)
 
     @classmethod
     def __execDisconnected(cls, trid):
@@ -145,7 +185,14 @@ class ExecutorMindHandler(RequestHandler):
             numTasks = max(1, int(kwargs["maxTasks"]))
         except Exception:
             numTasks = 1
-        self.__eDispatch.addExecutor(trid, kwargs["executorTypes"])
+        # Executors processing the tasks by batches ask for them with batchSize
+        try:
+            batchSize = max(1, int(kwargs.get("batchSize", 1)))
+        except Exception:
+            batchSize = 1
+        self.__eDispatch.addExecutor(
+            trid, kwargs["executorTypes"], maxTasks=max(numTasks, batchSize), batchSize=batchSize
+        )
         return self.exec_executorConnected(trid, kwargs["executorTypes"])
 
     auth_conn_drop = ["all"]
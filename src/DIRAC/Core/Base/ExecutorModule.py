@@ -37,8 +37,8 @@ class ExecutorModule:
         cls.__properties["shifterProxyLocation"] = os.path.join(cls.__defaults["WorkDirectory"], ".shifterCred")
         cls.__mindName = False
         cls.__mindExtraArgs = False
-        cls.__freezeTime = 0
-        cls.__fastTrackEnabled = True
+        cls.__taskStates = {}
+        cls.__currentTaskId = None
         cls.log = gLogger.getSubLogger(exeName, child=False)
 
         try:
@@ -123,23 +123,55 @@ class ExecutorModule:
         return result
 
     def _ex_processTask(self, taskId, taskStub):
-        self.__properties["shifterProxy"] = self.ex_getOption("shifterProxy")
-        self.__freezeTime = 0
-        self.__fastTrackEnabled = True
-        self.log.verbose("Task %s: Received" % str(taskId))
-        result = self.__deserialize(taskId, taskStub)
+        result = self._ex_processTasks([(taskId, taskStub)])
         if not result["OK"]:
-            self.log.error("Can not deserialize task", "Task %s: %s" % (str(taskId), result["Message"]))
             return result
-        taskObj = result["Value"]
+        return result["Value"][taskId]
+
+    def _ex_processTasks(self, taskStubs):
+        """Process a batch of tasks
+
+        :param list taskStubs: (taskId, taskStub) tuples
+
+        :return: S_OK({ taskId: S_OK((taskStub, freezeTime, fastTrackType))/S_ERROR })
+        """
+        self.__properties["shifterProxy"] = self.ex_getOption("shifterProxy")
+        self.__taskStates = {}
+        self.__currentTaskId = None
+        results = {}
+        tasks = []
+        for taskId, taskStub in taskStubs:
+            self.log.verbose("Task %s: Received" % str(taskId))
+            result = self.__deserialize(taskId, taskStub)
+            if not result["OK"]:
+                self.log.error("Can not deserialize task", "Task %s: %s" % (str(taskId), result["Message"]))
+                results[taskId] = result
+            else:
+                tasks.append((taskId, result["Value"]))
+        if not tasks:
+            return S_OK(results)
         # Shifter proxy?
         result = self.__installShifterProxy()
         if not result["OK"]:
-            return result
+            results.update((taskId, result) for taskId, _taskObj in tasks)
+            return S_OK(results)
         # Execute!
-        result = self.processTask(taskId, taskObj)
+        result = self.processTasks(tasks)
         if not isReturnStructure(result):
-            raise Exception("processTask does not return a return structure")
+            raise Exception("processTasks does not return a return structure")
+        if not result["OK"]:
+            processed = dict.fromkeys((taskId for taskId, _taskObj in tasks), result)
+        else:
+            processed = result["Value"]
+        for taskId, taskObj in tasks:
+            result = processed.get(taskId)
+            if result is None:
+                result = S_ERROR("Task %s was not processed" % taskId)
+            results[taskId] = self.__finishTask(taskId, taskObj, result)
+        return S_OK(results)
+
+    def __finishTask(self, taskId, taskObj, result):
+        """Serialize a processed task, and look for its next executor if it can be fast tracked"""
         if not result["OK"]:
             return result
         # If there's a result, serialize it again!
@@ -152,8 +184,9 @@ class ExecutorModule:
             return result
         taskStub = result["Value"]
         # Try fast track
+        taskState = self.__taskStates.get(taskId, {"FreezeTime": 0, "FastTrack": True})
         fastTrackType = False
-        if not self.__freezeTime and self.__fastTrackEnabled:
+        if not taskState["FreezeTime"] and taskState["FastTrack"]:
             result = self.fastTrackDispatch(taskId, taskObj)
             if not result["OK"]:
                 self.log.error("FastTrackDispatch failed for job", "%s: %s" % (taskId, result["Message"]))
@@ -161,20 +194,32 @@ class ExecutorModule:
                 fastTrackType = result["Value"]
 
         # EOP
-        return S_OK((taskStub, self.__freezeTime, fastTrackType))
+        return S_OK((taskStub, taskState["FreezeTime"], fastTrackType))
+
+    def _ex_runTask(self, taskId, taskObj):
+        """Process one task of a batch with processTask, keeping track of its freeze and fast track requests"""
+        self.__currentTaskId = taskId
+        self.__taskStates[taskId] = {"FreezeTime": 0, "FastTrack": True}
+        result = self.processTask(taskId, taskObj)
+        if not isReturnStructure(result):
+            raise Exception("processTask does not return a return structure")
+        return result
+
+    def __getTaskState(self):
+        return self.__taskStates.setdefault(self.__currentTaskId, {"FreezeTime": 0, "FastTrack": True})
 
     ####
     # Callable functions
     ####
 
     def freezeTask(self, freezeTime):
-        self.__freezeTime = freezeTime
+        self.__getTaskState()["FreezeTime"] = freezeTime
 
     def isTaskFrozen(self):
-        return self.__freezeTime
+        return self.__getTaskState()["FreezeTime"]
 
     def disableFastTrackForTask(self):
-        self.__fastTrackEnabled = True
+        self.__getTaskState()["FastTrack"] = False
 
     ###
     #  Fast-track tasks
@@ -195,3 +240,20 @@ class ExecutorModule:
 
     def processTask(self, taskId, taskObj):
         raise Exception("Method processTask has to be coded!")
+
+    ####
+    # Can be overwritten to process the tasks by batches
+    ####
+
+    def processTasks(self, tasks):
+        """Process a batch of tasks, by default one by one with processTask
+
+        The executors receive batches when their BatchSize option is greater than 1. They can
+        overwrite this method to make the queries needed by all the tasks at once. Each task
+        must then be processed with _ex_runTask, which calls processTask.
+
+        :param list tasks: (taskId, taskObj) tuples
+
+        :return: S_OK({ taskId: result of processTask })/S_ERROR
+        """
+        return S_OK({taskId: self._ex_runTask(taskId, taskObj) for taskId, taskObj in tasks})
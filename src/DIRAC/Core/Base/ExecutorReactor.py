@@ -59,6 +59,7 @@ class ExecutorReactor:
             self.__mindName = mindName
             self.__modules = {}
             self.__maxTasks = 1
+            self.__batchSize = 1
             self.__reconnectSleep = 1
             self.__reconnectRetries = 10
             self.__extraArgs = {}
@@ -72,6 +73,7 @@ class ExecutorReactor:
         def addModule(self, name, exeClass):
             self.__modules[name] = exeClass
             self.__maxTasks = max(self.__maxTasks, exeClass.ex_getOption("MaxTasks", 0))
+            self.__batchSize = max(self.__batchSize, exeClass.ex_getOption("BatchSize", 1))
             self.__reconnectSleep = max(self.__reconnectSleep, exeClass.ex_getOption("ReconnectSleep", 0))
             self.__reconnectRetries = max(self.__reconnectRetries, exeClass.ex_getOption("ReconnectRetries", 0))
             self.__extraArgs[name] = exeClass.ex_getExtraArguments()
@@ -79,9 +81,13 @@ class ExecutorReactor:
         def connect(self):
             self.__msgClient = MessageClient(self.__mindName)
             self.__msgClient.subscribeToMessage("ProcessTask", self.__processTask)
+            self.__msgClient.subscribeToMessage("ProcessTasks", self.__processTasks)
             self.__msgClient.subscribeToDisconnect(self.__disconnected)
             result = self.__msgClient.connect(
-                executorTypes=list(self.__modules), maxTasks=self.__maxTasks, extraArgs=self.__extraArgs
+                executorTypes=list(self.__modules),
+                maxTasks=self.__maxTasks,
+                batchSize=self.__batchSize,
+                extraArgs=self.__extraArgs,
             )
             if result["OK"]:
                 self.__aliveLock.alive()
@@ -93,7 +99,10 @@ class ExecutorReactor:
             while True:
                 gLogger.notice("Trying to reconnect to %s" % self.__mindName)
                 result = self.__msgClient.connect(
-                    executorTypes=list(self.__modules), maxTasks=self.__maxTasks, extraArgs=self.__extraArgs
+                    executorTypes=list(self.__modules),
+                    maxTasks=self.__maxTasks,
+                    batchSize=self.__batchSize,
+                    extraArgs=self.__extraArgs,
                 )
 
                 if result["OK"]:
@@ -146,13 +155,31 @@ class ExecutorReactor:
         def __processTask(self, msgObj):
             eType = msgObj.eType
             taskId = msgObj.taskId
-            taskStub = msgObj.taskStub
 
-            result = self.__moduleProcess(eType, taskId, taskStub)
+            result = self.__moduleProcess(eType, [(taskId, msgObj.taskStub)])
             if not result["OK"]:
                 return self.__sendExecutorError(eType, taskId, result["Message"])
-            msgName, taskStub, extra = result["Value"]
+            msgName, taskStub, extra = result["Value"][taskId]
+            return self.__sendTaskResult(eType, taskId, msgName, taskStub, extra)
 
+        def __processTasks(self, msgObj):
+            eType = msgObj.eType
+            tasks = list(zip(msgObj.taskIds, msgObj.taskStubs))
+            if not tasks:
+                return S_OK()
+
+            result = self.__moduleProcess(eType, tasks)
+            if not result["OK"]:
+                return self.__sendExecutorError(eType, tasks[0][0], result["Message"])
+            taskResults = result["Value"]
+            for taskId, _taskStub in tasks:
+                msgName, taskStub, extra = taskResults[taskId]
+                result = self.__sendTaskResult(eType, taskId, msgName, taskStub, extra)
+                if not result["OK"]:
+                    return result
+            return S_OK()
+
+        def __sendTaskResult(self, eType, taskId, msgName, taskStub, extra):
             result = self.__msgClient.createMessage(msgName)
             if not result["OK"]:
                 return self.__sendExecutorError(
@@ -169,32 +196,54 @@ class ExecutorReactor:
                 msgObj.freezeTime = extra
             return self.__msgClient.sendMessage(msgObj)
 
-        def __moduleProcess(self, eType, taskId, taskStub, fastTrackLevel=0):
+        def __moduleProcess(self, eType, tasks, fastTrackLevel=0):
+            """Process (taskId, taskStub) tuples with an executor module
+
+            :return: S_OK({ taskId: (message name, taskStub, extra) })/S_ERROR
+            """
             result = self.__getInstance(eType)
             if not result["OK"]:
                 return result
             modInstance = result["Value"]
             try:
-                result = modInstance._ex_processTask(taskId, taskStub)
+                result = modInstance._ex_processTasks(tasks)
             except Exception as excp:
-                gLogger.exception("Error while processing task %s" % taskId, lException=excp)
-                return S_ERROR("Error processing task %s: %s" % (taskId, excp))
+                taskIds = [taskId for taskId, _taskStub in tasks]
+                gLogger.exception("Error while processing tasks %s" % taskIds, lException=excp)
+                return S_ERROR("Error processing tasks %s: %s" % (taskIds, excp))
 
             self.__storeInstance(eType, modInstance)
 
             if not result["OK"]:
-                return S_OK(("TaskError", taskStub, "Error: %s" % result["Message"]))
-            taskStub, freezeTime, fastTrackType = result["Value"]
-            if freezeTime:
-                return S_OK(("TaskFreeze", taskStub, freezeTime))
-            if fastTrackType:
-                if fastTrackLevel < 10 and fastTrackType in self.__modules:
-                    gLogger.notice("Fast tracking task %s to %s" % (taskId, fastTrackType))
-                    return self.__moduleProcess(fastTrackType, taskId, taskStub, fastTrackLevel + 1)
-                else:
-                    gLogger.notice("Stopping %s fast track. Sending back to the mind" % (taskId))
-
-            return S_OK(("TaskDone", taskStub, True))
+                return result
+            taskResults = result["Value"]
+            replies = {}
+            fastTracks = {}
+            for taskId, taskStub in tasks:
+                result = taskResults[taskId]
+                if not result["OK"]:
+                    replies[taskId] = ("TaskError", taskStub, "Error: %s" % result["Message"])
+                    continue
+                taskStub, freezeTime, fastTrackType = result["Value"]
+                if freezeTime:
+                    replies[taskId] = ("TaskFreeze", taskStub, freezeTime)
+                    continue
+                if fastTrackType:
+                    if fastTrackLevel < 10 and fastTrackType in self.__modules:
+                        gLogger.notice("Fast tracking task %s to %s" % (taskId, fastTrackType))
+                        fastTracks.setdefault(fastTrackType, []).append((taskId, taskStub))
+                        continue
+                    else:
+                        gLogger.notice("Stopping %s fast track. Sending back to the mind" % (taskId))
+                replies[taskId] = ("TaskDone", taskStub, True)
+
+            # The tasks fast tracked to the same executor are processed together
+            for fastTrackType, fastTrackTasks in fastTracks.items():
+                result = self.__moduleProcess(fastTrackType, fastTrackTasks, fastTrackLevel + 1)
+                if not result["OK"]:
+                    return result
+                replies.update(result["Value"])
+            return S_OK(replies)
 
     #####
     # Start of ExecutorReactor
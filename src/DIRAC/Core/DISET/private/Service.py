@@ -9,6 +9,7 @@
 # __searchInitFunctions gives RuntimeError: maximum recursion depth exceeded
 
 import os
+import sys
 import time
 import threading
 
@@ -258,20 +259,28 @@ class Service(object):
         pendingQueries = self._threadPool._work_queue.qsize()
         activeQuereies = len(self._threadPool._threads)
         percentage = self.__endReportToMonitoring(initialWallTime, initialCPUTime)
-        self.activityMonitoringReporter.addRecord(
-            {
-                "timestamp": int(Time.toEpoch()),
-                "Host": Network.getFQDN(),
-                "ServiceName": "_".join(self._name.split("/")),
-                "Location": self._cfg.getURL(),
-                "MemoryUsage": mem,
-                "CpuPercentage": percentage,
-                "PendingQueries": pendingQueries,
-                "ActiveQueries": activeQuereies,
-                "RunningThreads": threading.activeCount(),
-                "MaxFD": self.__maxFD,
-            }
-        )
+        record = {
+            "timestamp": int(Time.toEpoch()),
+            "Host": Network.getFQDN(),
+            "ServiceName": "_".join(self._name.split("/")),
+            "Location": self._cfg.getURL(),
+            "MemoryUsage": mem,
+            "CpuPercentage": percentage,
+            "PendingQueries": pendingQueries,
+            "ActiveQueries": activeQuereies,
+            "RunningThreads": threading.activeCount(),
+            "MaxFD": self.__maxFD,
+        }
+        # Usage of the MySQL connections, if the service uses MySQL
+        # (the module is not imported here, it requires MySQLdb)
+        mysqlModule = sys.modules.get("DIRAC.Core.Utilities.MySQL")
+        if mysqlModule:
+            record.update(mysqlModule.getConnectionPoolsActivity())
+        # Reuse of the HTTPS connections to the other services, if any was called
+        sessionPoolModule = sys.modules.get("DIRAC.Core.Tornado.Client.private.SessionPool")
+        if sessionPoolModule:
+            record.update(sessionPoolModule.getSessionPoolActivity())
+        self.activityMonitoringReporter.addRecord(record)
         self.__maxFD = 0
 
     def getConfig(self):
@@ -0,0 +1,225 @@
+"""
+    Pool of the HTTPS sessions used by the TornadoClients of a process
+
+    Sending each call with ``requests.post`` opens a new TCP connection, with a full X.509 handshake, for every
+    RPC. The pool keeps one ``requests.Session`` per server and credentials, shared by all the threads, whose
+    connections are kept alive and reused from one call to the next.
+
+    - The number of connections kept alive per server is given by ``/DIRAC/HTTPSClient/PoolSize`` (10 by default).
+      More threads can call the server at the same time, but their extra connections are then closed after the call.
+      With a size of 0, no session is kept and each call opens its own connection, as before.
+    - The sessions not used for ``/DIRAC/HTTPSClient/IdleTimeout`` seconds (120 by default) are closed.
+    - The credentials are identified by the path of their files and by their modification time, so that a renewed
+      proxy (or host certificate) gets a new session, and the session of the old one is closed.
+    - After a fork, the child process does not reuse the connections of its parent.
+
+    The number of calls and of new connections (i.e. of TLS handshakes) are counted,
+    see :py:func:`getSessionPoolActivity`.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+from DIRAC import gLogger
+from DIRAC.ConfigurationSystem.Client.Config import gConfig
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 120
+
+
+class _CountingAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter calling a function for each new connection (i.e. each handshake for HTTPS)"""
+
+    def __init__(self, onNewConnection, **kwargs):
+        self.onNewConnection = onNewConnection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        onNewConnection = self.onNewConnection
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                onNewConnection()
+                return super()._new_conn()
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                onNewConnection()
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+class HTTPSSessionPool(object):
+    """Thread-safe pool of the sessions, keyed by server and credentials"""
+
+    def __init__(self, poolSize=None, idleTimeout=None):
+        """c'tor
+
+        :param int poolSize: number of connections kept alive per server, from the configuration if None
+        :param int idleTimeout: time after which an unused session is closed, from the configuration if None
+        """
+        self.log = gLogger.getSubLogger("HTTPSSessionPool")
+        self.__poolSize = poolSize
+        self.__idleTimeout = idleTimeout
+        self.__lock = threading.Lock()
+        # { (scheme, netloc, credentials files): (credentials fingerprint, session, last use) }
+        self.__sessions = {}
+        self.__lastPurge = time.time()
+        self.__stats = dict.fromkeys(("Requests", "Handshakes", "Evictions", "Invalidations"), 0)
+
+    @property
+    def poolSize(self):
+        if self.__poolSize is None:
+            self.__poolSize = gConfig.getValue("/DIRAC/HTTPSClient/PoolSize", DEFAULT_POOL_SIZE)
+        return self.__poolSize
+
+    @property
+    def idleTimeout(self):
+        if self.__idleTimeout is None:
+            self.__idleTimeout = gConfig.getValue("/DIRAC/HTTPSClient/IdleTimeout", DEFAULT_IDLE_TIMEOUT)
+        return self.__idleTimeout
+
+    def __countHandshake(self):
+        with self.__lock:
+            self.__stats["Handshakes"] += 1
+
+    @staticmethod
+    def __fingerprint(certFiles):
+        """Identify the content of the credentials files by their modification time, inode and size"""
+        fingerprint = []
+        for path in certFiles:
+            try:
+                stat = os.stat(path)
+                fingerprint.append((stat.st_mtime_ns, stat.st_ino, stat.st_size))
+            except OSError:
+                fingerprint.append(None)
+        return tuple(fingerprint)
+
+    def __newSession(self):
+        session = requests.Session()
+        adapter = _CountingAdapter(self.__countHandshake, pool_maxsize=self.poolSize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def __purge(self, now):
+        """Close the sessions unused for more than idleTimeout, under the lock"""
+        self.__lastPurge = now
+        for key, (_fingerprint, session, lastUse) in list(self.__sessions.items()):
+            if now - lastUse > self.idleTimeout:
+                del self.__sessions[key]
+                session.close()
+                self.__stats["Evictions"] += 1
+
+    def getSession(self, url, cert=None):
+        """Get the session to send a request, and count the request
+
+        :param str url: URL of the request
+        :param cert: client certificate, as for requests: path of the certificate, tuple (certificate, key) or None
+
+        :return: requests.Session
+        """
+        certFiles = (cert,) if isinstance(cert, str) else tuple(cert or ())
+        fingerprint = self.__fingerprint(certFiles)
+        parsedURL = urlparse(url)
+        key = (parsedURL.scheme, parsedURL.netloc, certFiles)
+        now = time.time()
+        with self.__lock:
+            self.__stats["Requests"] += 1
+            if now - self.__lastPurge > min(10, self.idleTimeout):
+                self.__purge(now)
+            oldFingerprint, session, _lastUse = self.__sessions.get(key, (None, None, None))
+            if session is not None and oldFingerprint != fingerprint:
+                # The credentials have been renewed, the connections made with the old ones are closed
+                self.log.debug("Credentials changed, closing their session", "%s %s" % (parsedURL.netloc, certFiles))
+                session.close()
+                session = None
+                self.__stats["Invalidations"] += 1
+            if session is None:
+                session = self.__newSession()
+            self.__sessions[key] = (fingerprint, session, now)
+        return session
+
+    def post(self, url, cert=None, **kwargs):
+        """Send a POST request through the session of its server and credentials
+
+        :param str url: URL of the request
+        :param cert: client certificate, see getSession
+        :param kwargs: other arguments of requests.post
+
+        :return: requests.Response
+        """
+        if self.poolSize <= 0:
+            with self.__lock:
+                self.__stats["Requests"] += 1
+                self.__stats["Handshakes"] += 1
+            return requests.post(url, cert=cert, **kwargs)
+        return self.getSession(url, cert).post(url, cert=cert, **kwargs)
+
+    def invalidate(self, cert=None):
+        """Close the sessions of some credentials, e.g. when they are known to be renewed
+
+        :param cert: client certificate, see getSession, or None for all the sessions
+        """
+        certFiles = None if cert is None else (cert,) if isinstance(cert, str) else tuple(cert)
+        with self.__lock:
+            for key, (_fingerprint, session, _lastUse) in list(self.__sessions.items()):
+                if certFiles is None or key[2] == certFiles:
+                    del self.__sessions[key]
+                    session.close()
+                    self.__stats["Invalidations"] += 1
+
+    def reset(self):
+        """Forget all the sessions without closing their connections, used in a forked child"""
+        self.__lock = threading.Lock()
+        self.__sessions = {}
+
+    def getStats(self):
+        """Get the counters of the pool since its creation
+
+        :return: dict with the number of Sessions, of Requests, of Handshakes (new connections),
+                 of Evictions (idle sessions closed), of Invalidations (sessions closed for renewed credentials)
+                 and the ReuseRatio (fraction of the requests which did not open a connection)
+        """
+        with self.__lock:
+            stats = dict(self.__stats, Sessions=len(self.__sessions))
+        requestCount = stats["Requests"]
+        stats["ReuseRatio"] = max(0.0, 1.0 - float(stats["Handshakes"]) / requestCount) if requestCount else 0.0
+        return stats
+
+
+gSessionPool = HTTPSSessionPool()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=gSessionPool.reset)
+
+# Statistics of the pool at the previous call of getSessionPoolActivity
+gLastPoolStats = {"Requests": 0, "Handshakes": 0}
+
+
+def getSessionPoolActivity():
+    """Activity of the HTTPS session pool since the previous call, for the service and agent monitoring.
+
+    :return: dict to be added to a monitoring record (empty if no HTTPS request was sent)
+    """
+    stats = gSessionPool.getStats()
+    requestCount = stats["Requests"] - gLastPoolStats["Requests"]
+    handshakes = stats["Handshakes"] - gLastPoolStats["Handshakes"]
+    gLastPoolStats["Requests"] = stats["Requests"]
+    gLastPoolStats["Handshakes"] = stats["Handshakes"]
+    if requestCount <= 0:
+        return {}
+    return {
+        "HTTPSRequests": requestCount,
+        "HTTPSHandshakes": handshakes,
+        # in percent
+        "HTTPSReuseRatio": int(100 * max(0, requestCount - handshakes) / requestCount),
+    }
@@ -4,7 +4,8 @@
 
     Requests library manage itself retry when connection failed, so the __nbOfRetry attribute is removed from DIRAC
     (For each URL requests manage retries himself, if it still fail, we try next url)
-    KeepAlive lapse is also removed because managed by request,
+    KeepAlive lapse is also removed: the requests are sent through the sessions of
+    :py:mod:`~DIRAC.Core.Tornado.Client.private.SessionPool`, which keep the connections alive,
     see https://requests.readthedocs.io/en/latest/user/advanced/#keep-alive
 
     If necessary this class can be modified to define number of retry in requests, documentation does not give
@@ -41,6 +42,7 @@ from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURLs, getGatew
 
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 from DIRAC.Core.Security import Locations
+from DIRAC.Core.Tornado.Client.private.SessionPool import gSessionPool
 from DIRAC.Core.Utilities import Network
 from DIRAC.Core.Utilities.JEncode import decode, encode
 
@@ -99,6 +101,7 @@ class TornadoBaseClient(object):
         self._destinationSrv = serviceName
         self._serviceName = serviceName
         self.__ca_location = False
+        self.__proxyFile = None
 
         self.kwargs = kwargs
         self.__idp = None
@@ -552,10 +555,12 @@ class TornadoBaseClient(object):
 
             auth = {"headers": {"Authorization": "Bearer %s" % token["access_token"]}}
         elif self.kwargs.get(self.KW_PROXY_STRING):
-            tmpHandle, cert = tempfile.mkstemp()
-            fp = os.fdopen(tmpHandle, "w")
-            fp.write(self.kwargs[self.KW_PROXY_STRING])
-            fp.close()
+            # The proxy is written once, so that its session is reused by the next calls
+            if not self.__proxyFile:
+                tmpHandle, self.__proxyFile = tempfile.mkstemp()
+                with os.fdopen(tmpHandle, "w") as fp:
+                    fp.write(self.kwargs[self.KW_PROXY_STRING])
+            auth = {"cert": self.__proxyFile}
 
         # CHRIS 04.02.21
         # TODO: add proxyLocation check ?
@@ -576,7 +581,7 @@ class TornadoBaseClient(object):
 
                 # Default case, just return the result
                 if not outputFile:
-                    call = requests.post(url, data=kwargs, timeout=self.timeout, verify=verify, **auth)
+                    call = gSessionPool.post(url, data=kwargs, timeout=self.timeout, verify=verify, **auth)
                     # raising the exception for status here
                     # means essentialy that we are losing here the information of what is returned by the server
                     # as error message, since it is not passed to the exception
@@ -595,7 +600,9 @@ class TornadoBaseClient(object):
                     rawText = None
                     # Stream download
                     # https://requests.readthedocs.io/en/latest/user/advanced/#body-content-workflow
-                    with requests.post(url, data=kwargs, timeout=self.timeout, verify=verify, stream=True, **auth) as r:
+                    with gSessionPool.post(
+                        url, data=kwargs, timeout=self.timeout, verify=verify, stream=True, **auth
+                    ) as r:
                         rawText = r.text
                         r.raise_for_status()
 
@@ -0,0 +1,127 @@
+""" Test the pool of the HTTPS sessions of the TornadoClients, against a local HTTP server
+"""
+# pylint: disable=protected-access
+import concurrent.futures
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from DIRAC.Core.Tornado.Client.private import SessionPool
+from DIRAC.Core.Tornado.Client.private.SessionPool import HTTPSSessionPool
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.clientPorts.add(self.client_address[1])
+        body = b"OK"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serverURL():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.clientPorts = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d/Framework/Dummy" % server.server_address[1], server.clientPorts
+    server.shutdown()
+    server.server_close()
+
+
+def test_reuse(serverURL):
+    url, clientPorts = serverURL
+    pool = HTTPSSessionPool(poolSize=2, idleTimeout=60)
+    for _ in range(10):
+        assert pool.post(url, data={"method": "ping"}, timeout=10).text == "OK"
+    # A single connection is used for all the calls
+    assert len(clientPorts) == 1
+    stats = pool.getStats()
+    assert stats["Requests"] == 10
+    assert stats["Handshakes"] == 1
+    assert stats["Sessions"] == 1
+    assert stats["ReuseRatio"] == pytest.approx(0.9)
+
+    # Concurrent calls: at most poolSize connections are kept alive
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: pool.post(url, data={}, timeout=10).text, range(40)))
+    assert results == ["OK"] * 40
+    stats = pool.getStats()
+    assert stats["Requests"] == 50
+    assert stats["Handshakes"] < 25
+
+    # Without pool, each call opens a connection
+    noPool = HTTPSSessionPool(poolSize=0)
+    for _ in range(3):
+        assert noPool.post(url, data={}, timeout=10).text == "OK"
+    assert noPool.getStats()["Handshakes"] == 3
+
+
+def test_credentials(serverURL, tmp_path):
+    url, clientPorts = serverURL
+    pool = HTTPSSessionPool(poolSize=2, idleTimeout=60)
+    proxy = tmp_path / "proxy"
+    proxy.write_text("first proxy")
+    session = pool.getSession(url, str(proxy))
+    assert pool.getSession(url, str(proxy)) is session
+    # Other credentials or server, other session
+    assert pool.getSession(url, (str(proxy), str(proxy))) is not session
+    assert pool.getSession(url.replace("127.0.0.1", "localhost"), str(proxy)) is not session
+    assert pool.getStats()["Sessions"] == 3
+
+    # Renewed proxy: the session is replaced
+    proxy.write_text("second proxy, renewed")
+    stat = os.stat(str(proxy))
+    os.utime(str(proxy), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    renewedSession = pool.getSession(url, str(proxy))
+    assert renewedSession is not session
+    assert pool.getStats()["Invalidations"] == 1
+    assert pool.getStats()["Sessions"] == 3
+
+    # The sessions of these credentials with all the servers are closed
+    pool.invalidate(str(proxy))
+    assert pool.getStats()["Sessions"] == 1
+    pool.invalidate()
+    assert pool.getStats()["Sessions"] == 0
+    assert pool.getStats()["Invalidations"] == 4
+
+
+def test_idleTimeout(serverURL, mocker):
+    url, clientPorts = serverURL
+    pool = HTTPSSessionPool(poolSize=2, idleTimeout=60)
+    timeMock = mocker.patch("DIRAC.Core.Tornado.Client.private.SessionPool.time.time", return_value=1000.0)
+    pool._HTTPSSessionPool__lastPurge = 1000.0
+    assert pool.post(url, data={}, timeout=10).text == "OK"
+    timeMock.return_value = 1030.0
+    assert pool.post(url, data={}, timeout=10).text == "OK"
+    assert pool.getStats()["Evictions"] == 0
+    # Idle for more than a minute: the session and its connection are closed
+    timeMock.return_value = 1100.0
+    assert pool.post(url, data={}, timeout=10).text == "OK"
+    stats = pool.getStats()
+    assert stats["Evictions"] == 1
+    assert stats["Handshakes"] == 2
+    assert len(clientPorts) == 2
+
+
+def test_sessionPoolActivity(serverURL, mocker):
+    url, _clientPorts = serverURL
+    pool = HTTPSSessionPool(poolSize=2, idleTimeout=60)
+    mocker.patch.object(SessionPool, "gSessionPool", pool)
+    mocker.patch.object(SessionPool, "gLastPoolStats", {"Requests": 0, "Handshakes": 0})
+    assert SessionPool.getSessionPoolActivity() == {}
+    for _ in range(4):
+        pool.post(url, data={}, timeout=10)
+    assert SessionPool.getSessionPoolActivity() == {"HTTPSRequests": 4, "HTTPSHandshakes": 1, "HTTPSReuseRatio": 75}
+    assert SessionPool.getSessionPoolActivity() == {}
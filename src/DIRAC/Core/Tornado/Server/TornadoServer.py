@@ -6,6 +6,7 @@ It may work better with TornadoClient but as it accepts HTTPS you can create you
 import time
 import datetime
 import os
+import sys
 import asyncio
 
 import M2Crypto
@@ -242,16 +243,24 @@ class TornadoServer(object):
         # Calculate CPU usage by comparing realtime and cpu time since last report
         percentage = self.__endReportToMonitoringLoop(self.__report[0], self.__report[1])
         # Send record to Monitoring
-        self.activityMonitoringReporter.addRecord(
-            {
-                "timestamp": int(Time.toEpoch()),
-                "Host": Network.getFQDN(),
-                "ServiceName": "Tornado",
-                "MemoryUsage": self.__report[2],
-                "CpuPercentage": percentage,
-                "ResponseTime": responseTime,
-            }
-        )
+        record = {
+            "timestamp": int(Time.toEpoch()),
+            "Host": Network.getFQDN(),
+            "ServiceName": "Tornado",
+            "MemoryUsage": self.__report[2],
+            "CpuPercentage": percentage,
+            "ResponseTime": responseTime,
+        }
+        # Usage of the MySQL connections, if the services use MySQL
+        # (the module is not imported here, it requires MySQLdb)
+        mysqlModule = sys.modules.get("DIRAC.Core.Utilities.MySQL")
+        if mysqlModule:
+            record.update(mysqlModule.getConnectionPoolsActivity())
+        # Reuse of the HTTPS connections to the other services, if any was called
+        sessionPoolModule = sys.modules.get("DIRAC.Core.Tornado.Client.private.SessionPool")
+        if sessionPoolModule:
+            record.update(sessionPoolModule.getSessionPoolActivity())
+        self.activityMonitoringReporter.addRecord(record)
         self.activityMonitoringReporter.commit()
         # Save memory usage and save realtime/CPU time for next call
         self.__report = self.__startReportToMonitoringLoop()
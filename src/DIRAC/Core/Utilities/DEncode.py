@@ -10,6 +10,9 @@ Encoding and decoding for dirac, Ids:
  l -> list
  t -> tuple
  d -> dictionary
+
+An alternative implementation of the same format, faster and with a streaming decoder,
+is available in :py:mod:`DIRAC.Core.Utilities.FastDEncode`
 """
 from past.builtins import long
 import six
@@ -529,6 +532,13 @@ def decode(data):
     return g_dDecodeFunctions[data[0]](data, 0)
 
 
+# Setting this environment variable to "Yes" replaces encode and decode by their
+# equivalent in FastDEncode, which produce and accept exactly the same data.
+# It is ignored when debugging the call stack, which relies on the functions above
+if os.environ.get("DIRAC_USE_FAST_DENCODE", "No").lower() in ("yes", "true") and not DIRAC_DEBUG_DENCODE_CALLSTACK:
+    from DIRAC.Core.Utilities.FastDEncode import encode, decode  # noqa # pylint: disable=unused-import
+
+
 if __name__ == "__main__":
     gObject = {2: "3", True: (3, None), 2.0 * 10**20: 2.0 * 10**-10}
     print("Initial: %s" % gObject)
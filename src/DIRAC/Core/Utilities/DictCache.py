@@ -2,34 +2,74 @@
   DictCache.
 """
 import datetime
+import heapq
+import itertools
 import threading
+import time
+import weakref
+from collections import OrderedDict
 
 # DIRAC
 from DIRAC.Core.Utilities.LockRing import LockRing
 
 
-class ThreadLocalDict(threading.local):
-    """This class is just useful to have a mutable object (in this case, a dict) as a thread local
+class MockLockRing(object):
+    """This mock class is just used to expose the acquire and release method"""
+
+    def doNothing(self, *args, **kwargs):
+        """Really does nothing !"""
+        pass
+
+    acquire = release = doNothing
+
+
+class CacheShard(object):
+    """A part of the cache, with its own lock, entries, expiration heap and counters.
+
+    The methods of this class do not lock: it is up to the DictCache to hold the lock.
+    """
+
+    def __init__(self, lock, maxEntries=0):
+        """c'tor
+
+        :param lock: lock protecting the shard
+        :param int maxEntries: maximum number of entries in the shard. 0 means no limit
+        """
+        self.lock = lock
+        self.maxEntries = maxEntries
+        # { key : [expirationTime, value] }. The order is the order of use (LRU first)
+        self.entries = OrderedDict()
+        # Heap of (expirationTime, sequence, key, entry). Entries which have been
+        # replaced or deleted are left in the heap and skipped when popped
+        self.heap = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+class ThreadLocalShard(threading.local):
+    """This class is just useful to have a mutable object (in this case, a CacheShard) as a thread local
     Read the _threading_local docstring for more details.
 
     Its purpose is to have a different cache per thread
     """
 
-    def __init__(self):  # pylint: disable=super-init-not-called
+    def __init__(self, maxEntries=0):  # pylint: disable=super-init-not-called
         """c'tor"""
         # Note: it is on purpose that the threading.local constructor is not called
-        # Dictionary, local to a thread, that will be used as such
-        self.cache = {}
+        # Shard, local to a thread, that will be used as the whole cache
+        self.shard = CacheShard(MockLockRing(), maxEntries)
 
 
-class MockLockRing(object):
-    """This mock class is just used to expose the acquire and release method"""
+def _sweepCache(cacheRef):
+    """Periodic task purging the expired entries of a cache, if it still exists
 
-    def doNothing(self, *args, **kwargs):
-        """Really does nothing !"""
-        pass
-
-    acquire = release = doNothing
+    :param cacheRef: weak reference to the DictCache, so that the task does not keep it alive
+    """
+    cache = cacheRef()
+    if cache is not None:
+        cache.purgeExpired()
 
 
 class DictCache(object):
@@ -37,57 +77,156 @@ class DictCache(object):
     The user can decide whether this cache should be shared among the threads or not, but it is always thread safe
     Note that when shared, the access to the cache is protected by a lock, but not necessarily the
     object you are retrieving from it.
+
+    Expiration times are measured with a monotonic clock, so the cache is not affected by changes of the
+    system time. The expired entries are removed when they are accessed, when new entries are added
+    (from the expiration heap, only as many as are expired), or by purgeExpired, which can be called
+    periodically by a background task (see sweepInterval).
+
+    Optionally, the cache can be bounded (maxEntries): when full, the least recently used entries are evicted.
+    The keys can also be spread over several shards, each with its own lock, to reduce the contention
+    between threads. The bound and the LRU order are then per shard.
     """
 
-    def __init__(self, deleteFunction=False, threadLocal=False):
+    # Maximum number of expired entries removed from the heap when adding an entry
+    __MAX_LAZY_PURGE = 10
+
+    def __init__(self, deleteFunction=False, threadLocal=False, maxEntries=0, shards=1, sweepInterval=0):
         """Initialize the dict cache.
 
         :param deleteFunction: if not False, invoked when deleting a cached object
         :param threadLocal: if False, the cache will be shared among all the threads, otherwise,
                             each thread gets its own cache.
+        :param int maxEntries: if not 0, maximum number of entries. When reached, the least
+                               recently used entries are evicted.
+        :param int shards: number of independently locked parts of a shared cache
+        :param int sweepInterval: if not 0, period in seconds at which the expired entries are purged
+                                  in the background (at least 60 seconds, see ThreadScheduler)
         """
 
         self.__threadLocal = threadLocal
+        self.__nShards = 1 if threadLocal else max(1, int(shards))
+        shardMaxEntries = -(-maxEntries // self.__nShards) if maxEntries > 0 else 0
 
         # Placeholder either for a LockRing if the cache is shared,
         # or a mock class if not.
         self.__lock = None
 
-        # One of the following two objects is returned
-        # by the __cache property, depending on the threadLocal strategy
+        # One of the following two objects is used,
+        # depending on the threadLocal strategy
 
         # This is the Placeholder for a shared cache
-        self.__sharedCache = {}
-        # This is the Placeholder for a shared cache
-        self.__threadLocalCache = ThreadLocalDict()
+        self.__sharedShards = []
+        # This is the Placeholder for a thread local cache
+        self.__threadLocalCache = None
+
+        if threadLocal:
+            self.__threadLocalCache = ThreadLocalShard(shardMaxEntries)
+        elif self.__nShards == 1:
+            # Keep using the lock shared by all the DictCache instances
+            self.__sharedShards = [CacheShard(self.lock, shardMaxEntries)]
+        else:
+            self.__sharedShards = [
+                CacheShard(LockRing().getLock(recursive=True), shardMaxEntries) for _ in range(self.__nShards)
+            ]
+
+        # Tie breaker for the heap entries having the same expiration time
+        self.__sequence = itertools.count()
 
         # Function to clean the elements
         self.__deleteFunction = deleteFunction
 
+        self.__sweepTaskId = None
+        if sweepInterval and not threadLocal:
+            # Imported here to avoid loading the ThreadScheduler (and DIRAC) with the DictCache
+            from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+
+            result = gThreadScheduler.addPeriodicTask(sweepInterval, _sweepCache, taskArgs=(weakref.ref(self),))
+            if result["OK"]:
+                self.__sweepTaskId = result["Value"]
+
     @property
     def lock(self):
         """Return the lock.
         In practice, if the cache is shared among threads, it is a LockRing.
         Otherwise, it is just a mock object.
+        When the cache is sharded, this is the lock of the first shard.
         """
 
         if not self.__lock:
-            if not self.__threadLocal:
-                self.__lock = LockRing().getLock(self.__class__.__name__, recursive=True)
-            else:
+            if self.__threadLocal:
                 self.__lock = MockLockRing()
+            elif self.__sharedShards:
+                self.__lock = self.__sharedShards[0].lock
+            else:
+                self.__lock = LockRing().getLock(self.__class__.__name__, recursive=True)
 
         return self.__lock
 
     @property
-    def __cache(self):
-        """Returns either a shared or a thread local cache.
-        In any case, the returned object is a dictionary
+    def __shards(self):
+        """Returns either the shared shards or the thread local one.
+        In any case, the returned object is a list of CacheShard
         """
         if self.__threadLocal:
-            return self.__threadLocalCache.cache
+            return [self.__threadLocalCache.shard]
 
-        return self.__sharedCache
+        return self.__sharedShards
+
+    def __getShard(self, cKey):
+        """Returns the shard in charge of a key"""
+        if self.__threadLocal:
+            return self.__threadLocalCache.shard
+        if self.__nShards == 1:
+            return self.__sharedShards[0]
+        return self.__sharedShards[hash(cKey) % self.__nShards]
+
+    def __deleteEntry(self, shard, cKey):
+        """Remove an entry from a shard, calling the delete function. The shard lock must be held"""
+        entry = shard.entries.pop(cKey)
+        if self.__deleteFunction:
+            self.__deleteFunction(entry[1])
+
+    def __purgeShard(self, shard, limitTime, maxEntries=None):
+        """Remove from a shard the entries expiring before limitTime, using the heap.
+        The shard lock must be held.
+
+        :param shard: CacheShard
+        :param float limitTime: monotonic time
+        :param int maxEntries: maximum number of heap entries to look at
+        """
+        heap = shard.heap
+        while heap and heap[0][0] < limitTime:
+            if maxEntries is not None:
+                if maxEntries <= 0:
+                    break
+                maxEntries -= 1
+            _expTime, _seq, cKey, entry = heapq.heappop(heap)
+            # Skip the heap entries of keys deleted or replaced since
+            if shard.entries.get(cKey) is entry:
+                shard.expirations += 1
+                self.__deleteEntry(shard, cKey)
+
+    def __getValid(self, shard, cKey, validSeconds):
+        """Returns the entry of a key if it is valid for validSeconds, deleting it if it is not.
+        The shard lock must be held and the hit/miss counters are updated.
+
+        :return: None or [expirationTime, value]
+        """
+        entry = shard.entries.get(cKey)
+        if entry is None:
+            shard.misses += 1
+            return None
+        # If it's valid return it!
+        if entry[0] > time.monotonic() + validSeconds:
+            shard.hits += 1
+            if shard.maxEntries:
+                shard.entries.move_to_end(cKey)
+            return entry
+        # Delete expired
+        shard.misses += 1
+        self.__deleteEntry(shard, cKey)
+        return None
 
     def exists(self, cKey, validSeconds=0):
         """Returns True/False if the key exists for the given number of seconds
@@ -97,35 +236,26 @@ class DictCache(object):
 
         :return: bool
         """
-        self.lock.acquire()
+        shard = self.__getShard(cKey)
+        shard.lock.acquire()
         try:
-            # Is the key in the cache?
-            if cKey in self.__cache:
-                expTime = self.__cache[cKey]["expirationTime"]
-                # If it's valid return True!
-                if expTime > datetime.datetime.now() + datetime.timedelta(seconds=validSeconds):
-                    return True
-                else:
-                    # Delete expired
-                    self.delete(cKey)
-            return False
+            return self.__getValid(shard, cKey, validSeconds) is not None
         finally:
-            self.lock.release()
+            shard.lock.release()
 
     def delete(self, cKey):
         """Delete a key from the cache
 
         :param cKey: identification key of the record
         """
-        self.lock.acquire()
+        shard = self.__getShard(cKey)
+        shard.lock.acquire()
         try:
-            if cKey not in self.__cache:
+            if cKey not in shard.entries:
                 return
-            if self.__deleteFunction:
-                self.__deleteFunction(self.__cache[cKey]["value"])
-            del self.__cache[cKey]
+            self.__deleteEntry(shard, cKey)
         finally:
-            self.lock.release()
+            shard.lock.release()
 
     def add(self, cKey, validSeconds, value=None):
         """Add a record to the cache
@@ -136,12 +266,28 @@ class DictCache(object):
         """
         if max(0, validSeconds) == 0:
             return
-        self.lock.acquire()
+        shard = self.__getShard(cKey)
+        shard.lock.acquire()
         try:
-            vD = {"expirationTime": datetime.datetime.now() + datetime.timedelta(seconds=validSeconds), "value": value}
-            self.__cache[cKey] = vD
+            now = time.monotonic()
+            entry = [now + validSeconds, value]
+            shard.entries[cKey] = entry
+            shard.entries.move_to_end(cKey)
+            heapq.heappush(shard.heap, (entry[0], next(self.__sequence), cKey, entry))
+            # Remove a few expired entries, so that the cache does not grow with them
+            self.__purgeShard(shard, now, maxEntries=self.__MAX_LAZY_PURGE)
+            # Evict the least recently used entries if the cache is full
+            if shard.maxEntries:
+                while len(shard.entries) > shard.maxEntries:
+                    lruKey = next(iter(shard.entries))
+                    shard.evictions += 1
+                    self.__deleteEntry(shard, lruKey)
+            # Rebuild the heap when it is mostly made of entries which are not in the cache anymore
+            if len(shard.heap) > 2 * len(shard.entries) + 100:
+                shard.heap = [item for item in shard.heap if shard.entries.get(item[2]) is item[3]]
+                heapq.heapify(shard.heap)
         finally:
-            self.lock.release()
+            shard.lock.release()
 
     def get(self, cKey, validSeconds=0):
         """Get a record from the cache
@@ -151,37 +297,34 @@ class DictCache(object):
 
         :return: None or value of key
         """
-        self.lock.acquire()
+        shard = self.__getShard(cKey)
+        shard.lock.acquire()
         try:
-            # Is the key in the cache?
-            if cKey in self.__cache:
-                expTime = self.__cache[cKey]["expirationTime"]
-                # If it's valid return True!
-                if expTime > datetime.datetime.now() + datetime.timedelta(seconds=validSeconds):
-                    return self.__cache[cKey]["value"]
-                else:
-                    # Delete expired
-                    self.delete(cKey)
-            return None
+            entry = self.__getValid(shard, cKey, validSeconds)
+            return entry[1] if entry is not None else None
         finally:
-            self.lock.release()
+            shard.lock.release()
 
     def showContentsInString(self):
         """Return a human readable string to represent the contents
 
         :return: str
         """
-        self.lock.acquire()
-        try:
-            data = []
-            for cKey in self.__cache:
-                data.append("%s:" % str(cKey))
-                data.append("\tExp: %s" % self.__cache[cKey]["expirationTime"])
-                if self.__cache[cKey]["value"]:
-                    data.append("\tVal: %s" % self.__cache[cKey]["value"])
-            return "\n".join(data)
-        finally:
-            self.lock.release()
+        data = []
+        for shard in self.__shards:
+            shard.lock.acquire()
+            try:
+                # Convert the monotonic expiration time to a date
+                nowDate = datetime.datetime.now()
+                now = time.monotonic()
+                for cKey, (expTime, value) in shard.entries.items():
+                    data.append("%s:" % str(cKey))
+                    data.append("\tExp: %s" % (nowDate + datetime.timedelta(seconds=expTime - now)))
+                    if value:
+                        data.append("\tVal: %s" % value)
+            finally:
+                shard.lock.release()
+        return "\n".join(data)
 
     def getKeys(self, validSeconds=0):
         """Get keys for all contents
@@ -190,35 +333,29 @@ class DictCache(object):
 
         :return: list
         """
-        self.lock.acquire()
-        try:
-            keys = []
-            limitTime = datetime.datetime.now() + datetime.timedelta(seconds=validSeconds)
-            for cKey in self.__cache:
-                if self.__cache[cKey]["expirationTime"] > limitTime:
-                    keys.append(cKey)
-            return keys
-        finally:
-            self.lock.release()
+        keys = []
+        for shard in self.__shards:
+            shard.lock.acquire()
+            try:
+                limitTime = time.monotonic() + validSeconds
+                for cKey, entry in shard.entries.items():
+                    if entry[0] > limitTime:
+                        keys.append(cKey)
+            finally:
+                shard.lock.release()
+        return keys
 
     def purgeExpired(self, expiredInSeconds=0):
         """Purge all entries that are expired or will be expired in <expiredInSeconds>
 
         :param int expiredInSeconds: expired time in a seconds
         """
-        self.lock.acquire()
-        try:
-            keys = []
-            limitTime = datetime.datetime.now() + datetime.timedelta(seconds=expiredInSeconds)
-            for cKey in self.__cache:
-                if self.__cache[cKey]["expirationTime"] < limitTime:
-                    keys.append(cKey)
-            for cKey in keys:
-                if self.__deleteFunction:
-                    self.__deleteFunction(self.__cache[cKey]["value"])
-                del self.__cache[cKey]
-        finally:
-            self.lock.release()
+        for shard in self.__shards:
+            shard.lock.acquire()
+            try:
+                self.__purgeShard(shard, time.monotonic() + expiredInSeconds)
+            finally:
+                shard.lock.release()
 
     def purgeAll(self, useLock=True):
         """Purge all entries
@@ -226,16 +363,36 @@ class DictCache(object):
 
         :param bool useLock: use lock
         """
-        if useLock:
-            self.lock.acquire()
-        try:
-            for cKey in list(self.__cache):
-                if self.__deleteFunction:
-                    self.__deleteFunction(self.__cache[cKey]["value"])
-                del self.__cache[cKey]
-        finally:
+        for shard in self.__shards:
             if useLock:
-                self.lock.release()
+                shard.lock.acquire()
+            try:
+                for cKey in list(shard.entries):
+                    self.__deleteEntry(shard, cKey)
+                shard.heap = []
+            finally:
+                if useLock:
+                    shard.lock.release()
+
+    def getStats(self):
+        """Get the size and the usage counters of the cache
+        (for a thread local cache, the ones of the current thread)
+
+        :return: dict with the keys Entries, MaxEntries, Hits, Misses, Evictions and Expirations
+        """
+        stats = {"Entries": 0, "MaxEntries": 0, "Hits": 0, "Misses": 0, "Evictions": 0, "Expirations": 0}
+        for shard in self.__shards:
+            shard.lock.acquire()
+            try:
+                stats["Entries"] += len(shard.entries)
+                stats["MaxEntries"] += shard.maxEntries
+                stats["Hits"] += shard.hits
+                stats["Misses"] += shard.misses
+                stats["Evictions"] += shard.evictions
+                stats["Expirations"] += shard.expirations
+            finally:
+                shard.lock.release()
+        return stats
 
     def __del__(self):
         """When the DictCache is deleted, all the entries should be purged.
@@ -244,9 +401,13 @@ class DictCache(object):
         caveat of __del__. In particular, no guaranty that it is called...
         (https://docs.python.org/2/reference/datamodel.html#object.__del__)
         """
+        if self.__sweepTaskId:
+            from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+
+            gThreadScheduler.removeTask(self.__sweepTaskId)
         self.purgeAll(useLock=False)
         del self.__lock
         if self.__threadLocal:
             del self.__threadLocalCache
         else:
-            del self.__sharedCache
+            del self.__sharedShards
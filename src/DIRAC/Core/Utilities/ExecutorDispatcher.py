@@ -18,6 +18,7 @@ class ExecutorState(object):
         self.__lock = threading.Lock()
         self.__typeToId = {}
         self.__maxTasks = {}
+        self.__batchSize = {}
         self.__execTasks = {}
         self.__taskInExec = {}
 
@@ -25,15 +26,17 @@ class ExecutorState(object):
         return {
             "type2id": dict(self.__typeToId),
             "maxTasks": dict(self.__maxTasks),
+            "batchSize": dict(self.__batchSize),
             "execTasks": dict(self.__execTasks),
             "tasksInExec": dict(self.__taskInExec),
             "locked": self.__lock.locked(),  # pylint: disable=no-member
         }
 
-    def addExecutor(self, eId, eTypes, maxTasks=1):
+    def addExecutor(self, eId, eTypes, maxTasks=1, batchSize=1):
         self.__lock.acquire()
         try:
             self.__maxTasks[eId] = max(1, maxTasks)
+            self.__batchSize[eId] = max(1, min(batchSize, self.__maxTasks[eId]))
             if eId not in self.__execTasks:
                 self.__execTasks[eId] = set()
             if not isinstance(eTypes, (list, tuple)):
@@ -57,6 +60,7 @@ class ExecutorState(object):
                 tasks.append(taskId)
             self.__execTasks.pop(eId)
             self.__maxTasks.pop(eId)
+            self.__batchSize.pop(eId)
             return tasks
         finally:
             self.__lock.release()
@@ -79,6 +83,23 @@ class ExecutorState(object):
         except KeyError:
             return 0
 
+    def batchSlots(self, eId):
+        """Number of tasks to send at once to an executor
+
+        An executor processing batches gets a full batch, or what is left when it is idle. While it is
+        processing a batch, it gets nothing until enough of its tasks are finished.
+        """
+        freeSlots = self.freeSlots(eId)
+        try:
+            batchSize = self.__batchSize[eId]
+            if freeSlots >= batchSize:
+                return batchSize
+            if not self.__execTasks[eId]:
+                return freeSlots
+        except KeyError:
+            pass
+        return 0
+
     def getFreeExecutors(self, eType):
         execs = {}
         try:
@@ -99,6 +120,8 @@ class ExecutorState(object):
         maxFreeSlots = 0
         try:
             for eId in self.__typeToId[eType]:
+                if not self.batchSlots(eId):
+                    continue
                 freeSlots = self.freeSlots(eId)
                 if freeSlots > maxFreeSlots:
                     maxFreeSlots = freeSlots
@@ -188,24 +211,37 @@ class ExecutorQueues(object):
             self.__lock.release()
 
     def popTask(self, eTypes):
+        pData = self.popTasks(eTypes)
+        if pData is None:
+            return None
+        return (pData[0][0], pData[1])
+
+    def popTasks(self, eTypes, numTasks=1):
+        """Pop up to numTasks tasks waiting for the same executor type
+
+        :param eTypes: executor type(s), by order of preference
+        :param int numTasks: maximum number of tasks
+
+        :return: (list of task IDs, executor type), None if no task is waiting
+        """
         if not isinstance(eTypes, (list, tuple)):
             eTypes = [eTypes]
         self.__lock.acquire()
-        for eType in eTypes:
-            try:
-                taskId = self.__queues[eType].pop(0)
-                del self.__taskInQueue[taskId]
-                # Found! release and return!
-                self.__lock.release()
+        try:
+            for eType in eTypes:
+                queue = self.__queues.get(eType)
+                if not queue:
+                    continue
+                taskIds = queue[:numTasks]
+                del queue[:numTasks]
+                for taskId in taskIds:
+                    self.__taskInQueue.pop(taskId, None)
                 self.__lastUse[eType] = time.time()
-                self.__log.verbose("Popped task %s from executor %s waiting queue" % (taskId, eType))
-                return (taskId, eType)
-            except IndexError:
-                continue
-            except KeyError:
-                continue
-        self.__lock.release()
-        # Not found. release and return None
+                self.__log.verbose("Popped tasks %s from executor %s waiting queue" % (taskIds, eType))
+                return (taskIds, eType)
+        finally:
+            self.__lock.release()
+        # Not found
         return None
 
     def getState(self):
@@ -255,6 +291,17 @@ class ExecutorDispatcherCallbacks(object):
     def cbSendTask(self, taskId, taskObj, eId, eType):
         return S_ERROR("No send task callback defined")
 
+    def cbSendTasks(self, tasks, eId, eType):
+        """Send a batch of tasks, by default one by one
+
+        :param list tasks: (taskId, taskObj) tuples
+        """
+        for taskId, taskObj in tasks:
+            result = self.cbSendTask(taskId, taskObj, eId, eType)
+            if not result["OK"]:
+                return result
+        return S_OK()
+
     def cbDisconectExecutor(self, eId):
         return S_ERROR("No disconnect callback defined")
 
@@ -357,7 +404,7 @@ class ExecutorDispatcher(object):
             return
         eTypes = self.__execTypes
 
-    def addExecutor(self, eId, eTypes, maxTasks=1):
+    def addExecutor(self, eId, eTypes, maxTasks=1, batchSize=1):
         self.__log.verbose("Adding new %s executor to the pool %s" % (eId, ", ".join(eTypes)))
         self.__executorsLock.acquire()
         try:
@@ -366,7 +413,7 @@ class ExecutorDispatcher(object):
             if not isinstance(eTypes, (list, tuple)):
                 eTypes = [eTypes]
             self.__idMap[eId] = list(eTypes)
-            self.__states.addExecutor(eId, eTypes, maxTasks)
+            self.__states.addExecutor(eId, eTypes, maxTasks, batchSize)
             for eType in eTypes:
                 if eType not in self.__execTypes:
                     self.__execTypes[eType] = 0
@@ -627,7 +674,7 @@ class ExecutorDispatcher(object):
             self.__freezerLock.release()
         if eId:
             # Send task to executor if idle
-            self.__sendTaskToExecutor(eId, checkIdle=True)
+            self.__sendTaskToExecutor(eId)
         return S_OK()
 
     def __taskReceived(self, taskId, eId):
@@ -743,8 +790,9 @@ class ExecutorDispatcher(object):
             eId = self.__states.getIdleExecutor(eType)
         self.__log.verbose("No more idle executors for %s" % eType)
 
-    def __sendTaskToExecutor(self, eId, eTypes=False, checkIdle=False):
-        if checkIdle and self.__states.freeSlots(eId) == 0:
+    def __sendTaskToExecutor(self, eId, eTypes=False):
+        numTasks = self.__states.batchSlots(eId)
+        if not numTasks:
             return S_OK()
         try:
             searchTypes = list(reversed(self.__idMap[eId]))
@@ -760,11 +808,14 @@ class ExecutorDispatcher(object):
                 except ValueError:
                     pass
                 searchTypes.append(eType)
-        pData = self.__queues.popTask(searchTypes)
+        pData = self.__queues.popTasks(searchTypes, numTasks)
         if pData is None:
             self.__log.verbose("No more tasks for %s" % eTypes)
             return S_OK()
-        taskId, eType = pData
+        taskIds, eType = pData
+        if len(taskIds) > 1:
+            return self.__sendTasksToExecutor(taskIds, eId, eType)
+        taskId = taskIds[0]
         self.__log.verbose("Sending task %s to %s=%s" % (taskId, eType, eId))
         self.__states.addTask(eId, taskId)
         try:
@@ -780,6 +831,34 @@ class ExecutorDispatcher(object):
             return S_ERROR("Exception while sending task to executor")
         return S_OK(taskId)
 
+    def __sendTasksToExecutor(self, taskIds, eId, eType):
+        self.__log.verbose("Sending tasks %s to %s=%s" % (taskIds, eType, eId))
+        tasks = []
+        for taskId in taskIds:
+            try:
+                eTask = self.__tasks[taskId]
+            except KeyError:
+                self.__log.error("Task has been deleted before being sent", "%s" % taskId)
+                continue
+            eTask.sendTime = time.time()
+            self.__states.addTask(eId, taskId)
+            tasks.append((taskId, eTask.taskObj))
+        if not tasks:
+            return S_OK()
+        try:
+            result = self.__cbHolder.cbSendTasks(tasks, eId, eType)
+            if not isReturnStructure(result):
+                errMsg = "Send tasks callback did not send back an S_OK/S_ERROR structure"
+                self.__log.fatal(errMsg)
+                raise ValueError(errMsg)
+        except Exception:
+            self.__log.exception("Exception while sending tasks to executor")
+            for taskId, _taskObj in tasks:
+                self.__queues.pushTask(eType, taskId, ahead=False)
+                self.__states.removeTask(taskId)
+            return S_ERROR("Exception while sending tasks to executor")
+        return S_OK([taskId for taskId, _taskObj in tasks])
+
     def __msgTaskToExecutor(self, taskId, eId, eType):
         try:
             self.__tasks[taskId].sendTime = time.time()
@@ -1,38 +1,182 @@
+import hashlib
+import re
+from types import MappingProxyType
+
 from diraccfg import CFG
 from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.Utilities import List
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+# Characters delimiting the JDL tokens
+_JDL_DELIMITERS = re.compile(r'["\[\]{};=]')
+_JDL_NESTING = re.compile(r"[\[\]{}]")
+# Maximum number of parsed JDLs kept by getParsedJDL
+JDL_CACHE_SIZE = 2000
+# The JDLs do not change, the cache is only bounded by its size
+JDL_CACHE_LIFETIME = 86400
+_jdlCache = DictCache(maxEntries=JDL_CACHE_SIZE, shards=4)
+
+
+def parseJDL(jdl):
+    """Parse a JDL into its attributes
+
+    The JDL is split on the ; and = found outside of the string literals and of the nested [ ] and { }.
+    The values are the expressions as written in the JDL, without the surrounding blanks and the
+    new lines, as in the ClassAd contents.
+
+    :param str jdl: JDL enclosed in [ ]
+
+    :return: S_OK(immutable mapping { name: value expression })/S_ERROR
+    """
+    jdl = jdl.strip()
+    if not jdl or jdl[0] != "[" or jdl[-1] != "]":
+        return S_ERROR("Invalid JDL: it should start with [ and end with ]")
+    contents = _splitJDL(jdl)
+    if contents is None:
+        result = _tokenizeJDL(jdl)
+        if not result["OK"]:
+            return result
+        contents = result["Value"]
+    return S_OK(MappingProxyType(contents))
+
+
+def _splitJDL(jdl):
+    """Parse a JDL by splitting it on the ;, which is the fastest for the usual JDLs
+
+    :return: dict { name: value expression }, None if the JDL is invalid
+    """
+    contents = {}
+    statement = ""
+    for piece in jdl[1:-1].split(";"):
+        statement += piece
+        if statement.count('"') % 2:
+            # The ; is inside a string
+            statement += ";"
+            continue
+        nested = "[" in statement or "]" in statement or "{" in statement or "}" in statement
+        if nested:
+            outside = "".join(statement.split('"')[0::2]) if '"' in statement else statement
+            if outside.count("[") != outside.count("]") or outside.count("{") != outside.count("}"):
+                # The ; is inside a sub-JDL or a list
+                statement += ";"
+                continue
+        name, equal, value = statement.partition("=")
+        statement = ""
+        name = name.strip()
+        if not equal:
+            if name:
+                return None
+            continue
+        value = value.strip()
+        if not name or not value or '"' in name:
+            return None
+        if nested:
+            if _JDL_NESTING.search(name):
+                return None
+            # The brackets are balanced, check that they are not closed before being opened
+            depth = 0
+            for char in _JDL_NESTING.findall(outside):
+                depth += 1 if char in "[{" else -1
+                if depth < 0:
+                    return None
+        contents[name] = value.replace("\n", "")
+    if statement:
+        return None
+    return contents
+
+
+def _tokenizeJDL(jdl):
+    """Parse a JDL looking for the delimiters of its tokens, which locates the syntax errors
+
+    :return: S_OK(dict { name: value expression })/S_ERROR
+    """
+    end = len(jdl) - 1
+    contents = {}
+    search = _JDL_DELIMITERS.search
+    statementStart = pos = 1
+    equalPos = -1
+    depth = 0
+    while True:
+        match = search(jdl, pos, end)
+        if match is None:
+            if depth:
+                return S_ERROR("Invalid JDL: unbalanced brackets")
+            # The end of the JDL ends the last statement
+            iPos, char = end, ";"
+        else:
+            iPos = match.start()
+            char = jdl[iPos]
+        if char == '"':
+            # Jump to the end of the string literal
+            iPos = jdl.find('"', iPos + 1, end)
+            if iPos < 0:
+                return S_ERROR("Invalid JDL: unterminated string")
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth < 0:
+                return S_ERROR("Invalid JDL: unbalanced %s" % char)
+        elif depth:
+            pass
+        elif char == "=":
+            if equalPos < 0:
+                equalPos = iPos
+        else:
+            # End of statement
+            if equalPos < 0:
+                if jdl[statementStart:iPos].strip():
+                    return S_ERROR("Invalid JDL: no value for %s" % jdl[statementStart:iPos].strip())
+            else:
+                name = jdl[statementStart:equalPos].strip()
+                value = jdl[equalPos + 1 : iPos].strip().replace("\n", "")
+                if not name or not value:
+                    return S_ERROR("Invalid JDL: incomplete statement %s" % jdl[statementStart:iPos].strip())
+                contents[name] = value
+            if match is None:
+                break
+            statementStart = iPos + 1
+            equalPos = -1
+        pos = iPos + 1
+
+    return S_OK(contents)
+
+
+def getParsedJDL(jdl):
+    """Parse a JDL, or get it from the cache of the parsed JDLs, shared by all the threads
+
+    :param str jdl: JDL enclosed in [ ]
+
+    :return: S_OK(immutable mapping { name: value expression })/S_ERROR, as for parseJDL
+    """
+    key = hashlib.blake2b(jdl.encode(errors="surrogatepass"), digest_size=16).digest()
+    contents = _jdlCache.get(key)
+    if contents is None:
+        result = parseJDL(jdl)
+        if not result["OK"]:
+            return result
+        contents = result["Value"]
+        _jdlCache.add(key, JDL_CACHE_LIFETIME, contents)
+    return S_OK(contents)
 
 
 def loadJDLAsCFG(jdl):
     """
     Load a JDL as CFG
+
+    :return: S_OK((CFG, position of the closing bracket))/S_ERROR
     """
 
     def cleanValue(value):
         value = value.strip()
         if value[0] == '"':
-            entries = []
-            iPos = 1
-            current = ""
-            state = "in"
-            while iPos < len(value):
-                if value[iPos] == '"':
-                    if state == "in":
-                        entries.append(current)
-                        current = ""
-                        state = "out"
-                    elif state == "out":
-                        current = current.strip()
-                        if current not in (",",):
-                            return S_ERROR("value seems a list but is not separated in commas")
-                        current = ""
-                        state = "in"
-                else:
-                    current += value[iPos]
-                iPos += 1
-            if state == "in":
+            # Alternatively the strings and what separates them, what follows the last string is ignored
+            parts = value[1:].split('"')
+            if len(parts) % 2:
                 return S_ERROR('value is opened with " but is not closed')
-            return S_OK(", ".join(entries))
+            if any(separator.strip() != "," for separator in parts[1:-1:2]):
+                return S_ERROR("value seems a list but is not separated in commas")
+            return S_OK(", ".join(parts[0::2]))
         else:
             return S_OK(value.replace('"', ""))
 
@@ -66,64 +210,24 @@ def loadJDLAsCFG(jdl):
         cfg.setOption(key, value)
         return S_OK()
 
-    if jdl[0] == "[":
-        iPos = 1
-    else:
-        iPos = 0
-    key = ""
-    value = ""
-    action = "key"
-    insideLiteral = False
+    jdl = jdl.strip()
+    if jdl[:1] != "[":
+        jdl = "[%s]" % jdl
+    result = getParsedJDL(jdl)
+    if not result["OK"]:
+        return result
     cfg = CFG()
-    while iPos < len(jdl):
-        char = jdl[iPos]
-        if char == ";" and not insideLiteral:
-            if key.strip():
-                result = assignValue(key, value, cfg)
-                if not result["OK"]:
-                    return result
-            key = ""
-            value = ""
-            action = "key"
-        elif char == "[" and not insideLiteral:
-            key = key.strip()
-            if not key:
-                return S_ERROR("Invalid key in JDL")
-            if value.strip():
-                return S_ERROR("Key %s seems to have a value and open a sub JDL at the same time" % key)
-            result = loadJDLAsCFG(jdl[iPos:])
+    for key, value in result["Value"].items():
+        if value[0] == "[":
+            result = loadJDLAsCFG(value)
             if not result["OK"]:
                 return result
-            subCfg, subPos = result["Value"]
-            cfg.createNewSection(key, contents=subCfg)
-            key = ""
-            value = ""
-            action = "key"
-            insideLiteral = False
-            iPos += subPos
-        elif char == "=" and not insideLiteral:
-            if action == "key":
-                action = "value"
-                insideLiteral = False
-            else:
-                value += char
-        elif char == "]" and not insideLiteral:
-            key = key.strip()
-            if len(key) > 0:
-                result = assignValue(key, value, cfg)
-                if not result["OK"]:
-                    return result
-            return S_OK((cfg, iPos))
+            cfg.createNewSection(key, contents=result["Value"][0])
         else:
-            if action == "key":
-                key += char
-            else:
-                value += char
-                if char == '"':
-                    insideLiteral = not insideLiteral
-        iPos += 1
-
-    return S_OK((cfg, iPos))
+            result = assignValue(key, value, cfg)
+            if not result["OK"]:
+                return result
+    return S_OK((cfg, len(jdl) - 1))
 
 
 def dumpCFGAsJDL(cfg, level=1, tab="  "):
@@ -58,8 +58,10 @@
 
     Gets a connection from the Queue (or open a new one if none is available)
     Returns S_OK with connection in Value or S_ERROR
-    the calling method is responsible for closing this connection once it is no
-    longer needed.
+    The connection stays with the calling thread until it is given back with
+    _releaseConnection(), or until it has not been used for a while. Such connections are
+    not counted in MaxConnections, unless obtained with _getConnection(pinned=False),
+    in which case _releaseConnection() must always be called (e.g. in a finally clause).
 
 
 
@@ -90,6 +92,19 @@
       String type values will be appropriately escaped.
 
 
+    bulkInsert( self, tableName, inFields, rows, chunkSize = 1000, ignore = False, conn = None ):
+
+      Insert many rows in "tableName", each row being a sequence of values for "inFields".
+      The rows are sent by chunks, as multi-row INSERT statements, with the values bound by the driver.
+      Returns S_OK( number of inserted rows ).
+
+
+    bulkUpsert( self, tableName, inFields, rows, updateFields = None, chunkSize = 1000, conn = None ):
+
+      As bulkInsert, but updates the rows already existing (INSERT ... ON DUPLICATE KEY UPDATE).
+      updateFields is a list of fields to set to the new value, or a dictionary of SQL expressions.
+
+
     updateFields( self, tableName, updateFields = None, updateValues = None,
                   condDict = None,
                   limit = False, conn = None,
@@ -147,6 +162,7 @@
 
 """
 import collections
+import itertools
 import time
 import threading
 import MySQLdb
@@ -159,6 +175,10 @@ from DIRAC.Core.Utilities import DErrno
 gInstancesCount = 0
 MAXCONNECTRETRY = 10
 RETRY_SLEEP_DURATION = 5
+# Default number of rows sent at once by bulkInsert and bulkUpsert
+BULK_CHUNK_SIZE = 1000
+# Maximum length of the statements built by executemany (to stay below max_allowed_packet)
+BULK_MAX_STATEMENT_LENGTH = 1024 * 1024
 
 
 def _checkFields(inFields, inValues):
@@ -200,19 +220,62 @@ def _quotedList(fieldList=None):
 
 class ConnectionPool(object):
     """
-    Management of connections per thread
+    Management of the connections to a MySQL server
+
+    A thread checks out a connection with get() and gives it back with release().
+    Nested get() calls from the same thread return the same connection, which goes back
+    to the pool only when all of them have been released (or when the thread has not used
+    it for graceTime seconds, or has died, for the callers which never release it).
+
+    When maxConnections is set, no more than that number of connections are opened:
+    the threads asking for more wait, in order of arrival, for a connection to be released,
+    at most waitTimeout seconds.
+    The connections checked out with pinned=True, by callers which may never release them,
+    are kept by their thread as before and are not counted in maxConnections, so that they
+    cannot starve the other threads. They come back under the limit once released or taken back.
     """
 
-    def __init__(self, host, user, passwd, port=3306, graceTime=600):
+    # Minimum number of seconds between two cleanings of the pool
+    CLEAN_INTERVAL = 30
+
+    def __init__(self, host, user, passwd, port=3306, graceTime=600, maxConnections=0, waitTimeout=60, pingInterval=30):
+        """c'tor
+
+        :param int graceTime: seconds after which a connection unused by its thread is taken back,
+                              and an idle connection is closed
+        :param int maxConnections: maximum number of connections opened. 0 means no limit
+        :param int waitTimeout: maximum number of seconds to wait for a connection when the pool is full
+        :param int pingInterval: a connection is pinged before being used only if it has not
+                                 been used for that many seconds
+        """
         self.__host = host
         self.__user = user
         self.__passwd = passwd
         self.__port = port
         self.__graceTime = graceTime
+        self.__maxConnections = max(0, maxConnections)
+        self.__waitTimeout = waitTimeout
+        self.__pingInterval = pingInterval
+        self.__lock = threading.Lock()
+        # Connections not used by any thread: [conn, dbName, lastUse]
         self.__spares = collections.deque()
-        self.__maxSpares = 10
+        self.__maxSpares = max(10, self.__maxConnections)
         self.__lastClean = 0
+        # Connections used by a thread: {thread: [conn, dbName, lastUse, number of get() not released, pinned]}
         self.__assigned = {}
+        # Number of pinned connections, not counted in maxConnections
+        self.__nPinned = 0
+        # Threads waiting for a connection, first come first served
+        self.__waiters = collections.deque()
+        # Threads having started a transaction
+        self.__inTransaction = set()
+        # Number of connections opened (spare, assigned, or being opened)
+        self.__nConnections = 0
+        # Statistics about the waits for a connection
+        self.__nWaits = 0
+        self.__totalWaitTime = 0.0
+        self.__maxWaitTime = 0.0
+        self.__nTimeouts = 0
 
     @property
     def __thid(self):
@@ -231,44 +294,53 @@ class ConnectionPool(object):
         cursor.close()
         return res
 
-    def get(self, dbName, retries=10):
+    def get(self, dbName, retries=10, pinned=False):
+        """Check out the connection of the current thread, or a new one
+
+        :param str dbName: database to use
+        :param int retries: number of retries if the connection cannot be opened
+        :param bool pinned: the caller may never release the connection: it stays with the thread
+                            until graceTime, and does not count in maxConnections nor waits for a slot
+
+        :return: S_OK(connection)/S_ERROR
+        """
         retries = max(0, min(MAXCONNECTRETRY, retries))
-        self.clean()
-        return self.__getWithRetry(dbName, retries, retries)
+        now = time.time()
+        if now - self.__lastClean > self.CLEAN_INTERVAL:
+            self.clean(now)
+        return self.__getWithRetry(dbName, retries, retries, pinned)
 
-    def __getWithRetry(self, dbName, totalRetries, retriesLeft):
+    def __getWithRetry(self, dbName, totalRetries, retriesLeft, pinned):
         sleepTime = RETRY_SLEEP_DURATION * (totalRetries - retriesLeft)
         if sleepTime > 0:
             time.sleep(sleepTime)
         try:
-            conn, lastName, thid = self.__innerGet()
+            result = self.__innerGet(pinned)
         except MySQLdb.MySQLError as excp:
             if retriesLeft > 0:
-                return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
+                return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1, pinned)
             return S_ERROR(DErrno.EMYSQL, "Could not connect: %s" % excp)
+        if not result["OK"]:
+            return result
+        data, idleTime = result["Value"]
+        conn, lastName = data[0], data[1]
 
-        if not self.__ping(conn):
-            try:
-                self.__assigned.pop(thid)
-            except KeyError:
-                pass
+        # Only check connections which have been idle for a while
+        if idleTime > self.__pingInterval and not self.__ping(conn):
+            self.__discard()
             if retriesLeft > 0:
-                return self.__getWithRetry(dbName, totalRetries, retriesLeft)
+                return self.__getWithRetry(dbName, totalRetries, retriesLeft, pinned)
             return S_ERROR(DErrno.EMYSQL, "Could not connect")
 
         if lastName != dbName:
             try:
                 conn.select_db(dbName)
             except MySQLdb.MySQLError as excp:
+                self.release()
                 if retriesLeft > 0:
-                    return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
+                    return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1, pinned)
                 return S_ERROR(DErrno.EMYSQL, "Could not select db %s: %s" % (dbName, excp))
-            try:
-                self.__assigned[thid][1] = dbName
-            except KeyError:
-                if retriesLeft > 0:
-                    return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
-                return S_ERROR(DErrno.EMYSQL, "Could not connect")
+            data[1] = dbName
         return S_OK(conn)
 
     def __ping(self, conn):
@@ -278,62 +350,222 @@ class ConnectionPool(object):
         except Exception:
             return False
 
-    def __innerGet(self):
+    def __innerGet(self, pinned):
+        """Get the connection of the current thread, a spare one, a new one,
+        or wait for one to be released
+
+        :return: S_OK(([conn, dbName, lastUse, leases, pinned], seconds since last use))/S_ERROR
+        """
         thid = self.__thid
         now = time.time()
-        if thid in self.__assigned:
-            data = self.__assigned[thid]
-            conn = data[0]
-            data[2] = now
-            return data[0], data[1], thid
-        # Not cached
-        try:
-            conn, dbName = self.__spares.pop()
-        except IndexError:
-            conn = self.__newConn()
-            dbName = ""
+        waiter = None
+        with self.__lock:
+            data = self.__assigned.get(thid)
+            if data:
+                # Nested get: same connection
+                data[3] += 1
+                idleTime, data[2] = now - data[2], now
+                if pinned and not data[4]:
+                    # Its slot under maxConnections is given to a waiting thread
+                    data[4] = True
+                    self.__nPinned += 1
+                    self.__openSlot()
+                return S_OK((data, idleTime))
+            if self.__spares:
+                # Most recently used first, they are the least likely to be broken
+                conn, dbName, lastUse = self.__spares.pop()
+                self.__assigned[thid] = data = [conn, dbName, now, 1, pinned]
+                if pinned:
+                    self.__nPinned += 1
+                    self.__openSlot()
+                return S_OK((data, now - lastUse))
+            if pinned:
+                self.__nConnections += 1
+                self.__nPinned += 1
+            elif not self.__maxConnections or self.__nConnections - self.__nPinned < self.__maxConnections:
+                self.__nConnections += 1
+            else:
+                waiter = [threading.Event(), None]
+                self.__waiters.append(waiter)
 
-        self.__assigned[thid] = [conn, dbName, now]
-        return conn, dbName, thid
+        if waiter:
+            return self.__wait(thid, waiter)
 
-    def __pop(self, thid):
         try:
-            data = self.__assigned.pop(thid)
-            if len(self.__spares) < self.__maxSpares:
-                self.__spares.append((data[0], data[1]))
+            conn = self.__newConn()
+        except Exception:
+            with self.__lock:
+                self.__nConnections -= 1
+                if pinned:
+                    self.__nPinned -= 1
+                else:
+                    self.__openSlot()
+            raise
+        with self.__lock:
+            self.__assigned[thid] = data = [conn, "", now, 1, pinned]
+        return S_OK((data, 0))
+
+    def __wait(self, thid, waiter):
+        """Wait for a connection to be handed over by release()"""
+        startTime = time.time()
+        waiter[0].wait(self.__waitTimeout)
+        waitTime = time.time() - startTime
+        with self.__lock:
+            self.__nWaits += 1
+            self.__totalWaitTime += waitTime
+            self.__maxWaitTime = max(self.__maxWaitTime, waitTime)
+            if waiter[1] is None:
+                self.__waiters.remove(waiter)
+                self.__nTimeouts += 1
+                return S_ERROR(
+                    DErrno.EMYSQL,
+                    "Timeout waiting for a connection: all %s connections are in use" % self.__maxConnections,
+                )
+            conn, dbName, lastUse = waiter[1]
+        idleTime = startTime - lastUse
+        if conn is None:
+            try:
+                conn = self.__newConn()
+            except Exception:
+                with self.__lock:
+                    self.__nConnections -= 1
+                    self.__openSlot()
+                raise
+            idleTime = 0
+        with self.__lock:
+            self.__assigned[thid] = data = [conn, dbName, time.time(), 1, False]
+        return S_OK((data, idleTime))
+
+    def release(self):
+        """Give back the connection checked out by the current thread, once all
+        the get() calls of the thread have been released
+        """
+        with self.__lock:
+            data = self.__assigned.get(self.__thid)
+            if not data:
+                return
+            data[3] -= 1
+            if data[3] > 0:
+                return
+            self.__checkin(self.__thid)
+
+    def __checkin(self, thid):
+        """Move the connection of a thread to a waiting thread or to the spares.
+        The lock must be held
+        """
+        data = self.__assigned.pop(thid)
+        if data[4]:
+            self.__nPinned -= 1
+            if self.__maxConnections and self.__nConnections - self.__nPinned > self.__maxConnections:
+                # Back under the limit, which is already reached by the other connections
+                self.__close(data[0])
+                return
+        spare = [data[0], data[1], time.time()]
+        if self.__waiters:
+            waiter = self.__waiters.popleft()
+            waiter[1] = spare
+            waiter[0].set()
+        elif len(self.__spares) < self.__maxSpares:
+            self.__spares.append(spare)
+        else:
+            self.__close(data[0])
+
+    def __discard(self):
+        """Forget the broken connection of the current thread"""
+        with self.__lock:
+            data = self.__assigned.pop(self.__thid, None)
+            if not data:
+                return
+            self.__close(data[0])
+            if data[4]:
+                self.__nPinned -= 1
             else:
-                try:
-                    data[0].close()
-                except MySQLdb.ProgrammingError as exc:
-                    gLogger.warn("ProgrammingError exception while closing MySQL connection: %s" % exc)
-                except Exception as exc:
-                    gLogger.warn("Exception while closing MySQL connection: %s" % exc)
-        except KeyError:
-            pass
+                self.__openSlot()
+
+    def __openSlot(self):
+        """Let the first waiting thread open a connection in place of a closed one.
+        The lock must be held
+        """
+        if self.__waiters and (
+            not self.__maxConnections or self.__nConnections - self.__nPinned < self.__maxConnections
+        ):
+            waiter = self.__waiters.popleft()
+            # No connection given: the waiter opens a new one
+            waiter[1] = [None, "", 0]
+            self.__nConnections += 1
+            waiter[0].set()
+
+    def __close(self, conn):
+        """Close a connection. The lock must be held"""
+        self.__nConnections -= 1
+        try:
+            conn.close()
+        except MySQLdb.ProgrammingError as exc:
+            gLogger.warn("ProgrammingError exception while closing MySQL connection: %s" % exc)
+        except Exception as exc:
+            gLogger.warn("Exception while closing MySQL connection: %s" % exc)
 
     def clean(self, now=False):
+        """Take back the connections of dead threads or unused since graceTime,
+        and close the spare connections unused since graceTime
+        """
         if not now:
             now = time.time()
-        self.__lastClean = now
-        for thid in list(self.__assigned):
-            if not thid.is_alive():
-                self.__pop(thid)
-            try:
-                data = self.__assigned[thid]
-            except KeyError:
-                continue
-            if now - data[2] > self.__graceTime:
-                self.__pop(thid)
+        with self.__lock:
+            self.__lastClean = now
+            for thid in list(self.__assigned):
+                if not thid.is_alive() or now - self.__assigned[thid][2] > self.__graceTime:
+                    self.__inTransaction.discard(thid)
+                    self.__checkin(thid)
+            while self.__spares and now - self.__spares[0][2] > self.__graceTime:
+                self.__close(self.__spares.popleft()[0])
+
+    def getStats(self):
+        """Get the usage statistics of the pool
+
+        :return: dict
+        """
+        with self.__lock:
+            return {
+                "MaxConnections": self.__maxConnections,
+                "Connections": self.__nConnections,
+                "InUse": len(self.__assigned),
+                "Pinned": self.__nPinned,
+                "Spare": len(self.__spares),
+                "Waiting": len(self.__waiters),
+                "Waits": self.__nWaits,
+                "WaitTime": self.__totalWaitTime,
+                "MaxWaitTime": self.__maxWaitTime,
+                "Timeouts": self.__nTimeouts,
+            }
 
     def transactionStart(self, dbName):
+        """Start a transaction. The connection stays with the thread until
+        transactionCommit or transactionRollback
+        """
         result = self.get(dbName)
         if not result["OK"]:
             return result
         conn = result["Value"]
         try:
-            return S_OK(self.__execute(conn, "START TRANSACTION WITH CONSISTENT SNAPSHOT"))
+            result = S_OK(self.__execute(conn, "START TRANSACTION WITH CONSISTENT SNAPSHOT"))
         except MySQLdb.MySQLError as excp:
+            self.release()
             return S_ERROR(DErrno.EMYSQL, "Could not begin transaction: %s" % excp)
+        # Keep the connection until the end of the transaction
+        if self.__thid in self.__inTransaction:
+            self.release()
+        else:
+            self.__inTransaction.add(self.__thid)
+        return result
+
+    def __endTransaction(self):
+        """Release the connection kept by transactionStart"""
+        try:
+            self.__inTransaction.remove(self.__thid)
+        except KeyError:
+            return
+        self.release()
 
     def transactionCommit(self, dbName):
         result = self.get(dbName)
@@ -345,6 +577,9 @@ class ConnectionPool(object):
             return S_OK(result)
         except MySQLdb.MySQLError as excp:
             return S_ERROR(DErrno.EMYSQL, "Could not commit transaction: %s" % excp)
+        finally:
+            self.release()
+            self.__endTransaction()
 
     def transactionRollback(self, dbName):
         result = self.get(dbName)
@@ -356,6 +591,35 @@ class ConnectionPool(object):
             return S_OK(result)
         except MySQLdb.MySQLError as excp:
             return S_ERROR(DErrno.EMYSQL, "Could not rollback transaction: %s" % excp)
+        finally:
+            self.release()
+            self.__endTransaction()
+
+
+# Statistics of the pools at the previous call of getConnectionPoolsActivity
+gLastPoolsStats = {"Waits": 0, "WaitTime": 0.0}
+
+
+def getConnectionPoolsActivity():
+    """Activity of the connection pools of the process, for the service monitoring.
+    The wait time is the average wait for a connection since the previous call.
+
+    :return: dict to be added to a ServiceMonitoring record (empty if no pool is used)
+    """
+    stats = MySQL.getConnectionPoolsStats()
+    if not stats:
+        return {}
+    waits = stats["Waits"] - gLastPoolsStats["Waits"]
+    waitTime = stats["WaitTime"] - gLastPoolsStats["WaitTime"]
+    gLastPoolsStats["Waits"] = stats["Waits"]
+    gLastPoolsStats["WaitTime"] = stats["WaitTime"]
+    return {
+        "MySQLConnections": stats["Connections"],
+        "MySQLConnectionsInUse": stats["InUse"],
+        "MySQLWaitingThreads": stats["Waiting"],
+        # in milliseconds
+        "MySQLWaitTime": int(1000 * waitTime / waits) if waits > 0 else 0,
+    }
 
 
 class MySQL(object):
@@ -367,11 +631,25 @@ class MySQL(object):
 
     __connectionPools = {}
 
-    def __init__(self, hostName="localhost", userName="dirac", passwd="dirac", dbName="", port=3306, debug=False):
+    def __init__(
+        self,
+        hostName="localhost",
+        userName="dirac",
+        passwd="dirac",
+        dbName="",
+        port=3306,
+        debug=False,
+        maxConnections=0,
+        connectionWaitTimeout=60,
+    ):
         """
         set MySQL connection parameters and try to connect
 
         :param debug: unused
+        :param int maxConnections: maximum number of connections to the server (0 for no limit).
+                                   The pool is shared by all the DBs using the same server and credentials,
+                                   and it is the first one to be created which defines it
+        :param int connectionWaitTimeout: maximum time to wait for a connection when they are all in use
         """
         global gInstancesCount
         gInstancesCount += 1
@@ -393,7 +671,9 @@ class MySQL(object):
         self.__port = port
         cKey = (self.__hostName, self.__userName, self.__passwd, self.__port)
         if cKey not in MySQL.__connectionPools:
-            MySQL.__connectionPools[cKey] = ConnectionPool(*cKey)
+            MySQL.__connectionPools[cKey] = ConnectionPool(
+                *cKey, maxConnections=maxConnections, waitTimeout=connectionWaitTimeout
+            )
         self.__connectionPool = MySQL.__connectionPools[cKey]
 
         self.__initialized = True
@@ -445,10 +725,13 @@ class MySQL(object):
         It also includes quotation marks " around the given string
         """
         if connection is None:
-            retDict = self._getConnection()
+            retDict = self._getConnection(pinned=False)
             if not retDict["OK"]:
                 return retDict
-            connection = retDict["Value"]
+            try:
+                return self.__escapeString(myString, connection=retDict["Value"])
+            finally:
+                self._releaseConnection()
 
         if isinstance(myString, bytes):
             myString = myString.decode()
@@ -522,11 +805,18 @@ class MySQL(object):
         Escapes all strings in the list of values provided
         """
         # self.log.debug('_escapeValues:', inValues)
-        retDict = self._getConnection()
+        retDict = self._getConnection(pinned=False)
         if not retDict["OK"]:
             return retDict
-        connection = retDict["Value"]
+        try:
+            return self.__escapeValues(inValues, retDict["Value"])
+        finally:
+            self._releaseConnection()
 
+    def __escapeValues(self, inValues, connection):
+        """
+        Escapes all strings in the list of values provided, using the given connection
+        """
         inEscapeValues = []
 
         if not inValues:
@@ -577,9 +867,10 @@ class MySQL(object):
             return S_OK()
 
         # Test the connection to the DB
-        retDict = self._getConnection()
+        retDict = self._getConnection(pinned=False)
         if not retDict["OK"]:
             return retDict
+        self._releaseConnection()
         self._connected = True
         return S_OK()
 
@@ -596,7 +887,7 @@ class MySQL(object):
 
         self.log.debug("_query: %s" % self._safeCmd(cmd))
 
-        retDict = self._getConnection()
+        retDict = self._getConnection(pinned=False)
         if not retDict["OK"]:
             return retDict
         connection = retDict["Value"]
@@ -624,6 +915,7 @@ class MySQL(object):
             cursor.close()
         except Exception:
             pass
+        self._releaseConnection()
 
         return retDict
 
@@ -638,7 +930,7 @@ class MySQL(object):
 
         self.log.debug("_update: %s" % self._safeCmd(cmd))
 
-        retDict = self._getConnection()
+        retDict = self._getConnection(pinned=False)
         if not retDict["OK"]:
             return retDict
         connection = retDict["Value"]
@@ -656,6 +948,7 @@ class MySQL(object):
             cursor.close()
         except Exception:
             pass
+        self._releaseConnection()
 
         return retDict
 
@@ -674,7 +967,7 @@ class MySQL(object):
         # # get connection
         connection = conn
         if not connection:
-            retDict = self._getConnection()
+            retDict = self._getConnection(pinned=False)
             if not retDict["OK"]:
                 return retDict
             connection = retDict["Value"]
@@ -686,13 +979,17 @@ class MySQL(object):
             for cmd in cmdList:
                 cmdRet.append((cmd, cursor.execute(cmd)))
             connection.commit()
+            # # close cursor
+            cursor.close()
         except Exception as error:
             self.logger.exception(error)
-            # # rollback, put back connection to the pool
+            # # rollback
             connection.rollback()
             return S_ERROR(DErrno.EMYSQL, error)
-        # # close cursor, put back connection to the pool
-        cursor.close()
+        finally:
+            # # put back connection to the pool
+            if not conn:
+                self._releaseConnection()
         return S_OK(cmdRet)
 
     def _createViews(self, viewsDict, force=False):
@@ -908,7 +1205,7 @@ class MySQL(object):
         """
         return str(param[0])
 
-    def _getConnection(self, retries=MAXCONNECTRETRY):
+    def _getConnection(self, retries=MAXCONNECTRETRY, pinned=True):
         """Return  a new connection to the DB,
 
         Try the Queue, if it is empty add a newConnection to the Queue and retry
@@ -916,6 +1213,9 @@ class MySQL(object):
         an error if it fails.
 
         :param int retries: Number of time it will retry to open a connection
+        :param bool pinned: by default, the connection may never be given back with _releaseConnection:
+                            it stays with the thread and is not counted in MaxConnections.
+                            Callers which always release it (in a finally) use pinned=False
         """
         # self.log.debug('_getConnection:')
 
@@ -924,7 +1224,32 @@ class MySQL(object):
             gLogger.error(error)
             return S_ERROR(DErrno.EMYSQL, error)
 
-        return self.__connectionPool.get(self.__dbName, retries)
+        return self.__connectionPool.get(self.__dbName, retries, pinned=pinned)
+
+    def _releaseConnection(self):
+        """Give back to the pool the connection obtained with _getConnection.
+
+        The connection is shared by all the calls made from the same thread,
+        and it really goes back to the pool when all of them have released it.
+        Connections which are never released are taken back after some idle time.
+        """
+        if self.__initialized:
+            self.__connectionPool.release()
+
+    @classmethod
+    def getConnectionPoolsStats(cls):
+        """Get the usage statistics of all the connection pools of the process
+
+        :return: dict with the sum of the statistics of the pools, see ConnectionPool.getStats
+        """
+        stats = {}
+        for pool in list(cls.__connectionPools.values()):
+            for key, value in pool.getStats().items():
+                if key == "MaxWaitTime":
+                    stats[key] = max(stats.get(key, 0), value)
+                else:
+                    stats[key] = stats.get(key, 0) + value
+        return stats
 
     ########################################################################################
     #
@@ -1479,14 +1804,111 @@ class MySQL(object):
 
         return self._update("INSERT INTO %s %s VALUES %s" % (table, inFieldString, inValueString), conn)
 
+    #############################################################################
+    def bulkInsert(self, tableName, inFields, rows, chunkSize=BULK_CHUNK_SIZE, ignore=False, conn=None):
+        """
+        Insert many rows in "tableName", each row being a sequence of values for the fields "inFields".
+        The rows are sent by chunks of chunkSize rows, as multi-row INSERT statements,
+        and the values are bound by the driver, so they do not have to be escaped
+        (and SQL expressions such as UTC_TIMESTAMP() cannot be used as values).
+        Without a transaction, the chunks already inserted stay in case of error.
+
+        :param str tableName: name of the table
+        :param list inFields: names of the fields
+        :param rows: iterable of sequences of values, in the order of inFields
+        :param int chunkSize: number of rows per round trip to the server
+        :param bool ignore: use INSERT IGNORE, i.e. skip the rows duplicating a unique key
+        :param conn: connection to use
+
+        :return: S_OK(number of inserted rows)/S_ERROR
+        """
+        return self.__bulkExecute(
+            "INSERT IGNORE" if ignore else "INSERT", tableName, inFields, rows, "", chunkSize, conn
+        )
+
+    def bulkUpsert(self, tableName, inFields, rows, updateFields=None, chunkSize=BULK_CHUNK_SIZE, conn=None):
+        """
+        Like bulkInsert, but update the rows already existing with the same unique key
+        (INSERT ... ON DUPLICATE KEY UPDATE)
+
+        :param updateFields: fields to update for the existing rows. Either a list of field names,
+                             which get the new value, or a dictionary { fieldName : SQL expression },
+                             e.g. { "Count" : "`Count` + VALUES(`Count`)" }.
+                             By default, all the inFields get the new value
+        :return: S_OK(number of affected rows)/S_ERROR, as counted by MySQL:
+                 1 per inserted row, 2 per updated row
+        """
+        if updateFields is None:
+            updateFields = inFields
+        if isinstance(updateFields, dict):
+            updates = ["%s = %s" % (_quotedList([field]), expr) for field, expr in updateFields.items()]
+        else:
+            updates = ["%s = VALUES(%s)" % ((_quotedList([field]),) * 2) for field in updateFields]
+        if not updates or None in updates:
+            return S_ERROR(DErrno.EMYSQL, "Invalid updateFields argument")
+        suffix = " ON DUPLICATE KEY UPDATE %s" % ", ".join(updates)
+        return self.__bulkExecute("INSERT", tableName, inFields, rows, suffix, chunkSize, conn)
+
+    def __bulkExecute(self, verb, tableName, inFields, rows, suffix, chunkSize, conn):
+        """Execute a multi-row INSERT statement by chunks, with executemany"""
+        table = _quotedList([tableName])
+        if not table:
+            return S_ERROR(DErrno.EMYSQL, "Invalid tableName argument")
+        inFieldString = _quotedList(inFields)
+        if inFieldString is None:
+            return S_ERROR(DErrno.EMYSQL, "Invalid inFields arguments")
+        nFields = len(inFields)
+        # The statement is a format string for the driver
+        cmd = "%s INTO %s ( %s ) VALUES ( %s )%s" % (
+            verb,
+            table.replace("%", "%%"),
+            inFieldString.replace("%", "%%"),
+            ", ".join(["%s"] * nFields),
+            suffix.replace("%", "%%"),
+        )
+        chunkSize = max(1, int(chunkSize))
+
+        connection = conn
+        if not connection:
+            retDict = self._getConnection(pinned=False)
+            if not retDict["OK"]:
+                return retDict
+            connection = retDict["Value"]
+
+        rows = iter(rows)
+        nRows = 0
+        try:
+            cursor = connection.cursor()
+            # executemany sends the rows in as few statements as this length allows
+            cursor.max_stmt_length = BULK_MAX_STATEMENT_LENGTH
+            try:
+                while True:
+                    chunk = [tuple(row) for row in itertools.islice(rows, chunkSize)]
+                    if not chunk:
+                        break
+                    if any(len(row) != nFields for row in chunk):
+                        return S_ERROR(DErrno.EMYSQL, "Mismatch between inFields and the values of a row.")
+                    nRows += cursor.executemany(cmd, chunk)
+            finally:
+                cursor.close()
+        except Exception as x:
+            return self._except("__bulkExecute", x, "Execution failed.", cmd)
+        finally:
+            if not conn:
+                self._releaseConnection()
+
+        self.log.debug("__bulkExecute: %s rows affected in %s" % (nRows, tableName))
+        return S_OK(nRows)
+
     def executeStoredProcedure(self, packageName, parameters, outputIds):
-        conDict = self._getConnection()
+        conDict = self._getConnection(pinned=False)
         if not conDict["OK"]:
             return conDict
 
         connection = conDict["Value"]
-        cursor = connection.cursor()
+        cursor = None
         try:
+            cursor = connection.cursor()
             cursor.callproc(packageName, parameters)
             row = []
             for oId in outputIds:
@@ -1502,17 +1924,19 @@ class MySQL(object):
             cursor.close()
         except Exception:
             pass
+        self._releaseConnection()
         return retDict
 
     # For the procedures that execute a select without storing the result
     def executeStoredProcedureWithCursor(self, packageName, parameters):
-        conDict = self._getConnection()
+        conDict = self._getConnection(pinned=False)
         if not conDict["OK"]:
             return conDict
 
         connection = conDict["Value"]
-        cursor = connection.cursor()
+        cursor = None
         try:
+            cursor = connection.cursor()
             #       execStr = "call %s(%s);" % ( packageName, ",".join( map( str, parameters ) ) )
             execStr = "call %s(%s);" % (
                 packageName,
@@ -1528,5 +1952,6 @@ class MySQL(object):
             cursor.close()
         except Exception:
             pass
+        self._releaseConnection()
 
         return retDict
@@ -123,6 +123,9 @@ class ThreadScheduler(object):
         if timeToWait and timeToWait > 0:
             return timeToWait
         taskId = self.__popNextTaskId()
+        # The task may have been removed in the meantime
+        if taskId is None:
+            return None
         startTime = time.time()
         self.__executeTask(taskId)
         elapsedTime = time.time() - startTime
@@ -184,6 +187,8 @@ class ThreadScheduler(object):
         return True
 
     def __scheduleIfNeeded(self, taskId, elapsedTime=0):
+        if taskId not in self.__taskDict:
+            return False
         if "executions" in self.__taskDict[taskId]:
             if self.__taskDict[taskId]["executions"] == 0:
                 del self.__taskDict[taskId]
@@ -0,0 +1,164 @@
+""" Test the DictCache
+"""
+import threading
+import time
+
+from pytest import fixture, mark
+
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+parametrize = mark.parametrize
+
+
+@fixture
+def fakeClock(monkeypatch):
+    """Replace the monotonic clock used by the DictCache by one we control"""
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    return clock
+
+
+@parametrize("shards", [1, 4])
+def test_addGet(shards):
+    """Basic add/get/exists/delete"""
+    cache = DictCache(shards=shards)
+    cache.add("key", 100, "value")
+    assert cache.exists("key")
+    assert cache.get("key") == "value"
+    # Not valid for long enough
+    assert cache.get("key", validSeconds=200) is None
+    # ... and it was deleted
+    assert not cache.exists("key")
+    assert cache.get("otherKey") is None
+
+    cache.add("key", 100, "value")
+    cache.delete("key")
+    assert not cache.exists("key")
+
+    # A null lifetime is not stored
+    cache.add("key", 0, "value")
+    assert not cache.exists("key")
+
+
+def test_expiration(fakeClock):
+    """Entries expire according to the monotonic clock"""
+    deleted = []
+    cache = DictCache(deleteFunction=deleted.append)
+    cache.add("short", 10, "shortValue")
+    cache.add("long", 100, "longValue")
+    assert sorted(cache.getKeys()) == ["long", "short"]
+    assert cache.getKeys(validSeconds=50) == ["long"]
+
+    fakeClock[0] += 20
+    assert cache.get("short") is None
+    assert cache.get("long") == "longValue"
+    assert deleted == ["shortValue"]
+
+
+def test_purgeExpired(fakeClock):
+    """purgeExpired only removes the entries expiring in the given time,
+    and ignores the stale heap entries of replaced keys"""
+    deleted = []
+    cache = DictCache(deleteFunction=deleted.append)
+    for i in range(10):
+        cache.add(i, 10 * (i + 1), i)
+    # Key 0 now expires late
+    cache.add(0, 1000, "replaced")
+
+    cache.purgeExpired(expiredInSeconds=35)
+    assert deleted == [1, 2]
+    assert sorted(cache.getKeys()) == [0] + list(range(3, 10))
+
+    fakeClock[0] += 500
+    cache.purgeExpired()
+    assert cache.getKeys() == [0]
+    assert cache.getStats()["Expirations"] == 9
+
+
+def test_lazyPurge(fakeClock):
+    """Adding entries removes the expired ones"""
+    cache = DictCache()
+    cache.add("old", 10, "value")
+    fakeClock[0] += 20
+    cache.add("new", 10, "value")
+    assert cache.getStats()["Entries"] == 1
+
+
+@parametrize("shards", [1, 3])
+def test_lruEviction(shards):
+    """When full, the least recently used entries are evicted"""
+    deleted = []
+    maxEntries = 6
+    cache = DictCache(deleteFunction=deleted.append, maxEntries=maxEntries, shards=shards)
+    for i in range(100):
+        cache.add(i, 100, i)
+        # Keep using the first key
+        assert cache.get(0) == 0
+    stats = cache.getStats()
+    assert stats["Entries"] <= maxEntries
+    assert stats["Evictions"] == 100 - stats["Entries"]
+    assert len(deleted) == stats["Evictions"]
+    assert 0 not in deleted
+    assert cache.exists(0)
+
+
+def test_stats():
+    """Hits and misses are counted"""
+    cache = DictCache()
+    cache.add("key", 100, "value")
+    cache.get("key")
+    cache.exists("key")
+    cache.get("missing")
+    stats = cache.getStats()
+    assert stats["Hits"] == 2
+    assert stats["Misses"] == 1
+    assert stats["Entries"] == 1
+    assert stats["MaxEntries"] == 0
+
+
+def test_purgeAll():
+    """purgeAll calls the delete function on everything"""
+    deleted = []
+    cache = DictCache(deleteFunction=deleted.append, shards=4)
+    for i in range(20):
+        cache.add(i, 100, i)
+    cache.purgeAll()
+    assert sorted(deleted) == list(range(20))
+    assert cache.getKeys() == []
+
+
+def test_threadLocal():
+    """Each thread sees its own cache"""
+    cache = DictCache(threadLocal=True)
+    cache.add("key", 100, "mainThread")
+    seen = []
+
+    def inThread():
+        seen.append(cache.get("key"))
+        cache.add("key", 100, "otherThread")
+        seen.append(cache.get("key"))
+
+    thread = threading.Thread(target=inThread)
+    thread.start()
+    thread.join()
+    assert seen == [None, "otherThread"]
+    assert cache.get("key") == "mainThread"
+
+
+def test_concurrentAccess():
+    """Sharded cache accessed from many threads stays consistent"""
+    cache = DictCache(maxEntries=50, shards=8)
+
+    def worker(offset):
+        for i in range(500):
+            cache.add((offset, i), 100, i)
+            cache.get((offset, i // 2))
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.getStats()
+    assert stats["Entries"] <= stats["MaxEntries"]
+    assert stats["Entries"] + stats["Evictions"] == 8 * 500
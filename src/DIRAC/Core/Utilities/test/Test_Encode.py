@@ -11,6 +11,7 @@ import datetime
 import sys
 
 from DIRAC.Core.Utilities.DEncode import encode as disetEncode, decode as disetDecode, g_dEncodeFunctions
+from DIRAC.Core.Utilities.FastDEncode import encode as fastEncode, decode as fastDecode
 from DIRAC.Core.Utilities.JEncode import encode as jsonEncode, decode as jsonDecode, JSerializable
 from DIRAC.Core.Utilities.MixedEncode import encode as mixEncode, decode as mixDecode
 
@@ -45,20 +46,29 @@ else:
 # function, and add the tuple here
 
 disetTuple = (disetEncode, disetDecode)
+fastTuple = (fastEncode, fastDecode)
 jsonTuple = (jsonEncode, jsonDecode)
 mixTuple = (mixEncode, mixDecode)
 
-enc_dec_imp = (disetTuple, jsonTuple, (mixTuple, "No", "No"), (mixTuple, "Yes", "No"), (mixTuple, "Yes", "Yes"))
+enc_dec_imp = (
+    disetTuple,
+    fastTuple,
+    jsonTuple,
+    (mixTuple, "No", "No"),
+    (mixTuple, "Yes", "No"),
+    (mixTuple, "Yes", "Yes"),
+)
 enc_dec_ids = (
     "disetTuple",
+    "fastTuple",
     "jsonTuple",
     "mixTuple",
     "mixTuple (DIRAC_USE_JSON_DECODE=Yes)",
     "mixTuple (DIRAC_USE_JSON_ENCODE=Yes)",
 )
 
-enc_dec_imp_without_json = (disetTuple, (mixTuple, "No", "No"), (mixTuple, "Yes", "No"))
-enc_dec_ids_without_json = ("disetTuple", "mixTuple", "mixTuple (DIRAC_USE_JSON_DECODE=Yes)")
+enc_dec_imp_without_json = (disetTuple, fastTuple, (mixTuple, "No", "No"), (mixTuple, "Yes", "No"))
+enc_dec_ids_without_json = ("disetTuple", "fastTuple", "mixTuple", "mixTuple (DIRAC_USE_JSON_DECODE=Yes)")
 
 
 def myDates():
@@ -1,7 +1,10 @@
 """ py.test test of ExecutorDispatcher
 """
 # pylint: disable=protected-access
+from DIRAC import S_OK
 from DIRAC.Core.Utilities.ExecutorDispatcher import (
+    ExecutorDispatcher,
+    ExecutorDispatcherCallbacks,
     ExecutorState,
     ExecutorQueues,
 )
@@ -94,3 +97,69 @@ def test_execQueues():
     assert res_internals["taskInQueue"] == {}
 
     assert not eQ.deleteTask("t00")
+
+
+def test_batches():
+    """Tasks are popped by batches, and batches are sent once enough slots are free"""
+    state = ExecutorState()
+    state.addExecutor(1, "type1", maxTasks=4, batchSize=3)
+    assert state.batchSlots(1) == 3
+    state.addTask(1, "t1")
+    assert state.batchSlots(1) == 3
+    state.addTask(1, "t2")
+    # Wait for the batch to be processed
+    assert state.batchSlots(1) == 0
+    assert state.getIdleExecutor("type1") is None
+    state.removeTask("t1")
+    state.removeTask("t2")
+    assert state.batchSlots(1) == 3
+    assert state.getIdleExecutor("type1") == 1
+
+    queues = ExecutorQueues()
+    for i in range(4):
+        queues.pushTask("type1", "t%s" % i)
+    queues.pushTask("type2", "u0")
+    assert queues.popTasks(["type1", "type2"], 3) == (["t0", "t1", "t2"], "type1")
+    assert queues.popTasks(["type1", "type2"], 3) == (["t3"], "type1")
+    assert queues.popTasks(["type1", "type2"], 3) == (["u0"], "type2")
+    assert queues.popTasks(["type1", "type2"], 3) is None
+    assert queues._internals()["taskInQueue"] == {}
+
+
+class RecordingCallbacks(ExecutorDispatcherCallbacks):
+    """Tasks go through one executor type, the sent batches are recorded"""
+
+    def __init__(self):
+        self.sent = []
+
+    def cbDispatch(self, taskId, taskObj, pathExecuted):
+        return S_OK() if pathExecuted else S_OK("type1")
+
+    def cbSendTask(self, taskId, taskObj, eId, eType):
+        self.sent.append([taskId])
+        return S_OK()
+
+    def cbSendTasks(self, tasks, eId, eType):
+        self.sent.append([taskId for taskId, _taskObj in tasks])
+        return S_OK()
+
+
+def test_dispatcherBatches():
+    """The tasks waiting while the executor is busy are sent in one batch"""
+    callbacks = RecordingCallbacks()
+    dispatcher = ExecutorDispatcher()
+    dispatcher.setCallbacks(callbacks)
+    dispatcher.addExecutor("e1", ["type1"], maxTasks=3, batchSize=3)
+    for taskId in range(1, 6):
+        assert dispatcher.addTask(taskId, "task%s" % taskId)["OK"]
+    assert callbacks.sent == [[1]]
+
+    assert dispatcher.taskProcessed("e1", 1)["OK"]
+    assert callbacks.sent == [[1], [2, 3, 4]]
+    dispatcher.taskProcessed("e1", 2)
+    dispatcher.taskProcessed("e1", 3)
+    assert callbacks.sent == [[1], [2, 3, 4]]
+    dispatcher.taskProcessed("e1", 4)
+    assert callbacks.sent == [[1], [2, 3, 4], [5]]
+    dispatcher.taskProcessed("e1", 5)
+    assert dispatcher.getTaskIds() == []
@@ -0,0 +1,116 @@
+""" Test that FastDEncode is a drop-in replacement of DEncode:
+it must produce the very same bytes and decode them the same way,
+also when the data is fed chunk by chunk to the StreamDecoder.
+"""
+import datetime
+
+from hypothesis import given, settings
+from hypothesis.strategies import integers, lists, recursive, text, booleans, none, dictionaries, tuples, floats
+from pytest import mark, raises
+
+from DIRAC.Core.Utilities import DEncode, FastDEncode
+from DIRAC.Core.Utilities.FastDEncode import StreamDecoder
+
+parametrize = mark.parametrize
+
+# Floats are included: both implementations must give exactly the same value
+scalarStrategies = none() | booleans() | text() | integers() | floats(allow_nan=False)
+nestedStrategy = recursive(scalarStrategies, lambda x: lists(x) | dictionaries(text(), x) | tuples(x))
+
+samples = [
+    None,
+    True,
+    False,
+    0,
+    -42,
+    2**80,
+    1.5,
+    2.0 * 10**20,
+    2.0 * 10**-10,
+    float("inf"),
+    "",
+    "/lhcb/MC/2018/file.dst",
+    "éè",
+    b"raw bytes",
+    [],
+    (),
+    {},
+    [1, "a", (2, None), [3.5]],
+    {1: "a", "b": [1, 2, {3: 4}], 2.5: (True, False)},
+    datetime.datetime(2021, 3, 4, 5, 6, 7, 8),
+    datetime.date(2021, 3, 4),
+    datetime.time(5, 6, 7, 8),
+    {"LastUpdateTime": datetime.datetime(2021, 3, 4, 5, 6, 7), "Dates": [datetime.date(2000, 1, 1)]},
+]
+
+
+@parametrize("data", samples)
+def test_sameEncoding(data):
+    """FastDEncode must produce exactly the bytes of DEncode"""
+    assert FastDEncode.encode(data) == DEncode.encode(data)
+
+
+@parametrize("data", samples)
+def test_sameDecoding(data):
+    """FastDEncode must decode DEncode data to the same object and length"""
+    encoded = DEncode.encode(data)
+    assert FastDEncode.decode(encoded) == DEncode.decode(encoded)
+
+
+@settings(max_examples=200)
+@given(data=nestedStrategy)
+def test_nestedStructure(data):
+    """Random nested structures are encoded and decoded identically"""
+    encoded = DEncode.encode(data)
+    assert FastDEncode.encode(data) == encoded
+    assert repr(FastDEncode.decode(encoded)) == repr(DEncode.decode(encoded))
+
+
+def test_trailingData():
+    """Like DEncode, only the first object is decoded, and its length returned"""
+    encoded = DEncode.encode([1, 2]) + DEncode.encode("more")
+    assert FastDEncode.decode(encoded) == ([1, 2], 8)
+
+
+def test_nonSerializable():
+    """Unknown types raise a KeyError, like DEncode"""
+    with raises(KeyError):
+        FastDEncode.encode({"a": object()})
+
+
+@parametrize("data", [b"l", b"i12", b"s10:abc", b"d s1:a"])
+def test_truncated(data):
+    """Truncated or malformed data raises a ValueError"""
+    with raises(ValueError):
+        FastDEncode.decode(data)
+
+
+@parametrize("chunkSize", [1, 2, 7, 1000])
+@parametrize("data", samples)
+def test_streamDecoder(data, chunkSize):
+    """Objects are returned as soon as they are complete, whatever the chunking"""
+    encoded = DEncode.encode(data) + DEncode.encode("next")
+    decoder = StreamDecoder()
+    results = []
+    for i in range(0, len(encoded), chunkSize):
+        results.extend(decoder.feed(encoded[i : i + chunkSize]))
+    results.extend(decoder.close())
+    assert results == [DEncode.decode(encoded)[0], "next"]
+    assert decoder.consumed == len(encoded)
+    assert decoder.pending == 0
+
+
+def test_streamDecoderTrailingFloat():
+    """A float at the very end of the stream is only known to be complete on close"""
+    decoder = StreamDecoder()
+    assert decoder.feed(DEncode.encode(1.5)) == []
+    assert decoder.close() == [1.5]
+
+
+def test_streamDecoderTruncated():
+    """Closing a stream in the middle of an object raises a ValueError"""
+    decoder = StreamDecoder()
+    assert decoder.feed(b"ls3:abc") == []
+    assert decoder.pending == 7
+    with raises(ValueError):
+        decoder.close()
@@ -0,0 +1,140 @@
+""" Test the JDL parsing, its cache, and the JDL to CFG conversion
+"""
+import pytest
+
+from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
+from DIRAC.Core.Utilities.JDL import _splitJDL, _tokenizeJDL, getParsedJDL, loadJDLAsCFG, parseJDL
+
+userJDL = """[
+    Executable = "dirac-jobexec";
+    Arguments = "jobDescription.xml -o LogLevel=info";
+    JobName = "helloWorld";
+    Priority = 1;
+    InputSandbox =
+        {
+            "exe-script.py",
+            "LFN:/vo/user/s/someone/input.tar"
+        };
+    Site = "ANY";
+]"""
+
+matchedJDL = """[
+    Executable = "dirac-jobexec";
+    JobID = 12;
+    Parameters.InputData =
+        {
+            {"/vo/data/1", "/vo/data/2"},
+            {"/vo/data/3"}
+        };
+    JobRequirements =
+        [
+            OwnerGroup = "vo_user";
+            Sites = {"LCG.A.org", "LCG.B.org"};
+            CPUTime = 86400
+        ];
+    Requirements = other.Site == "LCG.A.org"
+]"""
+
+
+def test_parseJDL():
+    """The values are the expressions of the JDL, as the ClassAd contents"""
+    result = parseJDL(userJDL)
+    assert result["OK"], result["Message"]
+    contents = result["Value"]
+    assert list(contents) == ["Executable", "Arguments", "JobName", "Priority", "InputSandbox", "Site"]
+    assert contents["Arguments"] == '"jobDescription.xml -o LogLevel=info"'
+    assert contents["Priority"] == "1"
+    assert (
+        contents["InputSandbox"]
+        == '{            "exe-script.py",            "LFN:/vo/user/s/someone/input.tar"        }'
+    )
+    # The parsed JDL can be shared: it is immutable
+    with pytest.raises(TypeError):
+        contents["Priority"] = "2"
+
+    result = parseJDL(matchedJDL)
+    assert result["OK"], result["Message"]
+    contents = result["Value"]
+    assert contents["JobRequirements"].startswith("[") and contents["JobRequirements"].endswith("]")
+    assert contents["Parameters.InputData"].replace(" ", "") == '{{"/vo/data/1","/vo/data/2"},{"/vo/data/3"}}'
+    assert contents["Requirements"] == 'other.Site == "LCG.A.org"'
+    assert ClassAd(contents["JobRequirements"]).getListFromExpression("Sites") == ["LCG.A.org", "LCG.B.org"]
+
+
+@pytest.mark.parametrize(
+    "jdl, expected",
+    [
+        # Delimiters in the strings
+        ('[ Arguments = "a;b=c"; Name = "[x]" ]', {"Arguments": '"a;b=c"', "Name": '"[x]"'}),
+        ('[ A = {"a;b", "c"}; B = 2; ]', {"A": '{"a;b", "c"}', "B": "2"}),
+        ("[]", {}),
+        ("[ ; ; ]", {}),
+    ],
+)
+def test_parseJDLDelimiters(jdl, expected):
+    result = parseJDL(jdl)
+    assert result["OK"], result["Message"]
+    assert dict(result["Value"]) == expected
+
+
+@pytest.mark.parametrize(
+    "jdl",
+    [
+        "Executable = 1;",
+        "[ Executable = ; ]",
+        "[ Executable ]",
+        '[ Arguments = "a ]',
+        "[ A = [ B = 1 ]",
+        "[ A = { 1, 2 ]",
+        "[ A = } 1 { ]",
+    ],
+)
+def test_parseJDLInvalid(jdl):
+    assert not parseJDL(jdl)["OK"]
+    assert ClassAd(jdl).contents == {}
+
+
+def test_fastPath():
+    """The JDLs split by the fast path are parsed as by the tokenizer"""
+    for jdl in [userJDL, matchedJDL, '[ A = "x;]"; B = {1, 2}; C = 3 ]', "[ A = {{1}, {2}} ]", "[ A = 1; A = 2 ]"]:
+        contents = _splitJDL(jdl)
+        assert contents is not None
+        assert contents == _tokenizeJDL(jdl)["Value"]
+    # The invalid JDLs are left to the tokenizer, which locates the error
+    assert _splitJDL("[ A = } 1 { ]") is None
+    assert _splitJDL('[ "A" = 1 ]') is None
+
+
+def test_getParsedJDL():
+    """The same JDL is parsed once, and the ClassAds do not modify the cached contents"""
+    jdl = userJDL.replace("helloWorld", "cachedJob")
+    first = getParsedJDL(jdl)["Value"]
+    assert getParsedJDL(jdl)["Value"] is first
+
+    classAd = ClassAd(jdl)
+    classAd.insertAttributeInt("JobID", 5)
+    assert "JobID" not in ClassAd(jdl).contents
+    assert "JobID" not in first
+
+
+def test_loadJDLAsCFG():
+    result = loadJDLAsCFG(matchedJDL)
+    assert result["OK"], result["Message"]
+    cfg = result["Value"][0]
+    assert cfg["Executable"] == "dirac-jobexec"
+    assert cfg["JobID"] == "12"
+    assert cfg["JobRequirements"]["Sites"] == "LCG.A.org, LCG.B.org"
+    assert cfg["JobRequirements"]["CPUTime"] == "86400"
+    assert cfg["Requirements"] == "other.Site == LCG.A.org"
+
+    result = loadJDLAsCFG(userJDL)
+    assert result["OK"], result["Message"]
+    assert result["Value"][0]["InputSandbox"] == "exe-script.py, LFN:/vo/user/s/someone/input.tar"
+
+    # Without the enclosing brackets
+    result = loadJDLAsCFG('Executable = "a.sh"; Arguments = "1 2"')
+    assert result["OK"], result["Message"]
+    assert result["Value"][0]["Arguments"] == "1 2"
+
+    assert not loadJDLAsCFG('[ A = "a" "b" ]')["OK"]
+    assert not loadJDLAsCFG('[ A = "a ]')["OK"]
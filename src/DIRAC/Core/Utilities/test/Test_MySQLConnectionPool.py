@@ -0,0 +1,160 @@
+""" Test the bounded connection pool of the MySQL class, with fake connections
+"""
+# pylint: disable=protected-access
+import threading
+import time
+
+import pytest
+from mock import MagicMock
+
+pytest.importorskip("MySQLdb")
+
+from DIRAC.Core.Utilities import MySQL  # noqa: E402
+from DIRAC.Core.Utilities.MySQL import ConnectionPool  # noqa: E402
+
+
+@pytest.fixture
+def connect(mocker):
+    return mocker.patch.object(MySQL.MySQLdb, "connect", side_effect=lambda **kwargs: MagicMock())
+
+
+def inThread(func):
+    """Run a function in a new thread, its result is in thread.result once joined"""
+
+    def target():
+        thread.result = func()
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+
+def waitFor(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        assert time.time() < end, "Timeout"
+        time.sleep(0.01)
+
+
+def test_nestedGet(connect):
+    pool = ConnectionPool("host", "user", "passwd", maxConnections=1)
+    conn = pool.get("DB1")["Value"]
+    assert pool.get("DB2")["Value"] is conn
+    conn.select_db.assert_called_with("DB2")
+    pool.release()
+    assert pool.getStats()["InUse"] == 1
+    pool.release()
+    assert pool.getStats()["InUse"] == 0
+    assert pool.getStats()["Spare"] == 1
+    # The spare connection is reused
+    assert pool.get("DB2")["Value"] is conn
+    assert connect.call_count == 1
+
+
+def test_waitAndHandover(connect):
+    pool = ConnectionPool("host", "user", "passwd", maxConnections=1, waitTimeout=10)
+    conn = pool.get("DB")["Value"]
+    # The other threads wait, first come first served
+    first = inThread(lambda: (pool.get("DB")["Value"], time.sleep(0.1), pool.release())[0])
+    waitFor(lambda: pool.getStats()["Waiting"] == 1)
+    second = inThread(lambda: (pool.get("DB")["Value"], pool.release())[0])
+    waitFor(lambda: pool.getStats()["Waiting"] == 2)
+    assert pool.getStats()["Connections"] == 1
+
+    pool.release()
+    first.join()
+    second.join()
+    # The connection is handed over from thread to thread, no other is opened
+    assert first.result is conn
+    assert second.result is conn
+    assert connect.call_count == 1
+    stats = pool.getStats()
+    assert stats["Waits"] == 2
+    assert stats["Timeouts"] == 0
+    assert stats["Waiting"] == 0
+    assert stats["Spare"] == 1
+
+
+def test_waitTimeout(connect):
+    pool = ConnectionPool("host", "user", "passwd", maxConnections=1, waitTimeout=0.2)
+    assert pool.get("DB")["OK"]
+    thread = inThread(lambda: pool.get("DB"))
+    thread.join()
+    assert not thread.result["OK"]
+    assert "Timeout" in thread.result["Message"]
+    stats = pool.getStats()
+    assert stats["Timeouts"] == 1
+    assert stats["Waiting"] == 0
+    assert stats["Connections"] == 1
+
+
+def test_pinned(connect):
+    """The connections which may never be released do not count in maxConnections"""
+    pool = ConnectionPool("host", "user", "passwd", maxConnections=1, waitTimeout=0.2)
+    pinnedThread = inThread(lambda: pool.get("DB", pinned=True))
+    pinnedThread.join()
+    assert pinnedThread.result["OK"]
+    assert pool.get("DB")["OK"]
+    stats = pool.getStats()
+    assert stats["Connections"] == 2
+    assert stats["Pinned"] == 1
+
+    # A nested pinned get gives the slot of the connection to a waiting thread
+    waiting = inThread(lambda: pool.get("DB"))
+    waitFor(lambda: pool.getStats()["Waiting"] == 1)
+    assert pool.get("DB", pinned=True)["OK"]
+    waiting.join()
+    assert waiting.result["OK"]
+    assert pool.getStats()["Pinned"] == 2
+
+    # Taken back from the dead threads: the limit is reached by the connection of the waiting thread,
+    # which becomes spare, so the pinned one is closed
+    pool.clean()
+    stats = pool.getStats()
+    assert stats["Pinned"] == 1
+    assert stats["Connections"] == 2
+    assert stats["Spare"] == 1
+    pinnedThread.result["Value"].close.assert_called_once_with()
+
+
+def test_transaction(connect):
+    """The connection of a transaction stays with its thread until the commit"""
+    pool = ConnectionPool("host", "user", "passwd", maxConnections=1, waitTimeout=0.2)
+    assert pool.transactionStart("DB")["OK"]
+    conn = pool.get("DB")["Value"]
+    pool.release()
+    assert pool.getStats()["InUse"] == 1
+    # Still in use by the transaction: the other threads wait
+    thread = inThread(lambda: pool.get("DB"))
+    thread.join()
+    assert not thread.result["OK"]
+
+    assert pool.transactionCommit("DB")["OK"]
+    executed = [call.args[0] for call in conn.cursor.return_value.execute.call_args_list]
+    assert executed[-2:] == ["START TRANSACTION WITH CONSISTENT SNAPSHOT", "COMMIT"]
+    assert pool.getStats()["InUse"] == 0
+    thread = inThread(lambda: (pool.get("DB"), pool.release())[0])
+    thread.join()
+    assert thread.result["Value"] is conn
+
+
+def test_clean(connect):
+    pool = ConnectionPool("host", "user", "passwd", graceTime=600, maxConnections=2)
+    # A thread dying without releasing its connection
+    thread = inThread(lambda: pool.get("DB")["Value"])
+    thread.join()
+    # A connection not used by its thread for more than graceTime
+    conn = pool.get("DB")["Value"]
+    assert pool.getStats()["InUse"] == 2
+
+    pool.clean()
+    assert pool.getStats()["InUse"] == 1
+    assert pool.getStats()["Spare"] == 1
+    pool.clean(time.time() + 700)
+    stats = pool.getStats()
+    assert stats["InUse"] == 0
+    # The spare connections unused for more than graceTime are closed
+    assert stats["Spare"] == 0
+    assert stats["Connections"] == 0
+    thread.result.close.assert_called_once_with()
+    conn.close.assert_called_once_with()
@@ -13,6 +13,8 @@ It is in charge of submitting and monitoring all the transfers. It can be duplic
 
 """
 import errno
+from functools import partial
+import threading
 import time
 
 # from threading import current_thread
@@ -83,6 +85,13 @@ class FTS3Agent(AgentModule):
 
         self.maxNumberOfThreads = self.am_getOption("MaxThreads", 10)
 
+        # Monitor the jobs of a server with bulk requests, through persistent sessions
+        self.bulkMonitoring = self.am_getOption("BulkMonitoring", False)
+        # Number of jobs monitored with one request in bulk mode
+        self.jobsPerMonitoringRequest = self.am_getOption("JobsPerMonitoringRequest", 50)
+        # Number of concurrent monitoring requests to a server in bulk mode
+        self.maxRequestsPerServer = self.am_getOption("MaxMonitoringRequestsPerServer", 4)
+
         # Number of Operation we treat in one loop
         self.operationBulkSize = self.am_getOption("OperationBulkSize", 20)
         # Number of Jobs we treat in one loop
@@ -105,6 +114,10 @@ class FTS3Agent(AgentModule):
         """
         self._globalContextCache = {}
 
+        # One semaphore per server, to limit the concurrent requests in bulk monitoring
+        self._serverSemaphores = {}
+        self._serverSemaphoresLock = threading.Lock()
+
         # name that will be used in DB for assignment tag
         self.assignmentTag = gethostname().split(".")[0]
 
@@ -185,7 +198,15 @@ class FTS3Agent(AgentModule):
             # never forced a redelegation, because it is recent enough for FTS3 servers.
             # The delegation is forced when 2/3 rd of the lifetime are left, and we get a fresh
             # one just before. So no problem
-            res = FTS3Job.generateContext(ftsServer, proxyFile, lifetime=self.proxyLifetime)
+            if self.bulkMonitoring:
+                res = FTS3Job.generateContext(
+                    ftsServer,
+                    proxyFile,
+                    lifetime=self.proxyLifetime,
+                    requestClass=partial(FTS3Utilities.FTS3SessionRequest, sessionKey=idTuple),
+                )
+            else:
+                res = FTS3Job.generateContext(ftsServer, proxyFile, lifetime=self.proxyLifetime)
 
             if not res["OK"]:
                 return res
@@ -274,9 +295,114 @@ class FTS3Agent(AgentModule):
         else:
             log.debug("Successfully updated job status")
 
+    def __getServerSemaphore(self, ftsServer):
+        """Returns the semaphore limiting the number of concurrent monitoring requests to a server
+
+        :param str ftsServer: address of the server
+        """
+        with self._serverSemaphoresLock:
+            if ftsServer not in self._serverSemaphores:
+                self._serverSemaphores[ftsServer] = threading.BoundedSemaphore(self.maxRequestsPerServer)
+            return self._serverSemaphores[ftsServer]
+
+    def _monitorJobs(self, ftsJobs):
+        """Bulk version of _monitorJob, for jobs of the same user, group and server:
+        * query the FTS server for all the jobs with one request
+        * update the FTSFiles status of all the jobs at once
+        * update the FTSJobs status of all the jobs at once
+
+        :param ftsJobs: list of FTS jobs
+
+        :return: ftsJobs, S_OK()/S_ERROR()
+        """
+        # General try catch to avoid that the tread dies
+        try:
+            threadID = current_process().name
+            ftsServer = ftsJobs[0].ftsServer
+            log = gLogger.getLocalSubLogger("_monitorJobs/%s" % ftsServer)
+
+            res = self.getFTS3Context(ftsJobs[0].username, ftsJobs[0].userGroup, ftsServer, threadID=threadID)
+
+            if not res["OK"]:
+                log.error("Error getting context", res)
+                return ftsJobs, res
+
+            context = res["Value"]
+
+            with self.__getServerSemaphore(ftsServer):
+                res = FTS3Job.monitorJobs(context, ftsJobs)
+
+            if not res["OK"]:
+                log.error("Error monitoring jobs", res)
+                return ftsJobs, res
+
+            monitoringResults = res["Value"]
+
+            # { ftsGUID : { fileID : { Status, Error } } }
+            filesStatusByGUID = {}
+            upDict = {}
+            for ftsJob in ftsJobs:
+                res = monitoringResults[ftsJob.jobID]
+                if not res["OK"]:
+                    log.error("Error monitoring job", "%s: %s" % (ftsJob.jobID, res))
+
+                    # If the job was not found on the server, update the DB
+                    if cmpError(res, errno.ESRCH):
+                        res = self.fts3db.cancelNonExistingJob(ftsJob.operationID, ftsJob.ftsGUID)
+                        if not res["OK"]:
+                            log.error("Error canceling non existing job", "%s: %s" % (ftsJob.jobID, res))
+                    continue
+
+                filesStatusByGUID[ftsJob.ftsGUID] = res["Value"]
+                upDict[ftsJob.jobID] = {
+                    "status": ftsJob.status,
+                    "error": ftsJob.error,
+                    "completeness": ftsJob.completeness,
+                    "operationID": ftsJob.operationID,
+                    "lastMonitor": True,
+                }
+
+            if not upDict:
+                return ftsJobs, S_OK()
+
+            # Specify the jobs ftsGUID to make sure we do not overwrite
+            # status of files already taken by newer jobs
+            res = self.fts3db.bulkUpdateFileStatus(filesStatusByGUID)
+
+            if not res["OK"]:
+                log.error("Error updating file fts status", res)
+                return ftsJobs, res
+
+            res = self.fts3db.updateJobStatus(upDict)
+
+            for ftsJob in ftsJobs:
+                if ftsJob.jobID in upDict and ftsJob.status in ftsJob.FINAL_STATES:
+                    self.__sendAccounting(ftsJob)
+
+            return ftsJobs, res
+
+        except Exception as e:
+            log.exception("Exception while monitoring jobs", repr(e))
+            return ftsJobs, S_ERROR(0, "Exception %s" % repr(e))
+
+    @staticmethod
+    def _monitorJobsCallback(returnedValue):
+        """Callback when jobs have been monitored
+        :param returnedValue: value returned by the _monitorJobs method
+                              (ftsJobs, standard dirac return struct)
+        """
+
+        ftsJobs, res = returnedValue
+        log = gLogger.getLocalSubLogger("_monitorJobsCallback/%s" % ftsJobs[0].ftsServer)
+        if not res["OK"]:
+            log.error("Error updating jobs status", res)
+        else:
+            log.debug("Successfully updated jobs status", len(ftsJobs))
+
     def monitorJobsLoop(self):
         """* fetch the active FTSJobs from the DB
         * spawn a thread to monitor each of them
+          (or, with BulkMonitoring, each group of them on the same server)
 
         :return: S_OK()/S_ERROR()
         """
@@ -284,8 +410,13 @@ class FTS3Agent(AgentModule):
         log = gLogger.getSubLogger("monitorJobs")
         log.debug("Size of the context cache %s" % len(self._globalContextCache))
 
+        # In bulk mode, a batch has enough jobs for one request per thread
+        batchSize = JOB_MONITORING_BATCH_SIZE
+        if self.bulkMonitoring:
+            batchSize = max(batchSize, min(self.jobBulkSize, self.jobsPerMonitoringRequest * self.maxNumberOfThreads))
+
         # Find the number of loops
-        nbOfLoops, mod = divmod(self.jobBulkSize, JOB_MONITORING_BATCH_SIZE)
+        nbOfLoops, mod = divmod(self.jobBulkSize, batchSize)
         if mod:
             nbOfLoops += 1
 
@@ -295,7 +426,7 @@ class FTS3Agent(AgentModule):
 
             log.info("Getting next batch of jobs to monitor", "%s/%s" % (loopId, nbOfLoops))
             # get jobs from DB
-            res = self.fts3db.getActiveJobs(limit=JOB_MONITORING_BATCH_SIZE, jobAssignmentTag=self.assignmentTag)
+            res = self.fts3db.getActiveJobs(limit=batchSize, jobAssignmentTag=self.assignmentTag)
 
             if not res["OK"]:
                 log.error("Could not retrieve ftsJobs from the DB", res)
@@ -307,14 +438,29 @@ class FTS3Agent(AgentModule):
             # We store here the AsyncResult object on which we are going to wait
             applyAsyncResults = []
 
-            # Starting the monitoring threads
-            for ftsJob in activeJobs:
-                log.debug("Queuing executing of ftsJob %s" % ftsJob.jobID)
-                # queue the execution of self._monitorJob( ftsJob ) in the thread pool
-                # The returned value is passed to _monitorJobCallback
-                applyAsyncResults.append(
-                    self.jobsThreadPool.apply_async(self._monitorJob, (ftsJob,), callback=self._monitorJobCallback)
-                )
+            if self.bulkMonitoring:
+                # Group the jobs by context, and in chunks of the size of the requests
+                jobsByContext = {}
+                for ftsJob in activeJobs:
+                    jobsByContext.setdefault((ftsJob.username, ftsJob.userGroup, ftsJob.ftsServer), []).append(ftsJob)
+                for contextJobs in jobsByContext.values():
+                    for i in range(0, len(contextJobs), self.jobsPerMonitoringRequest):
+                        ftsJobs = contextJobs[i : i + self.jobsPerMonitoringRequest]
+                        log.debug("Queuing executing of %s ftsJobs on %s" % (len(ftsJobs), ftsJobs[0].ftsServer))
+                        applyAsyncResults.append(
+                            self.jobsThreadPool.apply_async(
+                                self._monitorJobs, (ftsJobs,), callback=self._monitorJobsCallback
+                            )
+                        )
+            else:
+                # Starting the monitoring threads
+                for ftsJob in activeJobs:
+                    log.debug("Queuing executing of ftsJob %s" % ftsJob.jobID)
+                    # queue the execution of self._monitorJob( ftsJob ) in the thread pool
+                    # The returned value is passed to _monitorJobCallback
+                    applyAsyncResults.append(
+                        self.jobsThreadPool.apply_async(self._monitorJob, (ftsJob,), callback=self._monitorJobCallback)
+                    )
 
             log.debug("All execution queued")
 
@@ -325,7 +471,7 @@ class FTS3Agent(AgentModule):
 
             # If we got less to monitor than what we asked,
             # stop looping
-            if len(activeJobs) < JOB_MONITORING_BATCH_SIZE:
+            if len(activeJobs) < batchSize:
                 break
         # Commit records after each loop
         self.dataOpSender.concludeSending()
@@ -1,10 +1,11 @@
 """ FTS3Job module containing only the FTS3Job class """
 import datetime
 import errno
+import json
 
 # Requires at least version 3.3.3
 import fts3.rest.client.easy as fts3
-from fts3.rest.client.exceptions import FTS3ClientException, NotFound
+from fts3.rest.client.exceptions import ClientError, FTS3ClientException, NotFound
 
 # We specifically use Request in the FTS client because of a leak in the
 # default pycurl. See https://its.cern.ch/jira/browse/FTS-261
@@ -23,6 +24,10 @@ from DIRAC.DataManagementSystem.Client.FTS3File import FTS3File
 # 3 days in seconds
 BRING_ONLINE_TIMEOUT = 259200
 
+# Fields of the files returned by the FTS servers when monitoring jobs in bulk:
+# the ones used by the monitoring and the accounting
+BULK_MONITORING_FILE_FIELDS = "file_state,reason,file_metadata,filesize,tx_duration"
+
 
 class FTS3Job(JSerializable):
     """Abstract class to represent a job to be executed by FTS. It belongs
@@ -140,11 +145,87 @@ class FTS3Job(JSerializable):
         # The job is not found
         # Set its status to Failed and return
         except NotFound:
-            self.status = "Failed"
-            return S_ERROR(errno.ESRCH, "FTSGUID %s not found on %s" % (self.ftsGUID, self.ftsServer))
+            return self._setNotFound()
         except FTS3ClientException as e:
             return S_ERROR("Error getting the job status %s" % e)
 
+        return self._updateFromJobStatus(jobStatusDict)
+
+    @staticmethod
+    def monitorJobs(context, ftsJobs):
+        """Queries the fts server to monitor several jobs at once, with a single request.
+        The jobs must all be on the server of the context.
+        The internal state of each job is updated as with the monitor method.
+
+        If the server refuses the bulk request, the jobs are monitored one by one.
+
+        :param context: fts3 context
+        :param ftsJobs: list of FTS3Job
+
+        :returns: S_OK( { jobID : return value of the monitor method } )
+        """
+        if len(ftsJobs) == 1:
+            return S_OK({ftsJobs[0].jobID: ftsJobs[0].monitor(context=context)})
+
+        jobsByGUID = {}
+        for ftsJob in ftsJobs:
+            if ftsJob.ftsGUID:
+                jobsByGUID[ftsJob.ftsGUID] = ftsJob
+        results = {ftsJob.jobID: S_ERROR("FTSGUID not set, FTS job not submitted?") for ftsJob in ftsJobs}
+        if not jobsByGUID:
+            return S_OK(results)
+
+        try:
+            jobStatusList = json.loads(
+                context.get("/jobs/%s?files=%s" % (",".join(jobsByGUID), BULK_MONITORING_FILE_FIELDS))
+            )
+        # Not all the jobs are found, or the server does not support it:
+        # use the usual monitoring
+        except (NotFound, ClientError) as e:
+            gLogger.debug("Bulk monitoring failed, monitoring the jobs one by one", repr(e))
+            for ftsJob in jobsByGUID.values():
+                results[ftsJob.jobID] = ftsJob.monitor(context=context)
+            return S_OK(results)
+        except FTS3ClientException as e:
+            return S_ERROR("Error getting the jobs status %s" % e)
+
+        # One job only is returned as a dict
+        if isinstance(jobStatusList, dict):
+            jobStatusList = [jobStatusList]
+
+        for jobStatusDict in jobStatusList:
+            ftsJob = jobsByGUID.pop(jobStatusDict.get("job_id"), None)
+            if not ftsJob:
+                continue
+            # The status of each job of a bulk request is given, e.g. "200 Ok" or "404 Not Found"
+            httpStatus = str(jobStatusDict.get("http_status", "200"))
+            if httpStatus.startswith("404"):
+                results[ftsJob.jobID] = ftsJob._setNotFound()
+            elif not httpStatus.startswith("2"):
+                results[ftsJob.jobID] = S_ERROR("Error getting the job status %s" % httpStatus)
+            else:
+                results[ftsJob.jobID] = ftsJob._updateFromJobStatus(jobStatusDict)
+
+        for ftsJob in jobsByGUID.values():
+            results[ftsJob.jobID] = S_ERROR("No status returned for FTSGUID %s" % ftsJob.ftsGUID)
+
+        return S_OK(results)
+
+    def _setNotFound(self):
+        """The job is not found on the server: set its status to Failed
+
+        :returns: S_ERROR(errno.ESRCH)
+        """
+        self.status = "Failed"
+        return S_ERROR(errno.ESRCH, "FTSGUID %s not found on %s" % (self.ftsGUID, self.ftsServer))
+
+    def _updateFromJobStatus(self, jobStatusDict):
+        """Update the internal state of the object from the status returned by the fts server
+
+        :param jobStatusDict: status of the job, with the list of its files
+
+        :returns: see the monitor method
+        """
         now = datetime.datetime.utcnow().replace(microsecond=0)
         self.lastMonitor = now
 
@@ -727,18 +808,20 @@ class FTS3Job(JSerializable):
         return S_OK(fileIDsInTheJob)
 
     @staticmethod
-    def generateContext(ftsServer, ucert, lifetime=25200):
+    def generateContext(ftsServer, ucert, lifetime=25200, requestClass=ftsSSLRequest):
         """This method generates an fts3 context
 
         :param ftsServer: address of the fts3 server
         :param ucert: the path to the certificate to be used
         :param lifetime: duration (in sec) of the delegation to the FTS3 server
                         (default is 7h, like FTS3 default)
+        :param requestClass: class used by the context to send the requests
+                             (e.g. :py:class:`~DIRAC.DataManagementSystem.private.FTS3Utilities.FTS3SessionRequest`)
 
         :returns: an fts3 context
         """
         try:
-            context = fts3.Context(endpoint=ftsServer, ucert=ucert, request_class=ftsSSLRequest, verify=False)
+            context = fts3.Context(endpoint=ftsServer, ucert=ucert, request_class=requestClass, verify=False)
 
             # Explicitely delegate to be sure we have the lifetime we want
             # Note: the delegation will re-happen only when the FTS server
@@ -11,6 +11,7 @@ from DIRAC import S_OK, S_ERROR
 import DIRAC.Core.Utilities.Time as Time
 
 import json
+import sys
 
 FILE_STANDARD_METAKEYS = {
     "SE": "VARCHAR",
@@ -167,6 +168,47 @@ class MetaQuery(object):
 
         return json.dumps(self.__metaQueryDict)
 
+    def explain(self, catalog, path="/"):
+        """Get an EXPLAIN-style description of the evaluation of the query by the catalog
+
+        :param catalog: FileCatalogClient object
+        :param str path: starting directory path of the query
+
+        :return: S_OK/S_ERROR, Value the description as a text table
+        """
+        result = catalog.explainMetadataQuery(self.__metaQueryDict, path)
+        if not result["OK"]:
+            return result
+        return S_OK(self.formatPlan(result["Value"], path))
+
+    @staticmethod
+    def formatPlan(plan, path="/"):
+        """Format the query plan returned by the explainMetadataQuery catalog method"""
+        lines = ["Directory search in %s" % path]
+        if plan["Satisfied"]:
+            lines.append("Satisfied by the path: %s" % ", ".join(plan["Satisfied"]))
+        rows = [("Step", "Meta", "EstimatedRows", "Value")]
+        for step, stepDict in enumerate(plan["Steps"], 1):
+            estimation = stepDict["EstimatedRows"]
+            rows.append(
+                (
+                    str(step),
+                    stepDict["Meta"],
+                    "unknown" if estimation >= sys.maxsize else str(estimation),
+                    json.dumps(stepDict["Value"]),
+                )
+            )
+        widths = [max(len(row[i]) for row in rows) for i in range(3)]
+        for row in rows:
+            lines.append("  ".join(column.ljust(width) for column, width in zip(row, widths)) + "  " + row[3])
+        lines.append(
+            "Steps are evaluated in order, on the parent hierarchies of the candidates once they are at most %d"
+            % plan["SemijoinMaxDirs"]
+        )
+        if plan.get("FileMetadata"):
+            lines.append("File search: %s" % ", ".join(plan["FileMetadata"]))
+        return "\n".join(lines)
+
     def applyQuery(self, userMetaDict):
         """Return a list of tuples with tables and conditions to locate files for a given user Metadata"""
 
@@ -1,4 +1,5 @@
 import os
+import json
 import pytest
 import tempfile
 import errno
@@ -507,3 +508,86 @@ def test_submit_doubleMultiHopStaging():
     # Only "real" (i.e. non intermediate hop) have 'FileID' in their metadata and monitored
     monitoredJob = [f["metadata"] for f in job["files"] if "fileID" in f["metadata"]]
     assert len(monitoredJob) == 1
+
+
+class FakeBulkContext:
+    """fts3 context answering the bulk monitoring requests with the status of known jobs"""
+
+    def __init__(self, jobStatus):
+        self.jobStatus = jobStatus
+        self.paths = []
+
+    def get(self, path):
+        self.paths.append(path)
+        guids = path.split("/")[2].split("?")[0].split(",")
+        answer = []
+        for guid in guids:
+            if guid in self.jobStatus:
+                answer.append(dict(self.jobStatus[guid], job_id=guid, http_status="200 Ok"))
+            else:
+                answer.append({"job_id": guid, "http_status": "404 Not Found"})
+        return json.dumps(answer)
+
+
+def generateJobStatus(jobState, fileStates):
+    """Status of a job as returned by the FTS server, with files of ID 1, 2, ..."""
+    return {
+        "job_state": jobState,
+        "reason": None,
+        "job_metadata": {"sourceSE": "CERN-DST", "targetSE": "CNAF-DST"},
+        "files": [
+            {
+                "file_state": fileState,
+                "reason": "",
+                "file_metadata": {"fileID": fileID},
+                "filesize": 10,
+                "tx_duration": 1,
+            }
+            for fileID, fileState in enumerate(fileStates, start=1)
+        ],
+    }
+
+
+def test_monitorJobs():
+    """Several jobs are monitored with one request"""
+
+    jobs = []
+    for jobID, ftsGUID in enumerate(["guid1", "guid2", "guid3", None], start=1):
+        ftsJob = FTS3Job()
+        ftsJob.jobID = jobID
+        ftsJob.ftsGUID = ftsGUID
+        ftsJob.status = "Submitted"
+        jobs.append(ftsJob)
+
+    context = FakeBulkContext(
+        {
+            "guid1": generateJobStatus("ACTIVE", ["FINISHED", "ACTIVE"]),
+            "guid2": generateJobStatus("FINISHED", ["FINISHED", "FINISHED"]),
+        }
+    )
+    res = FTS3Job.monitorJobs(context, jobs)
+    assert res["OK"]
+    results = res["Value"]
+
+    # One request for the jobs having an FTS GUID
+    assert len(context.paths) == 1
+    assert context.paths[0].startswith("/jobs/guid1,guid2,guid3?files=")
+
+    assert results[1]["OK"]
+    assert results[1]["Value"] == {
+        1: {"status": "Finished", "error": "", "ftsGUID": None},
+        2: {"status": "Active", "error": ""},
+    }
+    assert jobs[0].status == "Active"
+    assert jobs[0].completeness == 50
+
+    assert results[2]["OK"]
+    assert jobs[1].status == "Finished"
+    assert jobs[1].accountingDict["TransferOK"] == 2
+
+    # Not found on the server
+    assert cmpError(results[3], errno.ESRCH)
+    assert jobs[2].status == "Failed"
+
+    # Not submitted
+    assert not results[4]["OK"]
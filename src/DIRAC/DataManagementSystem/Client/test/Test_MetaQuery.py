@@ -0,0 +1,34 @@
+""" Test the formatting of the metadata query plans
+"""
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+
+
+def test_explain():
+    plan = {
+        "Satisfied": ["Year"],
+        "Steps": [
+            {"Meta": "Run", "Value": {">": 10}, "EstimatedRows": 12},
+            {"Meta": "DataType", "Value": "Missing", "EstimatedRows": 2**63 - 1},
+        ],
+        "FileMetadata": ["Size"],
+        "SemijoinMaxDirs": 5000,
+    }
+    catalog = MagicMock()
+    catalog.explainMetadataQuery.return_value = S_OK(plan)
+    metaQuery = MetaQuery({"Year": 2020, "Run": {">": 10}, "DataType": "Missing", "Size": 10})
+
+    res = metaQuery.explain(catalog, "/vo/data")
+    assert res["OK"]
+    catalog.explainMetadataQuery.assert_called_once_with(metaQuery.getMetaQuery(), "/vo/data")
+    lines = res["Value"].split("\n")
+    assert lines[0] == "Directory search in /vo/data"
+    assert lines[1] == "Satisfied by the path: Year"
+    assert lines[2].split() == ["Step", "Meta", "EstimatedRows", "Value"]
+    assert lines[3].split() == ["1", "Run", "12", '{">":', "10}"]
+    assert lines[4].split() == ["2", "DataType", "unknown", '"Missing"']
+    # The columns are aligned
+    assert lines[2].index("Meta") == lines[3].index("Run") == lines[4].index("DataType")
+    assert lines[-1] == "File search: Size"
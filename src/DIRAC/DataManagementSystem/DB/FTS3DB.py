@@ -419,6 +419,55 @@ class FTS3DB(object):
 
         return S_OK()
 
+    def bulkUpdateFileStatus(self, fileStatusByGUID):
+        """Update the file ftsStatus and error of the files of several jobs, like updateFileStatus,
+        but in a single transaction, with one statement per job and set of values
+        (typically, all the files of a job in the same state)
+
+        :param fileStatusByGUID: { ftsGUID : { fileID : { status , error, ftsGUID } } }
+                                 Only the rows of the given ftsGUID are updated
+        """
+
+        # (ftsGUID, values to set) -> [fileIDs]
+        fileIDsByUpdate = {}
+        for ftsGUID, fileStatusDict in fileStatusByGUID.items():
+            for fileID, valueDict in fileStatusDict.items():
+                updateDict = {"status": valueDict["status"]}
+                # We only update error and ftsGUID if they are specified,
+                # and replace empty strings with None
+                for field in ("error", "ftsGUID"):
+                    if field in valueDict:
+                        updateDict[field] = valueDict[field] or None
+                fileIDsByUpdate.setdefault((ftsGUID, tuple(sorted(updateDict.items()))), []).append(fileID)
+
+        session = self.dbSession()
+        try:
+            # Always update the rows in the same order, to avoid deadlocks with other agents
+            for ftsGUID, updateItems in sorted(fileIDsByUpdate, key=lambda key: min(fileIDsByUpdate[key])):
+                fileIDs = sorted(fileIDsByUpdate[(ftsGUID, updateItems)])
+                session.execute(
+                    update(FTS3File)
+                    .where(
+                        and_(
+                            FTS3File.fileID.in_(fileIDs),
+                            ~FTS3File.status.in_(FTS3File.FINAL_STATES),
+                            FTS3File.ftsGUID == ftsGUID,
+                        )
+                    )
+                    .values(dict(updateItems))
+                    .execution_options(synchronize_session=False)  # see comment about synchronize_session
+                )
+            session.commit()
+
+            return S_OK()
+
+        except SQLAlchemyError as e:
+            session.rollback()
+            self.log.exception("bulkUpdateFileStatus: unexpected exception", lException=e)
+            return S_ERROR("bulkUpdateFileStatus: unexpected exception %s" % e)
+        finally:
+            session.close()
+
     def updateJobStatus(self, jobStatusDict):
         """Update the job Status and error
          The update is only done if the job is not in a final state
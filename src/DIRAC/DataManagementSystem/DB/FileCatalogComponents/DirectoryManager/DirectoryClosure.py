@@ -11,8 +11,12 @@ import six
 import os
 
 from DIRAC import S_OK, S_ERROR
-from DIRAC.Core.Utilities.List import intListToString, stringListToString
+from DIRAC.Core.Utilities.List import intListToString, stringListToString, breakListIntoChunks
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryTreeBase import DirectoryTreeBase
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryPathCache import getDirectoryLevel
+
+# Maximum number of directories resolved by a single call
+FIND_DIRS_CHUNK_SIZE = 5000
 
 
 class DirectoryClosure(DirectoryTreeBase):
@@ -37,6 +41,12 @@ class DirectoryClosure(DirectoryTreeBase):
         """
 
         dpath = os.path.normpath(path)
+        dirID = self.dirCache.get(dpath)
+        if dirID:
+            res = S_OK(dirID)
+            res["Level"] = getDirectoryLevel(dpath)
+            return res
+
         result = self.db.executeStoredProcedure("ps_find_dir", (dpath, "ret1", "ret2"), outputIds=[1, 2])
         if not result["OK"]:
             return result
@@ -44,6 +54,7 @@ class DirectoryClosure(DirectoryTreeBase):
         if not result["Value"]:
             return S_OK(0)
 
+        self.dirCache.add(dpath, result["Value"][0])
         res = S_OK(result["Value"][0])
         res["Level"] = result["Value"][1]
         return res
@@ -51,20 +62,22 @@ class DirectoryClosure(DirectoryTreeBase):
     def findDirs(self, paths, connection=False):
         """Find DirIDs for the given path list
 
+        The directories which are not cached are resolved with one call per chunk of FIND_DIRS_CHUNK_SIZE paths
+
         :param paths: list of path
 
         :returns: S_OK( { path : ID} )
         """
 
-        dirDict = {}
-        if not paths:
-            return S_OK(dirDict)
-        dpaths = stringListToString([os.path.normpath(path) for path in paths])
-        result = self.db.executeStoredProcedureWithCursor("ps_find_dirs", (dpaths,))
-        if not result["OK"]:
-            return result
-        for dirName, dirID in result["Value"]:
-            dirDict[dirName] = dirID
+        paths = set(os.path.normpath(path) for path in paths)
+        dirDict = self.dirCache.getDirs(paths)
+        for pathChunk in breakListIntoChunks(sorted(paths - set(dirDict)), FIND_DIRS_CHUNK_SIZE):
+            result = self.db.executeStoredProcedureWithCursor("ps_find_dirs", (stringListToString(pathChunk),))
+            if not result["OK"]:
+                return result
+            for dirName, dirID in result["Value"]:
+                dirDict[dirName] = dirID
+                self.dirCache.add(dirName, dirID)
 
         return S_OK(dirDict)
 
@@ -91,6 +104,8 @@ class DirectoryClosure(DirectoryTreeBase):
 
         dirId = result["Value"]
         result = self.db.executeStoredProcedure("ps_remove_dir", (dirId,), outputIds=[])
+        # Forgotten once deleted: a lookup made before the deletion may have cached the ID again
+        self.dirCache.remove(os.path.normpath(path))
         if not result["OK"]:
             return result
 
@@ -158,25 +173,6 @@ class DirectoryClosure(DirectoryTreeBase):
 
         return S_OK(dirDict)
 
-    def getPathIDs(self, path):
-        """Get IDs of all the directories in the parent hierarchy for a directory
-        specified by its path, including itself
-
-        :param path: path of the directory
-
-        :returns: S_OK( list of ids ), S_ERROR if not found
-        """
-
-        result = self.findDir(path)
-        if not result["OK"]:
-            return result
-        if not result["Value"]:
-            return S_ERROR("Directory %s not found" % path)
-
-        dirID = result["Value"]
-
-        return self.getPathIDsByID(dirID)
-
     def getPathIDsByID(self, dirID):
         """Get IDs of all the directories in the parent hierarchy for a directory
         specified by its ID, including itself
@@ -194,6 +190,26 @@ class DirectoryClosure(DirectoryTreeBase):
 
         return S_OK([dId[0] for dId in result["Value"]])
 
+    def getPathIDsByIDs(self, dirIDs):
+        """Get IDs of all the directories in the parent hierarchies of several directories,
+        including themselves
+
+        :param list dirIDs: ids of the directories
+
+        :returns: S_OK( { dirID: list of ids } ), the unknown directories being omitted
+        """
+        pathIDs = {}
+        for dirChunk in breakListIntoChunks(list(dirIDs), FIND_DIRS_CHUNK_SIZE):
+            req = "SELECT ChildID, ParentID FROM FC_DirectoryClosure WHERE ChildID IN (%s) ORDER BY Depth DESC" % (
+                intListToString(dirChunk)
+            )
+            result = self.db._query(req)
+            if not result["OK"]:
+                return result
+            for childID, parentID in result["Value"]:
+                pathIDs.setdefault(childID, []).append(parentID)
+        return S_OK(pathIDs)
+
     def getChildren(self, path, connection=False):
         """Get child directory IDs for the given directory"""
         if isinstance(path, six.string_types):
@@ -370,6 +386,7 @@ class DirectoryClosure(DirectoryTreeBase):
                 return result
 
             dirId = result["Value"][0][0]
+            self.dirCache.add(dpath, dirId)
 
             result = S_OK(dirId)
             result["NewDirectory"] = True
@@ -638,6 +655,15 @@ class DirectoryClosure(DirectoryTreeBase):
             lfns, "ps_calculate_dir_physical_size", recursiveSum=recursiveSum, connection=None
         )
 
+    def _rebuildDirectoryUsage(self):
+        """Recreate and replace the FC_DirectoryUsage and FC_DirectoryTreeUsage tables from the files
+        and replicas, in a single transaction.
+
+        FC_DirectoryTreeUsage, giving the usage of a directory including its subdirectories,
+        is otherwise maintained by the triggers on FC_DirectoryUsage.
+        """
+        return self.db.executeStoredProcedure("ps_rebuild_directory_usage", (), outputIds=[])
+
     def _changeDirectoryParameter(self, paths, directoryFunction, _fileFunction, recursive=False):
         """Bulk setting of the directory parameter with recursion for all the subdirectories and files
 
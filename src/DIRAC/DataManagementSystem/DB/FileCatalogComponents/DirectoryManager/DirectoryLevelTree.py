@@ -5,9 +5,13 @@ import six
 import os
 
 from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryTreeBase import DirectoryTreeBase
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryPathCache import getDirectoryLevel
 
 MAX_LEVELS = 15
+# Maximum number of directories resolved by a single query
+FIND_DIRS_CHUNK_SIZE = 5000
 
 
 class DirectoryLevelTree(DirectoryTreeBase):
@@ -26,7 +30,14 @@ class DirectoryLevelTree(DirectoryTreeBase):
     def findDir(self, path, connection=False):
         """Find directory ID for the given path"""
 
-        dpath = self.db._escapeString(os.path.normpath(path))
+        path = os.path.normpath(path)
+        dirID = self.dirCache.get(path)
+        if dirID:
+            res = S_OK(dirID)
+            res["Level"] = getDirectoryLevel(path)
+            return res
+
+        dpath = self.db._escapeString(path)
         if not dpath["OK"]:
             return dpath
         dpath = dpath["Value"]
@@ -38,26 +49,33 @@ class DirectoryLevelTree(DirectoryTreeBase):
         if not result["Value"]:
             return S_OK("")
 
+        self.dirCache.add(path, result["Value"][0][0])
         res = S_OK(result["Value"][0][0])
         res["Level"] = result["Value"][0][1]
         return res
 
     def findDirs(self, paths, connection=False):
-        """Find DirIDs for the given path list"""
-        dpathList = []
-        for path in paths:
-            dpath = self.db._escapeString(os.path.normpath(path))
-            if not dpath["OK"]:
-                return dpath
-            dpathList.append(dpath["Value"])
-        dpaths = ",".join(dpathList)
-        req = "SELECT DirName,DirID from FC_DirectoryLevelTree WHERE DirName in (%s)" % dpaths
-        result = self.db._query(req, connection)
-        if not result["OK"]:
-            return result
-        dirDict = {}
-        for dirName, dirID in result["Value"]:
-            dirDict[dirName] = dirID
+        """Find DirIDs for the given path list
+
+        The directories which are not cached are resolved with one query per chunk of FIND_DIRS_CHUNK_SIZE paths
+        """
+        paths = set(os.path.normpath(path) for path in paths)
+        dirDict = self.dirCache.getDirs(paths)
+        for pathChunk in breakListIntoChunks(sorted(paths - set(dirDict)), FIND_DIRS_CHUNK_SIZE):
+            dpathList = []
+            for path in pathChunk:
+                dpath = self.db._escapeString(path)
+                if not dpath["OK"]:
+                    return dpath
+                dpathList.append(dpath["Value"])
+            dpaths = ",".join(dpathList)
+            req = "SELECT DirName,DirID from FC_DirectoryLevelTree WHERE DirName in (%s)" % dpaths
+            result = self.db._query(req, connection)
+            if not result["OK"]:
+                return result
+            for dirName, dirID in result["Value"]:
+                dirDict[dirName] = dirID
+                self.dirCache.add(dirName, dirID)
 
         return S_OK(dirDict)
 
@@ -75,6 +93,8 @@ class DirectoryLevelTree(DirectoryTreeBase):
         dirID = result["Value"]
         req = "DELETE FROM FC_DirectoryLevelTree WHERE DirID=%d" % dirID
         result = self.db._update(req)
+        # Forgotten once deleted: a lookup made before the deletion may have cached the ID again
+        self.dirCache.remove(os.path.normpath(path))
         result["DirID"] = dirID
         return result
 
@@ -183,6 +203,7 @@ class DirectoryLevelTree(DirectoryTreeBase):
         else:
             result = self.db._query("ROLLBACK;", conn)
 
+        self.dirCache.add(os.path.normpath(path), dirID)
         result = S_OK(dirID)
         result["NewDirectory"] = True
         return result
@@ -267,29 +288,6 @@ class DirectoryLevelTree(DirectoryTreeBase):
 
         return S_OK(os.path.basename(result["Value"]))
 
-    def getPathIDs(self, path):
-        """Get IDs of all the directories in the parent hierarchy for a directory
-        specified by its path
-        """
-
-        elements = path.split("/")
-        pelements = []
-        dPath = ""
-        for el in elements[1:]:
-            dPath += "/" + el
-            pelements.append(dPath)
-        pelements.append("/")
-
-        pathString = ["'" + p + "'" for p in pelements]
-        req = "SELECT DirID FROM FC_DirectoryLevelTree WHERE DirName in (%s) ORDER BY DirID" % ",".join(pathString)
-        result = self.db._query(req)
-        if not result["OK"]:
-            return result
-        if not result["Value"]:
-            return S_ERROR("Directory %s not found" % path)
-
-        return S_OK([x[0] for x in result["Value"]])
-
     def getPathIDsByID_old(self, dirID):
         """Get IDs of all the directories in the parent hierarchy for a directory
         specified by its ID
@@ -513,6 +511,8 @@ class DirectoryLevelTree(DirectoryTreeBase):
             result = self.__rebuildLevelIndexes(parentID, connection)
             resUnlock = self.db._query("UNLOCK TABLES", connection)
 
+        # Directory IDs may have been changed
+        self.dirCache.clear()
         return S_OK()
 
     def _getConnection(self, connection=False):
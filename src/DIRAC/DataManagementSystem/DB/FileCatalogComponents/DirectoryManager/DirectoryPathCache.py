@@ -0,0 +1,79 @@
+""" In-process cache of the directory IDs of the FileCatalog, from their path
+
+    Only the existing directories are cached: a directory created by another process is always found.
+    Entries are dropped when the directory is removed by this process, and otherwise expire after
+    a configurable lifetime, which bounds the time a directory removed by another process can be seen.
+"""
+import os
+
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+
+def getDirectoryLevel(path):
+    """Get the level of a normalized directory path in the tree, the root being at level 0"""
+    return 0 if path == "/" else path.count("/")
+
+
+def getParentPaths(path):
+    """Get the paths of all the directories in the hierarchy of a directory, from the root to itself"""
+    path = os.path.normpath(path)
+    parents = [path]
+    while path != "/":
+        path = os.path.dirname(path)
+        parents.append(path)
+    return parents[::-1]
+
+
+class DirectoryPathCache(object):
+    """Size bounded, thread safe cache of the directory IDs, by normalized path"""
+
+    def __init__(self, maxEntries=100000, lifeTime=300):
+        """c'tor
+
+        :param int maxEntries: maximum number of cached directories. If 0, nothing is cached
+        :param int lifeTime: lifetime of the entries, in seconds. If 0, nothing is cached
+        """
+        self.lifeTime = lifeTime
+        self.__cache = DictCache(maxEntries=maxEntries, shards=8) if maxEntries > 0 and lifeTime > 0 else None
+
+    def get(self, path):
+        """Get the ID of a directory
+
+        :param str path: normalized path of the directory
+
+        :return: the directory ID, None if it is not cached
+        """
+        if self.__cache is None:
+            return None
+        return self.__cache.get(path)
+
+    def getDirs(self, paths):
+        """Get the IDs of the cached directories among a list
+
+        :param paths: normalized paths of the directories
+
+        :return: dict { path: dirID } of the cached directories
+        """
+        if self.__cache is None:
+            return {}
+        dirDict = {}
+        for path in paths:
+            dirID = self.__cache.get(path)
+            if dirID:
+                dirDict[path] = dirID
+        return dirDict
+
+    def add(self, path, dirID):
+        """Cache the ID of an existing directory"""
+        if self.__cache is not None and dirID:
+            self.__cache.add(path, self.lifeTime, dirID)
+
+    def remove(self, path):
+        """Forget a directory, when it is removed"""
+        if self.__cache is not None:
+            self.__cache.delete(path)
+
+    def clear(self):
+        """Forget all the directories, when their IDs may have changed"""
+        if self.__cache is not None:
+            self.__cache.purgeAll()
@@ -7,6 +7,10 @@ import stat
 
 from DIRAC import S_OK, S_ERROR, gLogger
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.Utilities import getIDSelectString
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryPathCache import (
+    DirectoryPathCache,
+    getParentPaths,
+)
 
 DEBUG = 0
 
@@ -18,6 +22,11 @@ class DirectoryTreeBase(object):
         self.db = database
         self.lock = threading.Lock()
         self.treeTable = ""
+        # Cache of the directory IDs, used by the trees implementing findDirs
+        if database is not None:
+            self.dirCache = DirectoryPathCache(database.directoryCacheSize, database.directoryCacheLifeTime)
+        else:
+            self.dirCache = DirectoryPathCache()
 
     ############################################################################
     #
@@ -57,6 +66,47 @@ class DirectoryTreeBase(object):
 
     ##########################################################################
 
+    def getPathIDs(self, path):
+        """Get IDs of all the directories in the parent hierarchy for a directory
+        specified by its path, including itself, from the root
+
+        The parent directories are resolved in a single findDirs call, mostly served by the directory cache
+
+        :param path: path of the directory
+
+        :returns: S_OK( list of ids ), S_ERROR if not found
+        """
+        parentPaths = getParentPaths(path)
+        result = self.findDirs(parentPaths)
+        if not result["OK"]:
+            return result
+        dirDict = result["Value"]
+        if parentPaths[-1] not in dirDict:
+            return S_ERROR("Directory %s not found" % path)
+        return S_OK([dirDict[parentPath] for parentPath in parentPaths if parentPath in dirDict])
+
+    def getPathIDsByIDs(self, dirIDs):
+        """Get IDs of all the directories in the parent hierarchies of several directories,
+        including themselves
+
+        :param list dirIDs: ids of the directories
+
+        :returns: S_OK( { dirID: list of ids } ), the unknown directories being omitted
+        """
+        if not dirIDs:
+            return S_OK({})
+        result = self.getDirectoryPaths(list(dirIDs))
+        if not result["OK"]:
+            return result
+        parentPaths = dict((dirID, getParentPaths(path)) for dirID, path in result["Value"].items())
+        result = self.findDirs(list(set(path for paths in parentPaths.values() for path in paths)))
+        if not result["OK"]:
+            return result
+        dirDict = result["Value"]
+        return S_OK(
+            dict((dirID, [dirDict[path] for path in paths if path in dirDict]) for dirID, paths in parentPaths.items())
+        )
+
     def _getConnection(self, connection):
         if connection:
             return connection
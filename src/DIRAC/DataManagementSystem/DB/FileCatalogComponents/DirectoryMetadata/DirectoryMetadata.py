@@ -4,16 +4,23 @@
 import six
 import os
 from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 from DIRAC.Core.Utilities.Time import queryTime
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryMetadata.MetadataQueryPlanner import (
+    MetadataQueryPlanner,
+    SEMIJOIN_MAX_DIRS,
+)
 
 
 class DirectoryMetadata(object):
     def __init__(self, database=None):
 
         self.db = database
+        self.planner = MetadataQueryPlanner(database)
 
     def setDatabase(self, database):
         self.db = database
+        self.planner.db = database
 
     ##############################################################################
     #
@@ -64,6 +71,7 @@ class DirectoryMetadata(object):
         result = self.db._query(req)
         if not result["OK"]:
             return result
+        self.planner.invalidateStatistics(pName)
 
         result = self.db.insertFields("FC_MetaFields", ["MetaName", "MetaType"], [pName, pType])
         if not result["OK"]:
@@ -85,6 +93,7 @@ class DirectoryMetadata(object):
         :return: S_OK/S_ERROR
         """
 
+        self.planner.invalidateStatistics(pName)
         req = "DROP TABLE FC_Meta_%s" % pName
         result = self.db._update(req)
         error = ""
@@ -660,19 +669,57 @@ class DirectoryMetadata(object):
         else:
             return S_OK(result["Value"][0][0])
 
-    @queryTime
-    def findDirIDsByMetadata(self, queryDict, path, credDict):
-        """Find Directories satisfying the given metadata and being subdirectories of
-        the given path
+    def __filterDirsByMeta(self, metaName, value, dirIDs):
+        """Select the directories having, or inheriting, the given metaName datum.
+        Only the parent hierarchies of the given directories are looked at, which is
+        cheaper than __findSubdirByMeta when they are few.
+
+        :param str metaName: metadata name
+        :param dict,list value: dictionary with selection instructions suitable for the database search
+        :param set dirIDs: IDs of the candidate directories
+
+        :return: S_OK/S_ERROR, Value set of selected directories
+        """
+        result = self.db.dtree.getPathIDsByIDs(list(dirIDs))
+        if not result["OK"]:
+            return result
+        pathIDs = result["Value"]
+
+        missing = value == "Missing"
+        result = self.__createMetaSelection("Any" if missing else value, "M.")
+        if not result["OK"]:
+            return result
+        selectString = result["Value"]
+
+        matchingIDs = set()
+        parentIDs = sorted(set(dirID for dirPathIDs in pathIDs.values() for dirID in dirPathIDs))
+        for parentChunk in breakListIntoChunks(parentIDs, SEMIJOIN_MAX_DIRS):
+            req = "SELECT M.DirID FROM FC_Meta_%s AS M WHERE M.DirID IN (%s)" % (
+                metaName,
+                ",".join(str(dirID) for dirID in parentChunk),
+            )
+            if selectString:
+                req += " AND %s" % selectString
+            result = self.db._query(req)
+            if not result["OK"]:
+                return result
+            matchingIDs.update(row[0] for row in result["Value"])
+
+        return S_OK(
+            set(dirID for dirID in dirIDs if bool(matchingIDs.intersection(pathIDs.get(dirID, []))) is not missing)
+        )
+
+    def __planQuery(self, queryDict, path, credDict):
+        """Prepare the evaluation of a metadata query
 
         :param dict queryDict: dictionary containing query data
         :param str path: starting directory path
         :param dict credDict: client credential dictionary
 
-        :return: S_OK/S_ERROR, Value list of selected directory IDs
+        :return: S_OK/S_ERROR, Value dictionary with the PathDirID, the metadata already Satisfied
+                 by the path, the ordered Steps of the MetadataQueryPlanner for the others, and the
+                 names of the FileMetadata left to the file search
         """
-
-        pathDirList = []
         pathDirID = 0
         pathString = "0"
         if path != "/":
@@ -688,6 +735,7 @@ class DirectoryMetadata(object):
         if not result["OK"]:
             return result
         metaDict = result["Value"]
+        extraMetaList = sorted(result["ExtraMetadata"])
 
         # Now check the meta data for the requested directory and its parents
         finalMetaDict = dict(metaDict)
@@ -700,32 +748,66 @@ class DirectoryMetadata(object):
                 # given metadata, no need to check it further
                 del finalMetaDict[meta]
 
-        if finalMetaDict:
+        result = self.planner.plan(finalMetaDict)
+        if not result["OK"]:
+            return result
+        return S_OK(
+            {
+                "PathDirID": pathDirID,
+                "Satisfied": sorted(set(metaDict) - set(finalMetaDict)),
+                "Steps": result["Value"],
+                "FileMetadata": extraMetaList,
+            }
+        )
+
+    @queryTime
+    def findDirIDsByMetadata(self, queryDict, path, credDict):
+        """Find Directories satisfying the given metadata and being subdirectories of
+        the given path
+
+        The metadata are evaluated by increasing estimated selectivity, see MetadataQueryPlanner
+
+        :param dict queryDict: dictionary containing query data
+        :param str path: starting directory path
+        :param dict credDict: client credential dictionary
+
+        :return: S_OK/S_ERROR, Value list of selected directory IDs
+        """
+
+        result = self.__planQuery(queryDict, path, credDict)
+        if not result["OK"]:
+            return result
+        pathDirID = result["Value"]["PathDirID"]
+        steps = result["Value"]["Steps"]
+
+        pathDirList = []
+        if steps:
             pathSelection = ""
             if pathDirID:
                 result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True, requestString=True)
                 if not result["OK"]:
                     return result
                 pathSelection = result["Value"]
-            dirList = []
-            first = True
-            for meta, value in finalMetaDict.items():
+            dirSet = None
+            for step in steps:
+                meta, value = step["Meta"], step["Value"]
+                if dirSet is not None and len(dirSet) <= SEMIJOIN_MAX_DIRS:
+                    # Few candidates left: only check them
+                    if not dirSet:
+                        break
+                    result = self.__filterDirsByMeta(meta, value, dirSet)
+                    if not result["OK"]:
+                        return result
+                    dirSet = result["Value"]
+                    continue
                 if value == "Missing":
                     result = self.__findSubdirMissingMeta(meta, pathSelection)
                 else:
                     result = self.__findSubdirByMeta(meta, value, pathSelection)
                 if not result["OK"]:
                     return result
-                mList = result["Value"]
-                if first:
-                    dirList = mList
-                    first = False
-                else:
-                    newList = []
-                    for d in dirList:
-                        if d in mList:
-                            newList.append(d)
-                    dirList = newList
+                dirSet = set(result["Value"]) if dirSet is None else dirSet.intersection(result["Value"])
+            dirList = sorted(dirSet)
         else:
             if pathDirID:
                 result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True)
@@ -735,7 +817,7 @@ class DirectoryMetadata(object):
 
         finalList = []
         dirSelect = False
-        if finalMetaDict:
+        if steps:
             dirSelect = True
             finalList = dirList
             if pathDirList:
@@ -755,6 +837,25 @@ class DirectoryMetadata(object):
 
         return result
 
+    def explainMetadataQuery(self, queryDict, path, credDict):
+        """Describe how a metadata query would be evaluated by findDirIDsByMetadata, without evaluating it
+
+        :param dict queryDict: dictionary containing query data
+        :param str path: starting directory path
+        :param dict credDict: client credential dictionary
+
+        :return: S_OK/S_ERROR, Value dictionary with the metadata Satisfied by the path, the
+                 ordered Steps, each with the Meta, Value and EstimatedRows of the predicate, the
+                 FileMetadata left to the file search and the SemijoinMaxDirs threshold
+        """
+        result = self.__planQuery(queryDict, path, credDict)
+        if not result["OK"]:
+            return result
+        plan = result["Value"]
+        plan.pop("PathDirID")
+        plan["SemijoinMaxDirs"] = SEMIJOIN_MAX_DIRS
+        return S_OK(plan)
+
     @queryTime
     def findDirectoriesByMetadata(self, queryDict, path, credDict):
         """Find Directory names satisfying the given metadata and being subdirectories of
@@ -0,0 +1,110 @@
+""" Planner of the directory metadata queries
+
+    The predicates of a query are evaluated by increasing estimated number of matching directories,
+    the estimations being based on the cardinality statistics of the FC_Meta_<name> tables:
+
+    * value or list of values: Rows * (number of values) / Distinct
+    * Any: Rows
+    * != or nin: Rows minus the estimation for the values
+    * range: Rows / 3
+    * Missing: the predicate is evaluated last
+
+    Once the candidate directories are few enough (SEMIJOIN_MAX_DIRS), the next predicates are
+    evaluated only on their parent hierarchies instead of on the whole table.
+"""
+import sys
+
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+# Maximum number of candidate directories for which the following predicates are evaluated as a semijoin
+SEMIJOIN_MAX_DIRS = 5000
+# Estimation for the predicates which cannot be estimated
+UNKNOWN_ROWS = sys.maxsize
+
+
+class MetadataQueryPlanner(object):
+    """Orders the predicates of a directory metadata query by selectivity"""
+
+    def __init__(self, database=None, statisticsLifeTime=3600):
+        """c'tor
+
+        :param database: FileCatalogDB object
+        :param int statisticsLifeTime: lifetime of the cardinality statistics of each field, in seconds
+        """
+        self.db = database
+        self.statisticsLifeTime = statisticsLifeTime
+        self.__statistics = DictCache()
+
+    def getFieldStatistics(self, metaName):
+        """Get the cardinality statistics of a metadata field
+
+        :param str metaName: metadata name
+
+        :return: S_OK/S_ERROR, Value dict with the number of Rows and of Distinct values
+        """
+        stats = self.__statistics.get(metaName)
+        if stats is None:
+            result = self.db._query("SELECT COUNT(*), COUNT(DISTINCT Value) FROM FC_Meta_%s" % metaName)
+            if not result["OK"]:
+                return result
+            rows, distinct = result["Value"][0]
+            stats = {"Rows": int(rows), "Distinct": int(distinct)}
+            self.__statistics.add(metaName, self.statisticsLifeTime, stats)
+        return S_OK(stats)
+
+    def invalidateStatistics(self, metaName=None):
+        """Forget the statistics of a field, or of all of them"""
+        if metaName is None:
+            self.__statistics.purgeAll()
+        else:
+            self.__statistics.delete(metaName)
+
+    @staticmethod
+    def estimateRows(stats, value):
+        """Estimate the number of directories directly matching a predicate
+
+        :param dict stats: statistics of the field, as returned by getFieldStatistics
+        :param value: value of the predicate, as in the metadata queries
+
+        :return: estimated number of rows
+        """
+        rows = stats["Rows"]
+        rowsPerValue = float(rows) / max(stats["Distinct"], 1)
+
+        def valuesRows(values):
+            nValues = len(values) if isinstance(values, list) else 1
+            return min(rows, int(rowsPerValue * nValues + 0.5))
+
+        if value == "Missing":
+            return UNKNOWN_ROWS
+        if value == "Any":
+            return rows
+        if isinstance(value, dict):
+            estimation = rows
+            for operation, operand in value.items():
+                if operation in ["in", "="]:
+                    estimation = min(estimation, valuesRows(operand))
+                elif operation in ["nin", "!="]:
+                    estimation = min(estimation, rows - valuesRows(operand))
+                else:
+                    estimation = min(estimation, rows // 3)
+            return estimation
+        return valuesRows(value)
+
+    def plan(self, metaDict):
+        """Order the predicates of a query by increasing estimated number of matching directories
+
+        :param dict metaDict: { metaName: value } predicates of the query
+
+        :return: S_OK/S_ERROR, Value list of dicts with Meta, Value and EstimatedRows keys
+        """
+        steps = []
+        for metaName, value in metaDict.items():
+            result = self.getFieldStatistics(metaName)
+            if not result["OK"]:
+                return result
+            steps.append({"Meta": metaName, "Value": value, "EstimatedRows": self.estimateRows(result["Value"], value)})
+        # Sorting on the name too gives a stable plan
+        steps.sort(key=lambda step: (step["EstimatedRows"], step["Meta"]))
+        return S_OK(steps)
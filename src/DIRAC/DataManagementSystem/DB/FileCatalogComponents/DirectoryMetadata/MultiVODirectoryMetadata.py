@@ -186,3 +186,19 @@ class MultiVODirectoryMetadata(DirectoryMetadata):
         """
         fMetaDict = _getMetaNameDict(metaDict, credDict)
         return super(MultiVODirectoryMetadata, self).findDirIDsByMetadata(fMetaDict, dPath, credDict)
+
+    def explainMetadataQuery(self, metaDict, dPath, credDict):
+        """Describe how a metadata query would be evaluated by findDirIDsByMetadata"""
+        fMetaDict = _getMetaNameDict(metaDict, credDict)
+        result = super(MultiVODirectoryMetadata, self).explainMetadataQuery(fMetaDict, dPath, credDict)
+        if not result["OK"]:
+            return result
+
+        # Strip off the VO suffix
+        suffix = _getMetaNameSuffix(credDict)
+        plan = result["Value"]
+        plan["Satisfied"] = [meta.rsplit(suffix, 1)[0] for meta in plan["Satisfied"]]
+        plan["FileMetadata"] = [meta.rsplit(suffix, 1)[0] for meta in plan["FileMetadata"]]
+        for step in plan["Steps"]:
+            step["Meta"] = step["Meta"].rsplit(suffix, 1)[0]
+        return result
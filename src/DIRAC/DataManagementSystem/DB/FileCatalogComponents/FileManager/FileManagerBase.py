@@ -7,9 +7,14 @@ import os
 import stat
 
 from DIRAC import S_OK, S_ERROR, gLogger
-from DIRAC.Core.Utilities.List import intListToString
+from DIRAC.Core.Utilities.List import intListToString, breakListIntoChunks
 from DIRAC.Core.Utilities.Pfn import pfnunparse
 
+# Number of LFNs processed at once by the bulk read methods, bounding the size of the queries
+LFN_CHUNK_SIZE = 5000
+# Number of rows per statement when updating FC_DirectoryUsage
+DIRECTORY_USAGE_CHUNK_SIZE = 1000
+
 
 class FileManagerBase(object):
     """Base class for all the specific File Managers"""
@@ -262,8 +267,14 @@ class FileManagerBase(object):
         if masterLfns:
             # Create the directories for the supplied files and store their IDs
             directories = self._getFileDirectories(list(masterLfns))
+            # Resolve the existing directories at once, only the missing ones are then created one by one
+            res = self.db.dtree.findDirs(list(directories))
+            existingDirs = res["Value"] if res["OK"] else {}
             for directory, fileNames in directories.items():
-                res = self.db.dtree.makeDirectories(directory, credDict)
+                if os.path.normpath(directory) in existingDirs:
+                    res = S_OK(existingDirs[os.path.normpath(directory)])
+                else:
+                    res = self.db.dtree.makeDirectories(directory, credDict)
                 if not res["OK"]:
                     for fileName in fileNames:
                         lfn = os.path.join(directory, fileName)
@@ -367,30 +378,52 @@ class FileManagerBase(object):
         return S_OK({"Successful": successful, "Failed": failed})
 
     def _updateDirectoryUsage(self, directorySEDict, change, connection=False):
+        """Update the usage of the directories and of all their parents, which makes the
+        recursive usage of any directory a single row lookup
+
+        The changes are summed per parent directory and SE, and applied in a single transaction,
+        in a fixed order to avoid deadlocks between concurrent updates
+
+        :param dict directorySEDict: { dirID: { seID: { "Files": nFiles, "Size": size } } } changes
+        :param str change: "+" or "-"
+        """
         connection = self._getConnection(connection)
-        for directoryID in directorySEDict.keys():
-            result = self.db.dtree.getPathIDsByID(directoryID)
-            if not result["OK"]:
-                return result
-            parentIDs = result["Value"]
-            dirDict = directorySEDict[directoryID]
-            for seID in dirDict.keys():
-                seDict = dirDict[seID]
-                files = seDict["Files"]
-                size = seDict["Size"]
-                insertTuples = []
-                for dirID in parentIDs:
-                    insertTuples.append("(%d,%d,%d,%d,UTC_TIMESTAMP())" % (dirID, seID, size, files))
-
-                req = "INSERT INTO FC_DirectoryUsage (DirID,SEID,SESize,SEFiles,LastUpdate) "
-                req += "VALUES %s" % ",".join(insertTuples)
-                req += (
-                    " ON DUPLICATE KEY UPDATE SESize=SESize%s%d, SEFiles=SEFiles%s%d, LastUpdate=UTC_TIMESTAMP() "
-                    % (change, size, change, files)
-                )
-                res = self.db._update(req)
-                if not res["OK"]:
-                    gLogger.warn("Failed to update FC_DirectoryUsage", res["Message"])
+        result = self.db.dtree.getPathIDsByIDs(list(directorySEDict))
+        if not result["OK"]:
+            return result
+        pathIDs = result["Value"]
+
+        sign = -1 if change == "-" else 1
+        usageDict = {}
+        for directoryID, dirDict in directorySEDict.items():
+            if directoryID not in pathIDs:
+                return S_ERROR("Directory with id %d not found" % directoryID)
+            for seID, seDict in dirDict.items():
+                for dirID in pathIDs[directoryID]:
+                    usage = usageDict.setdefault((dirID, seID), [0, 0])
+                    usage[0] += sign * seDict["Size"]
+                    usage[1] += sign * seDict["Files"]
+
+        insertTuples = [
+            "(%d,%d,%d,%d,UTC_TIMESTAMP())" % (dirID, seID, size, files)
+            for (dirID, seID), (size, files) in sorted(usageDict.items())
+            if size or files
+        ]
+        reqList = []
+        for tupleChunk in breakListIntoChunks(insertTuples, DIRECTORY_USAGE_CHUNK_SIZE):
+            req = "INSERT INTO FC_DirectoryUsage (DirID,SEID,SESize,SEFiles,LastUpdate) VALUES %s" % ",".join(
+                tupleChunk
+            )
+            req += " ON DUPLICATE KEY UPDATE SESize=SESize+VALUES(SESize), SEFiles=SEFiles+VALUES(SEFiles),"
+            req += " LastUpdate=UTC_TIMESTAMP()"
+            reqList.append(req)
+        if not reqList:
+            return S_OK()
+        # The connections are in autocommit mode
+        result = self.db._transaction(["START TRANSACTION"] + reqList, connection)
+        if not result["OK"]:
+            gLogger.warn("Failed to update FC_DirectoryUsage", result["Message"])
+            return result
         return S_OK()
 
     def _populateFileAncestors(self, lfns, connection=False):
@@ -909,25 +942,33 @@ class FileManagerBase(object):
         return res
 
     def getFileMetadata(self, lfns, connection=False):
-        """Get file metadata from the catalog"""
+        """Get file metadata from the catalog, by chunks of LFN_CHUNK_SIZE LFNs"""
         connection = self._getConnection(connection)
-        # TO DO, should check whether it is a directory if it fails
-        return self._findFiles(
-            lfns,
-            [
-                "Size",
-                "Checksum",
-                "ChecksumType",
-                "UID",
-                "GID",
-                "GUID",
-                "CreationDate",
-                "ModificationDate",
-                "Mode",
-                "Status",
-            ],
-            connection=connection,
-        )
+        successful = {}
+        failed = {}
+        for lfnChunk in breakListIntoChunks(list(lfns), LFN_CHUNK_SIZE):
+            # TO DO, should check whether it is a directory if it fails
+            res = self._findFiles(
+                lfnChunk,
+                [
+                    "Size",
+                    "Checksum",
+                    "ChecksumType",
+                    "UID",
+                    "GID",
+                    "GUID",
+                    "CreationDate",
+                    "ModificationDate",
+                    "Mode",
+                    "Status",
+                ],
+                connection=connection,
+            )
+            if not res["OK"]:
+                return res
+            successful.update(res["Value"]["Successful"])
+            failed.update(res["Value"]["Failed"])
+        return S_OK({"Successful": successful, "Failed": failed})
 
     def getPathPermissions(self, paths, credDict, connection=False):
         """Get the permissions for the supplied paths"""
@@ -987,22 +1028,25 @@ class FileManagerBase(object):
         return result
 
     def getReplicas(self, lfns, allStatus, connection=False):
-        """Get file replicas from the catalog"""
+        """Get file replicas from the catalog, by chunks of LFN_CHUNK_SIZE LFNs"""
         connection = self._getConnection(connection)
 
-        # Get FileID <-> LFN correspondence first
-        res = self._findFileIDs(lfns, connection=connection)
-        if not res["OK"]:
-            return res
-        failed = res["Value"]["Failed"]
-        fileIDLFNs = {}
-        for lfn, fileID in res["Value"]["Successful"].items():
-            fileIDLFNs[fileID] = lfn
+        replicas = {}
+        failed = {}
+        for lfnChunk in breakListIntoChunks(list(lfns), LFN_CHUNK_SIZE):
+            # Get FileID <-> LFN correspondence first
+            res = self._findFileIDs(lfnChunk, connection=connection)
+            if not res["OK"]:
+                return res
+            failed.update(res["Value"]["Failed"])
+            fileIDLFNs = {}
+            for lfn, fileID in res["Value"]["Successful"].items():
+                fileIDLFNs[fileID] = lfn
 
-        result = self.__getReplicasForIDs(fileIDLFNs, allStatus, connection)
-        if not result["OK"]:
-            return result
-        replicas = result["Value"]
+            result = self.__getReplicasForIDs(fileIDLFNs, allStatus, connection)
+            if not result["OK"]:
+                return result
+            replicas.update(result["Value"])
 
         return S_OK({"Successful": replicas, "Failed": failed})
 
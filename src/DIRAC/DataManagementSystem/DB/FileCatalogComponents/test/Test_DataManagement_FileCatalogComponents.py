@@ -7,12 +7,22 @@ from mock import MagicMock
 
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryTreeBase import DirectoryTreeBase
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryLevelTree import DirectoryLevelTree
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryClosure import DirectoryClosure
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryPathCache import (
+    DirectoryPathCache,
+    getParentPaths,
+)
 
 # from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectorySimpleTree import DirectorySimpleTree
 # from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryFlatTree import DirectoryFlatTree
 # from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryNodeTree import DirectoryNodeTree
 
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.FileManager.FileManagerBase import FileManagerBase
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryMetadata.DirectoryMetadata import DirectoryMetadata
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryMetadata.MetadataQueryPlanner import (
+    MetadataQueryPlanner,
+    UNKNOWN_ROWS,
+)
 
 dbMock = MagicMock()
 ugManagerMock = MagicMock()
@@ -44,6 +54,97 @@ def test_Level_makeDirectory():
     assert res["OK"] is True  # this will need to be implemented on a derived class
 
 
+def test_Level_directoryCache():
+    """The directories are looked up in the DB only once, and forgotten when removed"""
+    dbLevelMock = MagicMock()
+    dbLevelMock._escapeString.side_effect = lambda path: {"OK": True, "Value": "'%s'" % path}
+    dbLevelMock._query.return_value = {"OK": True, "Value": (("/a", 2), ("/a/b", 3))}
+    tree = DirectoryLevelTree()
+    tree.db = dbLevelMock
+
+    res = tree.findDirs(["/a", "/a/b/", "/a/c"])
+    assert res["OK"] is True
+    assert res["Value"] == {"/a": 2, "/a/b": 3}
+    assert dbLevelMock._query.call_count == 1
+
+    # Cached directories do not go to the DB, missing ones do
+    dbLevelMock._query.return_value = {"OK": True, "Value": (("/", 1),)}
+    res = tree.getPathIDs("/a/b")
+    assert res["OK"] is True
+    assert res["Value"] == [1, 2, 3]
+    assert "'/a'" not in dbLevelMock._query.call_args[0][0]
+    res = tree.findDir("/a/b")
+    assert res["Value"] == 3
+    assert res["Level"] == 2
+    assert dbLevelMock._query.call_count == 2
+
+    dbLevelMock._update.return_value = {"OK": True, "Value": 1}
+    assert tree.removeDir("/a/b")["DirID"] == 3
+    dbLevelMock._query.return_value = {"OK": True, "Value": ()}
+    assert tree.findDir("/a/b")["Value"] == ""
+    assert tree.getPathIDs("/a/b")["OK"] is False
+
+
+def test_Level_removeDirLookupBeforeDelete():
+    """A lookup made while the directory is being removed does not leave its ID in the cache"""
+    dbLevelMock = MagicMock()
+    dbLevelMock._escapeString.side_effect = lambda path: {"OK": True, "Value": "'%s'" % path}
+    dbLevelMock._query.return_value = {"OK": True, "Value": ((3, 2),)}
+    tree = DirectoryLevelTree()
+    tree.db = dbLevelMock
+
+    def delete(req):
+        # Another thread finds the directory before it is deleted
+        assert tree.findDir("/a/b")["Value"] == 3
+        dbLevelMock._query.return_value = {"OK": True, "Value": ()}
+        return {"OK": True, "Value": 1}
+
+    dbLevelMock._update.side_effect = delete
+    assert tree.removeDir("/a/b")["DirID"] == 3
+    assert tree.findDir("/a/b")["Value"] == ""
+
+
+def test_Closure_removeDirLookupBeforeDelete():
+    """A lookup made while the directory is being removed does not leave its ID in the cache"""
+    dbClosureMock = MagicMock()
+    dbClosureMock.executeStoredProcedure.return_value = {"OK": True, "Value": [3, 2]}
+    tree = DirectoryClosure()
+    tree.db = dbClosureMock
+
+    def executeStoredProcedure(procedure, args, outputIds=None):
+        if procedure == "ps_find_dir":
+            return {"OK": True, "Value": [] if removed else [3, 2]}
+        # Another thread finds the directory before it is deleted
+        assert tree.findDir("/a/b")["Value"] == 3
+        removed.append(args[0])
+        return {"OK": True, "Value": []}
+
+    removed = []
+    dbClosureMock.executeStoredProcedure.side_effect = executeStoredProcedure
+    assert tree.removeDir("/a/b")["DirID"] == 3
+    assert removed == [3]
+    assert tree.findDir("/a/b")["Value"] == 0
+
+
+def test_directoryPathCache():
+    assert getParentPaths("/a/b/c/") == ["/", "/a", "/a/b", "/a/b/c"]
+    assert getParentPaths("/") == ["/"]
+
+    cache = DirectoryPathCache()
+    for dirID, path in enumerate(["/", "/a", "/a/b"], 1):
+        cache.add(path, dirID)
+    assert cache.getDirs(["/a", "/a/b", "/a/c"]) == {"/a": 2, "/a/b": 3}
+    cache.remove("/a/b")
+    assert cache.get("/a/b") is None
+    cache.clear()
+    assert cache.get("/a") is None
+
+    # Nothing is cached without lifetime
+    cache = DirectoryPathCache(lifeTime=0)
+    cache.add("/a", 2)
+    assert cache.get("/a") is None
+
+
 ####################################################################################
 # SimpleTree
 # FIXME: this fails... is it a genuine failure?
@@ -99,3 +200,89 @@ def test_Base_addFile():
     res = fmb.addFile({"aa": "aaa/bbb"}, {})
     assert res["OK"] is True  # this will need to be implemented on a derived class, but it anyway returns S_OK()
     assert "aa" in res["Value"]["Failed"]
+
+
+####################################################################################
+####################################################################################
+# DirectoryMetadata
+
+
+def test_planner_estimateRows():
+    stats = {"Rows": 1000, "Distinct": 10}
+    assert MetadataQueryPlanner.estimateRows(stats, "abc") == 100
+    assert MetadataQueryPlanner.estimateRows(stats, ["a", "b"]) == 200
+    assert MetadataQueryPlanner.estimateRows(stats, {"in": ["a", "b", "c"]}) == 300
+    assert MetadataQueryPlanner.estimateRows(stats, {"!=": "a"}) == 900
+    assert MetadataQueryPlanner.estimateRows(stats, {">": 3, "<": 5}) == 333
+    assert MetadataQueryPlanner.estimateRows(stats, "Any") == 1000
+    assert MetadataQueryPlanner.estimateRows(stats, "Missing") == UNKNOWN_ROWS
+    # More values than the distinct ones
+    assert MetadataQueryPlanner.estimateRows(stats, [str(i) for i in range(20)]) == 1000
+    assert MetadataQueryPlanner.estimateRows({"Rows": 0, "Distinct": 0}, "abc") == 0
+
+
+def test_planner_plan():
+    """The predicates are ordered by estimated selectivity, with statistics queried once"""
+    db = MagicMock()
+    tableStats = {"FC_Meta_Run": (1000, 1000), "FC_Meta_Type": (1000, 2), "FC_Meta_Year": (1000, 10)}
+    db._query.side_effect = lambda req: {"OK": True, "Value": [tableStats[req.split()[-1]]]}
+    planner = MetadataQueryPlanner(db)
+
+    res = planner.plan({"Type": "RAW", "Year": "2020", "Run": 1})
+    assert res["OK"], res
+    assert [step["Meta"] for step in res["Value"]] == ["Run", "Year", "Type"]
+    assert [step["EstimatedRows"] for step in res["Value"]] == [1, 100, 500]
+    assert db._query.call_count == 3
+
+    res = planner.plan({"Type": "RAW", "Year": {"!=": "2020"}})
+    assert [step["Meta"] for step in res["Value"]] == ["Type", "Year"]
+    assert db._query.call_count == 3
+
+    planner.invalidateStatistics("Type")
+    res = planner.plan({"Type": "RAW"})
+    assert db._query.call_count == 4
+
+
+def test_filterDirsByMeta():
+    """The candidates are kept if they have or inherit the metadata, looking only at their parents"""
+    db = MagicMock()
+    db.dtree.getPathIDsByIDs.return_value = {"OK": True, "Value": {4: [1, 2, 4], 5: [1, 3, 5], 6: [1, 6]}}
+    # Directory 2 has the metadata with the right value
+    db._query.return_value = {"OK": True, "Value": [(2,)]}
+    dmeta = DirectoryMetadata(db)
+
+    res = dmeta._DirectoryMetadata__filterDirsByMeta("Type", "RAW", {4, 5, 6})
+    assert res["OK"], res
+    assert res["Value"] == {4}
+    req = db._query.call_args[0][0]
+    assert req.startswith("SELECT M.DirID FROM FC_Meta_Type AS M WHERE M.DirID IN (1,2,3,4,5,6)")
+    assert "M.Value='RAW'" in req
+
+    res = dmeta._DirectoryMetadata__filterDirsByMeta("Type", "Missing", {4, 5, 6})
+    assert res["Value"] == {5, 6}
+    assert "Value" not in db._query.call_args[0][0]
+
+
+def test_Base_updateDirectoryUsage():
+    """The changes are summed on all the parent directories, and applied in one transaction"""
+    db = MagicMock()
+    db.dtree.getPathIDsByIDs.return_value = {"OK": True, "Value": {3: [1, 2, 3], 4: [1, 2, 4]}}
+    db._transaction.return_value = {"OK": True, "Value": []}
+    fileManager = FileManagerBase(db)
+
+    directorySEDict = {3: {0: {"Files": 2, "Size": 20}, 5: {"Files": 1, "Size": 10}}, 4: {0: {"Files": 1, "Size": 5}}}
+    res = fileManager._updateDirectoryUsage(directorySEDict, "-")
+    assert res["OK"], res
+    assert db._transaction.call_count == 1
+    reqList = db._transaction.call_args[0][0]
+    assert len(reqList) == 2
+    assert reqList[0] == "START TRANSACTION"
+    values = reqList[1].split(" VALUES ")[1].split(" ON DUPLICATE KEY ")[0]
+    assert values.replace(",UTC_TIMESTAMP()", "") == (
+        "(1,0,-25,-3),(1,5,-10,-1),(2,0,-25,-3),(2,5,-10,-1),(3,0,-20,-2),(3,5,-10,-1),(4,0,-5,-1)"
+    )
+
+    # Unknown directories are not silently ignored
+    res = fileManager._updateDirectoryUsage({6: {0: {"Files": 1, "Size": 5}}}, "+")
+    assert not res["OK"]
+    assert db._transaction.call_count == 1
@@ -27,6 +27,8 @@ class FileCatalogDB(DB):
         self.dmeta = None
         self.fmeta = None
         self.datasetManager = None
+        self.directoryCacheSize = 100000
+        self.directoryCacheLifeTime = 300
 
     def setConfig(self, databaseConfig):
         self.directories = {}
@@ -50,6 +52,8 @@ class FileCatalogDB(DB):
         self.validReplicaStatus = databaseConfig["ValidReplicaStatus"]
         self.visibleFileStatus = databaseConfig["VisibleFileStatus"]
         self.visibleReplicaStatus = databaseConfig["VisibleReplicaStatus"]
+        self.directoryCacheSize = databaseConfig.get("DirectoryCacheSize", self.directoryCacheSize)
+        self.directoryCacheLifeTime = databaseConfig.get("DirectoryCacheLifeTime", self.directoryCacheLifeTime)
 
         # Load the configured components
         for compAttribute, componentType in [
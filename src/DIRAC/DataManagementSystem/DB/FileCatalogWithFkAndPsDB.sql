@@ -220,6 +220,22 @@ CREATE TABLE FC_DirectoryUsage(
 
 -- ------------------------------------------------------------------------------
 
+-- Usage of the directories including all their subdirectories, maintained by the triggers on FC_DirectoryUsage
+
+CREATE TABLE FC_DirectoryTreeUsage(
+   DirID INTEGER NOT NULL,
+   SEID INTEGER NOT NULL,
+   SESize BIGINT NOT NULL,
+   SEFiles BIGINT NOT NULL,
+
+   PRIMARY KEY (DirID,SEID),
+   FOREIGN KEY (SEID) REFERENCES FC_StorageElements(SEID) ON DELETE CASCADE,
+   FOREIGN KEY (DirID) REFERENCES FC_DirectoryList(DirID) ON DELETE CASCADE
+
+) ENGINE = INNODB;
+
+-- ------------------------------------------------------------------------------
+
 
 CREATE TABLE FC_DirMeta (
     DirID INTEGER NOT NULL,
@@ -625,6 +641,61 @@ DELIMITER ;
 
 
 
+-- update_directory_tree_usage : propagate a change of the usage of a directory to itself and all its parents
+--                               in FC_DirectoryTreeUsage, unless @skip_tree_usage is set (full rebuild)
+-- dir_id : the id of the directory whose usage changed
+-- se_id : the id of the SE
+-- size_diff : the modification to bring to the size
+-- file_diff : the modification to bring to the number of files
+
+DROP PROCEDURE IF EXISTS update_directory_tree_usage;
+DELIMITER //
+CREATE PROCEDURE update_directory_tree_usage
+(IN dir_id INT, IN se_id INT, IN size_diff BIGINT, IN file_diff BIGINT)
+BEGIN
+
+  IF @skip_tree_usage IS NULL AND (size_diff <> 0 OR file_diff <> 0) THEN
+    INSERT INTO FC_DirectoryTreeUsage (DirID, SEID, SESize, SEFiles)
+      SELECT SQL_NO_CACHE ParentID, se_id, size_diff, file_diff FROM FC_DirectoryClosure WHERE ChildID = dir_id
+      ON DUPLICATE KEY UPDATE SESize = SESize + size_diff, SEFiles = SEFiles + file_diff;
+  END IF;
+
+END //
+DELIMITER ;
+
+
+DROP TRIGGER IF EXISTS trg_after_insert_directory_usage;
+DELIMITER //
+CREATE TRIGGER trg_after_insert_directory_usage AFTER INSERT ON FC_DirectoryUsage
+FOR EACH ROW
+BEGIN
+  call update_directory_tree_usage (new.DirID, new.SEID, new.SESize, new.SEFiles);
+END //
+DELIMITER ;
+
+
+DROP TRIGGER IF EXISTS trg_after_update_directory_usage;
+DELIMITER //
+CREATE TRIGGER trg_after_update_directory_usage AFTER UPDATE ON FC_DirectoryUsage
+FOR EACH ROW
+BEGIN
+  call update_directory_tree_usage (old.DirID, old.SEID, -old.SESize, -old.SEFiles);
+  call update_directory_tree_usage (new.DirID, new.SEID, new.SESize, new.SEFiles);
+END //
+DELIMITER ;
+
+
+DROP TRIGGER IF EXISTS trg_after_delete_directory_usage;
+DELIMITER //
+CREATE TRIGGER trg_after_delete_directory_usage AFTER DELETE ON FC_DirectoryUsage
+FOR EACH ROW
+BEGIN
+  call update_directory_tree_usage (old.DirID, old.SEID, -old.SESize, -old.SEFiles);
+END //
+DELIMITER ;
+
+
+
 -- ps_get_replicas_for_files_in_dir : get replica information for all the files in a given dir
 -- dir_id : directory id
 -- allStatus : if False, consider only the status defined in visibleFileStatus and visibleReplicaStatus
@@ -1695,11 +1766,10 @@ BEGIN
 
     IF recursiveSum THEN
 
-      SELECT SQL_NO_CACHE COALESCE(SUM(SESize), 0), COALESCE(SUM(SEFiles),0) FROM FC_DirectoryUsage u
-      JOIN FC_DirectoryClosure c on c.ChildID = u.DirID
+      SELECT SQL_NO_CACHE COALESCE(SUM(SESize), 0), COALESCE(SUM(SEFiles),0) FROM FC_DirectoryTreeUsage u
       JOIN FC_StorageElements s ON s.SEID = u.SEID
       WHERE s.SEName = 'FakeSE'
-      AND c.ParentID = dir_id;
+      AND u.DirID = dir_id;
 
     ELSE
 
@@ -1775,15 +1845,12 @@ CREATE PROCEDURE ps_get_dir_physical_size
 BEGIN
 
   IF recursiveSum THEN
-    SELECT SQL_NO_CACHE SEName, COALESCE(SUM(SESize), 0), COALESCE(SUM(SEFiles), 0)
-    FROM FC_DirectoryUsage u
-    JOIN FC_DirectoryClosure c on u.DirID = c.ChildID
+    SELECT SQL_NO_CACHE SEName, SESize, SEFiles
+    FROM FC_DirectoryTreeUsage u
     JOIN FC_StorageElements se ON se.SEID = u.SEID
-    WHERE c.ParentID = dir_id
+    WHERE u.DirID = dir_id
     AND SEName != 'FakeSE'
-    AND (SESize != 0 OR SEFiles != 0)
-    GROUP BY se.SEName
-    ORDER BY NULL;
+    AND (SESize != 0 OR SEFiles != 0);
 
   ELSE
 
@@ -1853,12 +1920,16 @@ BEGIN
 
   DECLARE exit handler for sqlexception
     BEGIN
+    SET @skip_tree_usage = NULL;
     ROLLBACK;
     RESIGNAL;
   END;
 
   START TRANSACTION;
 
+  -- The tree usage is rebuilt at once at the end rather than row by row by the triggers
+  SET @skip_tree_usage = 1;
+
   DELETE FROM FC_DirectoryUsage;
 
   INSERT INTO FC_DirectoryUsage (DirID, SEID, SESize, SEFiles)
@@ -1874,11 +1945,35 @@ BEGIN
     GROUP BY DirID, SEID
     ORDER BY NULL;
 
+  SET @skip_tree_usage = NULL;
+
+  call ps_rebuild_directory_tree_usage();
+
   COMMIT;
 END //
 DELIMITER ;
 
 
+-- Rebuild the FC_DirectoryTreeUsage table from FC_DirectoryUsage
+
+DROP PROCEDURE IF EXISTS ps_rebuild_directory_tree_usage;
+DELIMITER //
+CREATE PROCEDURE ps_rebuild_directory_tree_usage()
+BEGIN
+
+  DELETE FROM FC_DirectoryTreeUsage;
+
+  INSERT INTO FC_DirectoryTreeUsage (DirID, SEID, SESize, SEFiles)
+    SELECT SQL_NO_CACHE c.ParentID, u.SEID, sum(u.SESize), sum(u.SEFiles)
+    FROM FC_DirectoryUsage u
+    JOIN FC_DirectoryClosure c ON c.ChildID = u.DirID
+    GROUP BY c.ParentID, u.SEID
+    ORDER BY NULL;
+
+END //
+DELIMITER ;
+
+
 -- Rebuild the directoryUsage table for one directory
 DROP PROCEDURE IF EXISTS ps_rebuild_directory_usage_for_dir;
 DELIMITER //
@@ -189,3 +189,46 @@ def test_raceCondition(fts3db):
     activeJobs = res["Value"]
     activeJobIDs = [op.jobID for op in activeJobs]
     assert activeJobIDs == [1, 6]
+
+
+def test_bulkUpdateFileStatus(fts3db):
+    """The files of several jobs are updated at once, only for the matching ftsGUID
+    and if they are not in a final state"""
+
+    op = FTS3TransferOperation()
+    op.operationID = 1
+    for fileID in range(1, 6):
+        f = FTS3File()
+        f.fileID = fileID
+        f.targetSE = "targetSE"
+        f.ftsGUID = "guid1" if fileID <= 3 else "guid2"
+        op.ftsFiles.append(f)
+    # File 3 is already in a final state
+    op.ftsFiles[2].status = "Finished"
+    res = fts3db.persistOperation(op)
+    assert res["OK"]
+
+    res = fts3db.bulkUpdateFileStatus(
+        {
+            "guid1": {
+                1: {"status": "Active", "error": ""},
+                2: {"status": "Finished", "error": "", "ftsGUID": None},
+                3: {"status": "Failed", "error": "Too late"},
+                # This file belongs to another job
+                4: {"status": "Failed", "error": "Wrong job"},
+            },
+            "guid2": {4: {"status": "Active"}, 5: {"status": "Active"}},
+        }
+    )
+    assert res["OK"]
+
+    res = fts3db.getOperation(1)
+    assert res["OK"]
+    files = {f.fileID: (f.status, f.error, f.ftsGUID) for f in res["Value"].ftsFiles}
+    assert files == {
+        1: ("Active", None, "guid1"),
+        2: ("Finished", None, None),
+        3: ("Finished", None, "guid1"),
+        4: ("Active", None, "guid2"),
+        5: ("Active", None, "guid2"),
+    }
@@ -56,6 +56,8 @@ class FileCatalogHandlerMixin:
             "ValidReplicaStatus": ["AprioriGood", "Trash", "Removing", "Probing"],
             "VisibleFileStatus": ["AprioriGood"],
             "VisibleReplicaStatus": ["AprioriGood"],
+            "DirectoryCacheSize": 100000,
+            "DirectoryCacheLifeTime": 300,
         }
         for configKey in sorted(defaultConfig.keys()):
             defaultValue = defaultConfig[configKey]
@@ -453,6 +455,12 @@ class FileCatalogHandlerMixin:
         """Find all the directories satisfying the given metadata set"""
         return self.fileCatalogDB.dmeta.findDirectoriesByMetadata(metaDict, path, self.getRemoteCredentials())
 
+    types_explainMetadataQuery = [dict, str]
+
+    def export_explainMetadataQuery(self, metaDict, path="/"):
+        """Describe how the directories satisfying the given metadata set would be searched"""
+        return self.fileCatalogDB.dmeta.explainMetadataQuery(metaDict, path, self.getRemoteCredentials())
+
     types_findFilesByMetadata = [dict, str]
 
     def export_findFilesByMetadata(self, metaDict, path="/"):
@@ -2,6 +2,13 @@
 """
 import random
 import threading
+import time
+
+import requests
+
+# We specifically use Request in the FTS client because of a leak in the
+# default pycurl. See https://its.cern.ch/jira/browse/FTS-261
+from fts3.rest.client.request import Request as ftsSSLRequest
 
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations as opHelper
 from DIRAC.DataManagementSystem.Client.DataManager import DataManager
@@ -10,6 +17,14 @@ from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.ResourceStatusSystem.Client.ResourceStatus import ResourceStatus
 
+# Lifetime in seconds of the HTTP sessions to the FTS servers.
+# The sessions (and their connections) are replaced after that time,
+# and as soon as the proxy used as client certificate is renewed
+FTS3_SESSION_LIFETIME = 600
+
+# Maximum number of connections kept alive per FTS server in a session
+FTS3_SESSION_POOL_SIZE = 10
+
 
 def _checkSourceReplicas(ftsFiles, preferDisk=True):
     """Check the active replicas
@@ -226,3 +241,87 @@ class FTS3ServerPolicy(object):
             return S_OK(self._serverDict[fts3Server])
 
         return S_ERROR("Could not find an FTS3 server (max attempt reached)")
+
+
+# { session key: (session, creation time, (certificate, key)) }
+_fts3Sessions = {}
+_fts3SessionsLock = threading.Lock()
+
+
+def getFTS3Session(sessionKey, ucert, ukey):
+    """Get the HTTP session to use for a user, shared by all the threads.
+    It keeps the connections to the FTS servers alive, so that they (and their SSL handshake)
+    are reused from one request to the next.
+
+    The session is replaced, and closed, when it is older than FTS3_SESSION_LIFETIME or when the credentials
+    (e.g. the path of the renewed proxy) change. The expired sessions of the other keys are closed too.
+
+    :param tuple sessionKey: identifies the user, e.g. (user name, group, FTS server)
+    :param str ucert: path to the certificate (proxy)
+    :param str ukey: path to the key
+
+    :returns: requests.Session
+    """
+    now = time.time()
+    with _fts3SessionsLock:
+        for key, (session, creationTime, _credentials) in list(_fts3Sessions.items()):
+            if key != sessionKey and now - creationTime > FTS3_SESSION_LIFETIME:
+                del _fts3Sessions[key]
+                session.close()
+        session, creationTime, credentials = _fts3Sessions.get(sessionKey, (None, 0, None))
+        if session is not None and (now - creationTime > FTS3_SESSION_LIFETIME or credentials != (ucert, ukey)):
+            session.close()
+            session = None
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=FTS3_SESSION_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _fts3Sessions[sessionKey] = (session, now, (ucert, ukey))
+        return session
+
+
+class FTS3SessionRequest(ftsSSLRequest):
+    """Request class for the fts3 Context, sending the requests through the persistent
+    session of its user (see getFTS3Session) instead of opening a connection per request.
+    The user is given by the sessionKey argument, e.g. with
+    ``functools.partial(FTS3SessionRequest, sessionKey=(username, group, ftsServer))`` as request class.
+    Without it, the session is the one of the credentials.
+
+    A 207 (Multi-Status) answer, given by the FTS servers to bulk requests when some of the
+    items are in error, is returned like a success: each item of the answer has its own status.
+    """
+
+    def __init__(self, *args, sessionKey=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sessionKey = sessionKey
+
+    def method(self, method, url, body=None, headers=None, user=None, passw=None):
+        _headers = {"Accept": "application/json"}
+        if headers:
+            _headers.update(headers)
+        if self.fts_access_token:
+            _headers["Authorization"] = "Bearer " + self.fts_access_token
+        auth = None
+        if user and passw:
+            auth = requests.auth.HTTPBasicAuth(user, passw)
+
+        if self.verify and self.capath:
+            self.verify = self.capath
+
+        sessionKey = self.sessionKey if self.sessionKey is not None else (self.ucert, self.ukey)
+        response = getFTS3Session(sessionKey, self.ucert, self.ukey).request(
+            method=method,
+            url=str(url),
+            data=body,
+            headers=_headers,
+            verify=self.verify,
+            timeout=(self.connectTimeout, self.timeout),
+            cert=(self.ucert, self.ukey) if self.ucert else None,
+            auth=auth,
+        )
+
+        if response.status_code != 207:
+            self._handle_error(url, response.status_code, response.text)
+
+        return str(response.text)
@@ -6,6 +6,7 @@ import mock
 from DIRAC.DataManagementSystem.Client.FTS3File import FTS3File
 from DIRAC import S_OK, S_ERROR
 
+from DIRAC.DataManagementSystem.private import FTS3Utilities
 from DIRAC.DataManagementSystem.private.FTS3Utilities import groupFilesByTarget, selectUniqueSource, FTS3ServerPolicy
 from DIRAC.DataManagementSystem.private.FTS3Plugins.DefaultFTS3Plugin import DefaultFTS3Plugin
 
@@ -206,7 +207,45 @@ class TestFTS3ServerPolicy(unittest.TestCase):
         self.assertEqual(len(serverSet), len(self.fakeServerDict))
 
 
+class TestFTS3Session(unittest.TestCase):
+    """Testing the sessions shared by the FTS3 requests of a user"""
+
+    def setUp(self):
+        FTS3Utilities._fts3Sessions.clear()
+        patcher = mock.patch.object(FTS3Utilities.requests, "Session", side_effect=lambda: mock.MagicMock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        FTS3Utilities._fts3Sessions.clear()
+
+    def testSessionReuse(self):
+        """The session of a user is kept, whatever the path of its proxy"""
+        session = FTS3Utilities.getFTS3Session(("user", "group", "server"), "proxy1", "proxy1")
+        self.assertIs(FTS3Utilities.getFTS3Session(("user", "group", "server"), "proxy1", "proxy1"), session)
+        self.assertIsNot(FTS3Utilities.getFTS3Session(("user", "group", "server2"), "proxy1", "proxy1"), session)
+
+        # The renewed proxy gets a new session, the old one is closed
+        newSession = FTS3Utilities.getFTS3Session(("user", "group", "server"), "proxy2", "proxy2")
+        self.assertIsNot(newSession, session)
+        session.close.assert_called_once_with()
+        self.assertEqual(len(FTS3Utilities._fts3Sessions), 2)
+
+    def testSessionExpiration(self):
+        """The expired sessions are closed, and removed"""
+        with mock.patch.object(FTS3Utilities.time, "time", return_value=1000):
+            session = FTS3Utilities.getFTS3Session(("user", "group", "server"), "proxy", "proxy")
+            otherSession = FTS3Utilities.getFTS3Session(("user2", "group", "server"), "proxy2", "proxy2")
+        with mock.patch.object(FTS3Utilities.time, "time", return_value=1001 + FTS3Utilities.FTS3_SESSION_LIFETIME):
+            newSession = FTS3Utilities.getFTS3Session(("user", "group", "server"), "proxy", "proxy")
+        self.assertIsNot(newSession, session)
+        session.close.assert_called_once_with()
+        otherSession.close.assert_called_once_with()
+        self.assertEqual(list(FTS3Utilities._fts3Sessions), [("user", "group", "server")])
+
+
 if __name__ == "__main__":
     suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestFileGrouping)
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestFTS3ServerPolicy))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestFTS3Session))
     unittest.TextTestRunner(verbosity=2).run(suite)
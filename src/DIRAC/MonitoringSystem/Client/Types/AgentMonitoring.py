@@ -24,6 +24,9 @@ class AgentMonitoring(BaseType):
             "MemoryUsage",
             "CpuPercentage",
             "CycleDuration",
+            "HTTPSRequests",
+            "HTTPSHandshakes",
+            "HTTPSReuseRatio",
         ]
 
         self.index = "agent_monitoring-index"
@@ -37,6 +40,9 @@ class AgentMonitoring(BaseType):
                 "MemoryUsage": {"type": "long"},
                 "CpuPercentage": {"type": "long"},
                 "CycleDuration": {"type": "long"},
+                "HTTPSRequests": {"type": "long"},
+                "HTTPSHandshakes": {"type": "long"},
+                "HTTPSReuseRatio": {"type": "long"},
             }
         )
 
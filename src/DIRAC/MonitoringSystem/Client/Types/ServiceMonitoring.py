@@ -30,6 +30,13 @@ class ServiceMonitoring(BaseType):
             "RunningThreads",
             "MaxFD",
             "ResponseTime",
+            "MySQLConnections",
+            "MySQLConnectionsInUse",
+            "MySQLWaitingThreads",
+            "MySQLWaitTime",
+            "HTTPSRequests",
+            "HTTPSHandshakes",
+            "HTTPSReuseRatio",
         ]
 
         self.index = "service_monitoring-index"
@@ -49,6 +56,13 @@ class ServiceMonitoring(BaseType):
                 "RunningThreads": {"type": "long"},
                 "MaxFD": {"type": "long"},
                 "ResponseTime": {"type": "long"},
+                "MySQLConnections": {"type": "long"},
+                "MySQLConnectionsInUse": {"type": "long"},
+                "MySQLWaitingThreads": {"type": "long"},
+                "MySQLWaitTime": {"type": "long"},
+                "HTTPSRequests": {"type": "long"},
+                "HTTPSHandshakes": {"type": "long"},
+                "HTTPSReuseRatio": {"type": "long"},
             }
         )
 
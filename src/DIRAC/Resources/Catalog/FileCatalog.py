@@ -42,18 +42,60 @@
     For the actual methods that can be called vie the File Catalog object, see
     the documentation of the respective FileCatalog plug-ins ( client classes )
 
+    If the ConcurrentCalls option is set, the catalogs are called in parallel on a thread pool
+    shared by all the FileCatalog objects of the process: for the "write" methods, the non Master
+    plug-ins are called concurrently once the Master plug-in has succeeded, and for the "read" methods
+    all the plug-ins are called concurrently. Each plug-in call is bounded by the Timeout of the catalog.
+    The results are merged in the order of the catalogs, exactly as with sequential calls.
+    The latencies of the calls to each catalog are available with getCatalogLatencies().
+
 """
+import concurrent.futures
+import errno
 import six
 import re
+import threading
+import time
 
 from DIRAC import gLogger, gConfig, S_OK, S_ERROR
 from DIRAC.Core.Utilities import DErrno
+from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Security.ProxyInfo import getVOfromProxyGroup
 from DIRAC.Resources.Catalog.Utilities import checkArgumentFormat
 from DIRAC.Resources.Catalog.FileCatalogFactory import FileCatalogFactory
 from DIRAC.Resources.Catalog.FCConditionParser import FCConditionParser
 
+# Thread pool shared by the FileCatalog objects for the concurrent calls to the catalogs
+_executorLock = threading.Lock()
+_executor = None
+
+# Latencies of the calls to the catalogs: { catalogName: { methodName: statistics } }
+_latenciesLock = threading.Lock()
+_catalogLatencies = {}
+
+
+def _getExecutor(maxWorkers):
+    """Get the thread pool for the concurrent calls to the catalogs, creating it if needed"""
+    global _executor
+    with _executorLock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix="FileCatalog")
+        return _executor
+
+
+def _recordLatency(catalogName, methodName, latency, ok=True, timedOut=False):
+    """Add a call to the latency statistics of a catalog"""
+    with _latenciesLock:
+        stats = _catalogLatencies.setdefault(catalogName, {}).setdefault(
+            methodName, {"Calls": 0, "Errors": 0, "Timeouts": 0, "TotalTime": 0.0, "MaxTime": 0.0}
+        )
+        stats["Calls"] += 1
+        stats["Errors"] += 0 if ok else 1
+        stats["Timeouts"] += 1 if timedOut else 0
+        stats["TotalTime"] += latency
+        stats["MaxTime"] = max(stats["MaxTime"], latency)
+
 
 class FileCatalog(object):
     def __init__(self, catalogs=None, vo=None):
@@ -72,6 +114,8 @@ class FileCatalog(object):
         self.log = gLogger.getSubLogger("FileCatalog")
 
         self.opHelper = Operations(vo=self.vo)
+        self.concurrentCalls = self.opHelper.getValue("/Services/Catalogs/ConcurrentCalls", False)
+        self.maxConcurrentCalls = self.opHelper.getValue("/Services/Catalogs/MaxConcurrentCalls", 10)
 
         catalogList = []
         if isinstance(catalogs, six.string_types):
@@ -177,6 +221,7 @@ class FileCatalog(object):
 
 
         """
+        call = self.call
         successful = {}
         failed = {}
         failedCatalogs = {}
@@ -188,7 +233,7 @@ class FileCatalog(object):
         lfnMapDict = {}
         masterResult = {}
         parms1 = []
-        if self.call not in self.no_lfn_methods:
+        if call not in self.no_lfn_methods:
             fileInfo = parms[0]
             result = checkArgumentFormat(fileInfo, generateMap=True)
             if not result["OK"]:
@@ -199,26 +244,57 @@ class FileCatalog(object):
             allLfns = list(fileInfo)
             parms1 = parms[1:]
 
+        def processResult(catalogName, master, result):
+            """Merge the result of a catalog, returning it if nothing else should be done"""
+            if not result["OK"]:
+                if master:
+                    # If this is the master catalog and it fails we don't want to continue with the other catalogs
+                    self.log.error(
+                        "Failed to execute call on master catalog",
+                        "%s on %s: %s" % (call, catalogName, result["Message"]),
+                    )
+                    return result
+                else:
+                    # Otherwise we keep the failed catalogs so we can update their state later
+                    failedCatalogs[catalogName] = result["Message"]
+            else:
+                successfulCatalogs[catalogName] = result["Value"]
+
+            if allLfns:
+                if result["OK"]:
+                    for lfn, message in result["Value"]["Failed"].items():
+                        # Save the error message for the failed operations
+                        failed.setdefault(lfn, {})[catalogName] = message
+                        if master:
+                            # If this is the master catalog then we should not attempt the operation on other catalogs
+                            fileInfo.pop(lfn, None)
+                    for lfn, result in result["Value"]["Successful"].items():
+                        # Save the result return for each file for the successful operations
+                        successful.setdefault(lfn, {})[catalogName] = result
+            return None
+
+        # Calls to the non master catalogs, done concurrently once the master has succeeded
+        pendingCalls = []
         for catalogName, oCatalog, master in self.writeCatalogs:
 
             # Skip if the method is not implemented in this catalog
             # NOTE: it is impossible for the master since the write method list is populated
             # only from the master catalog, and if the method is not there, __getattr__
             # would raise an exception
-            if not oCatalog.hasCatalogMethod(self.call):
+            if not oCatalog.hasCatalogMethod(call):
                 continue
 
-            method = getattr(oCatalog, self.call)
+            method = getattr(oCatalog, call)
 
-            if self.call in self.no_lfn_methods:
-                result = method(*parms, **kws)
+            if call in self.no_lfn_methods:
+                args = parms
             else:
                 if isinstance(specialConditions, dict):
                     condition = specialConditions.get(catalogName)
                 else:
                     condition = specialConditions
                 # Check whether this catalog should be used for this method
-                res = self.condParser(catalogName, self.call, fileInfo, condition=condition)
+                res = self.condParser(catalogName, call, fileInfo, condition=condition)
                 # condParser never returns S_ERROR
                 condEvals = res["Value"]["Successful"]
                 # For a master catalog, ALL the lfns should be valid
@@ -240,39 +316,24 @@ class FileCatalog(object):
                 if invalidLFNs:
                     gLogger.debug(
                         "Some LFNs are not valid for operation '%s' on catalog '%s' : %s"
-                        % (self.call, catalogName, invalidLFNs)
+                        % (call, catalogName, invalidLFNs)
                     )
 
-                result = method(validLFNs, *parms1, **kws)
+                args = (validLFNs,) + tuple(parms1)
 
+            if self.concurrentCalls and not master:
+                pendingCalls.append((catalogName, master, self._submitCall(catalogName, call, method, args, kws)))
+                continue
+
+            result = self._callCatalog(catalogName, call, method, args, kws)
             if master:
                 masterResult = result
+            result = processResult(catalogName, master, result)
+            if result:
+                return result
 
-            if not result["OK"]:
-                if master:
-                    # If this is the master catalog and it fails we don't want to continue with the other catalogs
-                    self.log.error(
-                        "Failed to execute call on master catalog",
-                        "%s on %s: %s" % (self.call, catalogName, result["Message"]),
-                    )
-                    return result
-                else:
-                    # Otherwise we keep the failed catalogs so we can update their state later
-                    failedCatalogs[catalogName] = result["Message"]
-            else:
-                successfulCatalogs[catalogName] = result["Value"]
-
-            if allLfns:
-                if result["OK"]:
-                    for lfn, message in result["Value"]["Failed"].items():
-                        # Save the error message for the failed operations
-                        failed.setdefault(lfn, {})[catalogName] = message
-                        if master:
-                            # If this is the master catalog then we should not attempt the operation on other catalogs
-                            fileInfo.pop(lfn, None)
-                    for lfn, result in result["Value"]["Successful"].items():
-                        # Save the result return for each file for the successful operations
-                        successful.setdefault(lfn, {})[catalogName] = result
+        for catalogName, master, pendingCall in pendingCalls:
+            processResult(catalogName, master, self._getCallResult(catalogName, call, *pendingCall))
 
         if allLfns:
             # This recovers the states of the files that completely failed i.e. when S_ERROR is returned by a catalog
@@ -294,16 +355,29 @@ class FileCatalog(object):
 
     def r_execute(self, *parms, **kws):
         """Read method executor."""
+        call = self.call
         successful = {}
         failed = {}
-        for _catalogName, oCatalog, _master in self.readCatalogs:
-
+        catalogs = [
+            (catalogName, getattr(oCatalog, call))
+            for catalogName, oCatalog, _master in self.readCatalogs
             # Skip if the method is not implemented in this catalog
-            if not oCatalog.hasCatalogMethod(self.call):
-                continue
+            if oCatalog.hasCatalogMethod(call)
+        ]
+        if self.concurrentCalls:
+            # The first catalog is called in this thread, the others in parallel
+            pendingCalls = [
+                self._submitCall(catalogName, call, method, parms, kws) for catalogName, method in catalogs[1:]
+            ]
+            results = [self._callCatalog(catalogName, call, method, parms, kws) for catalogName, method in catalogs[:1]]
+            results += [
+                self._getCallResult(catalogName, call, *pendingCall)
+                for (catalogName, _method), pendingCall in zip(catalogs[1:], pendingCalls)
+            ]
+        else:
+            results = (self._callCatalog(catalogName, call, method, parms, kws) for catalogName, method in catalogs)
 
-            method = getattr(oCatalog, self.call)
-            res = method(*parms, **kws)
+        for res in results:
             if res["OK"]:
                 if "Successful" in res["Value"]:
                     for key, item in res["Value"]["Successful"].items():
@@ -315,9 +389,64 @@ class FileCatalog(object):
                 else:
                     return res
         if not successful and not failed:
-            return S_ERROR(DErrno.EFCERR, "Failed to perform %s from any catalog" % self.call)
+            return S_ERROR(DErrno.EFCERR, "Failed to perform %s from any catalog" % call)
         return S_OK({"Failed": failed, "Successful": successful})
 
+    def _callCatalog(self, catalogName, methodName, method, args, kws, threadConfig=None):
+        """Call a method of a catalog, recording its latency
+
+        :param tuple threadConfig: content of the ThreadConfig of the calling thread, when called from the thread pool
+        """
+        if threadConfig is not None:
+            # The threads of the pool are reused
+            tc = ThreadConfig()
+            tc.reset()
+            tc.load(threadConfig)
+        result = None
+        startTime = time.time()
+        try:
+            result = method(*args, **kws)
+            return result
+        finally:
+            latency = time.time() - startTime
+            _recordLatency(catalogName, methodName, latency, ok=bool(result and result["OK"]))
+            self.log.debug("Catalog call", "%s.%s took %.3f s" % (catalogName, methodName, latency))
+
+    def _submitCall(self, catalogName, methodName, method, args, kws):
+        """Call a method of a catalog in the thread pool
+
+        :return: tuple (future, deadline of the call)
+        """
+        deadline = time.time() + self.opHelper.getValue("/Services/Catalogs/%s/Timeout" % catalogName, self.timeout)
+        future = _getExecutor(self.maxConcurrentCalls).submit(
+            self._callCatalog, catalogName, methodName, method, args, dict(kws), ThreadConfig().dump()
+        )
+        return future, deadline
+
+    def _getCallResult(self, catalogName, methodName, future, deadline):
+        """Wait for the result of a call submitted to the thread pool, until its deadline"""
+        try:
+            return future.result(timeout=max(0, deadline - time.time()))
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            _recordLatency(catalogName, methodName, 0.0, ok=False, timedOut=True)
+            self.log.warn("Timeout calling catalog", "%s on %s" % (methodName, catalogName))
+            return S_ERROR(errno.ETIMEDOUT, "Timeout calling %s on %s" % (methodName, catalogName))
+
+    @staticmethod
+    def getCatalogLatencies():
+        """Get the latency statistics of the calls to the catalogs made by the process
+
+        :return: S_OK({catalogName: {methodName: {"Calls", "Errors", "Timeouts", "TotalTime", "MaxTime"}}})
+        """
+        with _latenciesLock:
+            return S_OK(
+                {
+                    catalogName: {methodName: dict(stats) for methodName, stats in methods.items()}
+                    for catalogName, methods in _catalogLatencies.items()
+                }
+            )
+
     ###########################################################################################
     #
     # Below is the method for obtaining the objects instantiated for a provided catalogue configuration
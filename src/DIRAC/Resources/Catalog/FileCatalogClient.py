@@ -5,9 +5,10 @@ import os
 
 from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.Tornado.Client.ClientSelector import TransferClientSelector as TransferClient
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 
 from DIRAC.ConfigurationSystem.Client.Helpers.Registry import getVOMSAttributeForGroup, getDNForUsername
-from DIRAC.Resources.Catalog.Utilities import checkCatalogArguments
+from DIRAC.Resources.Catalog.Utilities import checkCatalogArguments, checkArgumentFormat
 from DIRAC.Resources.Catalog.FileCatalogClientBase import FileCatalogClientBase
 
 
@@ -32,6 +33,7 @@ class FileCatalogClient(FileCatalogClientBase):
         "findFilesByMetadata",
         "getMetadataFields",
         "findDirectoriesByMetadata",
+        "explainMetadataQuery",
         "getReplicasByMetadata",
         "findFilesByMetadataDetailed",
         "findFilesByMetadataWeb",
@@ -97,6 +99,7 @@ class FileCatalogClient(FileCatalogClientBase):
         "removeMetadata",
         "getDirectoryUserMetadata",
         "findDirectoriesByMetadata",
+        "explainMetadataQuery",
         "getReplicasByMetadata",
         "findFilesByMetadataDetailed",
         "findFilesByMetadataWeb",
@@ -126,27 +129,93 @@ class FileCatalogClient(FileCatalogClientBase):
     ]
 
     def __init__(self, url=None, **kwargs):
-        """Constructor function."""
+        """Constructor function.
+
+        :param int LFNsPerCall: maximum number of LFNs sent to the service in a single call
+                                by getReplicas and getFileMetadata (option of the catalog in the CS)
+        """
         self.serverURL = "DataManagement/FileCatalog" if not url else url
+        self.lfnsPerCall = int(kwargs.pop("LFNsPerCall", 10000))
         super(FileCatalogClient, self).__init__(self.serverURL, **kwargs)
 
-    @checkCatalogArguments
-    def getReplicas(self, lfns, allStatus=False, timeout=120):
-        """Get the replicas of the given files"""
-        rpcClient = self._getRPC(timeout=timeout)
-        result = rpcClient.getReplicas(lfns, allStatus)
+    def _pagedCall(self, methodName, lfns, args=(), timeout=120):
+        """Call a method of the service on successive pages of at most lfnsPerCall LFNs,
+        so that neither the service nor the client handle the whole answer at once
+
+        :param str methodName: name of the method
+        :param lfns: list or dict of LFNs, given as first argument of the method
+        :param tuple args: other arguments of the method
 
+        :return: generator of the results of each page, stopping after the first error
+        """
+        rpcClient = self._getRPC(timeout=timeout)
+        for lfnPage in breakListIntoChunks(list(lfns), self.lfnsPerCall):
+            if isinstance(lfns, dict):
+                lfnPage = dict((lfn, lfns[lfn]) for lfn in lfnPage)
+            result = getattr(rpcClient, methodName)(lfnPage, *args)
+            yield result
+            if not result["OK"]:
+                return
+
+    def _iterPages(self, methodName, lfns, args=(), timeout=120, processPage=None):
+        """Generator of the Successful/Failed results of a method called on pages of LFNs,
+        with the LFNs given as input restored
+
+        :param callable processPage: function applied to the result of each page
+        """
+        result = checkArgumentFormat(lfns, generateMap=True)
         if not result["OK"]:
-            return result
+            yield result
+            return
+        lfns, lfnMap = result["Value"]
+        for result in self._pagedCall(methodName, lfns, args=args, timeout=timeout):
+            if result["OK"]:
+                if processPage:
+                    processPage(result["Value"])
+                for status in ("Successful", "Failed"):
+                    result["Value"][status] = dict(
+                        (lfnMap.get(lfn, lfn), value) for lfn, value in result["Value"][status].items()
+                    )
+            yield result
+
+    @staticmethod
+    def _mergePages(pages):
+        """Merge the Successful/Failed results of the pages of a call, returning the first error"""
+        successful = {}
+        failed = {}
+        for result in pages:
+            if not result["OK"]:
+                return result
+            successful.update(result["Value"]["Successful"])
+            failed.update(result["Value"]["Failed"])
+        return S_OK({"Successful": successful, "Failed": failed})
 
-        # If there is no PFN returned, just set the LFN instead
-        lfnDict = result["Value"]
+    @staticmethod
+    def __setMissingPFNs(lfnDict):
+        """If there is no PFN returned, just set the LFN instead"""
         for lfn in lfnDict["Successful"]:
             for se in lfnDict["Successful"][lfn]:
                 if not lfnDict["Successful"][lfn][se]:
                     lfnDict["Successful"][lfn][se] = lfn
 
-        return S_OK(lfnDict)
+    @checkCatalogArguments
+    def getReplicas(self, lfns, allStatus=False, timeout=120):
+        """Get the replicas of the given files, with one call to the service per lfnsPerCall LFNs"""
+        result = self._mergePages(self._pagedCall("getReplicas", lfns, args=(allStatus,), timeout=timeout))
+        if not result["OK"]:
+            return result
+        self.__setMissingPFNs(result["Value"])
+        return result
+
+    def iterReplicas(self, lfns, allStatus=False, timeout=120):
+        """Get the replicas of the given files, page by page, with a bounded memory
+
+        :return: generator of S_OK({"Successful": {}, "Failed": {}}) for each page of lfnsPerCall LFNs,
+                 or of S_ERROR, after which it stops
+        """
+        return self._iterPages(
+            "getReplicas", lfns, args=(allStatus,), timeout=timeout, processPage=self.__setMissingPFNs
+        )
 
     @checkCatalogArguments
     def setReplicaProblematic(self, lfns, revert=False):
@@ -469,8 +538,16 @@ class FileCatalogClient(FileCatalogClientBase):
 
     @checkCatalogArguments
     def getFileMetadata(self, lfns, timeout=120):
-        """Get the metadata associated to supplied lfns"""
-        return self._getRPC(timeout=timeout).getFileMetadata(lfns)
+        """Get the metadata associated to supplied lfns, with one call to the service per lfnsPerCall LFNs"""
+        return self._mergePages(self._pagedCall("getFileMetadata", lfns, timeout=timeout))
+
+    def iterFileMetadata(self, lfns, timeout=120):
+        """Get the metadata associated to supplied lfns, page by page, with a bounded memory
+
+        :return: generator of S_OK({"Successful": {}, "Failed": {}}) for each page of lfnsPerCall LFNs,
+                 or of S_ERROR, after which it stops
+        """
+        return self._iterPages("getFileMetadata", lfns, timeout=timeout)
 
     @checkCatalogArguments
     def getReplicaStatus(self, lfns, timeout=120):
@@ -569,6 +646,10 @@ class FileCatalogClient(FileCatalogClientBase):
         """Find all the directories satisfying the given metadata set"""
         return self._getRPC(timeout=timeout).findDirectoriesByMetadata(metaDict, path)
 
+    def explainMetadataQuery(self, metaDict, path="/", timeout=120):
+        """Describe how the directories satisfying the given metadata set would be searched"""
+        return self._getRPC(timeout=timeout).explainMetadataQuery(metaDict, path)
+
     def getReplicasByMetadata(self, metaDict, path="/", allStatus=False, timeout=120):
         """Find all the files satisfying the given metadata set"""
         return self._getRPC(timeout=timeout).getReplicasByMetadata(metaDict, path, allStatus)
@@ -2,6 +2,7 @@
    Testing the FileCatalog logic
 """
 import sys
+import time
 import unittest
 import mock
 
@@ -81,6 +82,9 @@ class GenericCatalog(object):
                     return S_ERROR("%s.%s did not go well" % (self.name, self.call))
                 elif retType == "Failed":
                     failed[lfn] = "%s.%s failed for %s" % (self.name, self.call, lfn)
+                elif retType == "Slow":
+                    time.sleep(0.5)
+                    successful[lfn] = "yeah"
             except ValueError:
                 successful[lfn] = "yeah"
 
@@ -424,9 +428,91 @@ class TestRead(unittest.TestCase):
         self.assertEqual(["c2"], sorted(res["Value"]["Failed"][lfn]))
 
 
+class TestConcurrent(unittest.TestCase):
+    """Tests of the concurrent calls to the catalogs"""
+
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getSelectedCatalogs",
+        side_effect=mock_fc_getSelectedCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getEligibleCatalogs",
+        side_effect=mock_fc_getEligibleCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    def test_01_write(self, mk_getSelectedCatalogs, mk_getEligibleCatalogs):
+        """The results are merged as with the sequential calls"""
+
+        fc = FileCatalog(
+            catalogs=["c1_True_True_True_2_0_2_0", "c2_False_True_True_3_0_1_0", "c3_False_True_True_3_0_1_0"]
+        )
+        fc.concurrentCalls = True
+
+        lfns = ["/lhcb/toto", "/lhcb/c1/Failed", "/lhcb/c2/Failed", "/lhcb/c3/Error"]
+        res = fc.write1(lfns)
+        self.assertTrue(res["OK"])
+        self.assertEqual(
+            sorted(res["Value"]["Successful"]), sorted(["/lhcb/toto", "/lhcb/c2/Failed", "/lhcb/c3/Error"])
+        )
+        self.assertEqual(sorted(res["Value"]["Successful"]["/lhcb/toto"]), ["c1", "c2"])
+        self.assertEqual(sorted(res["Value"]["Successful"]["/lhcb/c2/Failed"]), ["c1"])
+        self.assertEqual(sorted(res["Value"]["Failed"]["/lhcb/c1/Failed"]), ["c1", "c3"])
+        self.assertEqual(sorted(res["Value"]["Failed"]["/lhcb/c2/Failed"]), ["c2", "c3"])
+        # The error of c3 is reported for all the LFNs
+        self.assertEqual(sorted(res["Value"]["Failed"]), sorted(lfns))
+
+        fc.concurrentCalls = False
+        self.assertEqual(fc.write1(lfns), res)
+
+        # An error in the master still stops everything
+        fc.concurrentCalls = True
+        res = fc.write1("/lhcb/c1/Error")
+        self.assertTrue(not res["OK"])
+
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getSelectedCatalogs",
+        side_effect=mock_fc_getSelectedCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getEligibleCatalogs",
+        side_effect=mock_fc_getEligibleCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    def test_02_timeout(self, mk_getSelectedCatalogs, mk_getEligibleCatalogs):
+        """A catalog not answering in time is considered as failed"""
+
+        fc = FileCatalog(catalogs=["c1_True_True_True_2_0_2_0", "c2_False_True_True_3_0_1_0"])
+        fc.concurrentCalls = True
+        fc.timeout = 0.1
+
+        lfn = "/lhcb/c2/Slow"
+        res = fc.write1(lfn)
+        self.assertTrue(res["OK"])
+        self.assertEqual(["c1"], sorted(res["Value"]["Successful"][lfn]))
+        self.assertEqual(["c2"], sorted(res["Value"]["Failed"][lfn]))
+
+        # For the reads, the other catalogs are still used
+        res = fc.read1([lfn])
+        self.assertTrue(res["OK"])
+        self.assertEqual([lfn], list(res["Value"]["Successful"]))
+
+        res = fc.getCatalogLatencies()
+        self.assertTrue(res["OK"])
+        self.assertEqual(res["Value"]["c2"]["write1"]["Timeouts"], 1)
+        self.assertEqual(res["Value"]["c2"]["read1"]["Timeouts"], 1)
+        self.assertTrue(res["Value"]["c1"]["write1"]["Calls"] >= 1)
+
+
 if __name__ == "__main__":
     suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestInitialization)
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestWrite))
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestRead))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestConcurrent))
 
     unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,59 @@
+""" Test the paging of the bulk read calls of the FileCatalogClient
+"""
+from mock import MagicMock
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
+
+
+def fakeGetReplicas(lfns, allStatus):
+    """Files are found if they are not in /missing"""
+    successful = dict((lfn, {"SE": ""}) for lfn in lfns if not lfn.startswith("/missing"))
+    failed = dict((lfn, "No such file or directory") for lfn in lfns if lfn not in successful)
+    return S_OK({"Successful": successful, "Failed": failed})
+
+
+def getClient(rpcClient):
+    fcClient = FileCatalogClient(LFNsPerCall=3)
+    fcClient._getRPC = MagicMock(return_value=rpcClient)
+    return fcClient
+
+
+def test_getReplicasPaged():
+    """The LFNs are sent by pages, and the results merged"""
+    rpcClient = MagicMock()
+    rpcClient.getReplicas.side_effect = fakeGetReplicas
+    fcClient = getClient(rpcClient)
+
+    lfns = ["/a/%d" % i for i in range(7)] + ["/missing/a"]
+    res = fcClient.getReplicas(lfns)
+    assert res["OK"]
+    assert rpcClient.getReplicas.call_count == 3
+    assert sorted(res["Value"]["Successful"]) == sorted(lfns[:-1])
+    # The missing PFNs are replaced by the LFN
+    assert res["Value"]["Successful"]["/a/0"] == {"SE": "/a/0"}
+    assert list(res["Value"]["Failed"]) == ["/missing/a"]
+
+    # An error in one of the pages is returned
+    rpcClient.getReplicas.side_effect = [S_OK({"Successful": {}, "Failed": {}}), S_ERROR("Timeout")]
+    res = fcClient.getReplicas(lfns)
+    assert not res["OK"]
+
+
+def test_iterReplicas():
+    """Pages are returned one by one, with the original LFNs"""
+    rpcClient = MagicMock()
+    rpcClient.getReplicas.side_effect = fakeGetReplicas
+    fcClient = getClient(rpcClient)
+
+    pages = list(fcClient.iterReplicas(["/a//0", "/a/1", "/a/2", "/missing/a"]))
+    assert len(pages) == 2
+    assert all(page["OK"] for page in pages)
+    assert pages[0]["Value"]["Successful"]["/a//0"] == {"SE": "/a/0"}
+    assert pages[1]["Value"]["Failed"] == {"/missing/a": "No such file or directory"}
+
+    # The iteration stops at the first error
+    rpcClient.getReplicas.side_effect = [S_ERROR("Timeout"), S_OK({"Successful": {}, "Failed": {}})]
+    pages = list(fcClient.iterReplicas(["/a/%d" % i for i in range(6)]))
+    assert len(pages) == 1
+    assert not pages[0]["OK"]
@@ -11,21 +11,23 @@ The following options can be set for the TransformationAgent.
 import time
 import os
 import datetime
-import pickle
+import threading
 import concurrent.futures
 
 from DIRAC import S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Base.AgentModule import AgentModule
-from DIRAC.Core.Utilities.ThreadSafe import Synchronizer
 from DIRAC.Core.Utilities.List import breakListIntoChunks, randomize
 from DIRAC.DataManagementSystem.Client.DataManager import DataManager
 from DIRAC.TransformationSystem.Client import TransformationFilesStatus
 from DIRAC.TransformationSystem.Client.TransformationClient import TransformationClient
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
 from DIRAC.TransformationSystem.Agent.TransformationAgentsUtilities import TransformationAgentsUtilities
 
 AGENT_NAME = "Transformation/TransformationAgent"
-gSynchro = Synchronizer()
+
+# Stages of the processing of a transformation, for which the time spent is reported
+STAGES = ("GetFiles", "GetReplicas", "SetFileStatus", "Plugin", "AddTasks")
 
 
 class TransformationAgent(AgentModule, TransformationAgentsUtilities):
@@ -54,8 +56,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         # Validity of the cache
         self.replicaCache = None
         self.replicaCacheValidity = None
-        self.writingCache = False
-        self.removedFromCache = 0
 
         self.noUnusedDelay = 0
         self.unusedFiles = {}
@@ -64,6 +64,13 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         self.debug = False
         self.pluginTimeout = {}
 
+        # pipelined mode, and time spent in each stage of the processing
+        self.pipelined = False
+        self.prefetchDepth = 0
+        self.prefetchExecutor = None
+        self.stageTimes = {}
+        self.stageTimesLock = threading.Lock()
+
     def initialize(self):
         """standard initialize"""
         # few parameters
@@ -85,17 +92,20 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         # clients
         self.transfClient = TransformationClient()
 
-        # for caching using a pickle file
+        # for caching using an SQLite database
         self.workDirectory = self.am_getWorkDirectory()
-        self.cacheFile = os.path.join(self.workDirectory, "ReplicaCache.pkl")
+        self.cacheFile = os.path.join(self.workDirectory, "ReplicaCache.db")
         self.controlDirectory = self.am_getControlDirectory()
 
         # remember the offset if any in TS
         self.lastFileOffset = {}
 
         # Validity of the cache
-        self.replicaCache = {}
         self.replicaCacheValidity = self.am_getOption("ReplicaCacheValidity", 2)
+        self.replicaCache = ReplicaCache(self.cacheFile, validity=self.replicaCacheValidity)
+        res = self.replicaCache.expireReplicas()
+        if res["OK"] and res["Value"]:
+            self.log.info("Expired replicas removed from the cache", "(%d files)" % res["Value"])
 
         self.noUnusedDelay = self.am_getOption("NoUnusedDelay", 6)
 
@@ -104,6 +114,19 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         self.log.info("Multithreaded with %d threads" % maxNumberOfThreads)
         self.threadPoolExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=maxNumberOfThreads)
 
+        # In pipelined mode, the files and replicas of the next transformations are obtained by other threads
+        # while the plugins of the current ones are running
+        self.pipelined = self.am_getOption("Pipelined", False)
+        prefetchThreads = self.am_getOption("PrefetchThreads", 4)
+        # At least one transformation must be prefetched at a time, or the pipeline would never progress
+        self.prefetchDepth = max(1, int(self.am_getOption("PrefetchDepth", maxNumberOfThreads + prefetchThreads)))
+        if self.pipelined:
+            self.log.info(
+                "Pipelined mode with %d prefetching threads, prefetching up to %d transformations"
+                % (prefetchThreads, self.prefetchDepth)
+            )
+            self.prefetchExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=prefetchThreads)
+
         self.log.info("Will treat the following transformation types: %s" % str(self.transformationTypes))
 
         return S_OK()
@@ -113,9 +136,11 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
 
         method = "finalize"
         self._logInfo("Wait for threads to get empty before terminating the agent", method=method)
+        if self.prefetchExecutor:
+            self.prefetchExecutor.shutdown()
         self.threadPoolExecutor.shutdown()
         self._logInfo("Threads are empty, terminating the agent...", method=method)
-        self.__writeCache()
+        self.replicaCache.close()
         return S_OK()
 
     def execute(self):
@@ -126,8 +151,10 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             self._logError("Failed to obtain transformations:", res["Message"])
             return S_OK()
         # Process the transformations
-        count = 0
-        future_to_transID = {}
+        startTime = time.time()
+        with self.stageTimesLock:
+            self.stageTimes = {}
+        transformations = []
 
         for transDict in res["Value"]:
             transID = int(transDict["TransformationID"])
@@ -146,10 +173,18 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                         )
                         for status, val in movedFiles.items():
                             self._logInfo("\t%d files to status %s" % (val, status), transID=transID)
-            count += 1
-            future = self.threadPoolExecutor.submit(self._execute, transDict)
-            future_to_transID[future] = transID
-        self._logInfo("Out of %d transformations, %d put in thread queue" % (len(res["Value"]), count))
+            transformations.append(transDict)
+
+        if self.pipelined:
+            future_to_transID = self.__submitPipelined(transformations)
+        else:
+            future_to_transID = {}
+            for transDict in transformations:
+                future = self.threadPoolExecutor.submit(self._execute, transDict)
+                future_to_transID[future] = int(transDict["TransformationID"])
+            self._logInfo(
+                "Out of %d transformations, %d put in thread queue" % (len(transformations), len(future_to_transID))
+            )
 
         for future in concurrent.futures.as_completed(future_to_transID):
             transID = future_to_transID[future]
@@ -160,8 +195,73 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             else:
                 self._logInfo("Processed %d" % transID)
 
+        with self.stageTimesLock:
+            stageTimes = dict(self.stageTimes)
+        self._logInfo(
+            "Processed %d transformations in %.1f seconds" % (len(transformations), time.time() - startTime),
+            self.__formatStageTimes(stageTimes),
+        )
         return S_OK()
 
+    def __submitPipelined(self, transformations):
+        """Prefetch the files and replicas of the transformations, and queue each of them to the plugin threads
+        as soon as its data are available.
+
+        The transformations being prefetched or waiting for a plugin thread are limited to PrefetchDepth.
+
+        :return: dictionary of the futures of the transformations queued to the plugin threads
+        """
+        toPrefetch = list(transformations)
+        prefetchDepth = max(1, self.prefetchDepth)
+        prefetching = {}
+        future_to_transID = {}
+        while toPrefetch or prefetching:
+            waiting = sum(1 for future in future_to_transID if not future.running() and not future.done())
+            while toPrefetch and len(prefetching) + waiting < prefetchDepth:
+                transDict = toPrefetch.pop(0)
+                prefetching[self.prefetchExecutor.submit(self._prefetch, transDict)] = transDict
+            done, _notDone = concurrent.futures.wait(
+                list(prefetching) + [future for future in future_to_transID if not future.done()],
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                transDict = prefetching.pop(future, None)
+                if transDict is None:
+                    continue
+                transData = future.result()
+                if transData:
+                    transID = int(transDict["TransformationID"])
+                    future_to_transID[self.threadPoolExecutor.submit(self._execute, transDict, transData)] = transID
+        self._logInfo(
+            "Out of %d transformations, %d with files to process put in thread queue"
+            % (len(transformations), len(future_to_transID))
+        )
+        return future_to_transID
+
+    def _prefetch(self, transDict):
+        """thread - get the files and replicas of a transformation, to be processed by the plugin threads"""
+        transID = int(transDict["TransformationID"])
+        try:
+            res = self.getTransformationData(transDict, self._getClients())
+            if not res["OK"]:
+                self._logInfo("Failed to get transformation data:", res["Message"], transID=transID)
+                return None
+            return res["Value"]
+        except Exception as x:  # pylint: disable=broad-except
+            self._logException("Exception when getting transformation data", lException=x, transID=transID)
+            return None
+
+    def _addStageTimes(self, transID, stageTimes):
+        """Add the time spent in the stages of the processing of a transformation to the ones of the cycle"""
+        with self.stageTimesLock:
+            for stage, stageTime in stageTimes.items():
+                self.stageTimes[stage] = self.stageTimes.get(stage, 0.0) + stageTime
+        self._logVerbose("Time spent per stage", self.__formatStageTimes(stageTimes), transID=transID)
+
+    @staticmethod
+    def __formatStageTimes(stageTimes):
+        return ", ".join("%s %.1f s" % (stage, stageTimes[stage]) for stage in STAGES if stage in stageTimes)
+
     def getTransformations(self):
         """Obtain the transformations to be executed - this is executed at the start of every loop (it's really the
         only real thing in the execute()
@@ -201,8 +301,11 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
 
         return {"TransformationClient": threadTransformationClient, "DataManager": threadDataManager}
 
-    def _execute(self, transDict):
-        """thread - does the real job: processing the transformation to be processed"""
+    def _execute(self, transDict, transData=None):
+        """thread - does the real job: processing the transformation to be processed
+
+        :param dict transData: files and replicas of the transformation if already obtained (pipelined mode)
+        """
 
         self._logDebug("Starting _execute")
 
@@ -213,7 +316,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             transID = int(transDict["TransformationID"])
             self._logInfo("Processing transformation %s." % transID, transID=transID)
             startTime = time.time()
-            res = self.processTransformation(transDict, clients)
+            res = self.processTransformation(transDict, clients, transData=transData)
             if not res["OK"]:
                 self._logInfo("Failed to process transformation:", res["Message"], transID=transID)
         except Exception as x:  # pylint: disable=broad-except
@@ -225,51 +328,32 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
 
         self._logDebug("Exiting _execute")
 
-    def processTransformation(self, transDict, clients):
-        """process a single transformation (in transDict)"""
+    def processTransformation(self, transDict, clients, transData=None):
+        """process a single transformation (in transDict)
+
+        :param dict transData: files and replicas of the transformation, as returned by getTransformationData.
+                               They are obtained if not given
+        """
         method = "processTransformation"
         transID = transDict["TransformationID"]
-        forJobs = transDict["Type"].lower() not in ("replication", "removal")
-
-        # First get the LFNs associated to the transformation
-        transFiles = self._getTransformationFiles(transDict, clients, replicateOrRemove=not forJobs)
-        if not transFiles["OK"]:
-            return transFiles
-        if not transFiles["Value"]:
-            return S_OK()
-
-        if transID not in self.replicaCache:
-            self.__readCache(transID)
-        transFiles = transFiles["Value"]
-        unusedLfns = [f["LFN"] for f in transFiles]
-        unusedFiles = len(unusedLfns)
-
         plugin = transDict.get("Plugin", "Standard")
-        # Limit the number of LFNs to be considered for replication or removal as they are treated individually
-        if not forJobs:
-            maxFiles = Operations().getValue("TransformationPlugins/%s/MaxFilesToProcess" % plugin, 0)
-            # Get plugin-specific limit in number of files (0 means no limit)
-            totLfns = len(unusedLfns)
-            lfnsToProcess = self.__applyReduction(unusedLfns, maxFiles=maxFiles)
-            if len(lfnsToProcess) != totLfns:
-                self._logInfo(
-                    "Reduced number of files from %d to %d" % (totLfns, len(lfnsToProcess)),
-                    method=method,
-                    transID=transID,
-                )
-                transFiles = [f for f in transFiles if f["LFN"] in lfnsToProcess]
-        else:
-            lfnsToProcess = unusedLfns
 
-        # Check the data is available with replicas
-        res = self.__getDataReplicas(transDict, lfnsToProcess, clients, forJobs=forJobs)
-        if not res["OK"]:
-            self._logError("Failed to get data replicas:", res["Message"], method=method, transID=transID)
-            return res
-        dataReplicas = res["Value"]
+        if transData is None:
+            res = self.getTransformationData(transDict, clients)
+            if not res["OK"]:
+                return res
+            transData = res["Value"]
+        if not transData:
+            return S_OK()
+        transFiles = transData["TransFiles"]
+        lfnsToProcess = transData["LFNsToProcess"]
+        dataReplicas = transData["DataReplicas"]
+        unusedFiles = transData["UnusedFiles"]
+        stageTimes = transData["StageTimes"]
 
         # Get the plug-in type and create the plug-in object
         self._logInfo("Processing transformation with '%s' plug-in." % plugin, method=method, transID=transID)
+        startTime = time.time()
         res = self.__generatePluginObject(plugin, clients)
         if not res["OK"]:
             return res
@@ -284,10 +368,13 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             self._logError(
                 "Failed to generate tasks for transformation:", res["Message"], method=method, transID=transID
             )
+            self._addStageTimes(transID, stageTimes)
             return res
         tasks = res["Value"]
         self.pluginTimeout[transID] = res.get("Timeout", False)
+        stageTimes["Plugin"] = time.time() - startTime
         # Create the tasks
+        startTime = time.time()
         allCreated = True
         created = 0
         lfnsInTasks = []
@@ -311,6 +398,8 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         if lastOffset:
             self.lastFileOffset[transID] = max(0, lastOffset - len(lfnsInTasks))
         self.__removeFilesFromCache(transID, lfnsInTasks)
+        stageTimes["AddTasks"] = time.time() - startTime
+        self._addStageTimes(transID, stageTimes)
 
         # If this production is to Flush
         if transDict["Status"] == "Flush" and allCreated:
@@ -326,13 +415,86 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                 self._logInfo("Updated transformation status to 'Active'.", method=method, transID=transID)
         return S_OK()
 
+    def getTransformationData(self, transDict, clients):
+        """Get the files of a transformation to be processed, and their replicas
+
+        The updates of the file statuses are sent with a single call once the replicas are obtained
+
+        :return: S_OK with None if there is nothing to process, or a dictionary with the TransFiles,
+                 LFNsToProcess, DataReplicas, UnusedFiles and StageTimes (time spent per stage)
+        """
+        method = "getTransformationData"
+        transID = transDict["TransformationID"]
+        forJobs = transDict["Type"].lower() not in ("replication", "removal")
+        stageTimes = {}
+        statusUpdates = {}
+
+        # First get the LFNs associated to the transformation
+        startTime = time.time()
+        transFiles = self._getTransformationFiles(
+            transDict, clients, replicateOrRemove=not forJobs, statusUpdates=statusUpdates
+        )
+        stageTimes["GetFiles"] = time.time() - startTime
+        if not transFiles["OK"]:
+            return transFiles
+        if not transFiles["Value"]:
+            return S_OK()
+
+        transFiles = transFiles["Value"]
+        unusedLfns = [f["LFN"] for f in transFiles]
+        unusedFiles = len(unusedLfns)
+
+        plugin = transDict.get("Plugin", "Standard")
+        # Limit the number of LFNs to be considered for replication or removal as they are treated individually
+        if not forJobs:
+            maxFiles = Operations().getValue("TransformationPlugins/%s/MaxFilesToProcess" % plugin, 0)
+            # Get plugin-specific limit in number of files (0 means no limit)
+            totLfns = len(unusedLfns)
+            lfnsToProcess = self.__applyReduction(unusedLfns, maxFiles=maxFiles)
+            if len(lfnsToProcess) != totLfns:
+                self._logInfo(
+                    "Reduced number of files from %d to %d" % (totLfns, len(lfnsToProcess)),
+                    method=method,
+                    transID=transID,
+                )
+                transFiles = [f for f in transFiles if f["LFN"] in lfnsToProcess]
+        else:
+            lfnsToProcess = unusedLfns
+
+        # Check the data is available with replicas
+        startTime = time.time()
+        res = self.__getDataReplicas(transDict, lfnsToProcess, clients, forJobs=forJobs, statusUpdates=statusUpdates)
+        stageTimes["GetReplicas"] = time.time() - startTime
+
+        # The files are set Unused before the tasks are created, even without replicas
+        startTime = time.time()
+        self._setFileStatuses(transID, statusUpdates, clients)
+        stageTimes["SetFileStatus"] = time.time() - startTime
+        if not res["OK"]:
+            self._logError("Failed to get data replicas:", res["Message"], method=method, transID=transID)
+            self._addStageTimes(transID, stageTimes)
+            return res
+
+        return S_OK(
+            {
+                "TransFiles": transFiles,
+                "LFNsToProcess": lfnsToProcess,
+                "DataReplicas": res["Value"],
+                "UnusedFiles": unusedFiles,
+                "StageTimes": stageTimes,
+            }
+        )
+
     ######################################################################
     #
     # Internal methods used by the agent
     #
 
-    def _getTransformationFiles(self, transDict, clients, statusList=None, replicateOrRemove=False):
-        """get the data replicas for a certain transID"""
+    def _getTransformationFiles(self, transDict, clients, statusList=None, replicateOrRemove=False, statusUpdates=None):
+        """get the data replicas for a certain transID
+
+        :param dict statusUpdates: if given, the file status updates are added to it instead of being sent
+        """
         # By default, don't skip if no new Unused for DM transformations
         skipIfNoNewUnused = not replicateOrRemove
         transID = transDict["TransformationID"]
@@ -416,6 +578,12 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             set([trFile["Status"] for trFile in transFiles]) - set([TransformationFilesStatus.UNUSED])
         )
         if notUnused:
+            if statusUpdates is not None:
+                # Their replicas are obtained again
+                self.__addStatusUpdates(statusUpdates, TransformationFilesStatus.UNUSED, notUnused, force=True)
+                self._logVerbose("Will set %d files from %s to Unused" % (len(notUnused), ",".join(otherStatuses)))
+                self.__removeFilesFromCache(transID, notUnused)
+                return S_OK(transFiles)
             res = transClient.setFileStatusForTransformation(
                 transID, TransformationFilesStatus.UNUSED, notUnused, force=True
             )
@@ -428,6 +596,36 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                 self.__removeFilesFromCache(transID, notUnused)
         return S_OK(transFiles)
 
+    @staticmethod
+    def __addStatusUpdates(statusUpdates, status, lfns, force=False):
+        """Record new statuses of files, the last one of a file overriding the previous ones"""
+        for lfn in lfns:
+            statusUpdates[lfn] = (status, force)
+
+    def _setFileStatuses(self, transID, statusUpdates, clients):
+        """Send the file status updates recorded for a transformation
+
+        The updates are sent with one call, or one per value of the force flag if both are used
+
+        :param dict statusUpdates: { lfn: (status, force) }
+        """
+        method = "_setFileStatuses"
+        updatesByForce = {}
+        for lfn, (status, force) in statusUpdates.items():
+            updatesByForce.setdefault(force, {})[lfn] = status
+        for force, newLFNsStatus in sorted(updatesByForce.items()):
+            res = clients["TransformationClient"].setFileStatusForTransformation(transID, newLFNsStatus, force=force)
+            statusCounts = {}
+            for status in newLFNsStatus.values():
+                statusCounts[status] = statusCounts.get(status, 0) + 1
+            counts = ", ".join("%d %s" % (count, status) for status, count in sorted(statusCounts.items()))
+            if not res["OK"]:
+                self._logError(
+                    "Failed to update the file statuses (%s):" % counts, res["Message"], method=method, transID=transID
+                )
+                continue
+            self._logInfo("Updated file statuses: %s" % counts, method=method, transID=transID)
+
     def __applyReduction(self, lfns, maxFiles=None):
         """eventually remove the number of files to be considered"""
         if maxFiles is None:
@@ -436,7 +634,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             return lfns
         return randomize(lfns)[:maxFiles]
 
-    def __getDataReplicas(self, transDict, lfns, clients, forJobs=True):
+    def __getDataReplicas(self, transDict, lfns, clients, forJobs=True, statusUpdates=None):
         """Get the replicas for the LFNs and check their statuses. It first looks within the cache."""
         method = "__getDataReplicas"
         transID = transDict["TransformationID"]
@@ -457,21 +655,14 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         else:
             # If the cache needs to be cleaned
             self.__cleanCache(transID)
-        startTime = time.time()
-        dataReplicas = {}
         nLfns = len(lfns)
         self._logVerbose("Getting replicas for %d files" % nLfns, method=method, transID=transID)
-        cachedReplicaSets = self.replicaCache.get(transID, {})
-        cachedReplicas = {}
-        # Merge all sets of replicas
-        for replicas in cachedReplicaSets.values():
-            cachedReplicas.update(replicas)
-        self._logInfo("Number of cached replicas: %d" % len(cachedReplicas), method=method, transID=transID)
-        setCached = set(cachedReplicas)
-        setLfns = set(lfns)
-        for lfn in setLfns & setCached:
-            dataReplicas[lfn] = cachedReplicas[lfn]
-        newLFNs = setLfns - setCached
+        # Only the replicas of the files to process are read from the cache
+        res = self.replicaCache.getReplicas(transID, lfns)
+        if not res["OK"]:
+            self._logWarn("Failed to read the replica cache", res["Message"], method=method, transID=transID)
+        dataReplicas = res.get("Value", {})
+        newLFNs = set(lfns) - set(dataReplicas)
         self._logInfo(
             "ReplicaCache hit for %d out of %d LFNs" % (len(dataReplicas), nLfns), method=method, transID=transID
         )
@@ -480,7 +671,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             self._logInfo("Getting replicas for %d files from catalog" % len(newLFNs), method=method, transID=transID)
             newReplicas = {}
             for chunk in breakListIntoChunks(newLFNs, 10000):
-                res = self._getDataReplicasDM(transID, chunk, clients, forJobs=forJobs)
+                res = self._getDataReplicasDM(transID, chunk, clients, forJobs=forJobs, statusUpdates=statusUpdates)
                 if res["OK"]:
                     reps = dict((lfn, ses) for lfn, ses in res["Value"].items() if ses)
                     newReplicas.update(reps)
@@ -500,7 +691,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             )
             dataReplicas.update(newReplicas)
             noReplicas = newLFNs - set(dataReplicas)
-            self.__writeCache(transID)
             if noReplicas:
                 self._logWarn(
                     "Found %d files without replicas (or only in Failover)" % len(noReplicas),
@@ -509,8 +699,11 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                 )
         return S_OK(dataReplicas)
 
-    def _getDataReplicasDM(self, transID, lfns, clients, forJobs=True, ignoreMissing=False):
-        """Get the replicas for the LFNs and check their statuses, using the replica manager"""
+    def _getDataReplicasDM(self, transID, lfns, clients, forJobs=True, ignoreMissing=False, statusUpdates=None):
+        """Get the replicas for the LFNs and check their statuses, using the replica manager
+
+        :param dict statusUpdates: if given, the file status updates are added to it instead of being sent
+        """
         method = "_getDataReplicasDM"
 
         startTime = time.time()
@@ -539,9 +732,13 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         problematicLfns = [lfn for lfn in lfns if lfn not in replicas["Successful"] and lfn not in replicas["Failed"]]
         if problematicLfns:
             self._logInfo("%d files found problematic in the catalog, set ProbInFC" % len(problematicLfns))
-            res = clients["TransformationClient"].setFileStatusForTransformation(
-                transID, TransformationFilesStatus.PROB_IN_FC, problematicLfns
-            )
+            if statusUpdates is not None:
+                self.__addStatusUpdates(statusUpdates, TransformationFilesStatus.PROB_IN_FC, problematicLfns)
+                res = S_OK()
+            else:
+                res = clients["TransformationClient"].setFileStatusForTransformation(
+                    transID, TransformationFilesStatus.PROB_IN_FC, problematicLfns
+                )
             if not res["OK"]:
                 self._logError(
                     "Failed to update status of problematic files:", res["Message"], method=method, transID=transID
@@ -569,6 +766,8 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             self._logInfo("%d files not found in the catalog" % len(missingLfns))
             if ignoreMissing:
                 dataReplicas.update(dict.fromkeys(missingLfns, []))
+            elif statusUpdates is not None:
+                self.__addStatusUpdates(statusUpdates, TransformationFilesStatus.MISSING_IN_FC, missingLfns)
             else:
                 res = clients["TransformationClient"].setFileStatusForTransformation(
                     transID, TransformationFilesStatus.MISSING_IN_FC, missingLfns
@@ -581,121 +780,42 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
 
     def __updateCache(self, transID, newReplicas):
         """Add replicas to the cache"""
-        self.replicaCache.setdefault(transID, {})[datetime.datetime.utcnow()] = newReplicas
+        res = self.replicaCache.setReplicas(transID, newReplicas)
+        if not res["OK"]:
+            self._logWarn("Failed to update the replica cache", res["Message"], method="__updateCache", transID=transID)
 
     def __clearCacheForTrans(self, transID):
         """Remove all replicas for a transformation"""
-        self.replicaCache.pop(transID, None)
-
-    def __cleanReplicas(self, transID, lfns):
-        """Remove cached replicas that are not in a list"""
-        cachedReplicas = set()
-        for replicas in self.replicaCache.get(transID, {}).values():
-            cachedReplicas.update(replicas)
-        toRemove = cachedReplicas - set(lfns)
-        if toRemove:
-            self._logInfo("Remove %d files from cache" % len(toRemove), method="__cleanReplicas", transID=transID)
-            self.__removeFromCache(transID, toRemove)
+        res = self.replicaCache.clearTransformation(transID)
+        if not res["OK"]:
+            self._logWarn(
+                "Failed to clear the replica cache", res["Message"], method="__clearCacheForTrans", transID=transID
+            )
+        return res
 
     def __cleanCache(self, transID):
-        """Cleans the cache"""
-        try:
-            if transID in self.replicaCache:
-                timeLimit = datetime.datetime.utcnow() - datetime.timedelta(days=self.replicaCacheValidity)
-                for updateTime in set(self.replicaCache[transID]):
-                    nCache = len(self.replicaCache[transID][updateTime])
-                    if updateTime < timeLimit or not nCache:
-                        self._logInfo(
-                            "Clear %s replicas for transformation %s, time %s"
-                            % ("%d cached" % nCache if nCache else "empty cache", str(transID), str(updateTime)),
-                            transID=transID,
-                            method="__cleanCache",
-                        )
-                        del self.replicaCache[transID][updateTime]
-                # Remove empty transformations
-                if not self.replicaCache[transID]:
-                    del self.replicaCache[transID]
-        except Exception as x:
-            self._logException("Exception when cleaning replica cache:", lException=x)
+        """Remove the expired replicas of a transformation from the cache"""
+        res = self.replicaCache.expireReplicas(transID)
+        if not res["OK"]:
+            self._logWarn("Failed to clean the replica cache", res["Message"], method="__cleanCache", transID=transID)
+        elif res["Value"]:
+            self._logInfo(
+                "Cleared %d expired replicas for transformation %s" % (res["Value"], str(transID)),
+                method="__cleanCache",
+                transID=transID,
+            )
 
     def __removeFilesFromCache(self, transID, lfns):
-        removed = self.__removeFromCache(transID, lfns)
-        if removed:
-            self._logInfo("Removed %d replicas from cache" % removed, method="__removeFilesFromCache", transID=transID)
-            self.__writeCache(transID)
-
-    def __removeFromCache(self, transID, lfns):
-        if transID not in self.replicaCache:
-            return
-        removed = 0
-        if self.replicaCache[transID] and lfns:
-            for lfn in lfns:
-                for timeKey in self.replicaCache[transID]:
-                    if self.replicaCache[transID][timeKey].pop(lfn, None):
-                        removed += 1
-        return removed
-
-    def __cacheFile(self, transID):
-        return self.cacheFile.replace(".pkl", "_%s.pkl" % str(transID))
-
-    @gSynchro
-    def __readCache(self, transID):
-        """Reads from the cache"""
-        if transID in self.replicaCache:
+        if not self.replicaCache or not lfns:
             return
-        try:
-            method = "__readCache"
-            fileName = self.__cacheFile(transID)
-            if not os.path.exists(fileName):
-                self.replicaCache[transID] = {}
-            else:
-                with open(fileName, "rb") as cacheFile:
-                    self.replicaCache[transID] = pickle.load(cacheFile)
-                self._logInfo(
-                    "Successfully loaded replica cache from file %s (%d files)"
-                    % (fileName, self.__filesInCache(transID)),
-                    method=method,
-                    transID=transID,
-                )
-        except Exception as x:
-            self._logException(
-                "Failed to load replica cache from file %s" % fileName, lException=x, method=method, transID=transID
+        res = self.replicaCache.removeReplicas(transID, lfns)
+        if not res["OK"]:
+            self._logWarn(
+                "Failed to remove replicas from cache", res["Message"], method="__removeFilesFromCache", transID=transID
             )
-            self.replicaCache[transID] = {}
-
-    def __filesInCache(self, transID):
-        cache = self.replicaCache.get(transID, {})
-        return sum(len(lfns) for lfns in cache.values())
-
-    @gSynchro
-    def __writeCache(self, transID=None):
-        """Writes the cache"""
-        method = "__writeCache"
-        try:
-            startTime = time.time()
-            transList = [transID] if transID else set(self.replicaCache)
-            filesInCache = 0
-            nCache = 0
-            for t_id in transList:
-                # Protect the copy of the cache
-                filesInCache += self.__filesInCache(t_id)
-                # write to a temporary file in order to avoid corrupted files
-                cacheFile = self.__cacheFile(t_id)
-                tmpFile = cacheFile + ".tmp"
-                with open(tmpFile, "wb") as fd:
-                    pickle.dump(self.replicaCache.get(t_id, {}), fd)
-                # Now rename the file as it shold
-                os.rename(tmpFile, cacheFile)
-                nCache += 1
+        elif res["Value"]:
             self._logInfo(
-                "Successfully wrote %d replica cache file(s) (%d files) in %.1f seconds"
-                % (nCache, filesInCache, time.time() - startTime),
-                method=method,
-                transID=transID if transID else None,
-            )
-        except Exception as x:
-            self._logException(
-                "Could not write replica cache file %s" % cacheFile, lException=x, method=method, transID=t_id
+                "Removed %d replicas from cache" % res["Value"], method="__removeFilesFromCache", transID=transID
             )
 
     def __generatePluginObject(self, plugin, clients):
@@ -721,12 +841,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     def pluginCallback(self, transID, invalidateCache=False):
         """Standard plugin callback"""
         if invalidateCache:
-            try:
-                if transID in self.replicaCache:
-                    self._logInfo(
-                        "Removed cached replicas for transformation", method="pluginCallBack", transID=transID
-                    )
-                    self.replicaCache.pop(transID)
-                    self.__writeCache(transID)
-            except Exception:
-                pass
+            res = self.__clearCacheForTrans(transID)
+            if res["OK"] and res["Value"]:
+                self._logInfo("Removed cached replicas for transformation", method="pluginCallBack", transID=transID)
@@ -132,18 +132,26 @@ class TransformationPlugin(PluginBase):
 
         fileGroups = getFileGroups(self.data)  # groups by SE
         targetSELfns = {}
+        targetSites = {}
         for replicaSE, lfns in fileGroups.items():
             ses = replicaSE.split(",")
             atSource = (not sourceSEs) or set(ses).intersection(sourceSEs)
             if not atSource:
                 continue
+            if not destinations:
+                # All the files are broadcast to all the targets
+                targetSELfns.setdefault(",".join(sorted(targetSEs)), []).extend(lfns)
+                continue
 
+            groupSourceSites = self._getSitesForSEs(ses)
             for lfn in lfns:
                 targets = []
-                sourceSites = self._getSitesForSEs(ses)
+                sourceSites = list(groupSourceSites)
                 random.shuffle(targetSEs)
                 for targetSE in targetSEs:
-                    site = self._getSiteForSE(targetSE)["Value"]
+                    if targetSE not in targetSites:
+                        targetSites[targetSE] = self._getSiteForSE(targetSE)["Value"]
+                    site = targetSites[targetSE]
                     if site not in sourceSites:
                         if (destinations) and (len(targets) >= destinations):
                             continue
@@ -191,17 +199,24 @@ class TransformationPlugin(PluginBase):
         replicaGroups = res["Value"]
 
         tasks = []
+        # Many tasks have the same SEs: the sites of the SEs, and the SEs of the sites, are looked up once
+        candidateSites = {}
+        siteSEs = {}
         # For the replica groups
         for replicaSE, lfns in replicaGroups:
             possibleSEs = replicaSE.split(",")
+            if replicaSE not in candidateSites:
+                candidateSites[replicaSE] = self._getSitesForSEs(possibleSEs)
             # Determine the next site based on requested shares, existing usage and candidate sites
-            res = self._getNextSite(existingCount, cpuShares, candidates=self._getSitesForSEs(possibleSEs))
+            res = self._getNextSite(existingCount, cpuShares, candidates=candidateSites[replicaSE])
             if not res["OK"]:
                 self.util.logError("Failed to get next destination SE", res["Message"])
                 continue
             targetSite = res["Value"]
             # Resolve the ses for the target site
-            res = getSEsForSite(targetSite)
+            if targetSite not in siteSEs:
+                siteSEs[targetSite] = getSEsForSite(targetSite)
+            res = siteSEs[targetSite]
             if not res["OK"]:
                 continue
             ses = res["Value"]
@@ -3,7 +3,9 @@
 # pylint: disable=protected-access, missing-docstring, invalid-name, line-too-long
 
 # imports
+import concurrent.futures
 import datetime
+import threading
 
 import pytest
 from mock import MagicMock
@@ -13,6 +15,7 @@ from DIRAC.TransformationSystem.Client import TransformationFilesStatus
 # sut
 from DIRAC.TransformationSystem.Agent.TaskManagerAgentBase import TaskManagerAgentBase
 from DIRAC.TransformationSystem.Agent.TransformationAgent import TransformationAgent
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
 
 mockAM = MagicMock()
 
@@ -246,3 +249,119 @@ def test__getTransformationFiles(mocker, transDict, getTFiles, expected):
     tc_mock.getTransformationFiles.return_value = getTFiles
     res = TransformationAgent()._getTransformationFiles(transDict, {"TransformationClient": tc_mock})
     assert res["OK"] == expected
+
+
+def test_getTransformationData(mocker, tmp_path):
+    """The file status updates of a transformation are sent once, with the last status of each file"""
+    mocker.patch("DIRAC.TransformationSystem.Agent.TransformationAgent.AgentModule", side_effect=mockAM)
+    operations = MagicMock()
+    operations.getValue.side_effect = lambda option, default=None: default
+    mocker.patch("DIRAC.TransformationSystem.Agent.TransformationAgent.Operations", return_value=operations)
+    agent = TransformationAgent()
+    agent.controlDirectory = str(tmp_path)
+    agent.replicaCache = ReplicaCache(":memory:")
+    agent.replicaCache.setReplicas(5, {"/a": ["SE-Old"]})
+
+    transClient = MagicMock()
+    transClient.getTransformationFiles.return_value = {
+        "OK": True,
+        "Value": [
+            {"LFN": "/a", "Status": TransformationFilesStatus.PROB_IN_FC},
+            {"LFN": "/b", "Status": TransformationFilesStatus.UNUSED},
+            {"LFN": "/c", "Status": TransformationFilesStatus.UNUSED},
+            {"LFN": "/d", "Status": TransformationFilesStatus.UNUSED},
+        ],
+    }
+    transClient.setFileStatusForTransformation.return_value = {"OK": True, "Value": {}}
+    dataManager = MagicMock()
+    dataManager.getReplicasForJobs.return_value = {
+        "OK": True,
+        "Value": {
+            "Successful": {"/a": {"SE-A": ""}, "/b": {"SE-B": ""}},
+            "Failed": {"/c": "No such file or directory"},
+        },
+    }
+    clients = {"TransformationClient": transClient, "DataManager": dataManager}
+    transDict = {"TransformationID": 5, "Status": "Active", "Type": "MCReconstruction", "Body": ""}
+
+    res = agent.getTransformationData(transDict, clients)
+    assert res["OK"], res["Message"]
+    transData = res["Value"]
+    # The replicas of the files reset Unused are obtained again
+    assert transData["DataReplicas"] == {"/a": ["SE-A"], "/b": ["SE-B"]}
+    assert transData["UnusedFiles"] == 4
+    assert set(transData["StageTimes"]) == {"GetFiles", "GetReplicas", "SetFileStatus"}
+    calls = transClient.setFileStatusForTransformation.call_args_list
+    # The forced reset is sent apart from the other updates
+    assert [(call[0], call[1]) for call in calls] == [
+        (
+            (5, {"/c": TransformationFilesStatus.MISSING_IN_FC, "/d": TransformationFilesStatus.PROB_IN_FC}),
+            {"force": False},
+        ),
+        ((5, {"/a": TransformationFilesStatus.UNUSED}), {"force": True}),
+    ]
+
+    # A file reset Unused which is still problematic keeps its status, the replicas of the others are cached
+    transClient.setFileStatusForTransformation.reset_mock()
+    dataManager.getReplicasForJobs.return_value = {"OK": True, "Value": {"Successful": {}, "Failed": {}}}
+    res = agent.getTransformationData(transDict, clients)
+    assert res["OK"], res["Message"]
+    transClient.setFileStatusForTransformation.assert_called_once_with(
+        5,
+        {
+            "/a": TransformationFilesStatus.PROB_IN_FC,
+            "/c": TransformationFilesStatus.PROB_IN_FC,
+            "/d": TransformationFilesStatus.PROB_IN_FC,
+        },
+        force=False,
+    )
+
+
+@pytest.mark.parametrize("prefetchDepth", [0, 1, 3])
+def test_executePipelined(mocker, prefetchDepth):
+    """The transformations are prefetched, and processed with their prefetched data"""
+    mocker.patch("DIRAC.TransformationSystem.Agent.TransformationAgent.AgentModule", side_effect=mockAM)
+    agent = TransformationAgent()
+    transformations = [{"TransformationID": transID} for transID in range(1, 9)]
+    agent.getTransformations = MagicMock(return_value={"OK": True, "Value": transformations})
+    agent._getClients = MagicMock(return_value={})
+    agent.pipelined = True
+    agent.prefetchDepth = prefetchDepth
+    agent.prefetchExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    agent.threadPoolExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+    lock = threading.Lock()
+    prefetched = set()
+    maxPrefetched = []
+
+    def getTransformationData(transDict, clients):
+        transID = transDict["TransformationID"]
+        # Nothing to process for the transformation 4
+        if transID == 4:
+            return {"OK": True, "Value": None}
+        with lock:
+            prefetched.add(transID)
+            maxPrefetched.append(len(prefetched))
+        return {"OK": True, "Value": {"TransID": transID, "StageTimes": {"GetFiles": 1.0}}}
+
+    processed = []
+
+    def processTransformation(transDict, clients, transData=None):
+        with lock:
+            prefetched.discard(transDict["TransformationID"])
+        assert transData["TransID"] == transDict["TransformationID"]
+        agent._addStageTimes(transDict["TransformationID"], transData["StageTimes"])
+        processed.append(transDict["TransformationID"])
+        return {"OK": True, "Value": None}
+
+    agent.getTransformationData = getTransformationData
+    agent.processTransformation = processTransformation
+    try:
+        assert agent.execute()["OK"]
+    finally:
+        agent.prefetchExecutor.shutdown()
+        agent.threadPoolExecutor.shutdown()
+    assert sorted(processed) == [1, 2, 3, 5, 6, 7, 8]
+    # At most PrefetchDepth transformations are waiting, besides the ones being processed
+    assert max(maxPrefetched) <= max(1, prefetchDepth) + 2
+    assert agent.stageTimes == {"GetFiles": 7.0}
@@ -0,0 +1,185 @@
+""" Columnar grouping of the input files of the transformation plugins
+
+    The files are held in arrays: their LFNs, the ID of their set of SEs (the distinct sorted tuples of SE names
+    being hashed once) and their sizes. The grouping by set of SEs, then by SE, selects the files still to be used
+    with boolean masks, and the tasks are cut from the arrays of file indices, so that no per-file loop is needed.
+
+    The tasks are the same, in the same order, as the ones of PluginUtilities.groupByReplicas, groupBySize
+    and createTasksBySize.
+"""
+import math
+
+import numpy as np
+
+
+def _splitBySize(sizes, files, groupSize, maxFiles, flush):
+    """Cut files into tasks by size, as PluginUtilities.createTasksBySize
+
+    The files are considered by increasing size, a file larger than groupSize makes a task alone.
+    Otherwise a task is created when its size exceeds groupSize or when it has maxFiles files
+
+    :param sizes: array of the sizes of all the files
+    :param files: array of the indices of the files to consider
+    :return: the indices of the files in tasks, in the order of the tasks, and the list of the boundaries
+             of the tasks in this array
+    """
+    files = files[np.argsort(sizes[files], kind="stable")]
+    fileSizes = sizes[files]
+    small = files[(fileSizes > 0) & (fileSizes <= groupSize)]
+    large = files[fileSizes > groupSize]
+    # For each file, the last file of a task starting with it: the first one for which the size of the task
+    # exceeds groupSize, or which makes maxFiles files. The comparison is exact for integer sizes
+    cumSizes = np.cumsum(sizes[small])
+    limits = np.concatenate((np.zeros(1, dtype=cumSizes.dtype), cumSizes[:-1]))
+    limits += math.floor(groupSize) if np.issubdtype(limits.dtype, np.integer) else groupSize
+    first = np.arange(len(small))
+    lasts = np.maximum(first, np.minimum(np.searchsorted(cumSizes, limits, side="right"), first + maxFiles - 1))
+    lasts = lasts.tolist()
+    bounds = [0]
+    while bounds[-1] < len(small) and lasts[bounds[-1]] < len(small):
+        bounds.append(lasts[bounds[-1]] + 1)
+    nSmall = bounds[-1]
+    # The files larger than groupSize come after all the others, each in its own task
+    bounds += range(nSmall + 1, nSmall + len(large) + 1)
+    taskFiles = [small[:nSmall], large]
+    if flush and nSmall < len(small):
+        taskFiles.append(small[nSmall:])
+        bounds.append(len(large) + len(small))
+    return np.concatenate(taskFiles), bounds
+
+
+def splitBySize(lfns, fileSizes, groupSize, maxFiles, flush):
+    """Cut a list of files into tasks by size, as PluginUtilities.createTasksBySize
+
+    :param list lfns: LFNs of the files
+    :param dict fileSizes: { lfn: size }, the files without size are not used
+    :param float groupSize: size of the tasks
+    :param int maxFiles: maximum number of files per task
+    :param bool flush: create a task with the files left
+
+    :return: list of lists of LFNs
+    """
+    sizes = np.array([fileSizes.get(lfn) or 0 for lfn in lfns])
+    if not len(sizes):
+        return []
+    taskFiles, bounds = _splitBySize(sizes, np.arange(len(lfns)), groupSize, maxFiles, flush)
+    taskLfns = np.array(lfns, dtype=object)[taskFiles].tolist()
+    return [taskLfns[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+class FileGroups(object):
+    """Files grouped by their set of SEs, from which the tasks are created"""
+
+    def __init__(self, fileReplicas, fileSizes=None):
+        """c'tor
+
+        :param dict fileReplicas: { lfn: [SEs] }, the files without replicas are ignored
+        :param dict fileSizes: { lfn: size } if the tasks are created by size, the files without size are not used
+        """
+        replicas = list(map(tuple, fileReplicas.values()))
+        # The same replicas, in any order and maybe repeated, are the same set of SEs
+        replicaIDs = dict.fromkeys(replicas)
+        seSetIDs = {}
+        for key in replicaIDs:
+            seSet = tuple(sorted(set(key)))
+            replicaIDs[key] = seSetIDs.setdefault(seSet, len(seSetIDs)) if seSet else -1
+        self.seSets = list(seSetIDs)
+        groupIDs = np.fromiter(map(replicaIDs.__getitem__, replicas), dtype=np.int64, count=len(replicas))
+        withReplicas = groupIDs >= 0
+        self.lfns = np.array(list(fileReplicas), dtype=object)[withReplicas]
+        self.groupIDs = groupIDs[withReplicas]
+        self.sizes = None
+        if fileSizes is not None:
+            sizes = np.array([fileSizes.get(lfn) or 0 for lfn in self.lfns.tolist()])
+            self.sizes = sizes if len(sizes) else np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.lfns)
+
+    def __groupFiles(self):
+        """Get the indices of the files of each set of SEs, in the order of the files"""
+        order = np.argsort(self.groupIDs, kind="stable")
+        bounds = np.cumsum(np.bincount(self.groupIDs, minlength=len(self.seSets)))[:-1]
+        return np.split(order, bounds)
+
+    def __addTasks(self, tasks, inTask, key, taskMaker, files):
+        """Add the tasks made from some files, and mark these files as used"""
+        taskFiles, bounds = taskMaker(files)
+        if not len(taskFiles):
+            return
+        inTask[taskFiles] = True
+        lfns = self.lfns[taskFiles].tolist()
+        tasks.extend((key, lfns[start:end]) for start, end in zip(bounds[:-1], bounds[1:]))
+
+    def __createTasks(self, sortKeys, sortSEs, taskMaker):
+        """Create the tasks for the files of each set of SEs, then of each SE for the files left
+
+        :param callable sortKeys: sorts the keys of the sets of SEs (the SE names joined by ",")
+        :param callable sortSEs: sorts the SE names
+        :param callable taskMaker: for an array of file indices, returns the indices of the files in tasks, in the
+                                   order of the tasks, and the list of the boundaries of the tasks in this array
+
+        :return: list of (SE names, list of LFNs) tuples
+        """
+        tasks = []
+        inTask = np.zeros(len(self.lfns), dtype=bool)
+        if not len(self.lfns):
+            return tasks
+
+        # Consider files by groups of SEs, a file is only in one group
+        groupFiles = self.__groupFiles()
+        groups = {",".join(seSet): files for seSet, files in zip(self.seSets, groupFiles) if len(files)}
+        for key in sortKeys(list(groups)):
+            self.__addTasks(tasks, inTask, key, taskMaker, groups[key])
+        if inTask.all():
+            return tasks
+
+        # Then consider files SE by SE, but a file can now be at more than one SE
+        seFiles = {}
+        for seSet, files in zip(self.seSets, groupFiles):
+            files = files[~inTask[files]]
+            if len(files):
+                for se in seSet:
+                    seFiles.setdefault(se, []).append(files)
+        seFiles = {se: np.sort(np.concatenate(files)) for se, files in seFiles.items()}
+        for se in sortSEs(list(seFiles)):
+            files = seFiles[se]
+            self.__addTasks(tasks, inTask, se, taskMaker, files[~inTask[files]])
+        return tasks
+
+    def groupByReplicas(self, groupSize, flush, sortSEs):
+        """Create tasks with a given number of files at the same SEs
+
+        :param int groupSize: number of files per task
+        :param bool flush: create tasks with less than groupSize files
+        :param callable sortSEs: sorts the keys of the groups, e.g. Utilities.sortSEs
+
+        :return: list of (SE names, list of LFNs) tuples
+        """
+
+        def taskMaker(files):
+            nFiles = len(files) if flush else len(files) // groupSize * groupSize
+            return files[:nFiles], list(range(0, nFiles, groupSize)) + [nFiles]
+
+        return self.__createTasks(sortSEs, sortSEs, taskMaker)
+
+    def groupBySize(self, groupSize, maxFiles, flush, sortSEs):
+        """Create tasks with a given amount of data at the same SEs, as PluginUtilities.createTasksBySize
+
+        The files are considered by increasing size, a file larger than groupSize makes a task alone.
+        Otherwise a task is created when its size exceeds groupSize or when it has maxFiles files
+
+        :param float groupSize: size of the tasks
+        :param int maxFiles: maximum number of files per task
+        :param bool flush: create a task with the files left
+        :param callable sortSEs: sorts the SE names, e.g. Utilities.sortSEs
+
+        :return: list of (SE names, list of LFNs) tuples
+        """
+        if self.sizes is None:
+            raise ValueError("File sizes are needed to group by size")
+
+        def taskMaker(files):
+            return _splitBySize(self.sizes, files, groupSize, maxFiles, flush)
+
+        return self.__createTasks(sorted, sortSEs, taskMaker)
@@ -22,6 +22,13 @@ from DIRAC.Resources.Catalog.FileCatalog import FileCatalog
 from DIRAC.Resources.Storage.StorageElement import StorageElement
 from DIRAC.TransformationSystem.Client.TransformationClient import TransformationClient
 
+try:
+    # numpy is only a dependency of the server installations
+    from DIRAC.TransformationSystem.Client.FileGroups import FileGroups, splitBySize
+except ImportError:
+    FileGroups = None
+    splitBySize = None
+
 
 class PluginUtilities(object):
     """
@@ -58,6 +65,8 @@ class PluginUtilities(object):
         self.cachedLFNSize = {}
         self.transString = ""
         self.debug = debug
+        # Group the files with the columnar FileGroups if available, else file by file
+        self.useFileGroups = FileGroups is not None
 
         self.log = gLogger.getSubLogger(self.plugin + self.transID)
         # FIXME: This doesn't work (yet) but should soon, will allow scripts to get the context
@@ -124,6 +133,10 @@ class PluginUtilities(object):
             self.groupSize = self.getPluginParam("GroupSize", 10)
         flush = status == "Flush"
         self.logVerbose("groupByReplicas: %d files, groupSize %d, flush %s" % (len(files), self.groupSize, flush))
+        if self.useFileGroups:
+            tasks = FileGroups(files).groupByReplicas(self.groupSize, flush, sortSEs)
+            self.logVerbose("groupByReplicas: %d tasks created" % len(tasks))
+            return S_OK(tasks)
 
         # Consider files by groups of SEs, a file is only in one group
         # Then consider files site by site, but a file can now be at more than one site
@@ -176,21 +189,30 @@ class PluginUtilities(object):
         if not self.maxFiles:
             # FIXME: prepare for chaging the name of the ambiguoug  CS option
             self.maxFiles = self.getPluginParam("MaxFilesPerTask", self.getPluginParam("MaxFiles", 100))
-        lfns = sorted(lfns, key=fileSizes.get)
-        for lfn in lfns:
-            size = fileSizes.get(lfn, 0)
-            if size:
-                if size > self.groupSize:
-                    tasks.append((replicaSE, [lfn]))
-                else:
-                    taskSize += size
-                    taskLfns.append(lfn)
-                    if (taskSize > self.groupSize) or (len(taskLfns) >= self.maxFiles):
-                        tasks.append((replicaSE, taskLfns))
-                        taskLfns = []
-                        taskSize = 0
-        if flush and taskLfns:
-            tasks.append((replicaSE, taskLfns))
+        if self.useFileGroups:
+            tasks = [
+                (replicaSE, lfnList)
+                for lfnList in splitBySize(list(lfns), fileSizes, self.groupSize, self.maxFiles, flush)
+            ]
+            if not tasks and not flush:
+                taskLfns = [lfn for lfn in lfns if fileSizes.get(lfn)]
+                taskSize = sum(fileSizes[lfn] for lfn in taskLfns)
+        else:
+            lfns = sorted(lfns, key=fileSizes.get)
+            for lfn in lfns:
+                size = fileSizes.get(lfn, 0)
+                if size:
+                    if size > self.groupSize:
+                        tasks.append((replicaSE, [lfn]))
+                    else:
+                        taskSize += size
+                        taskLfns.append(lfn)
+                        if (taskSize > self.groupSize) or (len(taskLfns) >= self.maxFiles):
+                            tasks.append((replicaSE, taskLfns))
+                            taskLfns = []
+                            taskSize = 0
+            if flush and taskLfns:
+                tasks.append((replicaSE, taskLfns))
         if not tasks and not flush and taskLfns:
             self.logVerbose(
                 "Not enough data to create a task, and flush not set (%d bytes for groupSize %d)"
@@ -223,6 +245,17 @@ class PluginUtilities(object):
             return res
         fileSizes = res["Value"]
 
+        if self.useFileGroups:
+            if not self.maxFiles:
+                self.maxFiles = self.getPluginParam("MaxFilesPerTask", self.getPluginParam("MaxFiles", 100))
+            tasks = FileGroups(files, fileSizes=fileSizes).groupBySize(self.groupSize, self.maxFiles, flush, sortSEs)
+            lfnsInTasks = [lfn for _se, lfns in tasks for lfn in lfns]
+            # Remove the selected files from the size cache
+            self.clearCachedFileSize(lfnsInTasks)
+            self.logVerbose("groupBySize: %d tasks created" % len(tasks))
+            self.logVerbose("groupBySize: %d files have not been included in tasks" % (len(files) - len(lfnsInTasks)))
+            return S_OK(tasks)
+
         for groupSE in (True, False):
             if not files:
                 break
@@ -320,8 +353,8 @@ class PluginUtilities(object):
 
     def clearCachedFileSize(self, lfns):
         """Utility function"""
-        for lfn in [lfn for lfn in lfns if lfn in self.cachedLFNSize]:
-            self.cachedLFNSize.pop(lfn)
+        for lfn in lfns:
+            self.cachedLFNSize.pop(lfn, None)
 
     def getPluginParam(self, name, default=None):
         """Get plugin parameters using specific settings or settings defined in the CS
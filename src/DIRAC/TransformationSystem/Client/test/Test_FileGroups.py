@@ -0,0 +1,105 @@
+""" Test the columnar grouping of the plugins: it creates the same tasks as the grouping file by file
+"""
+# pylint: disable=protected-access
+import random
+
+import pytest
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.TransformationSystem.Client.FileGroups import FileGroups
+from DIRAC.TransformationSystem.Client.Utilities import PluginUtilities
+
+# Tape SEs are ordered after the disk ones by sortSEs
+SES = ["CERN-DST", "CNAF-DST", "RAL-DST", "CERN-RAW", "PIC-RAW"]
+
+
+def getRandomFiles(rng, nFiles):
+    """Files at 1 to 3 SEs (the replicas in any order, maybe repeated), with sizes, some missing or too large"""
+    fileReplicas = {}
+    fileSizes = {}
+    for index in range(nFiles):
+        lfn = "/vo/data/%06d/file_%d.dst" % (rng.randint(0, nFiles), index)
+        fileReplicas[lfn] = [rng.choice(SES) for _ in range(rng.randint(0, 3))]
+        size = rng.choice([0, 1, rng.randint(1, 1000), rng.randint(1, 1000), 5000])
+        if size:
+            fileSizes[lfn] = size
+    return fileReplicas, fileSizes
+
+
+@pytest.fixture
+def pluginUtilities(mocker):
+    def storageElement(se):
+        seMock = MagicMock()
+        seMock.status.return_value = {"DiskSE": se.endswith("DST")}
+        return seMock
+
+    mocker.patch("DIRAC.TransformationSystem.Client.Utilities.StorageElement", side_effect=storageElement)
+    mocker.patch("DIRAC.TransformationSystem.Client.Utilities.DMSHelpers")
+    return PluginUtilities(transClient=MagicMock(), dataManager=MagicMock(), fc=MagicMock())
+
+
+def groupFiles(pluginUtilities, method, useFileGroups, fileReplicas, fileSizes, status, groupSize, maxFiles=0):
+    pluginUtilities.useFileGroups = useFileGroups
+    pluginUtilities.groupSize = groupSize
+    pluginUtilities.maxFiles = maxFiles
+    pluginUtilities.cachedLFNSize = {}
+    pluginUtilities.fc.getFileSize.return_value = S_OK({"Successful": dict(fileSizes), "Failed": {}})
+    result = getattr(pluginUtilities, method)(fileReplicas, status)
+    assert result["OK"], result["Message"]
+    return result["Value"], sorted(pluginUtilities.cachedLFNSize)
+
+
+@pytest.mark.parametrize("status", ["Active", "Flush"])
+@pytest.mark.parametrize("groupSize", [1, 3, 10])
+def test_groupByReplicas(pluginUtilities, status, groupSize):
+    rng = random.Random(groupSize)
+    for _ in range(20):
+        fileReplicas, fileSizes = getRandomFiles(rng, rng.randint(0, 200))
+        args = (fileReplicas, fileSizes, status, groupSize)
+        assert groupFiles(pluginUtilities, "groupByReplicas", True, *args) == groupFiles(
+            pluginUtilities, "groupByReplicas", False, *args
+        )
+
+
+@pytest.mark.parametrize("status", ["Active", "Flush"])
+@pytest.mark.parametrize("groupSize, maxFiles", [(1000, 100), (1000, 5), (2000.5, 10), (1, 3)])
+def test_groupBySize(pluginUtilities, status, groupSize, maxFiles):
+    rng = random.Random(maxFiles)
+    for _ in range(20):
+        fileReplicas, fileSizes = getRandomFiles(rng, rng.randint(0, 200))
+        # The grouping file by file cannot sort files without size with the others
+        fileReplicas = {lfn: ses for lfn, ses in fileReplicas.items() if lfn in fileSizes}
+        args = (fileReplicas, fileSizes, status, groupSize, maxFiles)
+        tasks, cachedLFNs = groupFiles(pluginUtilities, "groupBySize", True, *args)
+        assert (tasks, cachedLFNs) == groupFiles(pluginUtilities, "groupBySize", False, *args)
+
+
+@pytest.mark.parametrize("flush", [True, False])
+@pytest.mark.parametrize("groupSize, maxFiles", [(1000, 100), (1000, 5), (2000.5, 10), (1, 3)])
+def test_createTasksBySize(pluginUtilities, flush, groupSize, maxFiles):
+    rng = random.Random(maxFiles)
+    for _ in range(20):
+        _fileReplicas, fileSizes = getRandomFiles(rng, rng.randint(0, 50))
+        pluginUtilities.groupSize = groupSize
+        pluginUtilities.maxFiles = maxFiles
+        tasks = {}
+        for useFileGroups in (True, False):
+            pluginUtilities.useFileGroups = useFileGroups
+            tasks[useFileGroups] = pluginUtilities.createTasksBySize(list(fileSizes), "SE1", fileSizes, flush)
+        assert tasks[True] == tasks[False]
+
+
+def test_fileGroups():
+    fileGroups = FileGroups({"/a": ["SE2", "SE1"], "/b": [], "/c": ["SE1", "SE2", "SE1"], "/d": ["SE3"]})
+    assert len(fileGroups) == 3
+    assert fileGroups.seSets == [("SE1", "SE2"), ("SE3",)]
+    assert fileGroups.groupByReplicas(2, False, sorted) == [("SE1,SE2", ["/a", "/c"])]
+    # By size: a file too large makes a task alone, the others until the size is exceeded
+    fileGroups = FileGroups(
+        {"/%d" % size: ["SE1"] for size in (5, 1, 20, 3, 2)}, {"/%d" % s: s for s in (5, 1, 20, 3, 2)}
+    )
+    assert fileGroups.groupBySize(5, 10, False, sorted) == [("SE1", ["/1", "/2", "/3"]), ("SE1", ["/20"])]
+    assert fileGroups.groupBySize(5, 10, True, sorted)[-1] == ("SE1", ["/5"])
+    with pytest.raises(ValueError):
+        FileGroups({"/a": ["SE1"]}).groupBySize(5, 10, False, sorted)
@@ -21,9 +21,11 @@ from DIRAC.Core.Utilities.List import stringListToString, intListToString, break
 from DIRAC.Core.Utilities.Shifter import setupShifterProxyInEnv
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Utilities.Subprocess import pythonCall
-from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.MetaQueryFilterIndex import MetaQueryFilterIndex
 
 MAX_ERROR_COUNT = 10
+# Statuses of the transformations whose input meta query is used to filter the new files
+FILTER_STATUSES = ["New", "Active", "Stopped", "Flush", "Completing"]
 
 #############################################################################
 
@@ -111,6 +113,11 @@ class TransformationDB(DB):
 
         # Intialize filter Queries with Input Meta Queries
         self.filterQueries = []
+        # The filter index is rebuilt when the queries or the statuses change, and at least every filterIndexLifeTime
+        self.filterIndexLifeTime = 600
+        self.__filterIndex = MetaQueryFilterIndex()
+        self.__filterIndexTime = 0
+        self.__filterIndexLock = threading.Lock()
         res = self.__updateFilterQueries()
         if not res["OK"]:
             gLogger.fatal("Failed to create filter queries")
@@ -206,10 +213,6 @@ class TransformationDB(DB):
                 gLogger.error("Failed to add output meta query to the transformation", res["Message"])
                 return self.deleteTransformation(transID, connection=connection)
 
-        # If the transformation has an input data specification
-        if inputMetaQuery:
-            self.filterQueries.append((transID, inputMetaQuery))
-
         if inheritedFrom:
             res = self._getTransformationID(inheritedFrom, connection=connection)
             if not res["OK"]:
@@ -412,7 +415,11 @@ class TransformationDB(DB):
             paramValue,
             transID,
         )
-        return self._update(req, connection)
+        res = self._update(req, connection)
+        # The index is rebuilt with the new status only once it is in the DB
+        if res["OK"] and paramName == "Status":
+            self.invalidateFilterIndex()
+        return res
 
     def _getTransformationID(self, transName, connection=False):
         """Method returns ID of transformation with the name=<name>"""
@@ -440,24 +447,53 @@ class TransformationDB(DB):
 
     def __updateFilterQueries(self, connection=False):
         """Get filters for all defined input streams in all the transformations."""
-        resultList = []
-        res = self.getTransformations(
-            condDict={"Status": ["New", "Active", "Stopped", "Flush", "Completing"]}, connection=connection
+        req = "SELECT q.TransformationID, q.MetaDataName, q.MetaDataValue, q.MetaDataType"
+        req += " FROM TransformationMetaQueries q, Transformations t"
+        req += " WHERE q.TransformationID = t.TransformationID AND q.QueryType = 'Input' AND t.Status IN (%s)" % (
+            stringListToString(FILTER_STATUSES)
         )
+        req += " ORDER BY q.TransformationID"
+        res = self._query(req, connection)
         if not res["OK"]:
             return res
 
-        transIDs = res["Value"]
-        for transDict in transIDs:
-            transID = str(transDict["TransformationID"])
-            res = self.getTransformationMetaQuery(transID, "Input")
-            if not res["OK"]:
-                continue
-            resultList.append((transID, res["Value"]))
+        queryRows = {}
+        for row in res["Value"]:
+            queryRows.setdefault(row[0], []).append(row[1:])
+        resultList = [(str(transID), self.__getMetaQueryDict(rows)) for transID, rows in queryRows.items()]
 
         self.filterQueries = resultList
         return S_OK(resultList)
 
+    def invalidateFilterIndex(self):
+        """Have the filter index rebuilt before it is used next"""
+        self.__filterIndexTime = 0
+
+    def __getFilterIndex(self):
+        """Get the index of the input meta queries of the transformations, rebuilt if it is out of date"""
+        with self.__filterIndexLock:
+            if time.time() - self.__filterIndexTime < self.filterIndexLifeTime:
+                return S_OK(self.__filterIndex)
+            # Changes made while the index is rebuilt invalidate it again
+            self.__filterIndexTime = time.time()
+            res = self.__updateFilterQueries()
+            if not res["OK"]:
+                self.__filterIndexTime = 0
+                return res
+            res = FileCatalog().getMetadataFields()
+            if not res["OK"]:
+                gLogger.error("Error in getMetadataFields: %s" % res["Message"])
+                self.__filterIndexTime = 0
+                return res
+            if not res["Value"]:
+                gLogger.error("Error: no metadata fields defined")
+                self.__filterIndexTime = 0
+                return res
+            typeDict = dict(res["Value"]["FileMetaFields"])
+            typeDict.update(res["Value"]["DirectoryMetaFields"])
+            self.__filterIndex.compile(self.filterQueries, typeDict)
+            return S_OK(self.__filterIndex)
+
     ###########################################################################
     #
     # These methods manipulate the AdditionalParameters tables
@@ -1160,6 +1196,8 @@ class TransformationDB(DB):
             else:
                 message = "Added meta data query"
 
+        if queryType == "Input":
+            self.invalidateFilterIndex()
         self.__updateTransformationLogging(transID, message, author, connection=connection)
         return res
 
@@ -1178,6 +1216,7 @@ class TransformationDB(DB):
         res = self._update(req, connection)
         if not res["OK"]:
             return res
+        self.invalidateFilterIndex()
         if res["Value"]:
             # Add information to the transformation logging
             message = "Deleted meta data query"
@@ -1207,8 +1246,16 @@ class TransformationDB(DB):
         res = self._query(req, connection)
         if not res["OK"]:
             return res
+        queryDict = self.__getMetaQueryDict(res["Value"])
+        if not queryDict:
+            return S_ERROR(ENOENT, "No MetaQuery found for transformation")
+        return S_OK(queryDict)
+
+    @staticmethod
+    def __getMetaQueryDict(rows):
+        """Build a meta query dictionary from the (MetaDataName, MetaDataValue, MetaDataType) rows of a query"""
         queryDict = {}
-        for parameterName, parameterValue, parameterType in res["Value"]:
+        for parameterName, parameterValue, parameterType in rows:
             if re.search(";;;", str(parameterValue)):
                 parameterValue = parameterValue.split(";;;")
                 if parameterType == "Integer":
@@ -1218,9 +1265,7 @@ class TransformationDB(DB):
             elif parameterType == "Dict":
                 parameterValue = eval(parameterValue)
             queryDict[parameterName] = parameterValue
-        if not queryDict:
-            return S_ERROR(ENOENT, "No MetaQuery found for transformation")
-        return S_OK(queryDict)
+        return queryDict
 
     ###########################################################################
     #
@@ -1491,6 +1536,7 @@ class TransformationDB(DB):
         res = self.__deleteTransformationMetaQueries(transID, connection=connection)
         if not res["OK"]:
             return res
+        self.invalidateFilterIndex()
 
         self.__updateTransformationLogging(transID, "Transformation Cleaned", author, connection=connection)
 
@@ -1513,9 +1559,6 @@ class TransformationDB(DB):
         if not res["OK"]:
             return res
         res = self.__deleteTransformation(transID, connection=connection)
-        if not res["OK"]:
-            return res
-        res = self.__updateFilterQueries(connection=connection)
         if not res["OK"]:
             return res
         return S_OK()
@@ -1585,46 +1628,52 @@ class TransformationDB(DB):
         successful = {}
         failed = {}
         # Determine which files pass the filters and are to be added to transformations
-        transFiles = {}
-        filesToAdd = []
+        filesMetadata = {}
         catalog = FileCatalog()
 
         for lfn in fileDicts:
-            gLogger.info("addFile: Attempting to add file %s" % lfn)
+            gLogger.verbose("addFile: Attempting to add file %s" % lfn)
             res = catalog.getFileUserMetadata(lfn)
             if not res["OK"]:
                 gLogger.error("Failed to getFileUserMetadata for file", "%s: %s" % (lfn, res["Message"]))
                 failed[lfn] = res["Message"]
                 continue
-            else:
-                metadatadict = res["Value"]
-            gLogger.info("Filter file with metadata", metadatadict)
-            transIDs = self._filterFileByMetadata(metadatadict)
-            gLogger.info("Transformations passing the filter: %s" % transIDs)
-            if not (transIDs or force):  # not clear how force should be used for
-                successful[lfn] = False  # True -> False bug fix: otherwise it is set to True even if transIDs is empty.
-            else:
-                filesToAdd.append(lfn)
-                for trans in transIDs:
-                    if trans not in transFiles:
-                        transFiles[trans] = []
-                    transFiles[trans].append(lfn)
-
-            # Add the files to the transformations
-            gLogger.info("Files to add to transformations:", filesToAdd)
-            if filesToAdd:
-                for transID, lfns in transFiles.items():
-                    res = self.addFilesToTransformation(transID, lfns)
-                    if not res["OK"]:
-                        gLogger.error("Failed to add files to transformation", "%s %s" % (transID, res["Message"]))
-                        return res
-                    else:
-                        for lfn in lfns:
-                            successful[lfn] = True
+            filesMetadata[lfn] = res["Value"]
+
+        res = self.filterFilesByMetadata(filesMetadata)
+        if not res["OK"]:
+            return res
+        transFiles = res["Value"]
+        gLogger.info("Transformations passing the filter: %s" % list(transFiles))
+        for lfn in filesMetadata:
+            # not clear how force should be used for
+            if not force:
+                successful[lfn] = False
+
+        # Add the files to the transformations
+        for transID, lfns in transFiles.items():
+            res = self.addFilesToTransformation(transID, lfns)
+            if not res["OK"]:
+                gLogger.error("Failed to add files to transformation", "%s %s" % (transID, res["Message"]))
+                return res
+            for lfn in lfns:
+                successful[lfn] = True
 
         res = S_OK({"Successful": successful, "Failed": failed})
         return res
 
+    def filterFilesByMetadata(self, filesMetadata):
+        """Route a batch of files to the transformations whose input meta query they satisfy
+
+        :param dict filesMetadata: { lfn: metadataDict }
+
+        :return: S_OK with { transID: [lfns] }
+        """
+        res = self.__getFilterIndex()
+        if not res["OK"]:
+            return res
+        return res["Value"].matchBulk(filesMetadata)
+
     def removeFile(self, lfns, connection=False):
         """Remove file specified by lfn from the ProcessingDB"""
         gLogger.info("TransformationDB.removeFile: Attempting to remove %s files." % len(lfns))
@@ -1753,37 +1802,7 @@ class TransformationDB(DB):
 
     def _filterFileByMetadata(self, metadatadict):
         """Pass the input metadatadict through those currently active"""
-        transIDs = []
-        queries = self.filterQueries
-
-        catalog = FileCatalog()
-        gLogger.info("Filter file by queries", queries)
-        res = catalog.getMetadataFields()
-
+        res = self.__getFilterIndex()
         if not res["OK"]:
-            gLogger.error("Error in getMetadataFields: %s" % res["Message"])
-            return res
-        if not res["Value"]:
-            gLogger.error("Error: no metadata fields defined")
             return res
-        typeDict = res["Value"]["FileMetaFields"]
-        typeDict.update(res["Value"]["DirectoryMetaFields"])
-
-        for transID, query in queries:
-            gLogger.info("Check the transformation status")
-            res = self.getTransformationParameters(transID, "Status")
-            if res["Value"] not in ["New", "Active", "Stopped", "Completing", "Flush"]:
-                continue
-            mq = MetaQuery(query, typeDict)
-            gLogger.info("Apply query %s to metadata %s" % (mq.getMetaQuery(), metadatadict))
-            res = mq.applyQuery(metadatadict)
-            if not res["OK"]:
-                gLogger.error("Error in applying query: %s" % res["Message"])
-                return res
-            elif res["Value"]:
-                gLogger.info("Apply query result is True")
-                transIDs.append(transID)
-            else:
-                gLogger.info("Apply query result is False")
-
-        return transIDs
+        return res["Value"].match(metadatadict)
@@ -434,6 +434,16 @@ class TransformationManagerHandlerMixin:
         """Set metadata to a file or to a directory (path)"""
         return cls.transformationDB.setMetadata(path, querydict)
 
+    types_filterFilesByMetadata = [dict]
+
+    @classmethod
+    def export_filterFilesByMetadata(cls, filesMetadata):
+        """Get the transformations whose input meta query the files pass
+
+        Interface provides { LFN1 : { metaName : value, ... }, ... } and returns { transID : [ LFN1, ... ] }
+        """
+        return cls.transformationDB.filterFilesByMetadata(filesMetadata)
+
     ####################################################################
     #
     # These are the methods used for web monitoring
@@ -0,0 +1,154 @@
+""" Index of the input meta queries of the transformations, used to route the new files
+
+    The meta queries are compiled once into MetaQuery objects. Each query having an equality condition
+    (value, list of values, "=" or "in") is indexed by the typed values of its most selective one, in an
+    inverted index { metaName: { value: set of transformations } }. The candidate transformations for the
+    metadata of a file are the ones found in the index for its values, plus the ones without indexed condition,
+    and only these candidates evaluate their full query.
+"""
+from DIRAC import S_OK, gLogger
+import DIRAC.Core.Utilities.Time as Time
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+
+
+def getTypedValue(value, mtype):
+    """Convert a metadata value to its type, as MetaQuery.applyQuery does"""
+    if mtype[0:3].lower() == "int":
+        return int(value)
+    elif mtype[0:5].lower() == "float":
+        return float(value)
+    elif mtype[0:4].lower() == "date":
+        return Time.fromString(value)
+    return value
+
+
+class MetaQueryFilterIndex(object):
+    """Inverted index of the transformation input meta queries"""
+
+    def __init__(self, filterQueries=None, typeDict=None):
+        """c'tor
+
+        :param list filterQueries: (transID, queryDict) tuples, in the order the matching transformations are returned
+        :param dict typeDict: { metaName: type } of the metadata fields of the catalog
+        """
+        self.log = gLogger.getSubLogger("MetaQueryFilterIndex")
+        self.__queries = []
+        self.__index = {}
+        self.__unindexed = set()
+        self.compile(filterQueries or [], typeDict or {})
+
+    def compile(self, filterQueries, typeDict):
+        """Compile the queries and rebuild the index
+
+        :param list filterQueries: (transID, queryDict) tuples
+        :param dict typeDict: { metaName: type } of the metadata fields of the catalog
+        """
+        queries = []
+        index = {}
+        unindexed = set()
+        for position, (transID, queryDict) in enumerate(filterQueries):
+            queries.append((transID, MetaQuery(queryDict, typeDict)))
+            key = self.__getIndexKey(queryDict, typeDict)
+            if key is None:
+                unindexed.add(position)
+                continue
+            metaName, values = key
+            for value in values:
+                index.setdefault(metaName, {}).setdefault(value, set()).add(position)
+        self.__queries = queries
+        self.__index = index
+        self.__unindexed = unindexed
+        self.__typeDict = typeDict
+        self.log.verbose(
+            "Compiled transformation input queries", "%d queries, %d not indexed" % (len(queries), len(unindexed))
+        )
+
+    @staticmethod
+    def __getIndexKey(queryDict, typeDict):
+        """Get the most selective equality condition of a query
+
+        :return: (metaName, typed values) or None if the query has no equality condition
+        """
+        bestKey = None
+        for metaName in sorted(queryDict):
+            if metaName not in typeDict:
+                continue
+            value = queryDict[metaName]
+            if isinstance(value, dict):
+                # With several conditions, all of them are required
+                value = value.get("=", value.get("in"))
+                if value is None:
+                    continue
+            values = value if isinstance(value, (list, tuple)) else [value]
+            if not values or any(str(val).lower() in ("any", "missing") for val in values):
+                continue
+            try:
+                values = {getTypedValue(val, typeDict[metaName]) for val in values}
+            except (ValueError, TypeError):
+                continue
+            if bestKey is None or len(values) < len(bestKey[1]):
+                bestKey = (metaName, values)
+        return bestKey
+
+    def __len__(self):
+        return len(self.__queries)
+
+    def __getCandidates(self, metadataDict):
+        """Get the positions of the queries which can match some metadata"""
+        candidates = set(self.__unindexed)
+        for metaName, valueIndex in self.__index.items():
+            userValue = metadataDict.get(metaName)
+            if userValue is None:
+                continue
+            try:
+                candidates.update(valueIndex.get(getTypedValue(userValue, self.__typeDict[metaName]), ()))
+            except (ValueError, TypeError):
+                # Such values do not satisfy any equality condition
+                continue
+        return candidates
+
+    def match(self, metadataDict):
+        """Get the transformations whose input query is satisfied by some metadata
+
+        :param dict metadataDict: { metaName: value } metadata of a file
+
+        :return: list of transformation IDs, in the order of the queries
+        """
+        transIDs = []
+        for position in sorted(self.__getCandidates(metadataDict)):
+            transID, metaQuery = self.__queries[position]
+            try:
+                result = metaQuery.applyQuery(metadataDict)
+            except KeyError as excp:
+                self.log.error("Metadata field of the query not defined", "for transformation %s: %s" % (transID, excp))
+                continue
+            if not result["OK"]:
+                self.log.error("Error in applying query", "for transformation %s: %s" % (transID, result["Message"]))
+            elif result["Value"]:
+                transIDs.append(transID)
+        return transIDs
+
+    def matchBulk(self, filesMetadata):
+        """Route a batch of files to the transformations whose input query they satisfy
+
+        The queries are evaluated once for the files having the same metadata
+
+        :param dict filesMetadata: { lfn: metadataDict }
+
+        :return: S_OK with { transID: [lfns] }
+        """
+        transFiles = {}
+        matches = {}
+        for lfn, metadataDict in filesMetadata.items():
+            try:
+                key = frozenset(metadataDict.items())
+            except TypeError:
+                key = None
+            transIDs = matches.get(key) if key is not None else None
+            if transIDs is None:
+                transIDs = self.match(metadataDict)
+                if key is not None:
+                    matches[key] = transIDs
+            for transID in transIDs:
+                transFiles.setdefault(transID, []).append(lfn)
+        return S_OK(transFiles)
@@ -0,0 +1,188 @@
+""" On-disk cache of the file replicas used by the TransformationAgent
+
+    The replicas are kept in an SQLite database, one row per (transformation, LFN), with the time of their
+    last update. Only the rows of the LFNs requested are read, and the updates, removals and expiration are
+    done per LFN, so that the cost of a cycle does not depend on the size of the cache.
+    The connection is shared by the agent threads, and serialized by a lock.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from DIRAC import S_OK, S_ERROR, gLogger
+from DIRAC.Core.Utilities.List import breakListIntoChunks
+
+# Number of LFNs per statement, below the limit of SQLite on the number of parameters
+CHUNK_SIZE = 500
+
+
+class ReplicaCache(object):
+    """Replicas of the files of the transformations, expiring after a given validity"""
+
+    def __init__(self, dbPath, validity=2):
+        """c'tor
+
+        :param str dbPath: path of the SQLite database, created if needed (":memory:" for a transient cache)
+        :param float validity: validity of the cached replicas, in days
+        """
+        self.log = gLogger.getSubLogger("ReplicaCache")
+        self.dbPath = dbPath
+        self.validity = validity
+        self.__lock = threading.RLock()
+        self.__connection = None
+
+    def __connect(self):
+        """Open the database and create its schema, recreating it if it is corrupted"""
+        if self.__connection is not None:
+            return self.__connection
+        try:
+            self.__connection = self.__createSchema()
+        except sqlite3.DatabaseError as excp:
+            if self.dbPath == ":memory:" or not os.path.exists(self.dbPath):
+                raise
+            self.log.warn("Replica cache unreadable, recreating it", "%s: %s" % (self.dbPath, excp))
+            os.unlink(self.dbPath)
+            self.__connection = self.__createSchema()
+        return self.__connection
+
+    def __createSchema(self):
+        connection = sqlite3.connect(self.dbPath, timeout=60, check_same_thread=False, isolation_level=None)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS Replicas ("
+                "TransformationID INTEGER NOT NULL, LFN TEXT NOT NULL, SEs TEXT NOT NULL, UpdateTime REAL NOT NULL, "
+                "PRIMARY KEY (TransformationID, LFN))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS UpdateTime ON Replicas (TransformationID, UpdateTime)")
+        except sqlite3.DatabaseError:
+            connection.close()
+            raise
+        return connection
+
+    def __execute(self, func):
+        """Run a function on the connection, in a transaction and under the lock"""
+        with self.__lock:
+            try:
+                connection = self.__connect()
+                with connection:
+                    if not connection.in_transaction:
+                        connection.execute("BEGIN")
+                    return S_OK(func(connection))
+            except sqlite3.Error as excp:
+                self.log.error("Replica cache error", "%s: %s" % (self.dbPath, excp))
+                return S_ERROR("Replica cache error: %s" % excp)
+
+    def __timeLimit(self):
+        return time.time() - self.validity * 86400
+
+    def getReplicas(self, transID, lfns):
+        """Get the valid cached replicas of some files
+
+        :param int transID: transformation ID
+        :param list lfns: LFNs to look for
+
+        :return: S_OK with { lfn: [SEs] } for the LFNs found in the cache
+        """
+
+        def _get(connection):
+            replicas = {}
+            timeLimit = self.__timeLimit()
+            for chunk in breakListIntoChunks(list(lfns), CHUNK_SIZE):
+                rows = connection.execute(
+                    "SELECT LFN, SEs FROM Replicas WHERE TransformationID = ? AND UpdateTime >= ? AND LFN IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    [int(transID), timeLimit] + chunk,
+                )
+                replicas.update((lfn, ses.split(",")) for lfn, ses in rows)
+            return replicas
+
+        return self.__execute(_get)
+
+    def setReplicas(self, transID, replicas):
+        """Insert or update the replicas of some files, valid from now
+
+        :param int transID: transformation ID
+        :param dict replicas: { lfn: [SEs] }
+
+        :return: S_OK with the number of files updated
+        """
+        now = time.time()
+        rows = [(int(transID), lfn, ",".join(ses), now) for lfn, ses in replicas.items() if ses]
+        return self.__execute(
+            lambda connection: connection.executemany(
+                "INSERT OR REPLACE INTO Replicas (TransformationID, LFN, SEs, UpdateTime) VALUES (?, ?, ?, ?)", rows
+            ).rowcount
+        )
+
+    def removeReplicas(self, transID, lfns):
+        """Remove some files from the cache
+
+        :param int transID: transformation ID
+        :param list lfns: LFNs to remove
+
+        :return: S_OK with the number of files removed
+        """
+
+        def _remove(connection):
+            removed = 0
+            for chunk in breakListIntoChunks(list(lfns), CHUNK_SIZE):
+                removed += connection.execute(
+                    "DELETE FROM Replicas WHERE TransformationID = ? AND LFN IN (%s)" % ",".join("?" * len(chunk)),
+                    [int(transID)] + chunk,
+                ).rowcount
+            return removed
+
+        return self.__execute(_remove)
+
+    def clearTransformation(self, transID):
+        """Remove all the files of a transformation from the cache
+
+        :return: S_OK with the number of files removed
+        """
+        return self.__execute(
+            lambda connection: connection.execute(
+                "DELETE FROM Replicas WHERE TransformationID = ?", (int(transID),)
+            ).rowcount
+        )
+
+    def expireReplicas(self, transID=None):
+        """Remove the files whose replicas are no longer valid
+
+        :param int transID: transformation ID, or None for all transformations
+
+        :return: S_OK with the number of files removed
+        """
+        if transID is None:
+            return self.__execute(
+                lambda connection: connection.execute(
+                    "DELETE FROM Replicas WHERE UpdateTime < ?", (self.__timeLimit(),)
+                ).rowcount
+            )
+        return self.__execute(
+            lambda connection: connection.execute(
+                "DELETE FROM Replicas WHERE TransformationID = ? AND UpdateTime < ?", (int(transID), self.__timeLimit())
+            ).rowcount
+        )
+
+    def countReplicas(self, transID=None):
+        """Get the number of files in the cache
+
+        :param int transID: transformation ID, or None for all transformations
+        """
+        if transID is None:
+            return self.__execute(lambda connection: connection.execute("SELECT COUNT(*) FROM Replicas").fetchone()[0])
+        return self.__execute(
+            lambda connection: connection.execute(
+                "SELECT COUNT(*) FROM Replicas WHERE TransformationID = ?", (int(transID),)
+            ).fetchone()[0]
+        )
+
+    def close(self):
+        """Close the database"""
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
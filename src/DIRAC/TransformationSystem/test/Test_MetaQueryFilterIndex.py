@@ -0,0 +1,136 @@
+""" Test the index of the transformation input meta queries, and its use by the TransformationDB
+"""
+# pylint: disable=protected-access
+import random
+
+from mock import MagicMock, patch
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.MetaQueryFilterIndex import MetaQueryFilterIndex
+
+typeDict = {"DataType": "VARCHAR(128)", "RunNumber": "INT", "Energy": "FLOAT", "Stream": "VARCHAR(32)"}
+
+filterQueries = [
+    ("1", {"DataType": "RAW", "RunNumber": {">": 100}}),
+    ("2", {"DataType": ["RAW", "DST"], "Stream": "Muon"}),
+    ("3", {"RunNumber": {"in": [5, 6, 7]}}),
+    ("4", {"Energy": {">=": 3.5}}),
+    ("5", {"DataType": "DST", "Stream": "Missing"}),
+    ("6", {"DataType": "Any", "RunNumber": {"=": 6}}),
+    ("7", {"Stream": {"nin": ["Muon", "Electron"]}}),
+]
+
+
+def bruteForce(metadataDict):
+    """Apply all the queries, as without the index"""
+    return [transID for transID, query in filterQueries if MetaQuery(query, typeDict).applyQuery(metadataDict)["Value"]]
+
+
+def test_match():
+    index = MetaQueryFilterIndex(filterQueries, typeDict)
+    assert len(index) == 7
+    assert index.match({"DataType": "RAW", "RunNumber": 150, "Stream": "Muon"}) == ["1", "2"]
+    assert (
+        index.match({"DataType": "DST", "RunNumber": "6"})
+        == ["3", "5", "6"]
+        == bruteForce({"DataType": "DST", "RunNumber": "6"})
+    )
+    assert index.match({"Energy": "4.0"}) == ["4"]
+    assert index.match({}) == []
+    # Values which cannot be typed do not match
+    assert index.match({"RunNumber": "abc", "Stream": "Tau"}) == ["7"]
+
+
+def test_matchRandom():
+    """The index gives the same results as applying all the queries"""
+    rng = random.Random(1234)
+    index = MetaQueryFilterIndex(filterQueries, typeDict)
+    for _ in range(2000):
+        metadataDict = {}
+        if rng.random() < 0.8:
+            metadataDict["DataType"] = rng.choice(["RAW", "DST", "SIM"])
+        if rng.random() < 0.8:
+            metadataDict["RunNumber"] = rng.choice([5, 6, "7", 99, 101, 500])
+        if rng.random() < 0.5:
+            metadataDict["Energy"] = rng.choice([1.0, 3.5, "7.5"])
+        if rng.random() < 0.5:
+            metadataDict["Stream"] = rng.choice(["Muon", "Electron", "Tau"])
+        assert index.match(metadataDict) == bruteForce(metadataDict), metadataDict
+
+
+def test_matchBulk():
+    index = MetaQueryFilterIndex(filterQueries, typeDict)
+    index.match = MagicMock(side_effect=index.match)
+    filesMetadata = {
+        "/vo/raw/1": {"DataType": "RAW", "RunNumber": 150, "Stream": "Muon"},
+        "/vo/raw/2": {"DataType": "RAW", "RunNumber": 150, "Stream": "Muon"},
+        "/vo/dst/1": {"DataType": "DST", "RunNumber": 6},
+        "/vo/other": {"DataType": "SIM", "Stream": ["Muon"]},
+    }
+    result = index.matchBulk(filesMetadata)
+    assert result["OK"]
+    assert result["Value"] == {
+        "1": ["/vo/raw/1", "/vo/raw/2"],
+        "2": ["/vo/raw/1", "/vo/raw/2"],
+        "3": ["/vo/dst/1"],
+        "5": ["/vo/dst/1"],
+        "6": ["/vo/dst/1"],
+        # As for MetaQuery.applyQuery, a list is not in the excluded values
+        "7": ["/vo/other"],
+    }
+    # The files with the same metadata are matched once
+    assert index.match.call_count == 3
+
+
+def test_transformationDBFilter():
+    """The TransformationDB builds the index once, and rebuilds it when the queries or the statuses change"""
+    from DIRAC.TransformationSystem.DB.TransformationDB import TransformationDB
+
+    rows = [
+        (1, "DataType", "RAW", "String"),
+        (1, "RunNumber", "{'>': 100}", "Dict"),
+        (3, "RunNumber", "5;;;6", "Integer"),
+    ]
+    catalog = MagicMock()
+    catalog.getMetadataFields.return_value = S_OK({"FileMetaFields": {}, "DirectoryMetaFields": typeDict})
+    with patch.object(TransformationDB, "_query", create=True, return_value=S_OK(rows)) as queryMock, patch(
+        "DIRAC.TransformationSystem.DB.TransformationDB.FileCatalog", return_value=catalog
+    ):
+        transDB = TransformationDB(dbIn=True)
+        assert transDB.filterQueries == [
+            ("1", {"DataType": "RAW", "RunNumber": {">": 100}}),
+            ("3", {"RunNumber": [5, 6]}),
+        ]
+        assert transDB._filterFileByMetadata({"DataType": "RAW", "RunNumber": 150}) == ["1"]
+        assert transDB._filterFileByMetadata({"RunNumber": 6}) == ["3"]
+        result = transDB.filterFilesByMetadata({"/a": {"RunNumber": 5}, "/b": {"DataType": "RAW", "RunNumber": 101}})
+        assert result["Value"] == {"1": ["/b"], "3": ["/a"]}
+        # The queries and the metadata fields are read once
+        assert queryMock.call_count == 2
+        assert catalog.getMetadataFields.call_count == 1
+
+        queryMock.return_value = S_OK(rows[2:])
+        transDB.invalidateFilterIndex()
+        assert transDB._filterFileByMetadata({"DataType": "RAW", "RunNumber": 150}) == []
+        assert catalog.getMetadataFields.call_count == 2
+
+
+def test_transformationDBStatusUpdate():
+    """The index is invalidated once the new status of a transformation is in the DB, not before"""
+    from DIRAC.TransformationSystem.DB.TransformationDB import TransformationDB
+
+    with patch.object(TransformationDB, "_query", create=True, return_value=S_OK([])), patch(
+        "DIRAC.TransformationSystem.DB.TransformationDB.FileCatalog"
+    ):
+        transDB = TransformationDB(dbIn=True)
+    calls = []
+    transDB._update = MagicMock(side_effect=lambda req, conn: calls.append("update") or S_OK(1))
+    transDB.invalidateFilterIndex = MagicMock(side_effect=lambda: calls.append("invalidate"))
+
+    assert transDB._TransformationDB__updateTransformationParameter(1, "Status", "Stopped")["OK"]
+    assert calls == ["update", "invalidate"]
+
+    transDB._update.side_effect = lambda req, conn: S_ERROR("Lost connection")
+    assert not transDB._TransformationDB__updateTransformationParameter(1, "Status", "Active")["OK"]
+    assert transDB.invalidateFilterIndex.call_count == 1
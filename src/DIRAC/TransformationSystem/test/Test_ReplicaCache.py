@@ -0,0 +1,82 @@
+""" Test the on-disk replica cache of the TransformationAgent
+"""
+# pylint: disable=protected-access
+import concurrent.futures
+import time
+
+from mock import patch
+
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
+
+
+def test_replicaCache(tmp_path):
+    cache = ReplicaCache(str(tmp_path / "ReplicaCache.db"), validity=1)
+    replicas = {"/vo/file%d" % i: ["SE-A", "SE-B"] if i % 2 else ["SE-A"] for i in range(1200)}
+    replicas["/vo/noReplica"] = []
+    result = cache.setReplicas(1, replicas)
+    assert result["OK"], result["Message"]
+    assert result["Value"] == 1200
+    assert cache.setReplicas(2, {"/vo/file1": ["SE-C"]})["OK"]
+
+    # Only the requested files are returned, for their transformation
+    result = cache.getReplicas(1, ["/vo/file1", "/vo/file2", "/vo/unknown", "/vo/noReplica"])
+    assert result["OK"], result["Message"]
+    assert result["Value"] == {"/vo/file1": ["SE-A", "SE-B"], "/vo/file2": ["SE-A"]}
+    assert cache.getReplicas(2, set(replicas))["Value"] == {"/vo/file1": ["SE-C"]}
+    # More files than in one statement
+    assert len(cache.getReplicas(1, list(replicas))["Value"]) == 1200
+
+    # Upsert
+    assert cache.setReplicas(1, {"/vo/file2": ["SE-B"]})["OK"]
+    assert cache.getReplicas(1, ["/vo/file2"])["Value"] == {"/vo/file2": ["SE-B"]}
+
+    result = cache.removeReplicas(1, ["/vo/file%d" % i for i in range(1000)] + ["/vo/unknown"])
+    assert result["Value"] == 1000
+    assert cache.countReplicas(1)["Value"] == 200
+    assert cache.clearTransformation(1)["Value"] == 200
+    assert cache.countReplicas()["Value"] == 1
+
+    # The cache is persistent
+    cache.close()
+    cache = ReplicaCache(str(tmp_path / "ReplicaCache.db"), validity=1)
+    assert cache.getReplicas(2, ["/vo/file1"])["Value"] == {"/vo/file1": ["SE-C"]}
+
+
+def test_expiration():
+    cache = ReplicaCache(":memory:", validity=1)
+    now = time.time()
+    with patch("DIRAC.TransformationSystem.Utilities.ReplicaCache.time.time", return_value=now - 2 * 86400):
+        cache.setReplicas(1, {"/vo/old": ["SE-A"]})
+        cache.setReplicas(2, {"/vo/old": ["SE-A"]})
+    cache.setReplicas(1, {"/vo/new": ["SE-A"]})
+
+    # Expired replicas are not returned, even before they are removed
+    assert cache.getReplicas(1, ["/vo/old", "/vo/new"])["Value"] == {"/vo/new": ["SE-A"]}
+    assert cache.expireReplicas(1)["Value"] == 1
+    assert cache.countReplicas()["Value"] == 2
+    assert cache.expireReplicas()["Value"] == 1
+    assert cache.countReplicas()["Value"] == 1
+
+
+def test_corruptedCache(tmp_path):
+    dbPath = tmp_path / "ReplicaCache.db"
+    dbPath.write_bytes(b"not a database" * 100)
+    cache = ReplicaCache(str(dbPath))
+    assert cache.setReplicas(1, {"/vo/file": ["SE-A"]})["OK"]
+    assert cache.getReplicas(1, ["/vo/file"])["Value"] == {"/vo/file": ["SE-A"]}
+
+
+def test_threads(tmp_path):
+    """The cache can be used by the threads of the agent"""
+    cache = ReplicaCache(str(tmp_path / "ReplicaCache.db"))
+
+    def fill(transID):
+        for i in range(50):
+            lfn = "/vo/file%d" % i
+            assert cache.setReplicas(transID, {lfn: ["SE-%d" % transID]})["OK"]
+            assert cache.getReplicas(transID, [lfn])["Value"] == {lfn: ["SE-%d" % transID]}
+        return cache.removeReplicas(transID, ["/vo/file%d" % i for i in range(25)])["Value"]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(fill, range(16))) == [25] * 16
+    assert cache.countReplicas()["Value"] == 16 * 25
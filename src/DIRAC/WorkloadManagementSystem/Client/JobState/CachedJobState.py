@@ -58,10 +58,20 @@ class CachedJobState:
     def jid(self):
         return self.__jid
 
+    @property
+    def tqInsertionPending(self):
+        """The job is to be inserted in its task queue when its changes are committed"""
+        return self.__insertIntoTQ
+
     def getDirtyKeys(self):
         return set(self.__dirtyKeys)
 
-    def commitChanges(self):
+    def commitChanges(self, insertIntoTQ=True):
+        """Save the changes of the job
+
+        :param bool insertIntoTQ: insert the job in its task queue if it was requested. If False, the insertion
+                                  stays pending, to be done by insertIntoTQBulk
+        """
         if self.__initState is None:
             return S_ERROR("CachedJobState( %d ) is not valid" % self.__jid)
         changes = {}
@@ -92,7 +102,7 @@ class CachedJobState:
                 return result
             self.__manifest.clearDirty()
         # Insert into TQ
-        if self.__insertIntoTQ:
+        if self.__insertIntoTQ and insertIntoTQ:
             result = self.__jobState.insertIntoTQ()
             if not result["OK"]:
                 self.cleanState()
@@ -106,6 +116,38 @@ class CachedJobState:
         self.__lastValidState = time.time()
         return S_OK()
 
+    @staticmethod
+    def insertIntoTQBulk(cachedJobStates):
+        """Insert in their task queues the jobs whose changes were committed with insertIntoTQ=False,
+        with one TaskQueueDB.insertJobs call. The jobs which cannot be inserted are rescheduled,
+        as by commitChanges
+
+        :param list cachedJobStates: CachedJobState objects, the ones without pending insertion are ignored
+        :return: S_OK({ jid: S_OK()/S_ERROR }) for the jobs with a pending insertion
+        """
+        results = {}
+        manifests = {}
+        pending = [cjs for cjs in cachedJobStates if cjs.__insertIntoTQ]
+        for cjs in pending:
+            result = cjs.getManifest()
+            if not result["OK"]:
+                results[cjs.jid] = result
+            else:
+                manifests[cjs.jid] = result["Value"]
+        result = JobState.insertJobsIntoTQ(manifests)
+        if not result["OK"]:
+            return result
+        results.update(result["Value"])
+        for cjs in pending:
+            if results[cjs.jid]["OK"]:
+                cjs.__insertIntoTQ = False
+                continue
+            cjs.cleanState()
+            for _ in range(5):
+                if cjs.__jobState.rescheduleJob()["OK"]:
+                    break
+        return S_OK(results)
+
     def serialize(self):
         if self.__manifest:
             manifest = [self.__manifest.dumpAsCFG(), self.__manifest.isDirty()]
@@ -401,15 +401,13 @@ class JobState:
             return result
         return JobState.__db.jobDB.setInputData(self.__jid, lfnData)
 
-    right_insertIntoTQ = RIGHT_CHANGE_STATUS
-
-    def insertIntoTQ(self, manifest=None):
-        if not manifest:
-            result = self.getManifest()
-            if not result["OK"]:
-                return result
-            manifest = result["Value"]
+    @staticmethod
+    def getTQDefinition(manifest):
+        """Get the task queue definition and the priority of a job from the requirements of its manifest
 
+        :param manifest: JobManifest of the job
+        :return: S_OK((tqDefDict, jobPriority))/S_ERROR
+        """
         reqSection = "JobRequirements"
 
         result = manifest.getSection(reqSection)
@@ -430,6 +428,21 @@ class JobState:
                 jobReqDict[name] = reqCfg.getOption(name, [])
 
         jobPriority = reqCfg.getOption("UserPriority", 1)
+        return S_OK((jobReqDict, jobPriority))
+
+    right_insertIntoTQ = RIGHT_CHANGE_STATUS
+
+    def insertIntoTQ(self, manifest=None):
+        if not manifest:
+            result = self.getManifest()
+            if not result["OK"]:
+                return result
+            manifest = result["Value"]
+
+        result = self.getTQDefinition(manifest)
+        if not result["OK"]:
+            return result
+        jobReqDict, jobPriority = result["Value"]
 
         result = self.__retryFunction(2, JobState.__db.tqDB.insertJob, (self.__jid, jobReqDict, jobPriority))
         if not result["OK"]:
@@ -441,3 +454,39 @@ class JobState:
                     gLogger.info("Job %s removed from the TQ" % self.__jid)
             return S_ERROR("Cannot insert in task queue: %s" % errMsg)
         return S_OK()
+
+    @classmethod
+    def insertJobsIntoTQ(cls, manifests):
+        """Bulk version of insertIntoTQ, the jobs are inserted with one TaskQueueDB.insertJobs call
+
+        :param dict manifests: { jid: JobManifest }
+        :return: S_OK({ jid: S_OK()/S_ERROR })
+        """
+        cls.checkDBAccess()
+        results = {}
+        jobs = []
+        for jid, manifest in manifests.items():
+            result = cls.getTQDefinition(manifest)
+            if not result["OK"]:
+                results[jid] = result
+                continue
+            jobReqDict, jobPriority = result["Value"]
+            jobs.append((jid, jobReqDict, jobPriority))
+        if not jobs:
+            return S_OK(results)
+
+        result = JobState.__db.tqDB.insertJobs(jobs)
+        if result["OK"]:
+            failed = result["Value"]["Failed"]
+        else:
+            failed = {jid: result["Message"] for jid, _jobReqDict, _jobPriority in jobs}
+        for jid, _jobReqDict, _jobPriority in jobs:
+            if jid not in failed:
+                results[jid] = S_OK()
+                continue
+            # Force removing the job from the TQ if it was actually inserted
+            result = JobState.__db.tqDB.deleteJob(jid)
+            if result["OK"] and result["Value"]:
+                gLogger.info("Job %s removed from the TQ" % jid)
+            results[jid] = S_ERROR("Cannot insert in task queue: %s" % failed[jid])
+        return S_OK(results)
@@ -2,6 +2,9 @@
 
     Utilities and classes here are used by the Matcher
 """
+import threading
+import time
+
 from DIRAC import S_OK, S_ERROR
 from DIRAC import gLogger
 
@@ -18,6 +21,12 @@ class Limiter:
     csDictCache = DictCache()
     condCache = DictCache()
     delayMem = {}
+    # Number of jobs running, matched or stalled, by attribute, site and attribute value:
+    # { attName : { siteName : { attValue : count } } }, counted in the JobDB at the times
+    # in runningCountersTime, and incremented for each job matched in the meantime
+    runningCounters = {}
+    runningCountersTime = {}
+    runningCountersLock = threading.Lock()
 
     def __init__(self, jobDB=None, opsHelper=None, pilotRef=None):
         """Constructor"""
@@ -178,19 +187,10 @@ class Limiter:
             if attName not in self.jobDB.jobAttributeNames:
                 self.log.error("Attribute does not exist", "(%s). Check the job limits" % attName)
                 continue
-            cK = "Running:%s:%s" % (siteName, attName)
-            data = self.condCache.get(cK)
-            if not data:
-                result = self.jobDB.getCounters(
-                    "Jobs",
-                    [attName],
-                    {"Site": siteName, "Status": [JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED]},
-                )
-                if not result["OK"]:
-                    return result
-                data = result["Value"]
-                data = dict([(k[0][attName], k[1]) for k in data])
-                self.condCache.add(cK, 10, data)
+            result = self.__getRunningCounters(attName)
+            if not result["OK"]:
+                return result
+            data = result["Value"].get(siteName, {})
             for attValue in limitsDict[attName]:
                 limit = limitsDict[attName][attValue]
                 running = data.get(attValue, 0)
@@ -205,6 +205,55 @@ class Limiter:
         # negCond is something like : {'JobType': ['Merge']}
         return S_OK(negCond)
 
+    def __getRunningCounters(self, attName):
+        """Get the number of jobs running at each site for each value of an attribute.
+        They are counted in the JobDB for all the sites at once, every
+        JobScheduling/RunningCountersRefreshTime seconds, and shared by all the threads.
+
+        :return: S_OK({ siteName : { attValue : count } })/S_ERROR
+        """
+        refreshTime = self.__opsHelper.getValue("JobScheduling/RunningCountersRefreshTime", 30)
+        with self.runningCountersLock:
+            if time.time() - self.runningCountersTime.get(attName, 0) > refreshTime:
+                result = self.jobDB.getCounters(
+                    "Jobs",
+                    ["Site", attName],
+                    {"Status": [JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED]},
+                )
+                if not result["OK"]:
+                    return result
+                counters = {}
+                for attDict, count in result["Value"]:
+                    counters.setdefault(attDict["Site"], {})[attDict[attName]] = count
+                self.runningCounters[attName] = counters
+                self.runningCountersTime[attName] = time.time()
+            return S_OK(self.runningCounters[attName])
+
+    def getRunningCountersAttributes(self):
+        """Get the names of the job attributes with running counters,
+        which are needed by updateRunningCounters for a matched job
+        """
+        with self.runningCountersLock:
+            return list(self.runningCounters)
+
+    def updateRunningCounters(self, siteName, jobAttributes):
+        """Count a job just matched at a site in the running counters,
+        so that the limits apply without waiting for the next count in the JobDB
+
+        :param str siteName: site of the job
+        :param dict jobAttributes: attributes of the job, including the ones of getRunningCountersAttributes
+        """
+        with self.runningCountersLock:
+            for attName, counters in self.runningCounters.items():
+                # A limit may have been added since the attributes were read
+                if attName not in jobAttributes:
+                    self.log.verbose("Attribute missing to count the matched job", attName)
+                    continue
+                attValue = jobAttributes[attName]
+                siteCounters = counters.setdefault(siteName, {})
+                siteCounters[attValue] = siteCounters.get(attValue, 0) + 1
+        return S_OK()
+
     def updateDelayCounters(self, siteName, jid):
         # Get the info from the CS
         siteSection = "%s/%s" % (self.__matchingDelaySection, siteName)
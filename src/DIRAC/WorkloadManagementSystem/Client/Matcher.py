@@ -97,7 +97,12 @@ class Matcher:
             return {}
 
         jobID = result["jobId"]
-        resAtt = self.jobDB.getJobAttributes(jobID, ["OwnerDN", "OwnerGroup", "Status"])
+        # The attributes counted by the Limiter are read with the others
+        attNames = ["OwnerDN", "OwnerGroup", "Status"]
+        checkJobLimits = self.opsHelper.getValue("JobScheduling/CheckJobLimits", True)
+        if checkJobLimits:
+            attNames += [attName for attName in self.limiter.getRunningCountersAttributes() if attName not in attNames]
+        resAtt = self.jobDB.getJobAttributes(jobID, attNames)
         if not resAtt["OK"]:
             raise RuntimeError("Could not retrieve job attributes")
         if not resAtt["Value"]:
@@ -127,12 +132,9 @@ class Matcher:
         if resOpt["OK"]:
             for key, value in resOpt["Value"].items():
                 resultDict[key] = value
-        resAtt = self.jobDB.getJobAttributes(jobID, ["OwnerDN", "OwnerGroup"])
-        if not resAtt["OK"]:
-            raise RuntimeError("Could not retrieve job attributes")
-        if not resAtt["Value"]:
-            raise RuntimeError("No attributes returned for job")
 
+        if checkJobLimits:
+            self.limiter.updateRunningCounters(resourceDict["Site"], resAtt["Value"])
         if self.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True):
             self.limiter.updateDelayCounters(resourceDict["Site"], jobID)
 
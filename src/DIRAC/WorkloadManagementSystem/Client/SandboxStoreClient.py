@@ -160,8 +160,14 @@ class SandboxStoreClient:
                 oMD5.update(bData)
                 bData = fd.read(10240)
 
-        transferClient = self.__getTransferClient()
-        result = transferClient.sendFile(tmpFilePath, ["%s.tar.bz2" % oMD5.hexdigest(), assignTo])
+        fileId = ["%s.tar.bz2" % oMD5.hexdigest(), assignTo]
+        # Only the sandboxes which are not already stored are uploaded
+        result = self.__getRPCClient().lookupSandbox(fileId, os.path.getsize(tmpFilePath))
+        if not result["OK"] or not result["Value"]:
+            if not result["OK"]:
+                gLogger.verbose("Cannot look up the sandbox, uploading it", result["Message"])
+            transferClient = self.__getTransferClient()
+            result = transferClient.sendFile(tmpFilePath, fileId)
         result["SandboxFileName"] = tmpFilePath
         try:
             if result["OK"]:
@@ -0,0 +1,55 @@
+""" Test the running limits of the Limiter
+"""
+from unittest.mock import MagicMock
+
+from pytest import fixture
+
+from DIRAC import S_OK
+from DIRAC.WorkloadManagementSystem.Client.Limiter import Limiter
+
+
+@fixture
+def limiter():
+    """A Limiter with a limit of 2 MCSimulation jobs at Site_1, and counters reset"""
+    Limiter.runningCounters.clear()
+    Limiter.runningCountersTime.clear()
+    Limiter.csDictCache.purgeAll()
+
+    jobDB = MagicMock()
+    jobDB.jobAttributeNames = ["JobType", "Site"]
+    jobDB.getCounters.return_value = S_OK(
+        [({"Site": "Site_1", "JobType": "MCSimulation"}, 1), ({"Site": "Site_2", "JobType": "MCSimulation"}, 5)]
+    )
+
+    opsHelper = MagicMock()
+    opsHelper.getValue.side_effect = lambda option, default: default
+    opsHelper.getSections.return_value = S_OK(["JobType"])
+    opsHelper.getOptionsDict.return_value = S_OK({"MCSimulation": "2"})
+    yield Limiter(jobDB=jobDB, opsHelper=opsHelper)
+    Limiter.runningCounters.clear()
+    Limiter.runningCountersTime.clear()
+
+
+def test_runningLimit(limiter):
+    """The limit applies once reached, counting the jobs matched since the last count"""
+    assert limiter.getNegativeCondForSite("Site_1") == {}
+    assert limiter.getNegativeCondForSite("Site_3") == {}
+
+    assert limiter.getRunningCountersAttributes() == ["JobType"]
+    assert limiter.updateRunningCounters("Site_1", {"JobType": "MCSimulation", "OwnerGroup": "prod"})["OK"]
+    assert limiter.getNegativeCondForSite("Site_1") == {"JobType": ["MCSimulation"]}
+
+    # All the sites are counted with a single query, the attributes of the matched job are not queried
+    limiter.jobDB.getCounters.assert_called_once()
+    limiter.jobDB.getJobAttributes.assert_not_called()
+
+
+def test_refresh(limiter):
+    """The counters are refreshed from the JobDB after some time"""
+    assert limiter.getNegativeCondForSite("Site_1") == {}
+    limiter.updateRunningCounters("Site_1", {"JobType": "MCSimulation"})
+    assert limiter.getNegativeCondForSite("Site_1") == {"JobType": ["MCSimulation"]}
+
+    Limiter.runningCountersTime["JobType"] = 0
+    assert limiter.getNegativeCondForSite("Site_1") == {}
+    assert limiter.jobDB.getCounters.call_count == 2
@@ -12,6 +12,7 @@ The following options can be set in ``Systems/WorkloadManagement/<Setup>/Databas
 
 """
 import base64
+import uuid
 import zlib
 
 import operator
@@ -25,6 +26,7 @@ from DIRAC.Core.Utilities import DErrno
 from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities import Time
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 from DIRAC.Core.Utilities.DErrno import EWMSSUBM, EWMSJMAN
 from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
 from DIRAC.ResourceStatusSystem.Client.SiteStatus import SiteStatus
@@ -32,6 +34,28 @@ from DIRAC.WorkloadManagementSystem.Client.JobState.JobManifest import JobManife
 from DIRAC.WorkloadManagementSystem.Client import JobStatus
 from DIRAC.WorkloadManagementSystem.Client import JobMinorStatus
 
+# Number of jobs inserted in one transaction by insertNewJobsIntoDB
+BULK_SUBMISSION_CHUNK_SIZE = 500
+# Number of jobs updated by one statement by setHeartBeatDataBulk and setJobParametersBulk
+BULK_UPDATE_CHUNK_SIZE = 1000
+# Statuses from which the jobs may go back to Running, according to the JobsStateMachine
+HEARTBEAT_RUNNING_STATUSES = sorted(
+    status
+    for status, state in JobStatus.JobsStateMachine(JobStatus.RUNNING).states.items()
+    if JobStatus.RUNNING in state.stateMap
+)
+# Job attributes checked, and maybe set, by the JobManifest
+JOB_MANIFEST_ATTRIBUTES = (
+    "OwnerName",
+    "OwnerDN",
+    "OwnerGroup",
+    "DIRACSetup",
+    "CPUTime",
+    "Priority",
+    "InputData",
+    "JobType",
+)
+
 #############################################################################
 # utility functions
 
@@ -769,6 +793,36 @@ class JobDB(DB):
         cmd = "REPLACE JobParameters (JobID,Name,Value) VALUES %s" % ", ".join(insertValueList)
         return self._update(cmd)
 
+    #############################################################################
+    def setJobParametersBulk(self, jobParameters):
+        """Set the parameters of many jobs, with multi-row statements
+
+        :param dict jobParameters: { jobID: { name: value } }
+
+        :return: S_OK(list of the IDs of the jobs not found)/S_ERROR
+        """
+        jobParameters = {int(jobID): parameters for jobID, parameters in jobParameters.items() if parameters}
+        if not jobParameters:
+            return S_OK([])
+        result = self.__getExistingJobIDs(jobParameters)
+        if not result["OK"]:
+            return result
+        existing = result["Value"]
+
+        result = self.bulkUpsert(
+            "JobParameters",
+            ["JobID", "Name", "Value"],
+            [
+                (jobID, name, str(value))
+                for jobID in sorted(existing)
+                for name, value in sorted(jobParameters[jobID].items())
+            ],
+            updateFields=["Value"],
+        )
+        if not result["OK"]:
+            return result
+        return S_OK(sorted(set(jobParameters) - existing))
+
     #############################################################################
     def setJobOptParameter(self, jobID, name, value):
         """Set an optimzer parameter specified by name,value pair for the job JobID"""
@@ -1117,6 +1171,237 @@ class JobDB(DB):
 
         return retVal
 
+    def insertNewJobsIntoDB(
+        self,
+        jobList,
+        owner,
+        ownerDN,
+        ownerGroup,
+        diracSetup,
+        initialStatus=JobStatus.RECEIVED,
+        initialMinorStatus="Job accepted",
+        templateJDL=None,
+    ):
+        """Bulk version of insertNewJobIntoDB, e.g. for the jobs of a parametric submission.
+
+        All the job descriptions are checked first. If they are generated from a parametric template in which
+        none of the JOB_MANIFEST_ATTRIBUTES depends on the parameters, only the template is checked, and its
+        checked values are set in every job. Otherwise each job is checked by its own JobManifest.
+        The jobs are then inserted by chunks of BULK_SUBMISSION_CHUNK_SIZE, with multi-row statements in one
+        transaction per chunk, the values depending only on the owner being looked up once.
+
+        :param list jobList: job descriptions, as JDL strings or ClassAd objects (which are then modified)
+        :param str owner: job owner user name
+        :param str ownerDN: job owner DN
+        :param str ownerGroup: job owner group
+        :param str diracSetup: setup in which context the jobs are submitted
+        :param str initialStatus: optional initial job status (Received by default)
+        :param str initialMinorStatus: optional initial minor job status
+        :param str templateJDL: optional parametric job description from which the jobs are generated
+        :return: S_OK(list of dicts with the JobID, Status and MinorStatus of the new jobs, in order)/S_ERROR
+        """
+        ownerOptions = {"OwnerName": owner, "OwnerDN": ownerDN, "OwnerGroup": ownerGroup, "DIRACSetup": diracSetup}
+
+        def checkJDL(jdl):
+            jobManifest = JobManifest()
+            result = jobManifest.load(jdl)
+            if not result["OK"]:
+                return result
+            jobManifest.setOptionsFromDict(ownerOptions)
+            result = jobManifest.check()
+            if not result["OK"]:
+                return result
+            return S_OK(jobManifest.dumpAsJDL())
+
+        checkedValues = None
+        if templateJDL:
+            templateClassAd = ClassAd(templateJDL)
+            if templateClassAd.isOK() and not any(
+                "%" in templateClassAd.get_expression(name) for name in JOB_MANIFEST_ATTRIBUTES
+            ):
+                result = checkJDL(templateJDL)
+                if not result["OK"]:
+                    return result
+                checkedClassAd = ClassAd(result["Value"])
+                checkedValues = {
+                    name: checkedClassAd.get_expression(name)
+                    for name in JOB_MANIFEST_ATTRIBUTES
+                    if checkedClassAd.lookupAttribute(name)
+                }
+
+        jobDescs = []
+        for job in jobList:
+            if isinstance(job, str):
+                jdl = job
+                # Fix the possible lack of the brackets in the JDL
+                if jdl.strip()[0].find("[") != 0:
+                    jdl = "[" + jdl + "]"
+            else:
+                jdl = job.asJDL()
+            if checkedValues is None:
+                result = checkJDL(jdl)
+                if not result["OK"]:
+                    return result
+                classAdJob = ClassAd(result["Value"])
+            else:
+                classAdJob = ClassAd(jdl) if isinstance(job, str) else job
+                for name, value in checkedValues.items():
+                    classAdJob.set_expression(name, value)
+            jobDescs.append((jdl, classAdJob))
+
+        cache = {}
+        newJobs = []
+        for chunk in breakListIntoChunks(jobDescs, BULK_SUBMISSION_CHUNK_SIZE):
+            result = self.__insertNewJobsChunk(
+                chunk, owner, ownerDN, ownerGroup, diracSetup, initialStatus, initialMinorStatus, cache
+            )
+            if not result["OK"]:
+                return result
+            newJobs.extend(result["Value"])
+        return S_OK(newJobs)
+
+    def __insertNewJobsChunk(
+        self, jobDescs, owner, ownerDN, ownerGroup, diracSetup, initialStatus, initialMinorStatus, cache
+    ):
+        """Insert a chunk of new jobs in one transaction, see insertNewJobsIntoDB
+
+        :param list jobDescs: list of (original JDL, checked ClassAd) tuples
+        :param dict cache: values depending only on the owner, see __prepareJob
+        """
+        result = self.transactionStart()
+        if not result["OK"]:
+            return result
+        try:
+            result = self.__insertNewJobsRows(
+                jobDescs, owner, ownerDN, ownerGroup, diracSetup, initialStatus, initialMinorStatus, cache
+            )
+        except Exception as x:  # pylint: disable=broad-except
+            self.log.exception("Exception while inserting new jobs")
+            result = S_ERROR(EWMSSUBM, "Failed to insert the jobs: %s" % x)
+        if not result["OK"]:
+            self.transactionRollback()
+            return result
+        commit = self.transactionCommit()
+        if not commit["OK"]:
+            return commit
+        return result
+
+    def __insertNewJobsRows(
+        self, jobDescs, owner, ownerDN, ownerGroup, diracSetup, initialStatus, initialMinorStatus, cache
+    ):
+        """Insert the rows of a chunk of new jobs, to be called within a transaction"""
+        # 1.- insert the original JDLs and get the new JobIDs. They are not always consecutive (e.g. with
+        # auto_increment_increment > 1 or the interleaved lock mode), but they increase in the order of the rows,
+        # which are marked by a token until their JDL is set, so they are read back
+        token = "Submission %s" % uuid.uuid4().hex
+        insertValues = []
+        for jdl, _ in jobDescs:
+            result = self._escapeString(compressJDL(jdl))
+            if not result["OK"]:
+                return result
+            insertValues.append("('%s', '', %s)" % (token, result["Value"]))
+        result = self._update(
+            "INSERT INTO JobJDLs (JDL, JobRequirements, OriginalJDL) VALUES %s" % ", ".join(insertValues)
+        )
+        if not result["OK"]:
+            return S_ERROR(EWMSSUBM, "Failed to insert JDL in to DB")
+        if "lastRowId" not in result or result["Value"] != len(jobDescs):
+            return S_ERROR(EWMSSUBM, "JobDB: Failed to retrieve new Ids")
+        result = self._query(
+            "SELECT JobID FROM JobJDLs WHERE JobID >= %d AND JDL = '%s' ORDER BY JobID"
+            % (int(result["lastRowId"]), token)
+        )
+        if not result["OK"] or len(result["Value"]) != len(jobDescs):
+            return S_ERROR(EWMSSUBM, "JobDB: Failed to retrieve new Ids")
+        jobIDs = [int(row[0]) for row in result["Value"]]
+        self.log.info("JobDB: New JobIDs served", "%d to %d" % (jobIDs[0], jobIDs[-1]))
+
+        # 2.- Prepare DIRAC JDLs
+        jobList = []
+        jdlRows = []
+        jobRows = {}
+        parameterRows = []
+        inputDataRows = []
+        submissionTime = Time.toString()
+        for jobID, (_, classAdJob) in zip(jobIDs, jobDescs):
+            jobAttrs = {
+                "JobID": jobID,
+                "LastUpdateTime": submissionTime,
+                "SubmissionTime": submissionTime,
+                "Owner": owner,
+                "OwnerDN": ownerDN,
+                "OwnerGroup": ownerGroup,
+                "DIRACSetup": diracSetup,
+            }
+            classAdReq = ClassAd("[]")
+            if not classAdJob.isOK():
+                jdlRows.append((jobID, ""))
+                jobAttrs["Status"] = JobStatus.FAILED
+                jobAttrs["MinorStatus"] = "Error in JDL syntax"
+                jobRows.setdefault(tuple(jobAttrs), []).append(tuple(jobAttrs.values()))
+                jobList.append({"JobID": jobID, "Status": JobStatus.FAILED, "MinorStatus": "Error in JDL syntax"})
+                continue
+
+            # Replace the JobID placeholder if any
+            for name in classAdJob.getAttributes():
+                value = classAdJob.get_expression(name)
+                if "%j" in value:
+                    classAdJob.set_expression(name, value.replace("%j", str(jobID)))
+            classAdJob.insertAttributeInt("JobID", jobID)
+            result = self.__prepareJob(classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup, cache=cache)
+            if not result["OK"]:
+                return result
+            if result["Value"]:
+                # The whole chunk is rolled back
+                result = S_ERROR(EWMSSUBM, result["Value"])
+                result["JobId"] = jobID
+                return result
+
+            priority = classAdJob.getAttributeInt("Priority")
+            jobAttrs["UserPriority"] = priority if priority is not None else 0
+            for jdlName in self.jdl2DBParameters:
+                # Defaults are set by the DB.
+                jdlValue = classAdJob.getAttributeString(jdlName)
+                if jdlValue:
+                    jobAttrs[jdlName] = jdlValue
+            jdlValue = classAdJob.getAttributeString("Site")
+            if jdlValue:
+                jobAttrs["Site"] = "Multiple" if jdlValue.find(",") != -1 else jdlValue
+            jobAttrs["VerifiedFlag"] = "True"
+            jobAttrs["Status"] = initialStatus
+            jobAttrs["MinorStatus"] = initialMinorStatus
+
+            classAdJob.insertAttributeInt("JobRequirements", classAdReq.asJDL())
+            jdlRows.append((jobID, compressJDL(classAdJob.asJDL())))
+            jobRows.setdefault(tuple(jobAttrs), []).append(tuple(jobAttrs.values()))
+
+            if classAdJob.lookupAttribute("Parameters"):
+                parameters = classAdJob.getDictionaryFromSubJDL("Parameters")
+                parameterRows.extend((jobID, name, value) for name, value in parameters.items())
+            if classAdJob.lookupAttribute("InputData"):
+                # some jobs are setting empty string as InputData
+                inputDataRows.extend(
+                    (jobID, lfn.strip()) for lfn in classAdJob.getListFromExpression("InputData") if lfn
+                )
+            jobList.append({"JobID": jobID, "Status": initialStatus, "MinorStatus": initialMinorStatus})
+
+        # 3.- Insert all the rows
+        result = self.bulkUpsert("JobJDLs", ["JobID", "JDL"], jdlRows, updateFields=["JDL"])
+        if not result["OK"]:
+            return result
+        # The jobs without some optional attribute get the DB default
+        for jobAttrNames, rows in jobRows.items():
+            result = self.bulkInsert("Jobs", list(jobAttrNames), rows)
+            if not result["OK"]:
+                return result
+        result = self.bulkUpsert("JobParameters", ["JobID", "Name", "Value"], parameterRows)
+        if not result["OK"]:
+            return result
+        result = self.bulkInsert("InputData", ["JobID", "LFN"], inputDataRows)
+        if not result["OK"]:
+            return result
+        return S_OK(jobList)
+
     def __checkAndPrepareJob(
         self, jobID, classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup, jobAttrNames, jobAttrValues
     ):
@@ -1124,8 +1409,44 @@ class JobDB(DB):
         Check Consistency of Submitted JDL and set some defaults
         Prepare subJDL with Job Requirements
         """
+        result = self.__prepareJob(classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup)
+        if not result["OK"]:
+            return result
+        error = result["Value"]
+
+        if error:
+            retVal = S_ERROR(EWMSSUBM, error)
+            retVal["JobId"] = jobID
+            retVal["Status"] = JobStatus.FAILED
+            retVal["MinorStatus"] = error
+
+            jobAttrNames.append("Status")
+            jobAttrValues.append(JobStatus.FAILED)
+
+            jobAttrNames.append("MinorStatus")
+            jobAttrValues.append(error)
+            resultInsert = self.setJobAttributes(jobID, jobAttrNames, jobAttrValues)
+            if not resultInsert["OK"]:
+                retVal["MinorStatus"] += "; %s" % resultInsert["Message"]
+
+            return retVal
+
+        return S_OK()
+
+    def __prepareJob(self, classAdJob, classAdReq, owner, ownerDN, ownerGroup, diracSetup, cache=None):
+        """Check the consistency of a submitted JDL, set some defaults and fill the job requirements
+
+        :param dict cache: values already looked up for other jobs with the same owner, updated
+                           with the new ones. It is used for the bulk submissions
+
+        :return: S_OK(error message, empty if the job is correct)/S_ERROR
+        """
+        if cache is None:
+            cache = {}
         error = ""
-        vo = getVOForGroup(ownerGroup)
+        if "VO" not in cache:
+            cache["VO"] = getVOForGroup(ownerGroup)
+        vo = cache["VO"]
 
         jdlDiracSetup = classAdJob.getAttributeString("DIRACSetup")
         jdlOwner = classAdJob.getAttributeString("Owner")
@@ -1159,14 +1480,18 @@ class JobDB(DB):
         if vo:
             classAdReq.insertAttributeString("VirtualOrganization", vo)
 
-        inputDataPolicy = Operations(vo=vo).getValue("InputDataPolicy/InputDataModule")
+        if "InputDataPolicy" not in cache:
+            cache["InputDataPolicy"] = Operations(vo=vo).getValue("InputDataPolicy/InputDataModule")
+        inputDataPolicy = cache["InputDataPolicy"]
         if inputDataPolicy and not classAdJob.lookupAttribute("InputDataModule"):
             classAdJob.insertAttributeString("InputDataModule", inputDataPolicy)
 
         # ################## adding DIRAC/VOPolicy as classAds
         # FIXME: to remove
-        setup = gConfig.getValue("/DIRAC/Setup", "")
-        voPolicyDict = gConfig.getOptionsDict("/DIRAC/VOPolicy/%s/%s" % (vo, setup))
+        if "VOPolicy" not in cache:
+            setup = gConfig.getValue("/DIRAC/Setup", "")
+            cache["VOPolicy"] = gConfig.getOptionsDict("/DIRAC/VOPolicy/%s/%s" % (vo, setup))
+        voPolicyDict = cache["VOPolicy"]
         # voPolicyDict = gConfig.getOptionsDict('/DIRAC/VOPolicy')
         if voPolicyDict["OK"]:
             voPolicy = voPolicyDict["Value"]
@@ -1184,39 +1509,27 @@ class JobDB(DB):
         # CPU time
         cpuTime = classAdJob.getAttributeInt("CPUTime")
         if cpuTime is None:
-            opsHelper = Operations(group=ownerGroup, setup=diracSetup)
-            cpuTime = opsHelper.getValue("JobDescription/DefaultCPUTime", 86400)
+            if "DefaultCPUTime" not in cache:
+                opsHelper = Operations(group=ownerGroup, setup=diracSetup)
+                cache["DefaultCPUTime"] = opsHelper.getValue("JobDescription/DefaultCPUTime", 86400)
+            cpuTime = cache["DefaultCPUTime"]
         classAdReq.insertAttributeInt("CPUTime", cpuTime)
 
         # platform(s)
         platformList = classAdJob.getListFromExpression("Platform")
         if platformList:
-            result = self.getDIRACPlatform(platformList)
-            if not result["OK"]:
-                return result
-            if result["Value"]:
-                classAdReq.insertAttributeVectorString("Platforms", result["Value"])
+            platformKey = ("Platforms",) + tuple(platformList)
+            if platformKey not in cache:
+                result = self.getDIRACPlatform(platformList)
+                if not result["OK"]:
+                    return result
+                cache[platformKey] = result["Value"]
+            if cache[platformKey]:
+                classAdReq.insertAttributeVectorString("Platforms", cache[platformKey])
             else:
                 error = "OS compatibility info not found"
 
-        if error:
-            retVal = S_ERROR(EWMSSUBM, error)
-            retVal["JobId"] = jobID
-            retVal["Status"] = JobStatus.FAILED
-            retVal["MinorStatus"] = error
-
-            jobAttrNames.append("Status")
-            jobAttrValues.append(JobStatus.FAILED)
-
-            jobAttrNames.append("MinorStatus")
-            jobAttrValues.append(error)
-            resultInsert = self.setJobAttributes(jobID, jobAttrNames, jobAttrValues)
-            if not resultInsert["OK"]:
-                retVal["MinorStatus"] += "; %s" % resultInsert["Message"]
-
-            return retVal
-
-        return S_OK()
+        return S_OK(error)
 
     #############################################################################
     def removeJobFromDB(self, jobIDs):
@@ -1960,6 +2273,74 @@ class JobDB(DB):
 
         return S_OK() if ok else S_ERROR("Failed to store some or all the parameters")
 
+    #####################################################################################
+    def __getExistingJobIDs(self, jobIDs):
+        """Get the IDs of the jobs which exist among a list"""
+        existing = set()
+        for jobChunk in breakListIntoChunks(sorted(jobIDs), BULK_UPDATE_CHUNK_SIZE):
+            result = self._query("SELECT JobID FROM Jobs WHERE JobID IN (%s)" % ",".join(str(jID) for jID in jobChunk))
+            if not result["OK"]:
+                return result
+            existing.update(int(row[0]) for row in result["Value"])
+        return S_OK(existing)
+
+    def setHeartBeatDataBulk(self, heartBeatTimes, dynamicData, runningJobIDs=None):
+        """Add the heart beat data of many jobs to the database, with multi-row statements
+
+        :param dict heartBeatTimes: { jobID: HeartBeatTime string }
+        :param list dynamicData: (jobID, name, value, HeartBeatTime string) tuples for the HeartBeatLoggingInfo
+        :param list runningJobIDs: jobs whose Status is also set to Running, as setHeartBeatData does
+                                   when no HeartBeatTime is given. As the heart beats may be written late,
+                                   the status is changed only if the JobsStateMachine allows it: a job killed
+                                   or finished in the meantime keeps its status
+
+        :return: S_OK(list of the IDs of the jobs not found)/S_ERROR
+        """
+        heartBeatTimes = {int(jobID): hbTime for jobID, hbTime in heartBeatTimes.items()}
+        if not heartBeatTimes:
+            return S_OK([])
+        result = self.__getExistingJobIDs(heartBeatTimes)
+        if not result["OK"]:
+            return result
+        existing = result["Value"]
+        running = {int(jobID) for jobID in runningJobIDs or []}
+
+        for jobChunk in breakListIntoChunks(sorted(existing), BULK_UPDATE_CHUNK_SIZE):
+            cases = []
+            for jobID in jobChunk:
+                result = self._escapeString(heartBeatTimes[jobID])
+                if not result["OK"]:
+                    return result
+                cases.append("WHEN %d THEN %s" % (jobID, result["Value"]))
+            jobIDString = ",".join(str(jobID) for jobID in jobChunk)
+            req = "UPDATE Jobs SET HeartBeatTime = CASE JobID %s END" % " ".join(cases)
+            runningString = ",".join(str(jobID) for jobID in jobChunk if jobID in running)
+            if runningString:
+                req += ", Status = CASE WHEN JobID IN (%s) AND Status IN (%s) THEN '%s' ELSE Status END" % (
+                    runningString,
+                    ",".join("'%s'" % status for status in HEARTBEAT_RUNNING_STATUSES),
+                    JobStatus.RUNNING,
+                )
+            result = self._update(req + " WHERE JobID IN (%s)" % jobIDString)
+            if not result["OK"]:
+                return S_ERROR("Failed to set the heart beat time: %s" % result["Message"])
+
+        # The same value may be sent twice in the same second
+        result = self.bulkUpsert(
+            "HeartBeatLoggingInfo",
+            ["JobID", "Name", "Value", "HeartBeatTime"],
+            [
+                (int(jobID), name, str(value), hbTime)
+                for jobID, name, value, hbTime in dynamicData
+                if int(jobID) in existing
+            ],
+            updateFields=["Value"],
+        )
+        if not result["OK"]:
+            return S_ERROR("Failed to store the heart beat data: %s" % result["Message"])
+
+        return S_OK(sorted(set(heartBeatTimes) - existing))
+
     #####################################################################################
     def getHeartBeatData(self, jobID):
         """Retrieve the job's heart beat data"""
@@ -2,6 +2,7 @@
     The following methods are provided
 
     addLoggingRecord()
+    addLoggingRecords()
     getJobLoggingInfo()
     deleteJob()
     getWMSTimeStamps()
@@ -80,6 +81,30 @@ class JobLoggingDB(DB):
 
         return self._update(cmd)
 
+    #############################################################################
+    def addLoggingRecords(self, jobIDs, status="idem", minorStatus="idem", applicationStatus="idem", source="Unknown"):
+        """Add the same new entry, with the current time, for many jobs, with multi-row inserts
+
+        :param list jobIDs: job IDs
+        """
+        if not jobIDs:
+            return S_OK()
+        self.log.info(
+            "Adding record for jobs ",
+            "%d jobs: 'status/minor/app=%s/%s/%s' from %s"
+            % (len(jobIDs), status, minorStatus, applicationStatus, source),
+        )
+        _date = Time.dateTime()
+        epoc = time.mktime(_date.timetuple()) + _date.microsecond / 1000000.0 - MAGIC_EPOC_NUMBER
+        return self.bulkInsert(
+            "LoggingInfo",
+            ["JobId", "Status", "MinorStatus", "ApplicationStatus", "StatusTime", "StatusTimeOrder", "StatusSource"],
+            (
+                (int(jobID), status, minorStatus, applicationStatus[:255], str(_date), epoc, source[:32])
+                for jobID in jobIDs
+            ),
+        )
+
     #############################################################################
     def getJobLoggingInfo(self, jobID):
         """Returns a Status,MinorStatus,ApplicationStatus,StatusTime,StatusSource tuple
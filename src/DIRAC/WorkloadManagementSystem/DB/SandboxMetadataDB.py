@@ -1,4 +1,10 @@
 """ SandboxMetadataDB class is a front-end to the metadata for sandboxes
+
+    In the content-addressed mode of the SandboxStore, the sandboxes with the same contents share one blob.
+    The sandboxes are linked to their blob in sb_SandBoxBlobs, and the number of linked sandboxes is kept
+    in the RefCount of the blob. The blobs are purged once they are not referenced anymore: their RefCount
+    is set to -1 (tombstone), their contents are removed, then their row is deleted. The tombstoned blobs
+    are considered absent, so that their contents are uploaded again.
 """
 from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.Core.Base.DB import DB
@@ -15,6 +21,7 @@ class SandboxMetadataDB(DB):
             raise RuntimeError(f"Can't create tables: {result['Message']}")
         self.__assignedSBGraceDays = 0
         self.__unassignedSBGraceDays = 15
+        self.__unusedBlobGraceDays = 1
 
     def __initializeDB(self):
         """
@@ -67,6 +74,31 @@ class SandboxMetadataDB(DB):
             "UniqueIndexes": {"Mapping": ["SBId", "EntitySetup", "EntityId", "Type"]},
         }
 
+        self.__tablesDesc["sb_Blobs"] = {
+            "Fields": {
+                "BlobId": "INTEGER(10) UNSIGNED AUTO_INCREMENT NOT NULL",
+                "SEName": "VARCHAR(64) NOT NULL",
+                "SEPFN": "VARCHAR(512) NOT NULL",
+                "Checksum": "VARCHAR(64) NOT NULL",
+                "Bytes": "BIGINT(20) NOT NULL DEFAULT 0",
+                "RefCount": "INTEGER(10) NOT NULL DEFAULT 0",
+                "RegistrationTime": "DATETIME NOT NULL",
+                "LastAccessTime": "DATETIME NOT NULL",
+            },
+            "PrimaryKey": "BlobId",
+            "Indexes": {"RefCount": ["RefCount"]},
+            "UniqueIndexes": {"Location": ["SEName", "SEPFN"]},
+        }
+
+        self.__tablesDesc["sb_SandBoxBlobs"] = {
+            "Fields": {
+                "SBId": "INTEGER(10) UNSIGNED NOT NULL",
+                "BlobId": "INTEGER(10) UNSIGNED NOT NULL",
+            },
+            "PrimaryKey": "SBId",
+            "Indexes": {"BlobIndex": ["BlobId"]},
+        }
+
         for tableName in self.__tablesDesc:
             if tableName not in tablesInDB:
                 tablesToCreate[tableName] = self.__tablesDesc[tableName]
@@ -334,16 +366,139 @@ class SandboxMetadataDB(DB):
 
     def deleteSandboxes(self, SBIdList):
         """
-        Delete sandboxes
+        Delete sandboxes, and release the blobs they reference
         """
         sqlSBList = ", ".join([str(sbid) for sbid in SBIdList])
-        for table in ("sb_SandBoxes", "sb_EntityMapping"):
-            sqlCmd = "DELETE FROM `%s` WHERE SBId IN ( %s )" % (table, sqlSBList)
-            result = self._update(sqlCmd)
-            if not result["OK"]:
-                return result
+        # The connections are in autocommit mode
+        sqlCmds = [
+            "START TRANSACTION",
+            "UPDATE `sb_Blobs` b JOIN ( SELECT BlobId, COUNT(*) AS N FROM `sb_SandBoxBlobs` WHERE SBId IN ( %s ) "
+            "GROUP BY BlobId ) r ON b.BlobId = r.BlobId "
+            "SET b.RefCount = b.RefCount - r.N, b.LastAccessTime = UTC_TIMESTAMP()" % sqlSBList,
+        ]
+        for table in ("sb_SandBoxBlobs", "sb_SandBoxes", "sb_EntityMapping"):
+            sqlCmds.append("DELETE FROM `%s` WHERE SBId IN ( %s )" % (table, sqlSBList))
+        result = self._transaction(sqlCmds)
+        if not result["OK"]:
+            return result
         return S_OK()
 
+    ##################
+    # Content-addressed blobs
+
+    def getBlob(self, SEName, SEPFN):
+        """Get a blob, if it exists
+
+        :param SEName: name of the StorageElement
+        :param SEPFN: PFN of the blob
+
+        :returns: S_OK with dict with BlobId, Checksum, Bytes and RefCount, or None if there is no such blob
+                  or if it is being purged
+        """
+        sqlCmd = "SELECT BlobId, Checksum, Bytes, RefCount FROM `sb_Blobs` WHERE SEName = %s AND SEPFN = %s" % (
+            self._escapeString(SEName)["Value"],
+            self._escapeString(SEPFN)["Value"],
+        )
+        sqlCmd += " AND RefCount >= 0"
+        result = self._query(sqlCmd)
+        if not result["OK"]:
+            return result
+        if not result["Value"]:
+            return S_OK(None)
+        return S_OK(dict(zip(("BlobId", "Checksum", "Bytes", "RefCount"), result["Value"][0])))
+
+    def linkSandboxToBlob(self, sbId, SEName, SEPFN, checksum, size=0):
+        """Register a blob if it is not there, and make a sandbox reference it
+
+        :param int sbId: sandbox id
+        :param SEName: name of the StorageElement of the blob
+        :param SEPFN: PFN of the blob
+        :param str checksum: checksum of the contents
+        :param int size: size of the blob
+
+        :returns: S_OK with True if the sandbox references the blob, False if the blob is being purged
+        """
+        escapedSE = self._escapeString(SEName)["Value"]
+        escapedPFN = self._escapeString(SEPFN)["Value"]
+        sqlCmds = [
+            "START TRANSACTION",
+            "INSERT INTO `sb_Blobs` ( SEName, SEPFN, Checksum, Bytes, RefCount, RegistrationTime, LastAccessTime ) "
+            "VALUES ( %s, %s, %s, %d, 0, UTC_TIMESTAMP(), UTC_TIMESTAMP() ) "
+            "ON DUPLICATE KEY UPDATE LastAccessTime = IF( RefCount >= 0, UTC_TIMESTAMP(), LastAccessTime )"
+            % (escapedSE, escapedPFN, self._escapeString(checksum)["Value"], size),
+            # A tombstoned blob is not linked: its contents are being removed
+            "INSERT IGNORE INTO `sb_SandBoxBlobs` ( SBId, BlobId ) "
+            "SELECT %d, BlobId FROM `sb_Blobs` WHERE SEName = %s AND SEPFN = %s AND RefCount >= 0"
+            % (sbId, escapedSE, escapedPFN),
+            # Counting the references makes the link idempotent
+            "UPDATE `sb_Blobs` b SET b.RefCount = ( SELECT COUNT(*) FROM `sb_SandBoxBlobs` l WHERE l.BlobId = b.BlobId ) "
+            "WHERE b.SEName = %s AND b.SEPFN = %s AND b.RefCount >= 0" % (escapedSE, escapedPFN),
+        ]
+        result = self._transaction(sqlCmds)
+        if not result["OK"]:
+            return result
+        if result["Value"][2][1]:
+            return S_OK(True)
+        # Nothing inserted: the sandbox was already linked, or the blob is tombstoned
+        result = self.getSandboxBlob(sbId)
+        if not result["OK"]:
+            return result
+        return S_OK(result["Value"] == (SEName, SEPFN))
+
+    def getSandboxBlob(self, sbId):
+        """Get the blob holding the contents of a sandbox
+
+        :param int sbId: sandbox id
+
+        :returns: S_OK with tuple (SEName, SEPFN), or None if the sandbox is not content-addressed
+        """
+        sqlCmd = (
+            "SELECT b.SEName, b.SEPFN FROM `sb_Blobs` b, `sb_SandBoxBlobs` l WHERE l.BlobId = b.BlobId AND l.SBId = %d"
+            % sbId
+        )
+        result = self._query(sqlCmd)
+        if not result["OK"]:
+            return result
+        if not result["Value"]:
+            return S_OK(None)
+        return S_OK(tuple(result["Value"][0]))
+
+    def getUnusedBlobs(self):
+        """
+        Get the blobs which are not referenced by any sandbox anymore, and the ones already tombstoned
+
+        :returns: S_OK with list of (BlobId, SEName, SEPFN, RefCount) tuples
+        """
+        sqlCmd = (
+            "SELECT BlobId, SEName, SEPFN, RefCount FROM `sb_Blobs` WHERE RefCount < 0 OR ( RefCount = 0 AND "
+            "TIMESTAMPDIFF( DAY, LastAccessTime, UTC_TIMESTAMP() ) >= %d )" % self.__unusedBlobGraceDays
+        )
+        return self._query(sqlCmd)
+
+    def tombstoneBlob(self, blobId):
+        """Mark a blob as being purged if it is still not referenced.
+        It is then absent for getBlob and linkSandboxToBlob, until it is deleted with deleteBlob
+
+        :param int blobId: blob id
+
+        :returns: S_OK with True if the blob was tombstoned, in which case its contents can be removed
+        """
+        sqlCmd = (
+            "UPDATE `sb_Blobs` SET RefCount = -1 WHERE BlobId = %d AND RefCount = 0 AND "
+            "BlobId NOT IN ( SELECT BlobId FROM `sb_SandBoxBlobs` )" % blobId
+        )
+        result = self._update(sqlCmd)
+        if not result["OK"]:
+            return result
+        return S_OK(result["Value"] > 0)
+
+    def deleteBlob(self, blobId):
+        """Delete a tombstoned blob, once its contents are removed
+
+        :param int blobId: blob id
+        """
+        return self._update("DELETE FROM `sb_Blobs` WHERE BlobId = %d AND RefCount < 0" % blobId)
+
     def getSandboxId(self, SEName, SEPFN, requesterName, requesterGroup, field="SBId", requesterDN=None):
         """
         Get the sandboxId if it exists
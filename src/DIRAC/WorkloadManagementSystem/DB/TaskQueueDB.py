@@ -2,6 +2,8 @@
 """
 import random
 import string
+import threading
+import time
 
 from DIRAC import gConfig, S_OK, S_ERROR
 from DIRAC.Core.Base.DB import DB
@@ -12,6 +14,7 @@ from DIRAC.Core.Security import Properties
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.WorkloadManagementSystem.private.SharesCorrector import SharesCorrector
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
 
 DEFAULT_GROUP_SHARE = 1000
 TQ_MIN_SHARE = 0.001
@@ -60,6 +63,14 @@ class TaskQueueDB(DB):
         self.__opsHelper = Operations()
         self.__ensureInsertionIsSingle = False
         self.__sharesCorrector = SharesCorrector(self.__opsHelper)
+        # In-memory index of the task queues, used for matching if enabled
+        self.__tqIndex = None
+        self.__tqIndexLock = threading.Lock()
+        self.__tqIndexLoadTime = 0
+        self.__tqIndexSyncTime = 0
+        self.__tqIndexSyncFrom = 0
+        # Changes made while the index is loaded, None if it is not
+        self.__tqIndexChanges = None
         result = self.__initializeDB()
         if not result["OK"]:
             raise Exception("Can't create tables: %s" % result["Message"])
@@ -304,7 +315,9 @@ class TaskQueueDB(DB):
         orphanedTQs = result["Value"]
         if not orphanedTQs:
             return S_OK()
-        orphanedTQs = [str(otq[0]) for otq in orphanedTQs]
+        orphanedTQs = [otq[0] for otq in orphanedTQs]
+        self.__updateTaskQueueIndex("remove", orphanedTQs)
+        orphanedTQs = [str(otq) for otq in orphanedTQs]
 
         for mvField in multiValueDefFields:
             result = self._update(
@@ -358,7 +371,10 @@ class TaskQueueDB(DB):
         if not retVal["OK"]:
             return S_ERROR("Can't insert job: %s" % retVal["Message"])
         connObj = retVal["Value"]
+        # Not escaped definition, for the task queue index
+        rawDefDict = None
         if not skipTQDefCheck:
+            rawDefDict = dict(tqDefDict)
             tqDefDict = dict(tqDefDict)
             retVal = self._checkTaskQueueDefinition(tqDefDict)
             if not retVal["OK"]:
@@ -388,11 +404,138 @@ class TaskQueueDB(DB):
                 self.log.error("Error inserting job in TQ", "Job %s TQ %s: %s" % (jobId, tqId, result["Message"]))
                 return result
             if newTQ:
+                if rawDefDict:
+                    rawDefDict["CPUTime"] = tqDefDict["CPUTime"]
+                    self.__updateTaskQueueIndex("add", tqId, rawDefDict)
                 self.recalculateTQSharesForEntity(tqDefDict["OwnerDN"], tqDefDict["OwnerGroup"], connObj=connObj)
         finally:
             self.__setTaskQueueEnabled(tqId, True)
         return S_OK()
 
+    def insertJobs(self, jobs, skipTQDefCheck=False):
+        """Insert many jobs in task queues (creating them if needed), e.g. the jobs of a parametric submission.
+
+        The jobs are grouped by task queue definition: for each definition, the task queue is found
+        or created once, and the jobs are inserted with multi-row statements. The task queues are
+        filled up to the maximum number of jobs per task queue, as for insertJob. The shares are
+        recalculated once per owner for which task queues were created.
+
+        :param list jobs: list of (jobId, tqDefDict, jobPriority) tuples
+        :param bool skipTQDefCheck: the definitions were already checked (and escaped)
+
+        :returns: S_OK({"Successful": {jobId: tqId}, "Failed": {jobId: error message}}) / S_ERROR
+        """
+        successful = {}
+        failed = {}
+        # Definition key -> [ tqDefDict, rawDefDict, [ (jobId, jobPriority) ] ]
+        jobsByDefinition = {}
+        for jobId, tqDefDict, jobPriority in jobs:
+            try:
+                jobId = int(jobId)
+                jobPriority = int(jobPriority)
+            except (TypeError, ValueError):
+                failed[jobId] = "JobId or priority is not a number!"
+                continue
+            rawDefDict = None
+            if not skipTQDefCheck:
+                rawDefDict = dict(tqDefDict)
+                retVal = self._checkTaskQueueDefinition(dict(tqDefDict))
+                if not retVal["OK"]:
+                    self.log.error("TQ definition check failed", "for job %s: %s" % (jobId, retVal["Message"]))
+                    failed[jobId] = retVal["Message"]
+                    continue
+                tqDefDict = retVal["Value"]
+            tqDefDict["CPUTime"] = self.fitCPUTimeToSegments(tqDefDict["CPUTime"])
+            defKey = tuple(tqDefDict[field] for field in singleValueDefFields) + tuple(
+                tuple(sorted({value.strip() for value in tqDefDict.get(field, []) if value.strip()}))
+                for field in multiValueDefFields
+            )
+            jobsByDefinition.setdefault(defKey, [tqDefDict, rawDefDict, []])[2].append((jobId, jobPriority))
+        if not jobsByDefinition:
+            return S_OK({"Successful": successful, "Failed": failed})
+
+        retVal = self._getConnection()
+        if not retVal["OK"]:
+            return S_ERROR("Can't insert jobs: %s" % retVal["Message"])
+        connObj = retVal["Value"]
+        ownersWithNewTQs = set()
+        try:
+            for tqDefDict, rawDefDict, defJobs in jobsByDefinition.values():
+                self.log.info(
+                    "Inserting jobs with requirements", "(%s jobs : %s)" % (len(defJobs), printDict(tqDefDict))
+                )
+                inserted = {}
+                createdTQs = []
+                result = self.__insertJobsWithDefinition(tqDefDict, rawDefDict, defJobs, connObj, inserted, createdTQs)
+                successful.update(inserted)
+                if not result["OK"]:
+                    failedJobs = [jobId for jobId, _ in defJobs if jobId not in inserted]
+                    self.log.error("Error inserting jobs", "(%s jobs): %s" % (len(failedJobs), result["Message"]))
+                    for jobId in failedJobs:
+                        failed[jobId] = result["Message"]
+                if createdTQs:
+                    ownerDict = rawDefDict or tqDefDict
+                    ownersWithNewTQs.add((ownerDict["OwnerDN"], ownerDict["OwnerGroup"]))
+            for ownerDN, ownerGroup in ownersWithNewTQs:
+                self.recalculateTQSharesForEntity(ownerDN, ownerGroup, connObj=connObj)
+        finally:
+            self._releaseConnection()
+        return S_OK({"Successful": successful, "Failed": failed})
+
+    def __insertJobsWithDefinition(self, tqDefDict, rawDefDict, jobs, connObj, inserted, createdTQs):
+        """Insert jobs having all the same task queue definition, filling the smallest task queue
+        and creating new ones if needed
+
+        :param dict tqDefDict: checked definition of the task queues
+        :param dict rawDefDict: not escaped definition, for the task queue index (or None)
+        :param list jobs: list of (jobId, jobPriority)
+        :param connObj: connection to use
+        :param dict inserted: filled with the inserted jobs {jobId: tqId}, also in case of error
+        :param list createdTQs: filled with the IDs of the created task queues
+
+        :returns: S_OK() / S_ERROR
+        """
+        remaining = list(jobs)
+        while remaining:
+            retVal = self.__findAndDisableTaskQueue(tqDefDict, skipDefinitionCheck=True, connObj=connObj)
+            if not retVal["OK"]:
+                return retVal
+            tqInfo = retVal["Value"]
+            newTQ = not tqInfo["found"]
+            if newTQ:
+                retVal = self.__createTaskQueue(tqDefDict, 1, connObj=connObj)
+                if not retVal["OK"]:
+                    return retVal
+                tqId = retVal["Value"]
+                numJobs = self.__maxJobsInTQ
+            else:
+                tqId = tqInfo["tqId"]
+                numJobs = self.__maxJobsInTQ - tqInfo["jobs"]
+            tqJobs, remaining = remaining[:numJobs], remaining[numJobs:]
+            self.log.info("Inserting jobs in TQ", "(%s jobs : TQ %s)" % (len(tqJobs), tqId))
+            try:
+                rows = [
+                    (tqId, jobId, jobPriority, self.__hackJobPriority(jobPriority)) for jobId, jobPriority in tqJobs
+                ]
+                result = self.bulkUpsert(
+                    "tq_Jobs",
+                    ["TQId", "JobId", "Priority", "RealPriority"],
+                    rows,
+                    updateFields=["TQId", "Priority", "RealPriority"],
+                    conn=connObj,
+                )
+                if not result["OK"]:
+                    return result
+                inserted.update((jobId, tqId) for jobId, _ in tqJobs)
+                if newTQ:
+                    createdTQs.append(tqId)
+                    if rawDefDict:
+                        rawDefDict["CPUTime"] = tqDefDict["CPUTime"]
+                        self.__updateTaskQueueIndex("add", tqId, rawDefDict)
+            finally:
+                self.__setTaskQueueEnabled(tqId, True)
+        return S_OK()
+
     def __insertJobInTaskQueue(self, jobId, tqId, jobPriority, checkTQExists=True, connObj=False):
         """Insert a job in a given task queue
 
@@ -523,6 +666,8 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC"
         """
         if negativeCond is None:
             negativeCond = {}
+        # Not escaped copy, for the task queue index
+        rawMatchDict = dict(tqMatchDict)
         # Make a copy to avoid modification of original if escaping needs to be done
         tqMatchDict = dict(tqMatchDict)
         retVal = self._checkMatchDefinition(tqMatchDict)
@@ -542,15 +687,13 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
             noJobsFound = False
             if "JobID" in tqMatchDict:
                 # A certain JobID is required by the resource, so all TQ are to be considered
-                retVal = self.matchAndGetTaskQueue(
-                    tqMatchDict, numQueuesToGet=0, skipMatchDictDef=True, connObj=connObj
-                )
+                retVal = self.__matchTaskQueues(rawMatchDict, tqMatchDict, numQueuesToGet=0, connObj=connObj)
                 preJobSQL = "%s AND `tq_Jobs`.JobId = %s " % (preJobSQL, tqMatchDict["JobID"])
             else:
-                retVal = self.matchAndGetTaskQueue(
+                retVal = self.__matchTaskQueues(
+                    rawMatchDict,
                     tqMatchDict,
                     numQueuesToGet=numQueuesPerTry,
-                    skipMatchDictDef=True,
                     negativeCond=negativeCond,
                     connObj=connObj,
                 )
@@ -601,12 +744,31 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
         """Get a queue that matches the requirements"""
         if negativeCond is None:
             negativeCond = {}
+        # Without definition check, the values are already escaped and the index cannot be used
+        rawMatchDict = None if skipMatchDictDef else dict(tqMatchDict)
         # Make a copy to avoid modification of original if escaping needs to be done
         tqMatchDict = dict(tqMatchDict)
         if not skipMatchDictDef:
             retVal = self._checkMatchDefinition(tqMatchDict)
             if not retVal["OK"]:
                 return retVal
+        return self.__matchTaskQueues(
+            rawMatchDict, tqMatchDict, numQueuesToGet=numQueuesToGet, negativeCond=negativeCond, connObj=connObj
+        )
+
+    def __matchTaskQueues(self, rawMatchDict, tqMatchDict, numQueuesToGet=1, negativeCond=None, connObj=False):
+        """Get the task queues matching the requirements, from the task queue index if it is enabled,
+        or else from the DB
+
+        :param dict rawMatchDict: requirements, not escaped (None to query the DB)
+        :param dict tqMatchDict: the same requirements, checked and escaped
+
+        :return: S_OK([(tqId, ownerDN, ownerGroup)])/S_ERROR
+        """
+        if rawMatchDict is not None:
+            tqIndex = self.__getTaskQueueIndex()
+            if tqIndex is not None:
+                return tqIndex.match(rawMatchDict, negativeCond=negativeCond, numQueuesToGet=numQueuesToGet)
         retVal = self.__generateTQMatchSQL(tqMatchDict, numQueuesToGet=numQueuesToGet, negativeCond=negativeCond)
         if not retVal["OK"]:
             return retVal
@@ -616,6 +778,108 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
             return retVal
         return S_OK([(row[0], row[1], row[2]) for row in retVal["Value"]])
 
+    def __getTaskQueueIndex(self):
+        """Get the in-memory index of the task queues, if enabled with JobScheduling/UseTaskQueueIndex.
+
+        The changes made by this object are applied to the index as they happen. The task queues
+        created by other processes are added every TaskQueueIndexSyncInterval seconds, and the whole
+        index is reloaded every TaskQueueIndexReloadPeriod seconds (for the deletions and the priorities).
+
+        The DB is read without holding the lock, by one thread at a time, while the others keep matching
+        with the current index. The new index is then swapped in, after applying the changes made meanwhile.
+
+        :return: TaskQueueIndex or None
+        """
+        if not self.__getCSOption("UseTaskQueueIndex", False):
+            self.__tqIndex = None
+            return None
+        now = time.time()
+        with self.__tqIndexLock:
+            if self.__tqIndexChanges is not None:
+                # Being loaded by another thread
+                return self.__tqIndex
+            reload = self.__tqIndex is None or now - self.__tqIndexLoadTime > self.__getCSOption(
+                "TaskQueueIndexReloadPeriod", 300
+            )
+            if not reload and now - self.__tqIndexSyncTime <= self.__getCSOption("TaskQueueIndexSyncInterval", 10):
+                return self.__tqIndex
+            knownTQIds = self.__tqIndex.getTaskQueueIDs() if self.__tqIndex is not None else set()
+            if reload:
+                tqIndex = TaskQueueIndex(multiValueMatchFields, bannedJobMatchFields)
+                minTQId = 0
+            else:
+                tqIndex = self.__tqIndex
+                minTQId = self.__tqIndexSyncFrom
+            self.__tqIndexChanges = []
+
+        try:
+            result = self.__fillTaskQueueIndex(tqIndex, knownTQIds, minTQId=minTQId)
+        except Exception as excp:  # pylint: disable=broad-except
+            result = S_ERROR(repr(excp))
+
+        with self.__tqIndexLock:
+            changes = self.__tqIndexChanges
+            self.__tqIndexChanges = None
+            if not result["OK"]:
+                self.log.error("Could not update the task queue index", result["Message"])
+                return self.__tqIndex
+            for method, args in changes:
+                getattr(tqIndex, method)(*args)
+            if reload:
+                self.log.verbose("Loaded the task queue index", "(%s task queues)" % len(tqIndex))
+                self.__tqIndex = tqIndex
+                self.__tqIndexLoadTime = now
+            self.__tqIndexSyncTime = now
+            self.__tqIndexSyncFrom = result["Value"]
+            return self.__tqIndex
+
+    def __updateTaskQueueIndex(self, method, *args):
+        """Apply a change to the task queue index, if enabled, and keep it for the index being loaded
+
+        :param str method: name of the TaskQueueIndex method making the change
+        """
+        with self.__tqIndexLock:
+            if self.__tqIndex is not None:
+                getattr(self.__tqIndex, method)(*args)
+            if self.__tqIndexChanges is not None:
+                self.__tqIndexChanges.append((method, args))
+
+    def __fillTaskQueueIndex(self, tqIndex, knownTQIds, minTQId=0):
+        """Add to the index the task queues with an ID greater than minTQId.
+        A task queue being created does not have all its values in the DB before it has a job,
+        so the task queues without jobs are only added if they were already known.
+
+        :return: S_OK(ID after which to look for new task queues the next time)/S_ERROR
+        """
+        sqlCmd = "SELECT TQId, Priority, %s, " % ", ".join(singleValueDefFields)
+        sqlCmd += "EXISTS ( SELECT JobId FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = `tq_TaskQueues`.TQId ) "
+        sqlCmd += "FROM `tq_TaskQueues` WHERE TQId > %d" % minTQId
+        result = self._query(sqlCmd)
+        if not result["OK"]:
+            return result
+        tqDefs = {}
+        for row in result["Value"]:
+            tqDefs[row[0]] = (dict(zip(singleValueDefFields, row[2:-1])), row[1], row[-1])
+        for field in multiValueDefFields:
+            result = self._query("SELECT TQId, Value FROM `tq_TQTo%s` WHERE TQId > %d" % (field, minTQId))
+            if not result["OK"]:
+                return result
+            for tqId, value in result["Value"]:
+                if tqId in tqDefs:
+                    tqDefs[tqId][0].setdefault(field, []).append(value)
+
+        lastTQId = minTQId
+        pending = []
+        for tqId, (tqDefDict, priority, hasJobs) in tqDefs.items():
+            lastTQId = max(lastTQId, tqId)
+            if hasJobs or tqId in knownTQIds:
+                tqIndex.add(tqId, tqDefDict, priority)
+            else:
+                pending.append(tqId)
+        if pending:
+            return S_OK(min(pending) - 1)
+        return S_OK(lastTQId)
+
     @staticmethod
     def __generateSQLSubCond(sqlString, value, boolOp="OR"):
         if not isinstance(value, (list, tuple)):
@@ -1032,6 +1296,7 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
             retVal = self._update("DELETE FROM `tq_TaskQueues` WHERE TQId = %s" % tqId, conn=connObj)
             if not retVal["OK"]:
                 return retVal
+            self.__updateTaskQueueIndex("remove", [tqId])
             self.recalculateTQSharesForEntity(tqOwnerDN, tqOwnerGroup, connObj=connObj)
             self.log.info("Deleted empty and enabled TQ", tqId)
             return S_OK()
@@ -1069,6 +1334,7 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
             if not retVal["OK"]:
                 return retVal
         if delTQ > 0:
+            self.__updateTaskQueueIndex("remove", [tqId])
             self.recalculateTQSharesForEntity(tqOwnerDN, tqOwnerGroup, connObj=connObj)
             return S_OK(True)
         return S_OK(False)
@@ -1318,7 +1584,9 @@ FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
         for prio in prioDict:
             tqList = ", ".join([str(tqId) for tqId in prioDict[prio]])
             updateSQL = "UPDATE `tq_TaskQueues` SET Priority=%.4f WHERE TQId in ( %s )" % (prio, tqList)
-            self._update(updateSQL, conn=connObj)
+            result = self._update(updateSQL, conn=connObj)
+            if result["OK"]:
+                self.__updateTaskQueueIndex("setPriority", prioDict[prio], round(prio, 4))
         return S_OK()
 
     @staticmethod
@@ -7,6 +7,9 @@ import unittest
 from mock import MagicMock, patch
 
 from DIRAC import S_OK
+from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
+from DIRAC.WorkloadManagementSystem.Client.JobState.JobManifest import JobManifest
+from DIRAC.WorkloadManagementSystem.DB.JobDB import extractJDL
 
 MODULE_NAME = "DIRAC.WorkloadManagementSystem.DB.JobDB"
 
@@ -34,3 +37,134 @@ class JobDBTest(unittest.TestCase):
         print(result)
         self.assertTrue(result["OK"])
         self.assertEqual(result["Value"], ["/vo/user/lfn1", "/vo/user/lfn2"])
+
+    @patch(MODULE_NAME + ".getVOForGroup", new=MagicMock(return_value="vo"))
+    @patch(MODULE_NAME + ".Operations")
+    def test_insertNewJobsIntoDB(self, opsMock):
+        opsMock.return_value.getValue.side_effect = lambda option, default=None: default
+        self.jobDB.jdl2DBParameters = ["JobName", "JobType", "JobGroup"]
+        self.jobDB.transactionStart = MagicMock(return_value=S_OK())
+        self.jobDB.transactionCommit = MagicMock(return_value=S_OK())
+        self.jobDB.transactionRollback = MagicMock(return_value=S_OK())
+        self.jobDB._escapeString = MagicMock(side_effect=lambda value: S_OK("'%s'" % value))
+        self.jobDB._update = MagicMock(
+            side_effect=lambda cmd: {"OK": True, "Value": cmd.count("('Sub"), "lastRowId": 10}
+        )
+        # The new IDs are not consecutive, e.g. with auto_increment_increment = 2
+        self.jobDB._query.return_value = S_OK(((10,), (12,), (14,)))
+        self.jobDB.bulkInsert = MagicMock(return_value=S_OK())
+        self.jobDB.bulkUpsert = MagicMock(return_value=S_OK())
+
+        jdls = [
+            '[Executable = "a.sh"; JobName = "job_%%j"; InputData = {"/vo/lfn%d"}; Site = "A,B"]' % i for i in range(3)
+        ]
+        with patch(MODULE_NAME + ".gConfig") as gConfigMock:
+            gConfigMock.getOptionsDict.return_value = {"OK": False, "Message": "No VOPolicy"}
+            result = self.jobDB.insertNewJobsIntoDB(
+                jdls, "owner", "/DN/owner", "group", "Setup", initialStatus="Submitting", initialMinorStatus="Bulk"
+            )
+        self.assertTrue(result["OK"], result)
+        self.assertEqual([job["JobID"] for job in result["Value"]], [10, 12, 14])
+        self.assertEqual(self.jobDB._update.call_count, 1)
+        # The IDs are read back from the rows marked by the token of the insertion
+        token = self.jobDB._update.call_args[0][0].split("'")[1]
+        self.jobDB._query.assert_called_once_with(
+            "SELECT JobID FROM JobJDLs WHERE JobID >= 10 AND JDL = '%s' ORDER BY JobID" % token
+        )
+        self.jobDB.transactionCommit.assert_called_once_with()
+        self.jobDB.transactionRollback.assert_not_called()
+
+        # One multi-row insert per table
+        calls = {call[0][0]: call[0] for call in self.jobDB.bulkInsert.call_args_list}
+        fields, rows = calls["Jobs"][1], list(calls["Jobs"][2])
+        self.assertEqual(len(rows), 3)
+        jobRow = dict(zip(fields, rows[1]))
+        self.assertEqual(jobRow["JobID"], 12)
+        self.assertEqual(jobRow["JobName"], "job_12")
+        self.assertEqual(jobRow["Site"], "Multiple")
+        self.assertEqual(jobRow["Status"], "Submitting")
+        self.assertEqual(list(calls["InputData"][2]), [(10, "/vo/lfn0"), (12, "/vo/lfn1"), (14, "/vo/lfn2")])
+        jdlRows = self.jobDB.bulkUpsert.call_args_list[0][0][2]
+        self.assertEqual([row[0] for row in jdlRows], [10, 12, 14])
+
+    @patch(MODULE_NAME + ".getVOForGroup", new=MagicMock(return_value="vo"))
+    @patch(MODULE_NAME + ".Operations")
+    def test_insertNewJobsIntoDBFromTemplate(self, opsMock):
+        opsMock.return_value.getValue.side_effect = lambda option, default=None: default
+        self.jobDB.jdl2DBParameters = ["JobName"]
+        self.jobDB.transactionStart = MagicMock(return_value=S_OK())
+        self.jobDB.transactionCommit = MagicMock(return_value=S_OK())
+        self.jobDB._escapeString = MagicMock(side_effect=lambda value: S_OK("'%s'" % value))
+        self.jobDB._update = MagicMock(
+            side_effect=lambda cmd: {"OK": True, "Value": cmd.count("('Sub"), "lastRowId": 1}
+        )
+        self.jobDB._query.return_value = S_OK(((1,), (2,)))
+        self.jobDB.bulkInsert = MagicMock(return_value=S_OK())
+        self.jobDB.bulkUpsert = MagicMock(return_value=S_OK())
+
+        from DIRAC.WorkloadManagementSystem.Utilities.ParametricJob import generateParametricJobs
+
+        template = '[Executable = "a.sh"; JobName = "job_%j_%s"; Parameters = {"a", "b"}; CPUTime = 1000000]'
+        jobs = generateParametricJobs(ClassAd(template), asClassAds=True)["Value"]
+        with patch(MODULE_NAME + ".JobManifest", wraps=JobManifest) as manifestMock, patch(
+            MODULE_NAME + ".gConfig"
+        ) as gConfigMock:
+            gConfigMock.getOptionsDict.return_value = {"OK": False, "Message": "No VOPolicy"}
+            result = self.jobDB.insertNewJobsIntoDB(jobs, "owner", "/DN/owner", "group", "Setup", templateJDL=template)
+        self.assertTrue(result["OK"], result)
+        # Only the template is checked
+        manifestMock.assert_called_once_with()
+        calls = {call[0][0]: call[0] for call in self.jobDB.bulkInsert.call_args_list}
+        fields, rows = calls["Jobs"][1], list(calls["Jobs"][2])
+        self.assertEqual([dict(zip(fields, row))["JobName"] for row in rows], ["job_1_a", "job_2_b"])
+        jdl = extractJDL(self.jobDB.bulkUpsert.call_args_list[0][0][2][1][1])
+        # The values checked in the template are set in each job
+        self.assertIn("CPUTime = 500000;", jdl)
+        self.assertIn('OwnerName = "owner";', jdl)
+
+    @patch(MODULE_NAME + ".getVOForGroup", new=MagicMock(return_value="vo"))
+    def test_insertNewJobsIntoDBWrongOwner(self):
+        self.jobDB.transactionStart = MagicMock(return_value=S_OK())
+        self.jobDB.transactionCommit = MagicMock(return_value=S_OK())
+        self.jobDB.transactionRollback = MagicMock(return_value=S_OK())
+        self.jobDB._update = MagicMock(return_value={"OK": True, "Value": 1, "lastRowId": 10})
+        self.jobDB.bulkInsert = MagicMock(return_value=S_OK())
+
+        with patch(MODULE_NAME + ".gConfig") as gConfigMock:
+            gConfigMock.getOptionsDict.return_value = {"OK": False, "Message": "No VOPolicy"}
+            result = self.jobDB.insertNewJobsIntoDB(
+                ['[Executable = "a.sh"; Owner = "someoneElse"]'], "owner", "/DN/owner", "group", "Setup"
+            )
+        self.assertFalse(result["OK"])
+        self.jobDB.transactionRollback.assert_called_once_with()
+        self.jobDB.bulkInsert.assert_not_called()
+
+    def test_setHeartBeatDataBulk(self):
+        self.jobDB._query.return_value = S_OK(((1,), (2,)))
+        self.jobDB._escapeString = MagicMock(side_effect=lambda value: S_OK("'%s'" % value))
+        self.jobDB._update = MagicMock(return_value=S_OK(2))
+        self.jobDB.bulkUpsert = MagicMock(return_value=S_OK(2))
+
+        result = self.jobDB.setHeartBeatDataBulk(
+            {1: "2022-01-01 10:00:00", 2: "2022-01-01 10:01:00", 3: "2022-01-01 10:02:00"},
+            [(1, "CPUConsumed", 10, "2022-01-01 10:00:00"), (3, "CPUConsumed", 20, "2022-01-01 10:02:00")],
+            runningJobIDs=[2, 3],
+        )
+        self.assertTrue(result["OK"])
+        # Job 3 does not exist anymore
+        self.assertEqual(result["Value"], [3])
+        self.jobDB._update.assert_called_once_with(
+            "UPDATE Jobs SET HeartBeatTime = CASE JobID WHEN 1 THEN '2022-01-01 10:00:00' "
+            "WHEN 2 THEN '2022-01-01 10:01:00' END, Status = CASE WHEN JobID IN (2) "
+            "AND Status IN ('Matched','Stalled') THEN 'Running' ELSE Status END WHERE JobID IN (1,2)"
+        )
+        self.assertEqual(self.jobDB.bulkUpsert.call_args[0][2], [(1, "CPUConsumed", "10", "2022-01-01 10:00:00")])
+
+    def test_setJobParametersBulk(self):
+        self.jobDB._query.return_value = S_OK(((1,),))
+        self.jobDB.bulkUpsert = MagicMock(return_value=S_OK(2))
+
+        result = self.jobDB.setJobParametersBulk({1: {"Memory": 2, "CPU": "1"}, 2: {"CPU": "3"}})
+        self.assertTrue(result["OK"])
+        self.assertEqual(result["Value"], [2])
+        self.assertEqual(self.jobDB.bulkUpsert.call_args[0][2], [(1, "CPU", "1"), (1, "Memory", "2")])
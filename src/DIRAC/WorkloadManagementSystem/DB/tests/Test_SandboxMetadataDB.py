@@ -0,0 +1,49 @@
+""" Test the blobs of the SandboxMetadataDB """
+
+# pylint: disable=protected-access, missing-docstring
+
+from mock import MagicMock, patch
+
+from DIRAC import S_OK
+from DIRAC.WorkloadManagementSystem.DB.SandboxMetadataDB import SandboxMetadataDB
+
+MODULE_NAME = "DIRAC.WorkloadManagementSystem.DB.SandboxMetadataDB"
+
+
+def getSandboxMetadataDB():
+    def mockInit(self, *args, **kwargs):
+        self.log = MagicMock()
+        self._connected = True
+
+    with patch(MODULE_NAME + ".SandboxMetadataDB.__init__", new=mockInit):
+        sandboxDB = SandboxMetadataDB()
+    sandboxDB._escapeString = MagicMock(side_effect=lambda value: S_OK("'%s'" % value))
+    sandboxDB._query = MagicMock(return_value=S_OK(()))
+    return sandboxDB
+
+
+def test_linkSandboxToBlob():
+    sandboxDB = getSandboxMetadataDB()
+
+    # The sandbox is linked
+    sandboxDB._transaction = MagicMock(side_effect=lambda cmds: S_OK([(cmd, 1) for cmd in cmds]))
+    assert sandboxDB.linkSandboxToBlob(12, "SandboxSE", "/SandBox/Blobs/blob", "md5", 10)["Value"] is True
+    cmds = sandboxDB._transaction.call_args[0][0]
+    # A tombstoned blob is neither linked nor counted again
+    assert "RefCount >= 0" in cmds[2]
+    assert "RefCount >= 0" in cmds[3]
+    sandboxDB._query.assert_not_called()
+
+    # Nothing linked: the sandbox was already linked to the blob, or the blob is tombstoned
+    sandboxDB._transaction = MagicMock(side_effect=lambda cmds: S_OK([(cmd, 0) for cmd in cmds]))
+    sandboxDB._query.return_value = S_OK((("SandboxSE", "/SandBox/Blobs/blob"),))
+    assert sandboxDB.linkSandboxToBlob(12, "SandboxSE", "/SandBox/Blobs/blob", "md5", 10)["Value"] is True
+    sandboxDB._query.return_value = S_OK(())
+    assert sandboxDB.linkSandboxToBlob(12, "SandboxSE", "/SandBox/Blobs/blob", "md5", 10)["Value"] is False
+
+
+def test_getBlob():
+    """The tombstoned blobs are absent"""
+    sandboxDB = getSandboxMetadataDB()
+    assert sandboxDB.getBlob("SandboxSE", "/SandBox/Blobs/blob")["Value"] is None
+    assert "RefCount >= 0" in sandboxDB._query.call_args[0][0]
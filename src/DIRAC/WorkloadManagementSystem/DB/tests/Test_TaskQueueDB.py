@@ -0,0 +1,51 @@
+""" Test the loading of the in-memory task queue index of the TaskQueueDB """
+
+# pylint: disable=protected-access, missing-docstring
+
+from mock import MagicMock, patch
+
+from DIRAC import S_OK
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
+
+MODULE_NAME = "DIRAC.WorkloadManagementSystem.DB.TaskQueueDB"
+
+
+def getTaskQueueDB():
+    def mockInit(self, *args, **kwargs):
+        self.log = MagicMock()
+        self._connected = True
+
+    with patch(MODULE_NAME + ".DB.__init__", new=mockInit), patch(MODULE_NAME + ".Operations") as opsMock, patch(
+        MODULE_NAME + ".SharesCorrector"
+    ), patch.object(TaskQueueDB, "_TaskQueueDB__initializeDB", return_value=S_OK()):
+        opsMock.return_value.getValue.side_effect = lambda option, default: (
+            True if option == "JobScheduling/UseTaskQueueIndex" else default
+        )
+        return TaskQueueDB()
+
+
+def test_loadTaskQueueIndex():
+    """The DB is read without the lock, the changes made meanwhile are applied to the new index"""
+    tqDB = getTaskQueueDB()
+    tqIndexLock = tqDB._TaskQueueDB__tqIndexLock
+    loading = []
+
+    def query(cmd, conn=None):
+        if "FROM `tq_TaskQueues`" not in cmd:
+            return S_OK(())
+        assert not tqIndexLock.locked()
+        # Another thread matching during the load does not wait for it, nor loads the index again
+        loading.append(tqDB._TaskQueueDB__getTaskQueueIndex())
+        # The task queue 2 is deleted after it is read
+        tqDB._TaskQueueDB__updateTaskQueueIndex("remove", [2])
+        tqDef = ("/DN", "group", "setup", 3600)
+        return S_OK(((1, 1.0) + tqDef + (1,), (2, 1.0) + tqDef + (1,)))
+
+    tqDB._query = MagicMock(side_effect=query)
+    tqIndex = tqDB._TaskQueueDB__getTaskQueueIndex()
+    assert loading == [None]
+    assert tqIndex.getTaskQueueIDs() == {1}
+    assert tqDB._TaskQueueDB__tqIndexChanges is None
+    # The changes are now applied to the index only
+    tqDB._TaskQueueDB__updateTaskQueueIndex("remove", [1])
+    assert not tqIndex.getTaskQueueIDs()
@@ -95,6 +95,58 @@ class OptimizerExecutor(ExecutorModule):
             self.__jobData.jobState = None
             self.__jobData.jobLog = None
 
+    def processTasks(self, tasks):
+        return self.optimizeJobs(dict(tasks))
+
+    def optimizeJobs(self, jobStates):
+        """Optimize a batch of jobs, which the executors get when their BatchSize option is greater than 1
+
+        The optimizers can overwrite it to make the queries needed by all the jobs at once, e.g. the replicas
+        of their input data or the site mask, before calling this method, which optimizes the jobs one by one.
+
+        The jobs sent to their task queue (by the last optimizer of their chain) are then inserted all at once.
+
+        :param dict jobStates: { jid: CachedJobState }
+
+        :return: S_OK({ jid: S_OK/S_ERROR })
+        """
+        results = {jid: self._ex_runTask(jid, jobState) for jid, jobState in jobStates.items()}
+        self.__insertIntoTaskQueues(jobStates, results)
+        return S_OK(results)
+
+    def __insertIntoTaskQueues(self, jobStates, results):
+        """Insert the optimized jobs in their task queues with one TaskQueueDB.insertJobs call,
+        instead of one by one when the OptimizationMind commits their changes.
+
+        The changes of these jobs (e.g. their Waiting status) are committed first, so that they are not
+        matched before being Waiting. A job whose changes cannot be committed is left to the OptimizationMind.
+
+        :param dict jobStates: { jid: CachedJobState }
+        :param dict results: { jid: S_OK/S_ERROR } result of the optimization of the jobs
+        """
+        committed = []
+        for jid, jobState in jobStates.items():
+            if not results.get(jid, {}).get("OK") or not jobState.tqInsertionPending:
+                continue
+            result = jobState.commitChanges(insertIntoTQ=False)
+            if not result["OK"]:
+                self.log.warn("Could not save changes for job", "%s: %s" % (jid, result["Message"]))
+                continue
+            committed.append(jobState)
+        if not committed:
+            return
+        result = CachedJobState.insertIntoTQBulk(committed)
+        if not result["OK"]:
+            self.log.error("Could not insert jobs in the task queues", result["Message"])
+            return
+        inserted = 0
+        for jid, tqResult in result["Value"].items():
+            if tqResult["OK"]:
+                inserted += 1
+            else:
+                self.log.error("Job rescheduled", "%s: %s" % (jid, tqResult["Message"]))
+        self.log.info("Jobs inserted in the task queues", "%d/%d" % (inserted, len(jobStates)))
+
     def optimizeJob(self, jid, jobState):
         raise Exception("You need to overwrite this method to optimize the job!")
 
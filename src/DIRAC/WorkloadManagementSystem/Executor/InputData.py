@@ -37,6 +37,9 @@ class InputData(OptimizerExecutor):
         cls.__SEToSiteMap = {}
         cls.__lastCacheUpdate = 0
         cls.__cacheLifeTime = 600
+        # Replicas and metadata of the input data of the batch of jobs being optimized, per VO
+        cls.__batchReplicas = {}
+        cls.__batchMetadata = {}
 
         # Note: this is a default, that right now is generically the default for user jobs, at least for main DIRAC users
         # (since this now doesn't run for production jobs)
@@ -71,6 +74,101 @@ class InputData(OptimizerExecutor):
             return None
         return self.__fcDict[vo]
 
+    def optimizeJobs(self, jobStates):
+        """Look up the replicas, and the metadata, of the input data of all the jobs at once,
+        before optimizing them one by one
+        """
+        if len(jobStates) > 1 and not self.checkWithUserProxy:
+            self.__lookUpBatch(jobStates)
+        try:
+            return super().optimizeJobs(jobStates)
+        finally:
+            self.__batchReplicas = {}
+            self.__batchMetadata = {}
+
+    def __lookUpBatch(self, jobStates):
+        """Look up the input data, and the LFN input sandboxes, of the user jobs of a batch, per VO.
+        The jobs for which the lookup fails are looked up one by one.
+        """
+        productionTypes = Operations().getValue("Transformations/DataProcessing", [])
+        inputDataPerVO = {}
+        inputSandboxPerVO = {}
+        for jobState in jobStates.values():
+            result = jobState.getAttribute("JobType")
+            if not result["OK"] or result["Value"] in productionTypes:
+                continue
+            result = jobState.getInputData()
+            if not result["OK"]:
+                continue
+            inputData = result["Value"]
+            result = self._getInputSandbox(jobState)
+            if not result["OK"]:
+                continue
+            inputSandbox = result["Value"]
+            result = jobState.getManifest()
+            if not result["OK"]:
+                continue
+            vo = result["Value"].getOption("VirtualOrganization")
+            inputDataPerVO.setdefault(vo, set()).update(inputData or [])
+            inputSandboxPerVO.setdefault(vo, set()).update(inputSandbox)
+
+        batchReplicas = {}
+        batchMetadata = {}
+        startTime = time.time()
+        for vo in inputDataPerVO:
+            lfns = inputDataPerVO[vo] | inputSandboxPerVO[vo]
+            if not lfns:
+                continue
+            dm = self.__getDataManager(vo)
+            if dm is None:
+                continue
+            result = dm.getReplicasForJobs(sorted(lfns))
+            if not result["OK"]:
+                self.log.warn("Failed to get the replicas for a batch of jobs", result["Message"])
+                continue
+            batchReplicas[vo] = result["Value"]
+            if inputDataPerVO[vo] and self.checkFileMetadata:
+                fc = self.__getFileCatalog(vo)
+                if fc is None:
+                    continue
+                result = fc.getFileMetadata(sorted(inputDataPerVO[vo]))
+                if not result["OK"]:
+                    self.log.warn("Failed to get the metadata for a batch of jobs", result["Message"])
+                    continue
+                batchMetadata[vo] = result["Value"]
+        self.log.verbose(
+            "Batch catalog lookup time",
+            "%.2f seconds for %d jobs" % (time.time() - startTime, len(jobStates)),
+        )
+        self.__batchReplicas = batchReplicas
+        self.__batchMetadata = batchMetadata
+
+    @staticmethod
+    def __getFromBatch(batchResult, lfns):
+        """Get the part of the result of a batch lookup concerning some LFNs
+
+        :return: S_OK({"Successful": dict, "Failed": dict}), None if some LFNs were not looked up
+        """
+        if not batchResult:
+            return None
+        result = {"Successful": {}, "Failed": {}}
+        for lfn in lfns:
+            if lfn in batchResult["Successful"]:
+                # The dictionaries are updated by the caller
+                result["Successful"][lfn] = dict(batchResult["Successful"][lfn])
+            elif lfn in batchResult["Failed"]:
+                result["Failed"][lfn] = batchResult["Failed"][lfn]
+            else:
+                return None
+        return S_OK(result)
+
+    def __getReplicasForJobs(self, dm, vo, lfns):
+        """Get the replicas of LFNs, from the lookup of the batch of jobs if it has been done"""
+        result = self.__getFromBatch(self.__batchReplicas.get(vo), lfns)
+        if result is None:
+            result = dm.getReplicasForJobs(lfns)
+        return result
+
     def optimizeJob(self, jid, jobState):
         """This is the method that needs to be implemented by each and every Executor
 
@@ -201,7 +299,7 @@ class InputData(OptimizerExecutor):
         else:
             # This will return already active replicas, excluding banned SEs, and
             # removing tape replicas if there are disk replicas
-            result = dm.getReplicasForJobs(lfns)
+            result = self.__getReplicasForJobs(dm, vo, lfns)
         self.jobLog.verbose("Catalog replicas lookup time", "%.2f seconds " % (time.time() - startTime))
         if not result["OK"]:
             self.log.warn(result["Message"])
@@ -234,7 +332,9 @@ class InputData(OptimizerExecutor):
             if fc is None:
                 return S_ERROR("Failed to instantiate FileCatalog for vo %s" % vo)
             else:
-                guidDict = fc.getFileMetadata(lfns)
+                guidDict = self.__getFromBatch(self.__batchMetadata.get(vo), lfns)
+                if guidDict is None:
+                    guidDict = fc.getFileMetadata(lfns)
             self.jobLog.info("Catalog Metadata Lookup Time", "%.2f seconds " % (time.time() - startTime))
 
             if not guidDict["OK"]:
@@ -414,7 +514,7 @@ class InputData(OptimizerExecutor):
         # This will return already active replicas, excluding banned SEs, and
         # removing tape replicas if there are disk replicas
 
-        result = dm.getReplicasForJobs(inputSandbox)
+        result = self.__getReplicasForJobs(dm, vo, inputSandbox)
         self.jobLog.verbose("Catalog replicas lookup time", "%.2f seconds " % (time.time() - startTime))
         if not result["OK"]:
             self.log.warn(result["Message"])
@@ -41,8 +41,29 @@ class JobScheduling(OptimizerExecutor):
         """Initialization of the optimizer."""
         cls.siteClient = SiteStatus()
         cls.__jobDB = JobDB()
+        # Status of the sites, got once for the batch of jobs being optimized
+        cls.__batchSiteStatuses = None
         return S_OK()
 
+    def optimizeJobs(self, jobStates):
+        """Get the status of the sites once for all the jobs, before optimizing them one by one"""
+        result = self.siteClient.getSiteStatuses()
+        if result["OK"]:
+            self.__batchSiteStatuses = result["Value"]
+        try:
+            return super().optimizeJobs(jobStates)
+        finally:
+            self.__batchSiteStatuses = None
+
+    def __getSiteStatuses(self):
+        """Get the status of all the sites, from the batch if it has been got already
+
+        :return: S_OK({ site: status })/S_ERROR
+        """
+        if self.__batchSiteStatuses is not None:
+            return S_OK(self.__batchSiteStatuses)
+        return self.siteClient.getSiteStatuses()
+
     def optimizeJob(self, jid, jobState):
         """1. Banned sites are removed from the destination list.
         2. Get input files
@@ -86,23 +107,17 @@ class JobScheduling(OptimizerExecutor):
         jobType = result["Value"]
 
         # Get banned sites from DIRAC
-        result = self.siteClient.getSites("Banned")
+        result = self.__getSiteStatuses()
         if not result["OK"]:
             self.jobLog.error("Cannot retrieve banned sites", result["Message"])
             return result
-        wmsBannedSites = result["Value"]
+        siteStatuses = result["Value"]
+        wmsBannedSites = [site for site, status in siteStatuses.items() if status == "Banned"]
 
         # If the user has selected any site, filter them and hold the job if not able to run
         if userSites:
             if jobType not in self.ex_getOption("ExcludedOnHoldJobTypes", []):
-
-                result = self.siteClient.getUsableSites(userSites)
-                if not result["OK"]:
-                    self.jobLog.error(
-                        "Problem checking userSites for tuple of active/banned/invalid sites", result["Message"]
-                    )
-                    return result
-                usableSites = set(result["Value"])
+                usableSites = set(site for site in userSites if siteStatuses.get(site) in ("Active", "Degraded"))
                 bannedSites = []
                 invalidSites = []
                 for site in userSites:
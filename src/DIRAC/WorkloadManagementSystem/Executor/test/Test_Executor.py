@@ -5,7 +5,9 @@
 import pytest
 from mock import MagicMock
 
+from DIRAC import S_OK, S_ERROR
 from DIRAC.WorkloadManagementSystem.Client.JobState.CachedJobState import CachedJobState
+from DIRAC.WorkloadManagementSystem.Client.JobState.JobState import JobState
 from DIRAC.WorkloadManagementSystem.Client.JobState.JobManifest import JobManifest
 
 # sut
@@ -107,3 +109,113 @@ def test__getInputSandbox(mocker, manifestOptions, expected):
     res = inputData._getInputSandbox(js)
     assert res["OK"] is True
     assert res["Value"] == expected
+
+
+def getBatchJobState(inputData, inputSandbox=None):
+    """Mocked job state of a user job"""
+    manifest = JobManifest()
+    manifest.setOption("VirtualOrganization", "vo")
+    if inputSandbox:
+        manifest.setOption("InputSandbox", inputSandbox)
+    jobState = MagicMock()
+    jobState.getAttribute.return_value = S_OK("User")
+    jobState.getInputData.return_value = S_OK(inputData)
+    jobState.getManifest.return_value = S_OK(manifest)
+    return jobState
+
+
+def test_optimizeJobsInputData(mocker):
+    """The replicas of the jobs of a batch are looked up at once"""
+    mocker.patch("DIRAC.WorkloadManagementSystem.Executor.InputData.Operations")
+    inputData = InputData()
+    inputData.checkWithUserProxy = False
+    inputData.checkFileMetadata = True
+    inputData.log = MagicMock()
+    inputData._ExecutorModule__taskStates = {}
+    dm = MagicMock()
+    dm.getReplicasForJobs.return_value = S_OK(
+        {"Successful": {"/vo/1": {"SE1": "pfn1"}, "/vo/2": {"SE2": "pfn2"}}, "Failed": {"/vo/3": "No such file"}}
+    )
+    mocker.patch.object(inputData, "_InputData__getDataManager", return_value=dm)
+    fc = MagicMock()
+    fc.getFileMetadata.return_value = S_OK({"Successful": {"/vo/1": {"GUID": "1"}}, "Failed": {}})
+    mocker.patch.object(inputData, "_InputData__getFileCatalog", return_value=fc)
+
+    replicas = {}
+
+    def processTask(jid, jobState):
+        lfns = jobState.getInputData()["Value"] + inputData._getInputSandbox(jobState)["Value"]
+        replicas[jid] = inputData._InputData__getReplicasForJobs(dm, "vo", lfns)["Value"]
+        return S_OK()
+
+    mocker.patch.object(inputData, "processTask", side_effect=processTask)
+    jobStates = {1: getBatchJobState(["/vo/1"], "LFN:/vo/3"), 2: getBatchJobState(["/vo/1", "/vo/2"])}
+    result = inputData.optimizeJobs(jobStates)
+    assert result["OK"]
+    assert all(jobResult["OK"] for jobResult in result["Value"].values())
+
+    dm.getReplicasForJobs.assert_called_once_with(["/vo/1", "/vo/2", "/vo/3"])
+    fc.getFileMetadata.assert_called_once_with(["/vo/1", "/vo/2"])
+    assert replicas[1] == {"Successful": {"/vo/1": {"SE1": "pfn1"}}, "Failed": {"/vo/3": "No such file"}}
+    assert replicas[2] == {"Successful": {"/vo/1": {"SE1": "pfn1"}, "/vo/2": {"SE2": "pfn2"}}, "Failed": {}}
+
+    # Out of a batch, the replicas are looked up for each job
+    inputData._InputData__getReplicasForJobs(dm, "vo", ["/vo/1"])
+    assert dm.getReplicasForJobs.call_count == 2
+
+
+def test_optimizeJobsScheduling(mocker):
+    """The site statuses are got once per batch, and each job is frozen on its own"""
+    jobScheduling = JobScheduling()
+    jobScheduling._ExecutorModule__taskStates = {}
+    jobScheduling.log = MagicMock()
+    jobScheduling.siteClient = MagicMock()
+    jobScheduling.siteClient.getSiteStatuses.return_value = S_OK({"Site.A.org": "Active", "Site.B.org": "Banned"})
+
+    def processTask(jid, jobState):
+        assert jobScheduling._JobScheduling__getSiteStatuses()["Value"]["Site.B.org"] == "Banned"
+        if jid == 2:
+            jobScheduling.freezeTask(300)
+        return S_OK()
+
+    mocker.patch.object(jobScheduling, "processTask", side_effect=processTask)
+    insertIntoTQBulk = mocker.patch.object(CachedJobState, "insertIntoTQBulk", return_value=S_OK({1: S_OK()}))
+    jobStates = [MagicMock(tqInsertionPending=jid != 2) for jid in (1, 2, 3)]
+    jobStates[0].commitChanges.return_value = S_OK()
+    jobStates[2].commitChanges.return_value = S_ERROR("Initial state was different")
+    result = jobScheduling.processTasks(list(zip((1, 2, 3), jobStates)))
+    assert result["OK"]
+    assert sorted(result["Value"]) == [1, 2, 3]
+    assert jobScheduling.siteClient.getSiteStatuses.call_count == 1
+    taskStates = jobScheduling._ExecutorModule__taskStates
+    assert [taskStates[jid]["FreezeTime"] for jid in (1, 2, 3)] == [0, 300, 0]
+    # The jobs sent to the task queues are inserted at once, once their changes are saved
+    jobStates[0].commitChanges.assert_called_once_with(insertIntoTQ=False)
+    jobStates[1].commitChanges.assert_not_called()
+    insertIntoTQBulk.assert_called_once_with([jobStates[0]])
+
+
+def test_insertIntoTQBulk(mocker):
+    mocker.patch.object(JobState, "checkDBAccess")
+    mocker.patch.object(JobState, "getAttributes", return_value=S_OK({"Status": "Checking"}))
+    insertJobsIntoTQ = mocker.patch.object(
+        JobState, "insertJobsIntoTQ", return_value=S_OK({1: S_OK(), 2: S_ERROR("Cannot insert in task queue")})
+    )
+    rescheduleJob = mocker.patch.object(JobState, "rescheduleJob", return_value=S_OK())
+
+    jobStates = []
+    for jid in (1, 2, 3):
+        jobState = CachedJobState(jid)
+        jobState.setManifest(JobManifest())
+        if jid != 3:
+            jobState.insertIntoTQ()
+        jobStates.append(jobState)
+
+    result = CachedJobState.insertIntoTQBulk(jobStates)
+    assert result["OK"]
+    assert sorted(result["Value"]) == [1, 2]
+    assert sorted(insertJobsIntoTQ.call_args[0][0]) == [1, 2]
+    assert not jobStates[0].tqInsertionPending
+    # The job which could not be inserted is rescheduled
+    rescheduleJob.assert_called_once_with()
+    assert not jobStates[1].tqInsertionPending
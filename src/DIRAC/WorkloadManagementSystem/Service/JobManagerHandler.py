@@ -167,32 +167,48 @@ class JobManagerHandlerMixin:
                     "limit %d smaller than number of jobs %d" % (self.maxParametricJobs, nJobs),
                 )
                 return S_ERROR(EWMSJDL, "Number of parametric jobs exceeds the limit of %d" % self.maxParametricJobs)
-            result = generateParametricJobs(jobClassAd)
+            result = generateParametricJobs(jobClassAd, asClassAds=True)
             if not result["OK"]:
                 return result
             jobDescList = result["Value"]
-        else:
-            # if we are here, then jobDesc was the description of a single job.
-            jobDescList = [jobDesc]
 
         jobIDList = []
 
         if parametricJob:
-            initialStatus = JobStatus.SUBMITTING
-            initialMinorStatus = "Bulk transaction confirmation"
+            # All the jobs are inserted in bulk
+            result = self.jobDB.insertNewJobsIntoDB(
+                jobDescList,
+                self.owner,
+                self.ownerDN,
+                self.ownerGroup,
+                self.diracSetup,
+                initialStatus=JobStatus.SUBMITTING,
+                initialMinorStatus="Bulk transaction confirmation",
+                templateJDL=jobDesc,
+            )
+            if not result["OK"]:
+                return result
+            jobsByStatus = {}
+            for jobDict in result["Value"]:
+                jobIDList.append(jobDict["JobID"])
+                jobsByStatus.setdefault((jobDict["Status"], jobDict["MinorStatus"]), []).append(jobDict["JobID"])
+            self.log.info(
+                "Jobs added to the JobDB",
+                "%d jobs (%s to %s) for %s/%s"
+                % (len(jobIDList), jobIDList[0], jobIDList[-1], self.ownerDN, self.ownerGroup),
+            )
+            for (status, minorStatus), jobIDs in jobsByStatus.items():
+                self.jobLoggingDB.addLoggingRecords(jobIDs, status, minorStatus, source="JobManager")
         else:
-            initialStatus = JobStatus.RECEIVED
-            initialMinorStatus = "Job accepted"
-
-        for jobDescription in jobDescList:  # jobDescList because there might be a list generated by a parametric job
+            # if we are here, then jobDesc was the description of a single job.
             result = self.jobDB.insertNewJobIntoDB(
-                jobDescription,
+                jobDesc,
                 self.owner,
                 self.ownerDN,
                 self.ownerGroup,
                 self.diracSetup,
-                initialStatus=initialStatus,
-                initialMinorStatus=initialMinorStatus,
+                initialStatus=JobStatus.RECEIVED,
+                initialMinorStatus="Job accepted",
             )
             if not result["OK"]:
                 return result
@@ -5,6 +5,8 @@
 
     setJobStatus()
 
+    With the WriteBehind option, the status updates, heart beats and job parameters are buffered
+    and written in batches, see :mod:`~DIRAC.WorkloadManagementSystem.Utilities.JobStateUpdateBuffer`
 """
 import time
 
@@ -15,9 +17,14 @@ from DIRAC.Core.Utilities.DEncode import ignoreEncodeWarning
 from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.WorkloadManagementSystem.Client import JobStatus
+from DIRAC.WorkloadManagementSystem.Utilities.JobStateUpdateBuffer import JobStateUpdateBuffer
 
 
 class JobStateUpdateHandlerMixin:
+
+    # Write-behind buffer of the updates, if enabled
+    updateBuffer = None
+
     @classmethod
     def initializeHandler(cls, svcInfoDict):
         """
@@ -49,8 +56,24 @@ class JobStateUpdateHandlerMixin:
                 cls.elasticJobParametersDB = result["Value"]()
             except RuntimeError as excp:
                 return S_ERROR("Can't connect to DB: %s" % excp)
+
+        if cls.srv_getCSOption("WriteBehind", False):
+            cls.updateBuffer = JobStateUpdateBuffer(
+                cls.jobDB,
+                cls._setJobStatusBulk,
+                flushPeriod=cls.srv_getCSOption("WriteBehindFlushPeriod", 10),
+                maxQueueDepth=cls.srv_getCSOption("WriteBehindMaxQueueDepth", 10000),
+                parentLogger=cls.log,
+            )
+            cls.updateBuffer.start()
         return S_OK()
 
+    @classmethod
+    def _flushJob(cls, jobID):
+        """Write the buffered updates of a job, before writing an update which is not buffered"""
+        if cls.updateBuffer:
+            cls.updateBuffer.flushJob(int(jobID))
+
     ###########################################################################
     types_updateJobFromStager = [[str, int], str]
 
@@ -124,6 +147,7 @@ class JobStateUpdateHandlerMixin:
                 sDict["Source"] = source
             if not datetime:
                 datetime = Time.toString()
+            cls._flushJob(jobID)
             return cls._setJobStatusBulk(jobID, {datetime: sDict}, force=force)
         return S_OK()
 
@@ -133,6 +157,8 @@ class JobStateUpdateHandlerMixin:
     @classmethod
     def export_setJobStatusBulk(cls, jobID, statusDict, force=False):
         """Set various job status fields with a time stamp and a source"""
+        if cls.updateBuffer:
+            return cls.updateBuffer.addStatusUpdates(int(jobID), statusDict, force=force)
         return cls._setJobStatusBulk(jobID, statusDict, force=force)
 
     @classmethod
@@ -292,6 +318,7 @@ class JobStateUpdateHandlerMixin:
     @classmethod
     def export_setJobAttribute(cls, jobID, attribute, value):
         """Set a job attribute"""
+        cls._flushJob(jobID)
         return cls.jobDB.setJobAttribute(int(jobID), attribute, value)
 
     ###########################################################################
@@ -340,6 +367,7 @@ class JobStateUpdateHandlerMixin:
         if cls.elasticJobParametersDB:
             return cls.elasticJobParametersDB.setJobParameter(int(jobID), name, value)  # pylint: disable=no-member
 
+        cls._flushJob(jobID)
         return cls.jobDB.setJobParameter(int(jobID), name, value)
 
     ###########################################################################
@@ -365,6 +393,7 @@ class JobStateUpdateHandlerMixin:
                     message = res["Message"]
 
             else:
+                cls._flushJob(jobID)
                 res = cls.jobDB.setJobParameter(
                     jobID, str(jobsParameterDict[jobID][0]), str(jobsParameterDict[jobID][1])
                 )
@@ -390,6 +419,8 @@ class JobStateUpdateHandlerMixin:
             result = cls.elasticJobParametersDB.setJobParameters(jobID, parameters)
             if not result["OK"]:
                 cls.log.error("Failed to add Job Parameters to ElasticJobParametersDB", result["Message"])
+        elif cls.updateBuffer:
+            result = cls.updateBuffer.addJobParameters(int(jobID), parameters)
         else:
             result = cls.jobDB.setJobParameters(int(jobID), parameters)
             if not result["OK"]:
@@ -404,7 +435,10 @@ class JobStateUpdateHandlerMixin:
     def export_sendHeartBeat(cls, jobID, dynamicData, staticData):
         """Send a heart beat sign of life for a job jobID"""
 
-        result = cls.jobDB.setHeartBeatData(int(jobID), dynamicData)
+        if cls.updateBuffer:
+            result = cls.updateBuffer.addHeartBeat(int(jobID), dynamicData)
+        else:
+            result = cls.jobDB.setHeartBeatData(int(jobID), dynamicData)
         if not result["OK"]:
             cls.log.warn("Failed to set the heart beat data", f"for job {jobID} ")
 
@@ -413,6 +447,8 @@ class JobStateUpdateHandlerMixin:
                 result = cls.elasticJobParametersDB.setJobParameter(int(jobID), key, value)
                 if not result["OK"]:
                     cls.log.error("Failed to add Job Parameters to ElasticSearch", result["Message"])
+        elif cls.updateBuffer:
+            cls.updateBuffer.addJobParameters(int(jobID), staticData.items())
         else:
             result = cls.jobDB.setJobParameters(int(jobID), list(staticData.items()))
             if not result["OK"]:
@@ -443,6 +479,16 @@ class JobStateUpdateHandlerMixin:
 
         return S_OK(jobMessageDict)
 
+    ###########################################################################
+    types_getUpdateBufferStatistics = []
+
+    @classmethod
+    def export_getUpdateBufferStatistics(cls):
+        """Get the statistics of the write-behind buffer: queue depth, flush latency, numbers of updates"""
+        if not cls.updateBuffer:
+            return S_ERROR("The updates are not buffered")
+        return S_OK(cls.updateBuffer.getStatistics())
+
 
 class JobStateUpdateHandler(JobStateUpdateHandlerMixin, RequestHandler):
     pass
@@ -6,6 +6,10 @@
   :end-before: ##END
   :dedent: 2
   :caption: SandboxStore options
+
+With ContentAddressed enabled (local storage only), the sandboxes with the same contents are stored once,
+in a blob named after their checksum, which is shared by their owners. The clients first look up the
+checksum of their sandbox with lookupSandbox, and only upload it if it is not there yet.
 """
 import os
 import time
@@ -49,6 +53,7 @@ class SandboxStoreHandler(RequestHandler):
         self.__backend = self.getCSOption("Backend", "local")
         self.__localSEName = self.getCSOption("LocalSE", "SandboxSE")
         self.__maxUploadBytes = self.getCSOption("MaxSandboxSizeMiB", 10) * 1048576
+        self.__transferChunkBytes = self.getCSOption("TransferChunkSizeKiB", 1024) * 1024
         if self.__backend.lower() == "local" or self.__backend == self.__localSEName:
             self.__useLocalStorage = True
             self.__seNameToUse = self.__localSEName
@@ -56,6 +61,8 @@ class SandboxStoreHandler(RequestHandler):
             self.__useLocalStorage = False
             self.__externalSEName = self.__backend
             self.__seNameToUse = self.__backend
+        # The blobs are shared by the owners of the sandboxes, which requires the local storage
+        self.__contentAddressed = self.__useLocalStorage and self.getCSOption("ContentAddressed", False)
         # Execute the purge once every 1000 calls
         SandboxStoreHandler.__purgeCount += 1
         if SandboxStoreHandler.__purgeCount > self.getCSOption("QueriesBeforePurge", 1000):
@@ -76,15 +83,17 @@ class SandboxStoreHandler(RequestHandler):
         pathItems.extend([md5[0:3], md5[3:6], md5])
         return os.path.join(*pathItems)
 
-    def transfer_fromClient(self, fileId, token, fileSize, fileHelper):
-        """
-        Receive a file as a sandbox
-        """
+    @staticmethod
+    def __getBlobPath(md5):
+        """Generate the path of the blob holding the sandboxes with the given contents"""
+        return os.path.join("/", "SandBox", "Blobs", md5[0:3], md5[3:6], md5)
 
-        if self.__maxUploadBytes and fileSize > self.__maxUploadBytes:
-            fileHelper.markAsTransferred()
-            return S_ERROR("Sandbox is too big. Please upload it to a grid storage element")
+    @staticmethod
+    def __parseFileId(fileId):
+        """Split the file id sent by the clients
 
+        :return: S_OK with tuple (hash, extension, assignTo)
+        """
         if isinstance(fileId, (list, tuple)):
             if len(fileId) > 1:
                 assignTo = fileId[1]
@@ -101,26 +110,116 @@ class SandboxStoreHandler(RequestHandler):
         else:
             extension = ""
             aHash = fileId
-        gLogger.info("Upload requested", f"for {aHash} [{extension}]")
+        return S_OK((aHash, extension, assignTo))
+
+    def __assignNewSandbox(self, sbURL, assignTo):
+        """Assign a sandbox to the entities it was uploaded for, and return its URL"""
+        assignTo = dict([(key, [(sbURL, assignTo[key])]) for key in assignTo])
+        result = self.export_assignSandboxesToEntities(assignTo)
+        if not result["OK"]:
+            return result
+        return S_OK(sbURL)
+
+    def __getExistingSandbox(self, aHash, extension, fileSize, assignTo):
+        """Get the sandbox of the requester with the given contents, without any transfer
 
+        The sandbox is registered for the requester if there is a blob with these contents
+
+        :return: S_OK with the sandbox URL, or None if the contents have to be uploaded
+        """
         credDict = self.getRemoteCredentials()
-        sbPath = self.__getSandboxPath("%s.%s" % (aHash, extension))
-        # Generate the location
+        fileName = "%s.%s" % (aHash, extension)
+        sbPath = self.__getSandboxPath(fileName)
         result = self.__generateLocation(sbPath)
         if not result["OK"]:
             return result
         seName, sePFN = result["Value"]
-
         result = self.sandboxDB.getSandboxId(seName, sePFN, credDict["username"], credDict["group"])
         if result["OK"]:
-            gLogger.info("Sandbox already exists. Skipping upload")
+            gLogger.info("Sandbox already exists", f"SB:{seName}|{sePFN}")
+            return self.__assignNewSandbox(f"SB:{seName}|{sePFN}", assignTo)
+        if not self.__contentAddressed:
+            return S_OK(None)
+
+        blobPath = self.__getBlobPath(fileName)
+        result = self.sandboxDB.getBlob(self.__localSEName, blobPath)
+        if not result["OK"]:
+            return result
+        blob = result["Value"]
+        if not blob or (fileSize > 0 and blob["Bytes"] != fileSize):
+            return S_OK(None)
+        if not os.path.isfile(self.__sbToHDPath(blobPath)):
+            gLogger.warn("Registered sandbox blob is missing", blobPath)
+            return S_OK(None)
+        gLogger.info("Sandbox contents already stored", blobPath)
+        return self.__registerBlobSandbox(sbPath, blobPath, aHash, blob["Bytes"], assignTo)
+
+    def __registerBlobSandbox(self, sbPath, blobPath, aHash, size, assignTo):
+        """Register a sandbox of the requester referencing a blob, and assign it"""
+        credDict = self.getRemoteCredentials()
+        result = self.sandboxDB.registerAndGetSandbox(
+            credDict["username"], credDict["DN"], credDict["group"], self.__localSEName, sbPath, size
+        )
+        if not result["OK"]:
+            return result
+        sbId, newSandbox = result["Value"]
+        result = self.sandboxDB.linkSandboxToBlob(sbId, self.__localSEName, blobPath, aHash, size)
+        if not result["OK"]:
+            return result
+        if not result["Value"]:
+            # The blob is being purged, a sandbox without contents must not stay registered
+            gLogger.info("Sandbox blob is being purged", blobPath)
+            if newSandbox:
+                self.sandboxDB.deleteSandboxes([sbId])
+            return S_OK(None)
+        return self.__assignNewSandbox(f"SB:{self.__localSEName}|{sbPath}", assignTo)
+
+    types_lookupSandbox = [(list, tuple, str), int]
+
+    def export_lookupSandbox(self, fileId, fileSize):
+        """Check if a sandbox has to be uploaded, before sending it
+
+        :param fileId: file id, as for the upload: "<md5>.<extension>", or a tuple with it and the
+                       { entity : sandbox type } dict the sandbox has to be assigned to
+        :param int fileSize: size of the sandbox, or -1 if it is unknown
+
+        :return: S_OK with the URL of the sandbox, which is registered and assigned as after an upload,
+                 or None if the sandbox has to be uploaded
+        """
+        if self.__maxUploadBytes and fileSize > self.__maxUploadBytes:
+            return S_ERROR("Sandbox is too big. Please upload it to a grid storage element")
+        result = self.__parseFileId(fileId)
+        if not result["OK"]:
+            return result
+        aHash, extension, assignTo = result["Value"]
+        return self.__getExistingSandbox(aHash, extension, fileSize, assignTo)
+
+    def transfer_fromClient(self, fileId, token, fileSize, fileHelper):
+        """
+        Receive a file as a sandbox
+        """
+
+        if self.__maxUploadBytes and fileSize > self.__maxUploadBytes:
             fileHelper.markAsTransferred()
-            sbURL = "SB:%s|%s" % (seName, sePFN)
-            assignTo = dict([(key, [(sbURL, assignTo[key])]) for key in assignTo])
-            result = self.export_assignSandboxesToEntities(assignTo)
-            if not result["OK"]:
-                return result
-            return S_OK(sbURL)
+            return S_ERROR("Sandbox is too big. Please upload it to a grid storage element")
+
+        result = self.__parseFileId(fileId)
+        if not result["OK"]:
+            return result
+        aHash, extension, assignTo = result["Value"]
+        gLogger.info("Upload requested", f"for {aHash} [{extension}]")
+
+        credDict = self.getRemoteCredentials()
+        sbPath = self.__getSandboxPath("%s.%s" % (aHash, extension))
+
+        result = self.__getExistingSandbox(aHash, extension, fileSize, assignTo)
+        if not result["OK"] or result["Value"]:
+            # Nothing to receive
+            fileHelper.markAsTransferred()
+            return result
+
+        if self.__contentAddressed:
+            return self.__receiveBlob(fileHelper, aHash, extension, sbPath, assignTo)
 
         if self.__useLocalStorage:
             hdPath = self.__sbToHDPath(sbPath)
@@ -160,12 +259,42 @@ class SandboxStoreHandler(RequestHandler):
             self.__secureUnlinkFile(hdPath)
             return result
 
-        sbURL = f"SB:{self.__seNameToUse}|{sbPath}"
-        assignTo = dict([(key, [(sbURL, assignTo[key])]) for key in assignTo])
-        result = self.export_assignSandboxesToEntities(assignTo)
+        return self.__assignNewSandbox(f"SB:{self.__seNameToUse}|{sbPath}", assignTo)
+
+    def __receiveBlob(self, fileHelper, aHash, extension, sbPath, assignTo):
+        """Receive the contents of a sandbox into its blob, and register the sandbox referencing it"""
+        blobPath = self.__getBlobPath("%s.%s" % (aHash, extension))
+        hdBlobPath = self.__sbToHDPath(blobPath)
+        # Concurrent uploads of the same contents are received into different files
+        try:
+            mkDir(os.path.dirname(hdBlobPath))
+            tfd, hdTmpPath = tempfile.mkstemp(
+                prefix="%s." % os.path.basename(hdBlobPath), dir=os.path.dirname(hdBlobPath)
+            )
+            os.close(tfd)
+        except OSError as e:
+            gLogger.error("Cannot create temporary file", repr(e).replace(",)", ")"))
+            return S_ERROR("Cannot create temporary file")
+        result = self.__networkToFile(fileHelper, hdTmpPath)
         if not result["OK"]:
+            gLogger.error("Error while receiving sandbox file", result["Message"])
+            self.__secureUnlinkFile(hdTmpPath)
             return result
-        return S_OK(sbURL)
+        if fileHelper.getHash() != aHash:
+            self.__secureUnlinkFile(hdTmpPath)
+            gLogger.error("Hashes don't match! Client defined hash is different with received data hash!")
+            return S_ERROR("Hashes don't match!")
+        try:
+            os.rename(hdTmpPath, hdBlobPath)
+        except OSError as e:
+            self.__secureUnlinkFile(hdTmpPath)
+            gLogger.error("Cannot move temporal file to final path", repr(e).replace(",)", ")"))
+            return S_ERROR("Cannot move temporal file to final path")
+        gLogger.info("Wrote sandbox blob to file", hdBlobPath)
+        result = self.__registerBlobSandbox(sbPath, blobPath, aHash, fileHelper.getTransferedBytes(), assignTo)
+        if result["OK"] and not result["Value"]:
+            return S_ERROR("Sandbox contents are being purged, please upload them again")
+        return result
 
     def transfer_bulkFromClient(self, fileId, token, _fileSize, fileHelper):
         """Receive files packed into a tar archive by the fileHelper logic.
@@ -411,17 +540,25 @@ class SandboxStoreHandler(RequestHandler):
             return result
         sbId = result["Value"]
         self.sandboxDB.accessedSandboxById(sbId)
+        # The contents of the content-addressed sandboxes are in their blob
+        result = self.sandboxDB.getSandboxBlob(sbId)
+        if not result["OK"]:
+            return result
+        if result["Value"]:
+            filePath = result["Value"][1]
         # If it's a local file
         hdPath = self.__sbToHDPath(filePath)
         if not os.path.isfile(hdPath):
             return S_ERROR("Sandbox does not exist")
-        result = fileHelper.getFileDescriptor(hdPath, "rb")
-        if not result["OK"]:
-            return S_ERROR("Failed to get file descriptor: %s" % result["Message"])
-        fd = result["Value"]
-        result = fileHelper.FDToNetwork(fd)
-        fileHelper.oFile.close()
-        return result
+        try:
+            with open(hdPath, "rb") as fd:
+                # The file is streamed in chunks as it is read, never entirely in memory
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(fd.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                fileHelper.packetSize = self.__transferChunkBytes
+                return fileHelper.FDToNetwork(fd.fileno())
+        except OSError as e:
+            return S_ERROR("Failed to read sandbox: %s" % repr(e).replace(",)", ")"))
 
     ##################
     # Purge sandboxes
@@ -451,10 +588,36 @@ class SandboxStoreHandler(RequestHandler):
             if i % 10000 == 0:
                 gLogger.info("Purging", "%d out of %d" % (i, len(sbList)))
             self.__purgeSandbox(sbId, SEName, SEPFN)
+        self.__purgeUnusedBlobs()
 
         SandboxStoreHandler.__purgeWorking = False
         return S_OK()
 
+    def __purgeUnusedBlobs(self):
+        """Delete the blobs which are not referenced by any sandbox anymore"""
+        result = self.sandboxDB.getUnusedBlobs()
+        if not result["OK"]:
+            gLogger.error("Error while retrieving sandbox blobs to purge", result["Message"])
+            return
+        gLogger.info("Got sandbox blobs to purge", "(%d)" % len(result["Value"]))
+        for blobId, SEName, SEPFN, refCount in result["Value"]:
+            # The blob is tombstoned first, unless it got referenced again meanwhile: it can then not be
+            # referenced anymore, and its contents are removed before its row (already done if it was tombstoned)
+            if refCount >= 0:
+                result = self.sandboxDB.tombstoneBlob(blobId)
+                if not result["OK"]:
+                    gLogger.error("Cannot mark sandbox blob as purged", result["Message"])
+                    continue
+                if not result["Value"]:
+                    continue
+            result = self.__deleteSandboxFromBackend(SEName, SEPFN)
+            if not result["OK"]:
+                gLogger.error("Cannot delete sandbox blob from backend", result["Message"])
+                continue
+            result = self.sandboxDB.deleteBlob(blobId)
+            if not result["OK"]:
+                gLogger.error("Cannot delete sandbox blob from DB", result["Message"])
+
     def __purgeSandbox(self, sbId, SEName, SEPFN):
         result = self.__deleteSandboxFromBackend(SEName, SEPFN)
         if not result["OK"]:
@@ -228,3 +228,20 @@ def test__setJobStatusBulk(
     assert res["OK"] is resExpected
     if res["OK"]:
         assert res["Value"] == resExpected_value
+
+
+def test_setJobStatusBulkBuffered(mocker):
+    """With the write-behind buffer, the status updates are written when the buffer is flushed"""
+    JobStateUpdateHandlerMixin.jobDB = jobDB_mock
+    JobStateUpdateHandlerMixin.log = gLogger
+    mocker.patch.object(JobStateUpdateHandlerMixin, "updateBuffer", MagicMock())
+    setJobStatusBulk = mocker.patch.object(JobStateUpdateHandlerMixin, "_setJobStatusBulk")
+
+    statusDict = {"2002-01-01 00:00:00": {"Status": JobStatus.DONE}}
+    JobStateUpdateHandlerMixin.export_setJobStatusBulk("1", statusDict)
+    JobStateUpdateHandlerMixin.updateBuffer.addStatusUpdates.assert_called_once_with(1, statusDict, force=False)
+    setJobStatusBulk.assert_not_called()
+
+    # The updates which are not buffered first write the buffered ones
+    JobStateUpdateHandlerMixin.export_setJobAttribute("1", "Site", "Somewhere")
+    JobStateUpdateHandlerMixin.updateBuffer.flushJob.assert_called_once_with(1)
@@ -0,0 +1,192 @@
+""" unit test (pytest) of the content-addressed mode of the SandboxStore service
+"""
+# pylint: disable=protected-access
+import hashlib
+import os
+
+from mock import MagicMock
+import pytest
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.private.FileHelper import FileHelper
+from DIRAC.WorkloadManagementSystem.Service.SandboxStoreHandler import SandboxStoreHandler
+
+contents = b"sandbox contents" * 1000
+md5 = hashlib.md5(contents).hexdigest()
+fileName = "%s.tar.bz2" % md5
+blobPath = "/SandBox/Blobs/%s/%s/%s" % (md5[0:3], md5[3:6], fileName)
+sbPath = "/SandBox/u/user.user_group/%s/%s/%s" % (md5[0:3], md5[3:6], fileName)
+
+
+@pytest.fixture
+def handler(tmp_path):
+    """A SandboxStore handler using a temporary directory as local storage, and a mocked SandboxMetadataDB"""
+    options = {"BasePath": str(tmp_path), "ContentAddressed": True, "TransferChunkSizeKiB": 4}
+    SandboxStoreHandler._SandboxStoreHandler__purgeCount = 1
+    handler = SandboxStoreHandler.__new__(SandboxStoreHandler)
+    handler.getCSOption = lambda option, default=None: options.get(option, default)
+    handler.getRemoteCredentials = MagicMock(
+        return_value={"username": "user", "group": "user_group", "DN": "/DN=user", "properties": ["NormalUser"]}
+    )
+    handler.serviceInfoDict = {"clientSetup": "Test", "URL": "dips://server:9196/WorkloadManagement/SandboxStore"}
+    handler.sandboxDB = MagicMock()
+    handler.sandboxDB.getSandboxId.return_value = S_ERROR("No sandbox matches the requirements")
+    handler.sandboxDB.getBlob.return_value = S_OK(None)
+    handler.sandboxDB.getSandboxBlob.return_value = S_OK(None)
+    handler.sandboxDB.registerAndGetSandbox.return_value = S_OK((12, True))
+    handler.sandboxDB.linkSandboxToBlob.return_value = S_OK(True)
+    handler.sandboxDB.assignSandboxesToEntities.return_value = S_OK(1)
+    handler.initialize()
+    return handler
+
+
+def storeBlob(tmp_path):
+    """Write the blob of the test contents in the local storage"""
+    hdPath = os.path.join(str(tmp_path), blobPath[1:])
+    os.makedirs(os.path.dirname(hdPath), exist_ok=True)
+    with open(hdPath, "wb") as fd:
+        fd.write(contents)
+    return hdPath
+
+
+def test_lookupSandbox(handler, tmp_path):
+    """The sandboxes are registered without upload when their contents are stored"""
+    # Nothing stored yet: the sandbox has to be uploaded
+    result = handler.export_lookupSandbox([fileName, {"Job:1": "Input"}], len(contents))
+    assert result["OK"], result["Message"]
+    assert result["Value"] is None
+    handler.sandboxDB.registerAndGetSandbox.assert_not_called()
+
+    # The blob is registered, but another size was announced
+    storeBlob(tmp_path)
+    handler.sandboxDB.getBlob.return_value = S_OK({"BlobId": 3, "Checksum": md5, "Bytes": len(contents)})
+    result = handler.export_lookupSandbox([fileName, {"Job:1": "Input"}], 10)
+    assert result["Value"] is None
+
+    result = handler.export_lookupSandbox([fileName, {"Job:1": "Input"}], len(contents))
+    assert result["OK"], result["Message"]
+    assert result["Value"] == "SB:SandboxSE|%s" % sbPath
+    handler.sandboxDB.getBlob.assert_called_with("SandboxSE", blobPath)
+    handler.sandboxDB.linkSandboxToBlob.assert_called_once_with(12, "SandboxSE", blobPath, md5, len(contents))
+    assignDict = handler.sandboxDB.assignSandboxesToEntities.call_args[0][0]
+    assert assignDict == {"Job:1": [(result["Value"], "Input")]}
+
+
+def test_lookupSandboxNotContentAddressed(handler):
+    """Without content addressing, only the sandboxes of the requester are found"""
+    handler._SandboxStoreHandler__contentAddressed = False
+    result = handler.export_lookupSandbox(fileName, len(contents))
+    assert result["OK"], result["Message"]
+    assert result["Value"] is None
+    handler.sandboxDB.getBlob.assert_not_called()
+
+    handler.sandboxDB.getSandboxId.return_value = S_OK(12)
+    result = handler.export_lookupSandbox(fileName, len(contents))
+    assert result["Value"].endswith("|%s" % sbPath)
+
+
+def test_transferFromClient(handler, tmp_path):
+    """The uploaded contents are written to their blob, which the sandbox references"""
+
+    def networkToDataSink(dataSink, maxFileSize=0):
+        dataSink.write(contents)
+        return S_OK()
+
+    fileHelper = MagicMock()
+    fileHelper.networkToDataSink.side_effect = networkToDataSink
+    fileHelper.getHash.return_value = md5
+    fileHelper.getTransferedBytes.return_value = len(contents)
+
+    result = handler.transfer_fromClient([fileName, {}], "", len(contents), fileHelper)
+    assert result["OK"], result["Message"]
+    hdPath = os.path.join(str(tmp_path), blobPath[1:])
+    with open(hdPath, "rb") as fd:
+        assert fd.read() == contents
+    # No temporary file is left
+    assert os.listdir(os.path.dirname(hdPath)) == [fileName]
+    assert handler.sandboxDB.registerAndGetSandbox.call_args[0][4] == sbPath
+    handler.sandboxDB.linkSandboxToBlob.assert_called_once()
+
+    # Corrupted contents are not stored
+    os.unlink(hdPath)
+    fileHelper.getHash.return_value = "0" * 32
+    result = handler.transfer_fromClient([fileName, {}], "", len(contents), fileHelper)
+    assert not result["OK"]
+    assert not os.listdir(os.path.dirname(hdPath))
+
+    # Stored contents are not received again
+    storeBlob(tmp_path)
+    handler.sandboxDB.getBlob.return_value = S_OK({"BlobId": 3, "Checksum": md5, "Bytes": len(contents)})
+    fileHelper.reset_mock()
+    result = handler.transfer_fromClient([fileName, {}], "", len(contents), fileHelper)
+    assert result["OK"], result["Message"]
+    fileHelper.markAsTransferred.assert_called_once()
+    fileHelper.networkToDataSink.assert_not_called()
+
+
+def test_transferToClient(handler, tmp_path):
+    """The contents of the blob are streamed by chunks"""
+    storeBlob(tmp_path)
+    handler.sandboxDB.getSandboxId.return_value = S_OK(12)
+    handler.sandboxDB.getSandboxBlob.return_value = S_OK(("SandboxSE", blobPath))
+
+    chunks = []
+    transport = MagicMock()
+    transport.sendData.side_effect = lambda data: chunks.append(data["Value"]) or S_OK()
+    transport.receiveData.return_value = S_OK()
+    fileHelper = FileHelper(transport)
+
+    result = handler.transfer_toClient(handler.serviceInfoDict["URL"] + sbPath, "", fileHelper)
+    assert result["OK"], result["Message"]
+    data = [chunk[1] for chunk in chunks if chunk[0]]
+    assert b"".join(data) == contents
+    assert len(data) == (len(contents) + 4095) // 4096
+    # The end of file carries the checksum
+    assert chunks[-1] == [False, md5]
+
+
+def test_lookupSandboxBlobPurged(handler, tmp_path):
+    """A blob tombstoned by the purge is not referenced, its contents have to be uploaded again"""
+    storeBlob(tmp_path)
+    handler.sandboxDB.getBlob.return_value = S_OK({"BlobId": 3, "Checksum": md5, "Bytes": len(contents)})
+    handler.sandboxDB.linkSandboxToBlob.return_value = S_OK(False)
+    handler.sandboxDB.deleteSandboxes.return_value = S_OK()
+    result = handler.export_lookupSandbox([fileName, {"Job:1": "Input"}], len(contents))
+    assert result["OK"], result["Message"]
+    assert result["Value"] is None
+    # The sandbox registered for the blob is removed, and not assigned
+    handler.sandboxDB.deleteSandboxes.assert_called_once_with([12])
+    handler.sandboxDB.assignSandboxesToEntities.assert_not_called()
+
+
+def test_purgeUnusedBlobs(handler, tmp_path):
+    """Only the blobs which are still not referenced are removed, once tombstoned"""
+    hdPath = storeBlob(tmp_path)
+    handler.sandboxDB.getUnusedSandboxes.return_value = S_OK([])
+    handler.sandboxDB.getUnusedBlobs.return_value = S_OK([(3, "SandboxSE", blobPath, 0)])
+    handler.sandboxDB.deleteBlob.return_value = S_OK(1)
+
+    # Referenced again meanwhile
+    handler.sandboxDB.tombstoneBlob.return_value = S_OK(False)
+    assert handler.purgeUnusedSandboxes()["OK"]
+    assert os.path.isfile(hdPath)
+    handler.sandboxDB.deleteBlob.assert_not_called()
+
+    def deleteBlob(blobId):
+        # The row is deleted after the contents
+        assert not os.path.exists(hdPath)
+        return S_OK(1)
+
+    handler.sandboxDB.tombstoneBlob.return_value = S_OK(True)
+    handler.sandboxDB.deleteBlob.side_effect = deleteBlob
+    assert handler.purgeUnusedSandboxes()["OK"]
+    handler.sandboxDB.tombstoneBlob.assert_called_with(3)
+    handler.sandboxDB.deleteBlob.assert_called_once_with(3)
+
+    # A blob left tombstoned by an interrupted purge is removed
+    hdPath = storeBlob(tmp_path)
+    handler.sandboxDB.tombstoneBlob.reset_mock()
+    handler.sandboxDB.getUnusedBlobs.return_value = S_OK([(3, "SandboxSE", blobPath, -1)])
+    assert handler.purgeUnusedSandboxes()["OK"]
+    handler.sandboxDB.tombstoneBlob.assert_not_called()
+    assert handler.sandboxDB.deleteBlob.call_count == 2
@@ -0,0 +1,262 @@
+""" Write-behind buffer of the updates received by the JobStateUpdate service
+
+    The updates are kept in memory and written by a background thread every flushPeriod seconds,
+    or as soon as maxQueueDepth updates are pending. The updates of the same job are coalesced:
+
+    * the status updates are merged into one status dictionary, which is processed at once, in time order,
+      by the status update function of the service, which evaluates the state machine
+    * the heart beat time of all the jobs is set with one multi-row statement, and all the heart beat data
+      are inserted with one multi-row statement
+    * the job parameters are coalesced by name, the last value being kept, and set with one multi-row statement
+
+    The updates of a job are written in the order they are received. The heart beats are written before
+    the status updates, so a heart beat received while a status update of the same job is pending first
+    writes this status update. The service calls flushJob before writing the updates it does not buffer.
+"""
+import atexit
+import threading
+import time
+
+from DIRAC import S_OK, gLogger
+from DIRAC.Core.Utilities import Time
+
+
+class JobStateUpdateBuffer(object):
+    """Coalescing write-behind buffer of the job status updates, heart beats and parameters"""
+
+    def __init__(self, jobDB, setJobStatusBulk, flushPeriod=10, maxQueueDepth=10000, parentLogger=None):
+        """c'tor
+
+        :param jobDB: JobDB object, used to write the heart beats and parameters
+        :param setJobStatusBulk: function(jobID, statusDict, force=False) writing the status updates of a job
+        :param int flushPeriod: maximum time the updates are kept in memory, in seconds
+        :param int maxQueueDepth: number of pending updates triggering a flush
+        """
+        self.jobDB = jobDB
+        self.setJobStatusBulk = setJobStatusBulk
+        self.flushPeriod = flushPeriod
+        self.maxQueueDepth = maxQueueDepth
+        self.log = (parentLogger or gLogger).getSubLogger("JobStateUpdateBuffer")
+
+        # Protects the pending updates and the statistics
+        self.__lock = threading.Lock()
+        # Serializes the writes, so that the updates of a job are written in order
+        self.__flushLock = threading.RLock()
+        self.__wakeUp = threading.Event()
+        self.__thread = None
+        self.__stopped = False
+
+        # { jobID: { "StatusDict": { datetime: sDict }, "Force": bool } }
+        self.__statusUpdates = {}
+        # { jobID: { "HeartBeatTime": datetime, "Running": bool, "Data": { (name, datetime): value } } }
+        self.__heartBeats = {}
+        # { jobID: { name: value } }
+        self.__parameters = {}
+
+        self.__statistics = {
+            "ReceivedUpdates": 0,
+            "FlushedUpdates": 0,
+            "FailedUpdates": 0,
+            "Flushes": 0,
+            "LastFlushLatency": 0.0,
+            "MaxFlushLatency": 0.0,
+        }
+
+    def start(self):
+        """Start the thread flushing the updates, which are also flushed at exit"""
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__flushLoop, name="JobStateUpdateBuffer")
+            self.__thread.daemon = True
+            self.__thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flushing thread and write the pending updates"""
+        self.__stopped = True
+        self.__wakeUp.set()
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join()
+        self.flush()
+
+    def __flushLoop(self):
+        """Body of the flushing thread"""
+        while not self.__stopped:
+            self.__wakeUp.wait(self.flushPeriod)
+            self.__wakeUp.clear()
+            if self.__stopped:
+                break
+            try:
+                self.flush()
+            except Exception as excp:  # pylint: disable=broad-except
+                self.log.exception("Failed to flush the job updates", lException=excp)
+
+    @property
+    def queueDepth(self):
+        """Number of pending updates, once coalesced"""
+        return len(self.__statusUpdates) + len(self.__heartBeats) + len(self.__parameters)
+
+    def __updateAdded(self):
+        """Count an update, and wake the flushing thread up if there are too many pending ones"""
+        with self.__lock:
+            self.__statistics["ReceivedUpdates"] += 1
+            full = self.queueDepth >= self.maxQueueDepth
+        if full:
+            self.__wakeUp.set()
+
+    #############################################################################
+    def addStatusUpdates(self, jobID, statusDict, force=False):
+        """Buffer status updates of a job
+
+        :param int jobID: job ID
+        :param dict statusDict: { datetime: status information dictionary }, as for setJobStatusBulk
+        :param bool force: if True, the state machine is not evaluated
+
+        :return: S_OK
+        """
+        while True:
+            with self.__lock:
+                pending = self.__statusUpdates.get(jobID)
+                if pending is None or pending["Force"] == force:
+                    if pending is None:
+                        pending = self.__statusUpdates[jobID] = {"StatusDict": {}, "Force": force}
+                    for updTime, sDict in statusDict.items():
+                        pending["StatusDict"].setdefault(updTime, {}).update(
+                            (item, value) for item, value in sDict.items() if value
+                        )
+                    break
+            # The pending updates with the other force flag are written first
+            self.flushJob(jobID)
+        self.__updateAdded()
+        return S_OK()
+
+    def addHeartBeat(self, jobID, dynamicData):
+        """Buffer a heart beat of a job
+
+        :param int jobID: job ID
+        :param dict dynamicData: heart beat data, as for JobDB.setHeartBeatData
+
+        :return: S_OK
+        """
+        now = str(Time.dateTime().replace(microsecond=0))
+        dynamicData = dict(dynamicData)
+        heartBeatTime = dynamicData.pop("HeartBeatTime", None)
+        with self.__lock:
+            statusPending = jobID in self.__statusUpdates
+        if statusPending:
+            self.flushJob(jobID)
+        with self.__lock:
+            pending = self.__heartBeats.setdefault(jobID, {"Data": {}})
+            pending["HeartBeatTime"] = heartBeatTime or now
+            pending["Running"] = not heartBeatTime
+            for name, value in dynamicData.items():
+                pending["Data"][(name, now)] = value
+        self.__updateAdded()
+        return S_OK()
+
+    def addJobParameters(self, jobID, parameters):
+        """Buffer parameters of a job
+
+        :param int jobID: job ID
+        :param list parameters: (name, value) tuples
+
+        :return: S_OK
+        """
+        with self.__lock:
+            self.__parameters.setdefault(jobID, {}).update((str(name), str(value)) for name, value in parameters)
+        self.__updateAdded()
+        return S_OK()
+
+    #############################################################################
+    def flush(self):
+        """Write all the pending updates
+
+        :return: S_OK(number of written updates)
+        """
+        with self.__flushLock:
+            with self.__lock:
+                statusUpdates, self.__statusUpdates = self.__statusUpdates, {}
+                heartBeats, self.__heartBeats = self.__heartBeats, {}
+                parameters, self.__parameters = self.__parameters, {}
+            return self.__write(statusUpdates, heartBeats, parameters)
+
+    def flushJob(self, jobID):
+        """Write the pending updates of a job, before an update which is not buffered
+
+        :param int jobID: job ID
+
+        :return: S_OK(number of written updates)
+        """
+        with self.__flushLock:
+            with self.__lock:
+                statusUpdates = self.__extractJob(self.__statusUpdates, jobID)
+                heartBeats = self.__extractJob(self.__heartBeats, jobID)
+                parameters = self.__extractJob(self.__parameters, jobID)
+            return self.__write(statusUpdates, heartBeats, parameters)
+
+    @staticmethod
+    def __extractJob(pendingDict, jobID):
+        """Remove the entry of a job from a dictionary of pending updates, and return it as a dictionary"""
+        return {jobID: pendingDict.pop(jobID)} if jobID in pendingDict else {}
+
+    def __write(self, statusUpdates, heartBeats, parameters):
+        """Write updates, the heart beats being written before the status updates"""
+        nUpdates = len(statusUpdates) + len(heartBeats) + len(parameters)
+        if not nUpdates:
+            return S_OK(0)
+        startTime = time.time()
+        failed = 0
+
+        if parameters:
+            result = self.jobDB.setJobParametersBulk(parameters)
+            if not result["OK"]:
+                self.log.error("Failed to set the job parameters", result["Message"])
+                failed += len(parameters)
+            elif result["Value"]:
+                self.log.warn("Parameters of unknown jobs ignored", str(result["Value"]))
+
+        if heartBeats:
+            result = self.jobDB.setHeartBeatDataBulk(
+                {jobID: heartBeat["HeartBeatTime"] for jobID, heartBeat in heartBeats.items()},
+                [
+                    (jobID, name, value, hbTime)
+                    for jobID, heartBeat in heartBeats.items()
+                    for (name, hbTime), value in heartBeat["Data"].items()
+                ],
+                runningJobIDs=[jobID for jobID, heartBeat in heartBeats.items() if heartBeat["Running"]],
+            )
+            if not result["OK"]:
+                self.log.error("Failed to set the heart beat data", result["Message"])
+                failed += len(heartBeats)
+            elif result["Value"]:
+                self.log.warn("Heart beats of unknown jobs ignored", str(result["Value"]))
+
+        for jobID, statusUpdate in sorted(statusUpdates.items()):
+            result = self.setJobStatusBulk(jobID, statusUpdate["StatusDict"], force=statusUpdate["Force"])
+            if not result["OK"]:
+                self.log.error("Failed to set the job status", "for job %s: %s" % (jobID, result["Message"]))
+                failed += 1
+
+        latency = time.time() - startTime
+        with self.__lock:
+            self.__statistics["Flushes"] += 1
+            self.__statistics["FlushedUpdates"] += nUpdates - failed
+            self.__statistics["FailedUpdates"] += failed
+            self.__statistics["LastFlushLatency"] = latency
+            self.__statistics["MaxFlushLatency"] = max(latency, self.__statistics["MaxFlushLatency"])
+            queueDepth = self.queueDepth
+        self.log.verbose(
+            "Job updates flushed",
+            "%d updates (%d failed) in %.3f s, %d pending" % (nUpdates, failed, latency, queueDepth),
+        )
+        return S_OK(nUpdates - failed)
+
+    def getStatistics(self):
+        """Get the statistics of the buffer
+
+        :return: dict with the QueueDepth, the numbers of ReceivedUpdates, of FlushedUpdates (once coalesced),
+                 of FailedUpdates and of Flushes, and the Last and Max FlushLatency in seconds
+        """
+        with self.__lock:
+            statistics = dict(self.__statistics)
+            statistics["QueueDepth"] = self.queueDepth
+        return statistics
@@ -80,15 +80,16 @@ def __updateAttribute(classAd, attribute, parName, parValue):
     return True
 
 
-def generateParametricJobs(jobClassAd):
+def generateParametricJobs(jobClassAd, asClassAds=False):
     """Generate a series of ClassAd job descriptions expanding
         job parameters
 
     :param jobClassAd: ClassAd job description object
-    :return: list of ClassAd job description objects
+    :param bool asClassAds: return the ClassAd objects of the jobs instead of their JDLs
+    :return: list of JDL strings, or of ClassAd job description objects
     """
     if not jobClassAd.lookupAttribute("Parameters"):
-        return S_OK([jobClassAd.asJDL()])
+        return S_OK([jobClassAd if asClassAds else jobClassAd.asJDL()])
 
     result = getParameterVectorLength(jobClassAd)
     if not result["OK"]:
@@ -146,6 +147,14 @@ def generateParametricJobs(jobClassAd):
 
         parameterLists[seqID] = parList
 
+    # The attributes using each parameter are looked for once in the template
+    parameterAttributes = {}
+    for seqID in parameterLists:
+        pattern = "%s" if seqID == "0" else "%%(%s)s" % seqID
+        parameterAttributes[seqID] = [
+            attribute for attribute in attributes if pattern in jobClassAd.get_expression(attribute)
+        ]
+
     jobDescList = []
     jobDesc = jobClassAd.asJDL()
     # Width of the sequential parameter number
@@ -156,7 +165,7 @@ def generateParametricJobs(jobClassAd):
         newClassAd = ClassAd(newJobDesc)
         for seqID in parameterLists:
             parameter = parameterLists[seqID][n]
-            for attribute in newClassAd.getAttributes():
+            for attribute in parameterAttributes[seqID]:
                 __updateAttribute(newClassAd, attribute, seqID, str(parameter))
 
         for seqID in parameterLists:
@@ -177,7 +186,6 @@ def generateParametricJobs(jobClassAd):
                 newClassAd.insertAttributeString(attribute, str(parameter))
 
         newClassAd.insertAttributeInt("ParameterNumber", n)
-        newJDL = newClassAd.asJDL()
-        jobDescList.append(newJDL)
+        jobDescList.append(newClassAd if asClassAds else newClassAd.asJDL())
 
     return S_OK(jobDescList)
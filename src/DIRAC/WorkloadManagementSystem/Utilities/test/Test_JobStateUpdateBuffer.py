@@ -0,0 +1,137 @@
+""" Test the write-behind buffer of the JobStateUpdate service
+"""
+import time
+
+from mock import MagicMock
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.WorkloadManagementSystem.Client import JobStatus
+from DIRAC.WorkloadManagementSystem.Utilities.JobStateUpdateBuffer import JobStateUpdateBuffer
+
+
+def getBuffer(maxQueueDepth=100):
+    """Get a buffer, its mocked JobDB, and the list of the heart beat and status writes, in order"""
+    calls = []
+
+    def setHeartBeatDataBulk(heartBeatTimes, dynamicData, runningJobIDs=None):
+        calls.append(("HeartBeat", sorted(heartBeatTimes)))
+        return S_OK([])
+
+    def setJobStatusBulk(jobID, statusDict, force=False):
+        calls.append(("Status", jobID, statusDict, force))
+        return S_OK()
+
+    jobDB = MagicMock()
+    jobDB.setJobParametersBulk.return_value = S_OK([])
+    jobDB.setHeartBeatDataBulk.side_effect = setHeartBeatDataBulk
+    return JobStateUpdateBuffer(jobDB, setJobStatusBulk, maxQueueDepth=maxQueueDepth), jobDB, calls
+
+
+def test_coalescing():
+    """The updates of a job are merged, and written with one call per kind"""
+    buffer, jobDB, calls = getBuffer()
+    buffer.addStatusUpdates(1, {"2022-01-01 10:00:00": {"Status": JobStatus.RUNNING, "Source": "Job"}})
+    buffer.addStatusUpdates(1, {"2022-01-01 10:05:00": {"MinorStatus": "Application", "ApplicationStatus": ""}})
+    buffer.addJobParameters(1, [("CPU", 1), ("Memory", "2")])
+    buffer.addJobParameters(1, [("CPU", 3)])
+    buffer.addJobParameters(2, [("CPU", 4)])
+    assert buffer.getStatistics()["QueueDepth"] == 3
+    assert not calls
+
+    result = buffer.flush()
+    assert result["OK"]
+    assert result["Value"] == 3
+    jobDB.setJobParametersBulk.assert_called_once_with({1: {"CPU": "3", "Memory": "2"}, 2: {"CPU": "4"}})
+    assert calls == [
+        (
+            "Status",
+            1,
+            {
+                "2022-01-01 10:00:00": {"Status": JobStatus.RUNNING, "Source": "Job"},
+                "2022-01-01 10:05:00": {"MinorStatus": "Application"},
+            },
+            False,
+        )
+    ]
+    statistics = buffer.getStatistics()
+    assert statistics["QueueDepth"] == 0
+    assert statistics["ReceivedUpdates"] == 5
+    assert statistics["FlushedUpdates"] == 3
+    assert statistics["Flushes"] == 1
+
+    # Nothing left to write
+    assert buffer.flush()["Value"] == 0
+
+
+def test_heartBeats():
+    """The heart beat time is the last one, all the data are kept"""
+    buffer, jobDB, _calls = getBuffer()
+    buffer.addHeartBeat(1, {"CPUConsumed": 10})
+    buffer.addHeartBeat(2, {"HeartBeatTime": "2022-01-01 10:00:00", "LoadAverage": 1.5})
+    buffer.flush()
+    heartBeatTimes, dynamicData = jobDB.setHeartBeatDataBulk.call_args[0]
+    assert heartBeatTimes[2] == "2022-01-01 10:00:00"
+    assert sorted(heartBeatTimes) == [1, 2]
+    assert sorted((jobID, name, value) for jobID, name, value, _hbTime in dynamicData) == [
+        (1, "CPUConsumed", 10),
+        (2, "LoadAverage", 1.5),
+    ]
+    # Only the heart beats without time stamp set the Running status
+    assert jobDB.setHeartBeatDataBulk.call_args[1] == {"runningJobIDs": [1]}
+
+
+def test_ordering():
+    """The updates of a job are written in the order they are received"""
+    buffer, _jobDB, calls = getBuffer()
+
+    # A heart beat is written before the following status update...
+    buffer.addHeartBeat(1, {})
+    buffer.addStatusUpdates(1, {"2022-01-01 10:00:00": {"Status": JobStatus.DONE}})
+    buffer.flush()
+    assert [call[0] for call in calls] == ["HeartBeat", "Status"]
+
+    # ... and after the previous one
+    del calls[:]
+    buffer.addStatusUpdates(1, {"2022-01-01 10:00:00": {"Status": JobStatus.RUNNING}})
+    buffer.addHeartBeat(1, {})
+    assert [call[0] for call in calls] == ["Status"]
+    buffer.flush()
+    assert [call[0] for call in calls] == ["Status", "HeartBeat"]
+
+    # Forced updates are not merged with the others
+    del calls[:]
+    buffer.addStatusUpdates(2, {"2022-01-01 10:00:00": {"Status": JobStatus.RUNNING}})
+    buffer.addStatusUpdates(2, {"2022-01-01 10:01:00": {"Status": JobStatus.KILLED}}, force=True)
+    assert [call[3] for call in calls] == [False]
+    buffer.flushJob(2)
+    assert [call[3] for call in calls] == [False, True]
+
+
+def test_failures():
+    """Failed writes are counted, and the other updates are still written"""
+    buffer, jobDB, calls = getBuffer()
+    jobDB.setJobParametersBulk.return_value = S_ERROR("Connection lost")
+    buffer.addJobParameters(1, [("CPU", 1)])
+    buffer.addStatusUpdates(1, {"2022-01-01 10:00:00": {"Status": JobStatus.RUNNING}})
+    result = buffer.flush()
+    assert result["OK"]
+    assert result["Value"] == 1
+    assert len(calls) == 1
+    assert buffer.getStatistics()["FailedUpdates"] == 1
+
+
+def test_sizeTrigger():
+    """The flushing thread is woken up when the queue is full"""
+    buffer, _jobDB, calls = getBuffer(maxQueueDepth=2)
+    buffer.flushPeriod = 3600
+    buffer.start()
+    try:
+        buffer.addStatusUpdates(1, {"2022-01-01 10:00:00": {"Status": JobStatus.RUNNING}})
+        buffer.addStatusUpdates(2, {"2022-01-01 10:00:00": {"Status": JobStatus.RUNNING}})
+        for _ in range(100):
+            if len(calls) == 2:
+                break
+            time.sleep(0.05)
+        assert len(calls) == 2
+    finally:
+        buffer.stop()
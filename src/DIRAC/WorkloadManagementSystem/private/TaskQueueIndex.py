@@ -0,0 +1,281 @@
+""" In-memory index of the task queues, used by the TaskQueueDB to find the task queues
+    matching a resource without building and running the matching SQL query.
+
+    The matching rules are the ones of the SQL query generated by the TaskQueueDB.
+    Values are compared ignoring the case and the surrounding spaces,
+    as MySQL does with the default collation.
+"""
+import heapq
+import random
+import string
+import threading
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Security import Properties
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
+
+# Fields of the task queues taking a single value
+SINGLE_VALUE_FIELDS = ("OwnerDN", "OwnerGroup", "Setup", "CPUTime")
+
+
+def _norm(value):
+    """Normalize a value for the comparisons"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, bytes):
+        value = value.decode()
+    return str(value).strip().lower()
+
+
+def _asList(value):
+    """Values of a match field, which can be given as a single value or as a list"""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _isAny(values):
+    """Whether the values of a match field contain the "any" wildcard"""
+    table = str.maketrans("", "", string.punctuation)
+    return any(str(value).lower().translate(table) == "any" for value in values)
+
+
+class TaskQueueIndex:
+    """Index of the task queues by the values of their fields
+
+    For each field, the index keeps the set of task queues having each value,
+    and for the multi value fields also the set of task queues without any value.
+    The matching is made of intersections and differences of these sets.
+    """
+
+    def __init__(self, multiValueMatchFields, bannedMatchFields):
+        """c'tor
+
+        :param tuple multiValueMatchFields: multi value match fields (e.g. Site), the task queue fields being
+                                            the plural forms (e.g. Sites)
+        :param tuple bannedMatchFields: match fields whose values can be banned by the task queues (e.g. Site
+                                        and the task queue field BannedSites)
+        """
+        self.__multiValueMatchFields = multiValueMatchFields
+        self.__bannedMatchFields = bannedMatchFields
+        self.__multiValueFields = [field + "s" for field in multiValueMatchFields]
+        self.__multiValueFields += ["Banned%ss" % field for field in bannedMatchFields]
+        self.__lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Remove all the task queues"""
+        with self.__lock:
+            # tqId -> { field : value or frozenset of values }
+            self.__tqs = {}
+            # field -> { value : set of tqIds }
+            self.__byValue = {field: {} for field in list(SINGLE_VALUE_FIELDS) + self.__multiValueFields}
+            # multi value field -> set of tqIds without value
+            self.__withoutValue = {field: set() for field in self.__multiValueFields}
+
+    def __len__(self):
+        return len(self.__tqs)
+
+    def __contains__(self, tqId):
+        return tqId in self.__tqs
+
+    def getTaskQueueIDs(self):
+        """:return: set of the task queue IDs in the index"""
+        with self.__lock:
+            return set(self.__tqs)
+
+    def add(self, tqId, tqDefDict, priority=1):
+        """Add or replace a task queue
+
+        :param int tqId: task queue ID
+        :param dict tqDefDict: task queue definition, with the (not escaped) values of the single value fields
+                               and the lists of values of the multi value fields
+        :param float priority: priority of the task queue
+        """
+        tq = {field: tqDefDict[field] for field in SINGLE_VALUE_FIELDS}
+        tq["Priority"] = priority
+        for field in self.__multiValueFields:
+            tq[field] = frozenset(_norm(value) for value in tqDefDict.get(field, []) if str(value).strip())
+        with self.__lock:
+            self.__remove(tqId)
+            self.__tqs[tqId] = tq
+            for field in SINGLE_VALUE_FIELDS:
+                self.__byValue[field].setdefault(_norm(tq[field]), set()).add(tqId)
+            for field in self.__multiValueFields:
+                if not tq[field]:
+                    self.__withoutValue[field].add(tqId)
+                for value in tq[field]:
+                    self.__byValue[field].setdefault(value, set()).add(tqId)
+
+    def remove(self, tqIds):
+        """Remove task queues
+
+        :param list tqIds: task queue IDs
+        """
+        with self.__lock:
+            for tqId in tqIds:
+                self.__remove(tqId)
+
+    def __remove(self, tqId):
+        """Remove a task queue. The lock must be held"""
+        tq = self.__tqs.pop(tqId, None)
+        if tq is None:
+            return
+        for field in SINGLE_VALUE_FIELDS:
+            self.__discard(field, _norm(tq[field]), tqId)
+        for field in self.__multiValueFields:
+            self.__withoutValue[field].discard(tqId)
+            for value in tq[field]:
+                self.__discard(field, value, tqId)
+
+    def __discard(self, field, value, tqId):
+        tqIds = self.__byValue[field].get(value)
+        if tqIds is not None:
+            tqIds.discard(tqId)
+            if not tqIds:
+                del self.__byValue[field][value]
+
+    def setPriority(self, tqIds, priority):
+        """Set the priority of task queues"""
+        with self.__lock:
+            for tqId in tqIds:
+                if tqId in self.__tqs:
+                    self.__tqs[tqId]["Priority"] = priority
+
+    def __having(self, field, values):
+        """Task queues having any of the values in a field. The lock must be held"""
+        result = set()
+        for value in values:
+            result |= self.__byValue[field].get(_norm(value), set())
+        return result
+
+    def __havingAll(self, field, values):
+        """Task queues having all the values in a field. The lock must be held"""
+        result = None
+        for value in values:
+            tqIds = self.__byValue[field].get(_norm(value), set())
+            result = set(tqIds) if result is None else result & tqIds
+            if not result:
+                break
+        return result or set()
+
+    def match(self, tqMatchDict, negativeCond=None, numQueuesToGet=1):
+        """Find the task queues matching a resource, in random order weighted by their priority
+
+        :param dict tqMatchDict: resource description (not escaped), as for TaskQueueDB.matchAndGetTaskQueue
+        :param negativeCond: dict or list of dicts of conditions excluding task queues
+        :param int numQueuesToGet: maximum number of task queues to return, 0 for all
+
+        :return: S_OK(list of (tqId, OwnerDN, OwnerGroup))/S_ERROR
+        """
+        with self.__lock:
+            result = self.__match(tqMatchDict, negativeCond)
+            if not result["OK"]:
+                return result
+            tqIds = result["Value"]
+            # Same order as "ORDER BY RAND() / Priority ASC"
+            keys = {}
+            for tqId in tqIds:
+                priority = self.__tqs[tqId]["Priority"]
+                keys[tqId] = random.random() / priority if priority > 0 else -1.0
+            if numQueuesToGet:
+                tqIds = heapq.nsmallest(numQueuesToGet, tqIds, key=keys.get)
+            else:
+                tqIds = sorted(tqIds, key=keys.get)
+            return S_OK([(tqId, self.__tqs[tqId]["OwnerDN"], self.__tqs[tqId]["OwnerGroup"]) for tqId in tqIds])
+
+    def __match(self, tqMatchDict, negativeCond):
+        """Set of the IDs of the matching task queues. The lock must be held"""
+        # Setup and CPUTime are mandatory
+        tqIds = self.__having("Setup", _asList(tqMatchDict["Setup"]))
+        maxCPUTime = max(_asList(tqMatchDict["CPUTime"]))
+        tqIds &= self.__having("CPUTime", [cpu for cpu in self.__byValue["CPUTime"] if cpu <= maxCPUTime])
+
+        # Owners
+        if "OwnerDN" in tqMatchDict and "OwnerGroup" in tqMatchDict:
+            owners = set()
+            dns = _asList(tqMatchDict["OwnerDN"])
+            for group in _asList(tqMatchDict["OwnerGroup"]):
+                inGroup = self.__having("OwnerGroup", [group])
+                if Properties.JOB_SHARING in Registry.getPropertiesForGroup(group):
+                    owners |= inGroup
+                else:
+                    owners |= inGroup & self.__having("OwnerDN", dns)
+            tqIds &= owners
+        else:
+            for field in ("OwnerGroup", "OwnerDN"):
+                if field in tqMatchDict:
+                    tqIds &= self.__having(field, _asList(tqMatchDict[field]))
+
+        # Multi value fields: the task queue must accept one of the values of the resource
+        tags = _asList(tqMatchDict.get("Tag", []))
+        for field in self.__multiValueMatchFields:
+            tqField = field + "s"
+            if field == "Tag":
+                if "Tag" not in tqMatchDict and "RequiredTag" in tqMatchDict:
+                    continue
+                if _isAny(tags):
+                    continue
+                # All the tags of the task queue must be provided by the resource
+                normTags = {_norm(tag) for tag in tags}
+                tagged = self.__having(tqField, tags)
+                tqIds &= self.__withoutValue[tqField] | {
+                    tqId for tqId in tagged if self.__tqs[tqId][tqField] <= normTags
+                }
+                continue
+            values = tqMatchDict.get(field)
+            if not values:
+                continue
+            values = _asList(values)
+            if _isAny(values):
+                continue
+            tqIds &= self.__withoutValue[tqField] | self.__having(tqField, values)
+            if field in self.__bannedMatchFields:
+                # Not banned for all the values
+                tqIds -= self.__havingAll("Banned%ss" % field, values)
+
+        # Tags required by the resource
+        requiredTags = _asList(tqMatchDict.get("RequiredTag", []))
+        if requiredTags and not _isAny(requiredTags):
+            if not set(requiredTags).issubset(set(tags if "Tag" in tqMatchDict else [])):
+                return S_ERROR("Wrong conditions")
+            tqIds &= self.__havingAll("Tags", requiredTags)
+
+        # Banned by the resource
+        for field in self.__multiValueMatchFields:
+            values = tqMatchDict.get("Banned%s" % field)
+            if not values:
+                continue
+            values = _asList(values)
+            if _isAny(values):
+                continue
+            tqIds -= self.__havingAll(field + "s", values)
+
+        # Extra negative conditions
+        if negativeCond:
+            if isinstance(negativeCond, dict):
+                tqIds -= self.__excludedBy(negativeCond)
+            else:
+                excluded = None
+                for condDict in negativeCond:
+                    condExcluded = self.__excludedBy(condDict)
+                    excluded = condExcluded if excluded is None else excluded & condExcluded
+                tqIds -= excluded or set()
+
+        return S_OK(tqIds)
+
+    def __excludedBy(self, negativeCond):
+        """Task queues excluded by a negative condition dict: the ones matching all of its conditions.
+        The lock must be held
+        """
+        excluded = None
+        for field, values in negativeCond.items():
+            values = _asList(values)
+            if field in self.__multiValueMatchFields:
+                condExcluded = self.__having(field + "s", values)
+            elif field in SINGLE_VALUE_FIELDS:
+                condExcluded = self.__havingAll(field, values)
+            else:
+                continue
+            excluded = condExcluded if excluded is None else excluded & condExcluded
+        return excluded or set()
@@ -0,0 +1,131 @@
+""" Test the matching of the in-memory task queue index
+"""
+from pytest import fixture, mark
+
+from DIRAC.WorkloadManagementSystem.private import TaskQueueIndex as moduleTested
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+parametrize = mark.parametrize
+
+multiValueMatchFields = ("GridCE", "Site", "Platform", "JobType", "Tag")
+bannedJobMatchFields = ("Site",)
+
+
+def tqDef(**kwargs):
+    """A task queue definition with default owner, setup and CPU time"""
+    definition = {"OwnerDN": "/my/DN", "OwnerGroup": "myGroup", "Setup": "aSetup", "CPUTime": 86400}
+    definition.update(kwargs)
+    return definition
+
+
+@fixture
+def tqIndex(monkeypatch):
+    """An index with a few task queues"""
+    monkeypatch.setattr(
+        moduleTested.Registry,
+        "getPropertiesForGroup",
+        lambda group: ["JobSharing"] if group == "sharingGroup" else [],
+    )
+    index = TaskQueueIndex(multiValueMatchFields, bannedJobMatchFields)
+    index.add(1, tqDef())
+    index.add(2, tqDef(Sites=["Site_1", "Site_2"]))
+    index.add(3, tqDef(BannedSites=["Site_1"]))
+    index.add(4, tqDef(Platforms=["centos7"], Tags=["MultiProcessor"]))
+    index.add(5, tqDef(Tags=["GPU", "MultiProcessor"], CPUTime=3600))
+    index.add(6, tqDef(OwnerDN="/other/DN", JobTypes=["MCSimulation"]))
+    index.add(7, tqDef(OwnerDN="/other/DN", OwnerGroup="sharingGroup", Setup="otherSetup"))
+    return index
+
+
+def matchIDs(index, matchDict, negativeCond=None):
+    result = index.match(matchDict, negativeCond=negativeCond, numQueuesToGet=0)
+    assert result["OK"], result["Message"]
+    return sorted(tq[0] for tq in result["Value"])
+
+
+@parametrize(
+    "matchDict, expected",
+    [
+        ({"Setup": "aSetup", "CPUTime": 86400}, [1, 2, 3, 6]),
+        # CPUTime
+        ({"Setup": "aSetup", "CPUTime": 4000, "Tag": ["GPU", "MultiProcessor"]}, [5]),
+        # Sites and banned sites
+        ({"Setup": "aSetup", "CPUTime": 86400, "Site": "Site_1"}, [1, 2, 6]),
+        ({"Setup": "aSetup", "CPUTime": 86400, "Site": "Site_3"}, [1, 3, 6]),
+        ({"Setup": "aSetup", "CPUTime": 86400, "Site": ["Site_1", "Site_3"]}, [1, 2, 3, 6]),
+        ({"Setup": "aSetup", "CPUTime": 86400, "Site": "ANY"}, [1, 2, 3, 6]),
+        ({"Setup": "aSetup", "CPUTime": 86400, "BannedSite": ["Site_1"]}, [1, 3, 6]),
+        # Comparisons ignore the case, as MySQL does
+        ({"Setup": "aSetup", "CPUTime": 86400, "Site": "site_2 "}, [1, 2, 3, 6]),
+        # All the tags of the task queues must be provided
+        ({"Setup": "aSetup", "CPUTime": 86400, "Tag": "MultiProcessor"}, [1, 2, 3, 4, 6]),
+        ({"Setup": "aSetup", "CPUTime": 86400, "Tag": ["MultiProcessor"], "Platform": "centos7"}, [1, 2, 3, 4, 6]),
+        ({"Setup": "aSetup", "CPUTime": 86400, "Tag": ["GPU", "MultiProcessor"]}, [1, 2, 3, 4, 5, 6]),
+        ({"Setup": "aSetup", "CPUTime": 86400, "Tag": "any"}, [1, 2, 3, 4, 5, 6]),
+        # Required tags
+        ({"Setup": "aSetup", "CPUTime": 86400, "Tag": ["GPU", "MultiProcessor"], "RequiredTag": "GPU"}, [5]),
+        # Job types
+        ({"Setup": "aSetup", "CPUTime": 86400, "JobType": "User"}, [1, 2, 3]),
+        ({"Setup": "aSetup", "CPUTime": 86400, "JobType": ["User", "MCSimulation"]}, [1, 2, 3, 6]),
+        # Owners
+        ({"Setup": "aSetup", "CPUTime": 86400, "OwnerDN": "/other/DN"}, [6]),
+        (
+            {"Setup": ["aSetup", "otherSetup"], "CPUTime": 86400, "OwnerDN": "/my/DN", "OwnerGroup": "myGroup"},
+            [1, 2, 3],
+        ),
+        ({"Setup": "otherSetup", "CPUTime": 86400, "OwnerDN": "/my/DN", "OwnerGroup": "sharingGroup"}, [7]),
+    ],
+)
+def test_match(tqIndex, matchDict, expected):
+    """The matching follows the rules of the TaskQueueDB SQL query"""
+    assert matchIDs(tqIndex, matchDict) == expected
+
+
+def test_wrongConditions(tqIndex):
+    """Required tags must be part of the tags"""
+    result = tqIndex.match({"Setup": "aSetup", "CPUTime": 86400, "Tag": "MultiProcessor", "RequiredTag": "GPU"})
+    assert not result["OK"]
+
+
+@parametrize(
+    "negativeCond, expected",
+    [
+        ({"JobType": ["MCSimulation"]}, [1, 2, 3]),
+        ({"Site": "Site_1"}, [1, 3, 6]),
+        # All the conditions of a dict must match to exclude a task queue
+        ({"Site": "Site_1", "JobType": ["MCSimulation"]}, [1, 2, 3, 6]),
+        ({"OwnerDN": ["/other/DN"]}, [1, 2, 3]),
+        # With a list, a task queue is excluded if all the dicts exclude it
+        ([{"Site": "Site_1"}, {"JobType": "MCSimulation"}], [1, 2, 3, 6]),
+        ([{"Site": "Site_1"}, {"Site": ["Site_2"]}], [1, 3, 6]),
+    ],
+)
+def test_negativeCond(tqIndex, negativeCond, expected):
+    """Negative conditions exclude task queues"""
+    assert matchIDs(tqIndex, {"Setup": "aSetup", "CPUTime": 86400}, negativeCond) == expected
+
+
+def test_updates(tqIndex):
+    """Task queues can be removed and replaced"""
+    matchDict = {"Setup": "aSetup", "CPUTime": 86400}
+    tqIndex.remove([1, 2, 42])
+    assert matchIDs(tqIndex, matchDict) == [3, 6]
+    assert 1 not in tqIndex
+    tqIndex.add(3, tqDef(Setup="otherSetup"))
+    assert matchIDs(tqIndex, matchDict) == [6]
+    assert len(tqIndex) == 5
+    tqIndex.clear()
+    assert matchIDs(tqIndex, matchDict) == []
+
+
+def test_priorities(tqIndex):
+    """Task queues with a higher priority come first more often"""
+    matchDict = {"Setup": "aSetup", "CPUTime": 86400}
+    tqIndex.setPriority([6], 1000)
+    tqIndex.setPriority([1, 2, 3], 0.001)
+    firsts = [tqIndex.match(matchDict, numQueuesToGet=1)["Value"][0][0] for _ in range(100)]
+    assert firsts.count(6) > 90
+    result = tqIndex.match(matchDict, numQueuesToGet=2)
+    assert result["OK"]
+    assert len(result["Value"]) == 2
+    assert result["Value"][0] == (6, "/other/DN", "myGroup")
@@ -294,3 +294,52 @@ def test_deleteEntries(name, fields, requiredFields, values, table, cond, expect
     result = mysqlDB.getCounters(name, fields, {})
     assert result["OK"], result["Message"]
     assert result["Value"] == []
+
+
+@pytest.mark.parametrize("chunkSize", [1, 7, 1000])
+def test_bulkInsert(chunkSize):
+    """Insert many rows at once, from a generator, in several chunks"""
+    mysqlDB = setupDB()
+    result = mysqlDB._createTables(table, force=True)
+    assert result["OK"], result["Message"]
+
+    result = mysqlDB.bulkInsert(name, reqFields, (("name%d" % i, "Surn'%d" % i, i) for i in range(100)), chunkSize)
+    assert result["OK"], result["Message"]
+    assert result["Value"] == 100
+
+    result = mysqlDB.getFields(name, ["Surname", "Count"], {"Count": [3, 42]})
+    assert result["OK"], result["Message"]
+    assert sorted(result["Value"]) == [("Surn'3", 3), ("Surn'42", 42)]
+
+    # Wrong number of values
+    result = mysqlDB.bulkInsert(name, reqFields, [("name", "Surname")])
+    assert not result["OK"]
+
+
+def test_bulkUpsert():
+    """Insert rows, some of them already existing"""
+    mysqlDB = setupDB()
+    result = mysqlDB._createTables(table, force=True)
+    assert result["OK"], result["Message"]
+
+    result = mysqlDB.bulkInsert(name, ["ID", "Name", "Count"], [(i, "name%d" % i, i) for i in range(1, 11)])
+    assert result["OK"], result["Message"]
+
+    # Same rows plus 5 new ones: the existing ones are updated (2 affected rows each)
+    rows = [(i, "new%d" % i, 1) for i in range(6, 16)]
+    result = mysqlDB.bulkUpsert(name, ["ID", "Name", "Count"], rows, updateFields=["Name"])
+    assert result["OK"], result["Message"]
+    assert result["Value"] == 5 * 2 + 5
+
+    result = mysqlDB.getFields(name, ["Name", "Count"], {"ID": [1, 6, 15]})
+    assert result["OK"], result["Message"]
+    assert sorted(result["Value"]) == [("name1", 1), ("new15", 1), ("new6", 6)]
+
+    # Update with an expression
+    result = mysqlDB.bulkUpsert(
+        name, ["ID", "Count"], [(6, 10), (7, 10)], updateFields={"Count": "`Count` + VALUES(`Count`)"}
+    )
+    assert result["OK"], result["Message"]
+    result = mysqlDB.getFields(name, ["Count"], {"ID": [6, 7]})
+    assert result["OK"], result["Message"]
+    assert sorted(result["Value"]) == [(16,), (17,)]
@@ -120,6 +120,33 @@ def test_insertAndRemoveJobIntoDB(putAndDelete):
         assert res["OK"] is True, res["Message"]
 
 
+def test_insertNewJobsIntoDB(putAndDelete):
+
+    res = jobDB.insertNewJobsIntoDB(
+        [jdl] * 3,
+        "owner",
+        "/DN/OF/owner",
+        "ownerGroup",
+        "someSetup",
+        initialStatus=JobStatus.SUBMITTING,
+        initialMinorStatus="Bulk transaction confirmation",
+    )
+    assert res["OK"] is True, res["Message"]
+    jobIDs = [jobDict["JobID"] for jobDict in res["Value"]]
+    assert len(set(jobIDs)) == 3
+    res = jobDB.getJobsAttributes(jobIDs, ["Status", "JobName", "Site"])
+    assert res["OK"] is True, res["Message"]
+    assert res["Value"] == {
+        jobID: {"Status": JobStatus.SUBMITTING, "JobName": "helloWorld", "Site": "ANY"} for jobID in jobIDs
+    }
+    res = jobDB.getJobJDL(jobIDs[-1])
+    assert res["OK"] is True, res["Message"]
+    assert "JobRequirements" in res["Value"]
+    res = jobDB.getJobJDL(jobIDs[-1], original=True)
+    assert res["OK"] is True, res["Message"]
+    assert "JobRequirements" not in res["Value"]
+
+
 def test_rescheduleJob(putAndDelete):
 
     res = jobDB.insertNewJobIntoDB(jdl, "owner", "/DN/OF/owner", "ownerGroup", "someSetup")
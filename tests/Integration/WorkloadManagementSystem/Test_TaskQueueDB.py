@@ -1197,3 +1197,43 @@ def test_TQ():
 
     result = tqDB.deleteTaskQueueIfEmpty(tq)
     assert result["OK"] is True
+
+
+def test_insertJobs():
+    """bulk insertion: one task queue per definition"""
+    tqDefDict = {"OwnerDN": "/my/DN", "OwnerGroup": "myGroup", "Setup": "aSetup", "CPUTime": 50000}
+    tqDefDictSites = dict(tqDefDict, Sites=["Site_1", "Site_2"])
+    jobs = [(300 + i, tqDefDict, 10) for i in range(10)]
+    jobs += [(400 + i, dict(tqDefDictSites, Sites=["Site_2", "Site_1"]), 5) for i in range(5)]
+    jobs += [(500, {"OwnerDN": "/my/DN"}, 10)]
+
+    result = tqDB.insertJobs(jobs)
+    assert result["OK"] is True
+    assert list(result["Value"]["Failed"]) == [500]
+    inserted = result["Value"]["Successful"]
+    assert sorted(inserted) == [300 + i for i in range(10)] + [400 + i for i in range(5)]
+    # Same definition, same task queue
+    assert len({inserted[300 + i] for i in range(10)}) == 1
+    assert len({inserted[400 + i] for i in range(5)}) == 1
+    assert inserted[300] != inserted[400]
+
+    result = tqDB.getTaskQueueForJobs(list(inserted))
+    assert result["OK"] is True
+    assert result["Value"] == inserted
+    result = tqDB.retrieveTaskQueues([inserted[300], inserted[400]])
+    assert result["OK"] is True
+    assert result["Value"][inserted[300]]["Jobs"] == 10
+    assert result["Value"][inserted[400]]["Jobs"] == 5
+    assert sorted(result["Value"][inserted[400]]["Sites"]) == ["Site_1", "Site_2"]
+
+    # More jobs with an existing definition go to the same task queue
+    result = tqDB.insertJobs([(310, tqDefDict, 10)])
+    assert result["OK"] is True
+    assert result["Value"]["Successful"] == {310: inserted[300]}
+
+    for jobId in list(inserted) + [310]:
+        result = tqDB.deleteJob(jobId)
+        assert result["OK"] is True
+    for tqId in set(inserted.values()):
+        result = tqDB.deleteTaskQueueIfEmpty(tqId)
+        assert result["OK"] is True
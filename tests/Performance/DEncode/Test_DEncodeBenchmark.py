@@ -0,0 +1,109 @@
+""" Benchmarks of DEncode against FastDEncode on realistic payloads
+
+Run with ``pytest tests/Performance/DEncode/ --benchmark-group-by=func``
+"""
+import datetime
+
+import pytest
+
+from DIRAC.Core.Utilities import DEncode, FastDEncode
+
+pytest.importorskip("pytest_benchmark")
+
+engines = pytest.mark.parametrize("engine", [DEncode, FastDEncode], ids=["DEncode", "FastDEncode"])
+
+NB_LFNS = 50000
+NB_JOBS = 20000
+NB_STATUS_UPDATES = 10000
+
+
+def replicaDict():
+    """Result of a getReplicas call on NB_LFNS files with two replicas each"""
+    successful = {}
+    for i in range(NB_LFNS):
+        lfn = "/lhcb/MC/2018/ALLSTREAMS.DST/%08d/0000/%08d_%08d_1.allstreams.dst" % (i // 1000, i // 1000, i)
+        successful[lfn] = {
+            "CERN-DST-EOS": "root://eoslhcb.cern.ch//eos/lhcb/grid/prod%s" % lfn,
+            "GRIDKA-DST": "srm://gridka-dcache.fzk.de:8443/srm/managerv2?SFN=/pnfs/gridka.de/lhcb%s" % lfn,
+        }
+    return {"OK": True, "Value": {"Successful": successful, "Failed": {}}}
+
+
+def jobAttributeTable():
+    """Result of a getJobsSummary call on NB_JOBS jobs"""
+    now = datetime.datetime(2022, 3, 4, 5, 6, 7)
+    jobs = {}
+    for jobID in range(1000000, 1000000 + NB_JOBS):
+        jobs[jobID] = {
+            "JobID": jobID,
+            "JobName": "00012345_%08d" % jobID,
+            "Owner": "lhcbprod",
+            "OwnerGroup": "lhcb_mc",
+            "Status": "Running",
+            "MinorStatus": "Application",
+            "ApplicationStatus": "Gauss step 1",
+            "Site": "LCG.CERN.cern",
+            "JobType": "MCSimulation",
+            "UserPriority": 1,
+            "RescheduleCounter": 0,
+            "SubmissionTime": now,
+            "HeartBeatTime": now,
+            "LastUpdateTime": now,
+            "CPUTime": 12345.5,
+        }
+    return {"OK": True, "Value": jobs}
+
+
+def bulkStatusUpdate():
+    """Arguments of a setJobStatusBulk call: NB_STATUS_UPDATES status changes of one job"""
+    statusDict = {}
+    for i in range(NB_STATUS_UPDATES):
+        timestamp = "2022-03-04 05:%02d:%02d.%06d" % (i // 3600 % 60, i // 60 % 60, i)
+        statusDict[timestamp] = {
+            "Status": "Running",
+            "MinorStatus": "Application",
+            "ApplicationStatus": "Event %d" % i,
+            "Source": "JobWrapper",
+        }
+    return (123456, statusDict, False)
+
+
+payloads = pytest.mark.parametrize(
+    "payloadFunc", [replicaDict, jobAttributeTable, bulkStatusUpdate], ids=lambda func: func.__name__
+)
+
+
+@engines
+@payloads
+def test_encode(benchmark, engine, payloadFunc):
+    payload = payloadFunc()
+    encoded = benchmark(engine.encode, payload)
+    assert encoded == DEncode.encode(payload)
+
+
+@engines
+@payloads
+def test_decode(benchmark, engine, payloadFunc):
+    payload = payloadFunc()
+    encoded = DEncode.encode(payload)
+    decoded, length = benchmark(engine.decode, encoded)
+    assert length == len(encoded)
+    assert decoded == payload
+
+
+@payloads
+def test_streamDecode(benchmark, payloadFunc):
+    """Decoding the payload as it arrives from the network in 64kB chunks"""
+    payload = payloadFunc()
+    encoded = DEncode.encode(payload)
+    chunks = [encoded[i : i + 65536] for i in range(0, len(encoded), 65536)]
+
+    def streamDecode():
+        decoder = FastDEncode.StreamDecoder()
+        results = []
+        for chunk in chunks:
+            results.extend(decoder.feed(chunk))
+        results.extend(decoder.close())
+        return results
+
+    assert benchmark(streamDecode) == [payload]
@@ -0,0 +1,171 @@
+""" A fake FTS3 server, answering the monitoring requests of the FTS3 REST API for a large number
+of active jobs, to benchmark the monitoring of the FTS3Agent without a real server.
+
+It is a plain HTTP server, which ignores the credentials: the fts3 contexts using it can be created
+with any ``fts_access_token`` instead of a proxy.
+The state of the jobs does not change: one job out of ten is finished, the others are active
+with half of their files finished.
+
+Run it standalone with::
+
+  python tests/Performance/FTS3Monitoring/FakeFTS3Server.py --port 8446 --jobs 100000
+"""
+import argparse
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_INFO = {"api": {"major": 3, "minor": 12, "patch": 0}, "schema": {"major": 8, "minor": 0, "patch": 0}}
+
+
+def jobGUID(jobIndex):
+    """FTS GUID of the job with the given index"""
+    return str(uuid.UUID(int=jobIndex + 1))
+
+
+class FakeFTS3Handler(BaseHTTPRequestHandler):
+    """Answer the GET requests of the monitoring"""
+
+    # Keep the connections alive, as the real servers do
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.countConnection()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.countRequest()
+        url = urlparse(self.path)
+        path = [part for part in url.path.split("/") if part]
+        if not path:
+            return self._answer(200, API_INFO)
+        if path[0] != "jobs" or len(path) > 3:
+            return self._answer(404, {"status": "404 Not Found", "message": "No such resource"})
+
+        jobIndexes = [self.server.getJobIndex(guid) for guid in path[1].split(",")]
+        if len(jobIndexes) == 1:
+            jobIndex = jobIndexes[0]
+            if jobIndex is None:
+                return self._answer(404, {"status": "404 Not Found", "message": "No job with the id %s" % path[1]})
+            if len(path) == 3:
+                if path[2] == "files":
+                    return self._answer(200, self.server.getFiles(jobIndex))
+                return self._answer(200, [])
+            return self._answer(200, self.server.getJob(jobIndex))
+
+        # Bulk request: the files are listed with the requested fields
+        fileFields = parse_qs(url.query).get("files", [""])[0].split(",")
+        jobs = []
+        for guid, jobIndex in zip(path[1].split(","), jobIndexes):
+            if jobIndex is None:
+                jobs.append({"job_id": guid, "http_status": "404 Not Found"})
+                continue
+            job = self.server.getJob(jobIndex)
+            job["http_status"] = "200 Ok"
+            job["files"] = [
+                {field: fileDict.get(field) for field in fileFields} for fileDict in self.server.getFiles(jobIndex)
+            ]
+            jobs.append(job)
+        notFound = sum(1 for job in jobs if job["http_status"].startswith("404"))
+        self._answer(207 if notFound else 200, jobs)
+
+    def _answer(self, code, data):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeFTS3Server(ThreadingHTTPServer):
+    """Fake FTS3 server with nbJobs active jobs of filesPerJob files each
+
+    The number of connections and requests received are counted,
+    to check the reuse of the connections.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, nbJobs=100000, filesPerJob=10):
+        super().__init__(("localhost", port), FakeFTS3Handler)
+        self.nbJobs = nbJobs
+        self.filesPerJob = filesPerJob
+        self.endpoint = "http://localhost:%s" % self.server_address[1]
+        self.connections = 0
+        self.requests = 0
+        self._countersLock = threading.Lock()
+
+    def countConnection(self):
+        with self._countersLock:
+            self.connections += 1
+
+    def countRequest(self):
+        with self._countersLock:
+            self.requests += 1
+
+    def getJobIndex(self, guid):
+        """Index of the job with the given GUID, None if it does not exist"""
+        try:
+            jobIndex = uuid.UUID(guid).int - 1
+        except ValueError:
+            return None
+        return jobIndex if 0 <= jobIndex < self.nbJobs else None
+
+    @staticmethod
+    def isFinished(jobIndex):
+        return jobIndex % 10 == 0
+
+    def getJob(self, jobIndex):
+        """Status of a job, as returned by the FTS3 REST API"""
+        return {
+            "job_id": jobGUID(jobIndex),
+            "job_state": "FINISHED" if self.isFinished(jobIndex) else "ACTIVE",
+            "reason": None,
+            "job_metadata": {"operationID": jobIndex, "sourceSE": "CERN-DST", "targetSE": "RAL-DST"},
+            "submit_time": "2022-01-01T00:00:00",
+        }
+
+    def getFiles(self, jobIndex):
+        """Files of a job, as returned by the FTS3 REST API"""
+        files = []
+        for fileIndex in range(self.filesPerJob):
+            finished = self.isFinished(jobIndex) or fileIndex % 2 == 0
+            files.append(
+                {
+                    "file_id": jobIndex * self.filesPerJob + fileIndex,
+                    "file_state": "FINISHED" if finished else "ACTIVE",
+                    "reason": "",
+                    "file_metadata": {"fileID": jobIndex * self.filesPerJob + fileIndex},
+                    "filesize": 1000000,
+                    "tx_duration": 10.0 if finished else None,
+                    "source_surl": "root://source/file_%s_%s" % (jobIndex, fileIndex),
+                    "dest_surl": "root://dest/file_%s_%s" % (jobIndex, fileIndex),
+                }
+            )
+        return files
+
+    def startInThread(self):
+        """Serve the requests in a background thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8446)
+    parser.add_argument("--jobs", type=int, default=100000, help="number of active jobs")
+    parser.add_argument("--files", type=int, default=10, help="number of files per job")
+    args = parser.parse_args()
+    server = FakeFTS3Server(port=args.port, nbJobs=args.jobs, filesPerJob=args.files)
+    print("Fake FTS3 server with %s jobs listening on %s" % (args.jobs, server.endpoint))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,82 @@
+""" Benchmarks of the monitoring of the FTS3 jobs against a fake FTS3 server with many active jobs:
+one request per job (the default) against bulk requests through a persistent session (BulkMonitoring)
+
+Run with ``pytest tests/Performance/FTS3Monitoring/ --benchmark-group-by=group``
+"""
+import random
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+import fts3.rest.client.easy as fts3
+from fts3.rest.client.request import Request as ftsSSLRequest
+
+from DIRAC.DataManagementSystem.Client.FTS3Job import FTS3Job
+from DIRAC.DataManagementSystem.private.FTS3Utilities import FTS3SessionRequest
+
+from .FakeFTS3Server import FakeFTS3Server, jobGUID
+
+pytest.importorskip("pytest_benchmark")
+
+NB_ACTIVE_JOBS = 100000
+# Jobs monitored in each round, as by one FTS3Agent cycle
+NB_MONITORED_JOBS = 2000
+# As the MaxThreads option of the FTS3Agent
+NB_THREADS = 10
+
+
+@pytest.fixture(scope="module")
+def fakeServer():
+    server = FakeFTS3Server(nbJobs=NB_ACTIVE_JOBS)
+    server.startInThread()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def ftsJobs(fakeServer):
+    """FTS3Jobs for a random sample of the active jobs of the server"""
+    jobs = []
+    for jobIndex in random.sample(range(NB_ACTIVE_JOBS), NB_MONITORED_JOBS):
+        ftsJob = FTS3Job()
+        ftsJob.jobID = jobIndex
+        ftsJob.ftsGUID = jobGUID(jobIndex)
+        ftsJob.ftsServer = fakeServer.endpoint
+        ftsJob.status = "Active"
+        jobs.append(ftsJob)
+    return jobs
+
+
+@pytest.mark.benchmark(group="FTS3Monitoring")
+def test_monitorOneByOne(benchmark, fakeServer, ftsJobs):
+    """One request per job, with a new connection for each request"""
+    context = fts3.Context(endpoint=fakeServer.endpoint, fts_access_token="fakeToken", request_class=ftsSSLRequest)
+    pool = ThreadPool(NB_THREADS)
+
+    def monitor():
+        results = pool.map(lambda ftsJob: ftsJob.monitor(context=context), ftsJobs)
+        assert all(res["OK"] for res in results)
+
+    benchmark(monitor)
+    pool.close()
+
+
+@pytest.mark.benchmark(group="FTS3Monitoring")
+@pytest.mark.parametrize("jobsPerRequest", [20, 50, 200])
+def test_monitorBulk(benchmark, fakeServer, ftsJobs, jobsPerRequest):
+    """Bulk requests of jobsPerRequest jobs, through a persistent session"""
+    context = fts3.Context(endpoint=fakeServer.endpoint, fts_access_token="fakeToken", request_class=FTS3SessionRequest)
+    pool = ThreadPool(NB_THREADS)
+    chunks = [ftsJobs[i : i + jobsPerRequest] for i in range(0, len(ftsJobs), jobsPerRequest)]
+
+    def monitor():
+        results = pool.map(lambda chunk: FTS3Job.monitorJobs(context, chunk), chunks)
+        assert all(res["OK"] for res in results)
+        assert all(jobRes["OK"] for res in results for jobRes in res["Value"].values())
+
+    connections = fakeServer.connections
+    benchmark(monitor)
+    pool.close()
+    # The connections are kept alive: at most one per thread
+    assert fakeServer.connections - connections <= NB_THREADS
@@ -0,0 +1,56 @@
+""" Benchmarks of the JDL parsing on a corpus of JDLs
+
+Run with ``pytest tests/Performance/JDL/ --benchmark-group-by=param:jdlFile``
+"""
+import glob
+import os
+
+import pytest
+
+from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
+from DIRAC.Core.Utilities.JDL import getParsedJDL, loadJDLAsCFG, parseJDL
+
+pytest.importorskip("pytest_benchmark")
+
+# Directory of *.jdl files, e.g. dumped from the JobJDLs table of a production JobDB
+CORPUS_DIR = os.environ.get("DIRAC_JDL_CORPUS", os.path.join(os.path.dirname(__file__), "corpus"))
+
+corpus = pytest.mark.parametrize("jdlFile", sorted(glob.glob(os.path.join(CORPUS_DIR, "*.jdl"))), ids=os.path.basename)
+
+
+def readJDL(jdlFile):
+    with open(jdlFile) as fd:
+        return fd.read()
+
+
+@corpus
+def test_parseJDL(benchmark, jdlFile):
+    """Parsing without the cache"""
+    jdl = readJDL(jdlFile)
+    result = benchmark(parseJDL, jdl)
+    assert result["OK"], result["Message"]
+
+
+@corpus
+def test_getParsedJDL(benchmark, jdlFile):
+    """Parsing a JDL already in the cache"""
+    jdl = readJDL(jdlFile)
+    assert getParsedJDL(jdl)["OK"]
+    result = benchmark(getParsedJDL, jdl)
+    assert result["OK"], result["Message"]
+
+
+@corpus
+def test_classAd(benchmark, jdlFile):
+    """Building a ClassAd, as done by the JobDB, the Matcher, the optimizers and the JobWrapper"""
+    jdl = readJDL(jdlFile)
+    classAd = benchmark(ClassAd, jdl)
+    assert classAd.isOK()
+
+
+@corpus
+def test_loadJDLAsCFG(benchmark, jdlFile):
+    """Loading a job manifest"""
+    jdl = readJDL(jdlFile)
+    result = benchmark(loadJDLAsCFG, jdl)
+    assert result["OK"], result["Message"]
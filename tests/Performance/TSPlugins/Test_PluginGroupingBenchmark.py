@@ -0,0 +1,82 @@
+""" Benchmarks of the grouping of the input files by the transformation plugins, file by file and columnar
+
+Run with ``pytest tests/Performance/TSPlugins/ --benchmark-group-by=func,param:nFiles``
+"""
+import os
+import random
+
+import pytest
+from mock import MagicMock, patch
+
+from DIRAC import S_OK
+from DIRAC.TransformationSystem.Client.Utilities import PluginUtilities
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("numpy")
+
+# Number of files of the inputs, e.g. DIRAC_TS_BENCHMARK_FILES=1000000
+N_FILES = [int(nFiles) for nFiles in os.environ.get("DIRAC_TS_BENCHMARK_FILES", "10000,100000").split(",")]
+DISK_SES = ["CERN-DST", "CNAF-DST", "GRIDKA-DST", "IN2P3-DST", "PIC-DST", "RAL-DST", "SARA-DST"]
+TAPE_SES = ["CERN-RAW", "CNAF-RAW", "GRIDKA-RAW", "IN2P3-RAW", "PIC-RAW", "RAL-RAW", "SARA-RAW"]
+
+
+def getInput(nFiles):
+    """Files of runs, at a tape SE and 1 or 2 disk SEs, with sizes of 1 to 5 GB"""
+    rng = random.Random(nFiles)
+    fileReplicas = {}
+    fileSizes = {}
+    for index in range(nFiles):
+        lfn = "/vo/data/2022/RAW/%06d/%08d_%08d.raw" % (index // 1000, index // 1000, index)
+        tier = rng.randrange(len(TAPE_SES))
+        fileReplicas[lfn] = [TAPE_SES[tier], DISK_SES[tier]]
+        if rng.random() < 0.3:
+            fileReplicas[lfn].append(rng.choice(DISK_SES))
+        fileSizes[lfn] = rng.randint(1000, 5000) * 1000 * 1000
+    return fileReplicas, fileSizes
+
+
+@pytest.fixture(scope="module", params=N_FILES, ids=lambda nFiles: "nFiles=%d" % nFiles)
+def inputFiles(request):
+    return getInput(request.param)
+
+
+@pytest.fixture
+def pluginUtilities():
+    def storageElement(se):
+        seMock = MagicMock()
+        seMock.status.return_value = {"DiskSE": se.endswith("DST")}
+        return seMock
+
+    with patch("DIRAC.TransformationSystem.Client.Utilities.StorageElement", side_effect=storageElement), patch(
+        "DIRAC.TransformationSystem.Client.Utilities.DMSHelpers"
+    ):
+        yield PluginUtilities(transClient=MagicMock(), dataManager=MagicMock(), fc=MagicMock())
+
+
+def group(pluginUtilities, method, useFileGroups, inputFiles, groupSize, status):
+    fileReplicas, fileSizes = inputFiles
+    pluginUtilities.useFileGroups = useFileGroups
+    pluginUtilities.groupSize = groupSize
+    pluginUtilities.maxFiles = 100
+    pluginUtilities.cachedLFNSize = {}
+    pluginUtilities.fc.getFileSize.return_value = S_OK({"Successful": fileSizes, "Failed": {}})
+    result = getattr(pluginUtilities, method)(fileReplicas, status)
+    assert result["OK"], result["Message"]
+    return result["Value"]
+
+
+@pytest.mark.parametrize("useFileGroups", [False, True], ids=["PerFile", "FileGroups"])
+def test_groupByReplicas(benchmark, pluginUtilities, inputFiles, useFileGroups):
+    """Tasks of 7 files (Standard and ByShare plugins): many files left, grouped SE by SE"""
+    tasks = benchmark(group, pluginUtilities, "groupByReplicas", useFileGroups, inputFiles, 7, "Active")
+    if useFileGroups:
+        assert tasks == group(pluginUtilities, "groupByReplicas", False, inputFiles, 7, "Active")
+
+
+@pytest.mark.parametrize("useFileGroups", [False, True], ids=["PerFile", "FileGroups"])
+def test_groupBySize(benchmark, pluginUtilities, inputFiles, useFileGroups):
+    """Tasks of 20 GB (BySize plugin)"""
+    groupSize = 20 * 1000 * 1000 * 1000.0
+    tasks = benchmark(group, pluginUtilities, "groupBySize", useFileGroups, inputFiles, groupSize, "Flush")
+    if useFileGroups:
+        assert tasks == group(pluginUtilities, "groupBySize", False, inputFiles, groupSize, "Flush")